@@ -594,7 +594,7 @@ this.setData(updateData)
       console.log(`[handleNightAction] myRole=${myRole}, currentRole=${currentRole}, nightTimeLeft=${nightTimeLeft}`)
 
       // 检查是否轮到我的角色
-      const isMyTurn = currentRole === myRole
+      const isMyTurn = this.isNightRoleActing(gameData, myRole as string)
       this.setData({ isMyTurn })
 
       // 晚上行动阶段：Agent 由前端触发后端接口
@@ -619,7 +619,7 @@ this.setData(updateData)
         }
 
         // 检查是否轮到这个角色行动
-        if (currentRole !== playerRole) {
+        if (!this.isNightRoleActing(gameData, playerRole)) {
           console.log(`[handleNightAction] 跳过 ${player.seat} (当前不是该角色行动: ${playerRole} != ${currentRole})`)
           continue
         }
@@ -676,7 +676,7 @@ this.setData(updateData)
       const currentRole = gameData.currentRole as string || gameData.actionRole || ''
 
       // 根据当前角色和是否轮到我，更新提示文本
-      if (currentRole === myRole) {
+      if (this.isNightRoleActing(gameData, myRole as string)) {
         const roleMap: Record<string, string> = {
           'werewolf': '请选择击杀目标',
           'witch': '请选择是否使用药水',
@@ -690,11 +690,22 @@ this.setData(updateData)
         const roleName: Record<string, string> = { 'werewolf': '狼人', 'witch': '女巫', 'seer': '预言家' }
         this.setData({
           nightPhaseTip: '请等待其他角色行动',
-          waitingText: `${roleName[currentRole as string] || currentRole}正在行动中...`
+          waitingText: currentRole === 'all'
+            ? '其他角色正在行动中...'
+            : `${roleName[currentRole as string] || currentRole}正在行动中...`
         })
       }
     },
 
+    // 辅助方法：该夜晚角色当前是否可以行动（快速模式下所有未完成的角色同时行动）
+    isNightRoleActing(gameData: any, role: string): boolean {
+      const currentRole = gameData.currentRole as string || gameData.actionRole || ''
+      if (currentRole === 'all') {
+        return (gameData.nightPendingRoles || []).includes(role)
+      }
+      return currentRole === role
+    },
+
     // 辅助方法：根据座位号获取角色
     getRoleBySeat(seat: number): string | null {
       if (!this.data.rolesBySeat) return null
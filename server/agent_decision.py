@@ -4,31 +4,240 @@ Agent 决策系统
 为不同角色的 AI Agent 提供智能决策，根据游戏上下文做出合理行动。
 每个角色只能根据自己的视角信息进行决策。
 """
+import json
 import logging
 import random
-from typing import List, Dict, Optional
-
-import openai
-
-# 导入配置
-from config import OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL
+import threading
+import time
+from typing import List, Dict, Optional, Set
+
+import config
+from llm_cache import LLMResponseCache, make_cache_key
+from llm_guard import CircuitBreaker, LLMUnavailableError, call_with_deadline
+from metrics import (
+    AGENT_DECISIONS, AGENT_DECISION_DURATION, AGENT_FALLBACKS,
+    LLM_INFLIGHT, LLM_REQUESTS, LLM_REQUEST_DURATION, LLM_TOKENS
+)
+from prompt_context import RoomPromptContext, get_room_prompt_context, clear_room_prompt_context
+from prompt_history import clear_room_history
+from room_store import RoomRegistry, get_store
 from state_machines import Role
 from state_machines.state_context import GameStateContext
+from tracing import set_attribute, traced
 
 logger = logging.getLogger('agent_decision')
 
-# 初始化 OpenAI 客户端
-try:
-    llm_client = openai.OpenAI(
-        api_key=OPENAI_API_KEY,
-        base_url=OPENAI_BASE_URL
-    )
-    logger.info(f"已初始化大模型客户端: {OPENAI_MODEL}")
-except Exception as e:
-    logger.error(f"大模型客户端初始化失败: {str(e)}")
-    llm_client = None
+# 大模型运行时（客户端、熔断器、缓存）在首次使用时初始化：
+# 导入本模块不加载 openai SDK、不读取 config.json，缺少配置时 Agent 使用规则决策
+_llm_client = None
+_llm_breaker: Optional[CircuitBreaker] = None
+_llm_cache: Optional[LLMResponseCache] = None
+_llm_initialized = False
+_llm_init_lock = threading.Lock()
+
+
+def _init_llm():
+    """初始化大模型客户端、熔断器和响应缓存（只执行一次）"""
+    global _llm_client, _llm_breaker, _llm_cache, _llm_initialized
+    with _llm_init_lock:
+        if _llm_initialized:
+            return
+
+        try:
+            settings = config.get_settings()
+        except Exception as e:
+            logger.error(f"大模型配置不可用，Agent 将使用规则决策: {str(e)}")
+            settings = None
+        get = config.get_setting
+
+        # 全局熔断器：错误率过高时所有房间都跳过大模型，直接使用规则决策
+        _llm_breaker = CircuitBreaker(
+            window_size=get('CIRCUIT_BREAKER_WINDOW'),
+            min_calls=get('CIRCUIT_BREAKER_MIN_CALLS'),
+            failure_rate_threshold=get('CIRCUIT_BREAKER_FAILURE_RATE'),
+            cooldown_seconds=get('CIRCUIT_BREAKER_COOLDOWN_SECONDS')
+        )
+
+        if settings is not None:
+            # 按配置在后台启动本地模拟大模型服务
+            if settings['FAKE_LLM_ENABLED'] and settings['FAKE_LLM_AUTOSTART']:
+                try:
+                    from tools.fake_llm_server import start_server_in_background
+                    start_server_in_background(settings['FAKE_LLM_HOST'], settings['FAKE_LLM_PORT'],
+                                               settings['FAKE_LLM_PROFILE'], settings['FAKE_LLM_PROFILES'])
+                except Exception as e:
+                    logger.error(f"模拟大模型服务启动失败: {str(e)}")
+
+            # 初始化 OpenAI 客户端（重试由 call_with_deadline 在截止时间内控制）
+            try:
+                import openai
+                _llm_client = openai.OpenAI(
+                    api_key=settings['OPENAI_API_KEY'],
+                    base_url=settings['OPENAI_BASE_URL'],
+                    max_retries=0
+                )
+                logger.info(f"已初始化大模型客户端: {settings['OPENAI_MODEL']}")
+            except Exception as e:
+                logger.error(f"大模型客户端初始化失败: {str(e)}")
+                _llm_client = None
+
+            # 大模型响应缓存（可选）
+            if settings['LLM_CACHE_ENABLED']:
+                try:
+                    _llm_cache = LLMResponseCache(
+                        path=settings['LLM_CACHE_PATH'] or None,
+                        memory_entries=settings['LLM_CACHE_MEMORY_ENTRIES'],
+                        max_entries=settings['LLM_CACHE_MAX_ENTRIES'],
+                        ttl_seconds=settings['LLM_CACHE_TTL_SECONDS']
+                    )
+                    logger.info(f"已启用大模型响应缓存: {settings['LLM_CACHE_PATH'] or '仅内存'}")
+                except Exception as e:
+                    logger.error(f"大模型响应缓存初始化失败: {str(e)}")
+
+        _llm_initialized = True
+
+
+def get_llm_client():
+    """获取大模型客户端（首次调用时初始化，配置不可用时为 None）"""
+    if not _llm_initialized:
+        _init_llm()
+    return _llm_client
+
+
+def get_llm_breaker() -> CircuitBreaker:
+    """获取全局熔断器"""
+    if not _llm_initialized:
+        _init_llm()
+    return _llm_breaker
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """获取大模型响应缓存（未启用时为 None）"""
+    if not _llm_initialized:
+        _init_llm()
+    return _llm_cache
+
+
+def get_decision_deadline(context: GameStateContext, decision_type: str) -> float:
+    """
+    根据当前回合计时器计算决策截止时间
+
+    Args:
+        context: 游戏状态上下文
+        decision_type: 决策类型 ('speech', 'vote' 或 'night_action')
+
+    Returns:
+        截止时间戳（time.time() 口径）
+    """
+    start_time, time_limit = 0.0, 0
+    if decision_type == 'speech':
+        start_time, time_limit = context.speaking_start_time, context.speaking_time_limit
+    elif decision_type == 'vote':
+        start_time, time_limit = context.voting_start_time, context.voting_time_limit
+    elif decision_type == 'night_action':
+        start_time = context.night_role_start_times.get(context.night_current_role, 0.0)
+        time_limit = context.night_role_time_limit
+
+    now = time.time()
+    deadline = now + config.get_setting('LLM_TIMEOUT_SECONDS')
+    if start_time > 0 and time_limit > 0:
+        # 计时器使用房间时钟（可能是虚拟时钟），换算成剩余时间后再落到墙上时钟
+        room_now = context.clock.now() if context.clock is not None else now
+        remaining = start_time + time_limit - config.get_setting('DECISION_DEADLINE_MARGIN_SECONDS') - room_now
+        deadline = min(deadline, now + remaining)
+    return deadline
+
+
+@traced('llm.chat_completion')
+def chat_completion(messages: List[Dict], max_tokens: int, temperature: float, deadline: float) -> str:
+    """
+    在截止时间内调用大模型（启用缓存时优先返回缓存结果）
+
+    Args:
+        messages: 对话消息
+        max_tokens: 最大生成 token 数
+        temperature: 采样温度
+        deadline: 截止时间戳
+
+    Returns:
+        模型返回的文本
+
+    Raises:
+        LLMUnavailableError: 客户端未初始化、熔断、超时或重试耗尽
+    """
+    llm_cache = get_llm_cache()
+    llm_client = get_llm_client()
+    model = config.get_setting('OPENAI_MODEL')
+
+    cache_key = None
+    if llm_cache is not None:
+        cache_key = make_cache_key(model, messages, max_tokens=max_tokens, temperature=temperature)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc(outcome='cache_hit')
+            set_attribute('outcome', 'cache_hit')
+            return cached
+        if config.get_setting('LLM_CACHE_OFFLINE'):
+            LLM_REQUESTS.inc(outcome='offline_miss')
+            set_attribute('outcome', 'offline_miss')
+            raise LLMUnavailableError("离线模式下缓存未命中", reason='offline_miss')
+
+    if llm_client is None:
+        LLM_REQUESTS.inc(outcome='no_client')
+        set_attribute('outcome', 'no_client')
+        raise LLMUnavailableError("大模型客户端未初始化", reason='no_client')
+
+    def _request(timeout: float) -> str:
+        response = llm_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            stream=False,
+            max_tokens=max_tokens,
+            temperature=temperature,
+            timeout=timeout
+        )
+        usage = getattr(response, 'usage', None)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, type='prompt')
+            LLM_TOKENS.inc(usage.completion_tokens or 0, type='completion')
+            set_attribute('promptTokens', usage.prompt_tokens)
+            set_attribute('completionTokens', usage.completion_tokens)
+        return response.choices[0].message.content.strip()
+
+    started = time.perf_counter()
+    LLM_INFLIGHT.inc()
+    try:
+        content = call_with_deadline(_request, deadline, max_retries=config.get_setting('LLM_MAX_RETRIES'),
+                                     breaker=get_llm_breaker())
+    except LLMUnavailableError as e:
+        LLM_REQUESTS.inc(outcome=e.reason)
+        set_attribute('outcome', e.reason)
+        raise
+    finally:
+        LLM_INFLIGHT.dec()
+        LLM_REQUEST_DURATION.observe(time.perf_counter() - started)
+    LLM_REQUESTS.inc(outcome='ok')
+    set_attribute('outcome', 'ok')
+    if cache_key is not None:
+        llm_cache.set(cache_key, content)
+    return content
 
 
+def _get_prompt_context(context: GameStateContext) -> RoomPromptContext:
+    """获取房间共享的提示词上下文"""
+    return get_room_prompt_context(context.room_id, config.get_setting('HISTORY_TOKEN_BUDGET'),
+                                   config.get_setting('HISTORY_RECENT_WINDOW'))
+
+
+def _fallback_speech(context: GameStateContext, seat: int) -> str:
+    """大模型不可用时的规则发言（不暴露身份）"""
+    last_dead = context.last_dead_player
+    if last_dead and last_dead.get('seat'):
+        return f"我是{seat}号。昨晚{last_dead.get('seat')}号出局了，目前信息还不多，我先听听后面的发言再做判断。"
+    return f"我是{seat}号，目前信息还不多，我先听听大家的发言再做判断。"
+
+
+@traced('agent.speech')
 def generate_agent_speech(context: GameStateContext, seat: int) -> str:
     """
     为 Agent 生成白天讨论发言
@@ -45,101 +254,33 @@ def generate_agent_speech(context: GameStateContext, seat: int) -> str:
         return '我没什么好说的。'
 
     role_name = agent.role.value if agent.role else 'unknown'
+    started = time.perf_counter()
 
-    # 获取历史对话消息
-    messages_history = context.messages
-
-    # 构建历史对话文本
-    history_text = ""
-    if messages_history:
-        history_text = "\n".join(
-            f"[Round {msg.content.get('round', '?')}] {msg.content.get('message', '')}" for msg in messages_history[-10:]  # 只取最近10条
-        )
-
-    # 获取存活玩家信息
-    alive_players = context.get_alive_players()
-
-    # === 角色信息（不同角色能看到不同的内容）===
-    role_info = ""
-    if agent.role == Role.WEREWOLF:
-        # 狼人视角：看到所有狼人队友的身份
-        if context.werewolf_context:
-            teammates = context.werewolf_context.get('teammates', [])
-            werewolf_info = [f"{s}号是狼人" for s in teammates]
-            role_info = "狼人视角：\n" + "\n".join(werewolf_info)
-        else:
-            role_info = "狼人视角：\n无队友信息"
-    elif agent.role == Role.SEER or agent.role == Role.WITCH or agent.role == Role.HUNTER or agent.role == Role.VILLAGER:
-        # 预言家、女巫、猎人、村民：只能看到自己的角色
-        role_info = f"神职/村民视角：\n{seat}号是{role_name}"
-
-    # === 动作信息（不同角色特有的夜晚行动信息）===
-    action_info = ""
-    if agent.role == Role.WEREWOLF:
-        # 狼人：知道昨晚杀的人
-        if context.last_dead_player and context.last_dead_player.get('killed_by') == 'werewolf':
-            action_info = f"\n夜晚行动信息：\n昨晚击杀了{context.last_dead_player.get('seat', '未知')}号"
-    elif agent.role == Role.SEER:
-        # 预言家：查看历史
-        if context.seer_context:
-            action_info = "\n夜晚行动信息：\n" + "\n".join(
-                f"第{c.get('round', '?')}晚查了{c.get('seat', '?')}号，结果是{c.get('result', '?')}"
-                for c in context.seer_context
-            )
-    elif agent.role == Role.WITCH:
-        # 女巫：药水状态和使用历史
-        if context.witch_context:
-            action_info = f"\n夜晚行动信息：\n解药状态：{'有' if context.witch_context.get('has_save_potion') else '已使用'}\n毒药状态：{'有' if context.witch_context.get('has_poison_potion') else '已使用'}"
-            saved = context.witch_context.get('saved_history', [])
-            if saved:
-                action_info += f"\n救过的玩家：{', '.join(map(str, saved))}"
-    # 猎人和村民：没有特殊夜晚行动信息
-
-    prompt = f"""你是一个狼人杀游戏的玩家。
-
-【游戏规则】
-- 狼人阵营：狼人每晚选择一名玩家击杀
-- 神职阵营：
-  * 预言家：每晚查验一名玩家的身份
-  * 女巫：有一瓶解药（救被狼人杀的人）和一瓶毒药（毒死一人），同一晚只能使用一瓶
-  * 猎人：死亡时可开枪带走一人
-- 平民阵营：村民，晚上不行动
-- 投票规则：白天所有人投票，票数最多者出局
-
-【角色信息】
-座位号：{seat}
-{role_info}
-
-【游戏状态】
-当前轮次：第 {context.round} 轮
-存活玩家：{', '.join(map(str, alive_players))}
-今晚被狼人击杀：{context.werewolf_killed if context.werewolf_killed else '无'}号
-昨晚死亡：{context.last_dead_player.get('seat', '无') if context.last_dead_player else '无'}号（{context.last_dead_player.get('killed_by', 'N/A') if context.last_dead_player else 'N/A'}）
-{action_info}
-
-【历史对话】（最近10条）
-{history_text if history_text else '暂无对话'}
-
+    # 固定前缀 + 房间共享的公共段 + 该座位的角色段（后两者按状态版本缓存）
+    prompt = _get_prompt_context(context).build(context, seat, '', """
 【任务】
 现在进入白天讨论阶段，轮到你发言了。
 请根据你的角色和游戏状态，生成一段自然的发言内容（50-200字）。
 发言要符合你的角色身份和游戏情境。
 
-返回纯文本发言内容，不要有多余格式："""
+返回纯文本发言内容，不要有多余格式：""")
 
-    response = llm_client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "你是狼人杀游戏的 AI 玩家，需要根据角色和游戏状态生成自然的发言。"},
-            {"role": "user", "content": prompt}
-        ],
-        stream=False,
-        max_tokens=500,
-        temperature=0.8
-    )
-
-    speech = response.choices[0].message.content.strip()
+    try:
+        speech = chat_completion(
+            messages=[
+                {"role": "system", "content": "你是狼人杀游戏的 AI 玩家，需要根据角色和游戏状态生成自然的发言。"},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=500,
+            temperature=0.8,
+            deadline=get_decision_deadline(context, 'speech')
+        )
+    except LLMUnavailableError as e:
+        logger.warning(f"Agent {seat} 大模型发言不可用，使用规则发言: {str(e)}")
+        AGENT_FALLBACKS.inc(decision_type='speech', reason=e.reason)
+        speech = _fallback_speech(context, seat)
 
+    _record_decision(role_name, 'speech', started)
     logger.debug(f"Agent {seat} ({role_name}) 发言: {speech}")
     return speech
 
@@ -151,6 +292,25 @@ class AgentDecision:
         self.context = context
         self.agent_seat = agent_seat
         self.agent = context.players.get(agent_seat)
+        # 每个座位独立的随机数生成器（由房间种子派生），不占用房间规则的随机序列
+        self.rng = random.Random(f"{context.seed}:{agent_seat}")
+
+    # 不属于决策状态的属性（由上下文和座位重建）
+    _BOUND_ATTRIBUTES = ('context', 'agent_seat', 'agent', 'rng')
+
+    def export_state(self) -> Dict:
+        """导出决策状态（随机数状态和子类记录的历史），用于保存到房间存储"""
+        rng_version, rng_internal, rng_gauss = self.rng.getstate()
+        return {
+            'rng': [rng_version, list(rng_internal), rng_gauss],
+            'state': {k: v for k, v in vars(self).items() if k not in self._BOUND_ATTRIBUTES},
+        }
+
+    def restore_state(self, exported: Dict):
+        """恢复 export_state() 导出的决策状态"""
+        rng_version, rng_internal, rng_gauss = exported['rng']
+        self.rng.setstate((rng_version, tuple(rng_internal), rng_gauss))
+        vars(self).update(exported['state'])
 
     def get_alive_players_except_self(self) -> List[int]:
         """获取除自己以外的存活玩家"""
@@ -169,7 +329,7 @@ class AgentDecision:
         """决定投票（子类可以重写）"""
         return {
             'voterSeat': self.agent_seat,
-            'targetSeat': random.choice(available_targets) if available_targets else None,
+            'targetSeat': self.rng.choice(available_targets) if available_targets else None,
             'reason': '随机投票'
         }
 
@@ -183,40 +343,20 @@ class AgentDecision:
             available_targets: 可选目标列表
 
         Returns:
-            决策结果
+            决策结果，大模型不可用或返回无效时为 None
         """
         role_name = self.agent.role.value if self.agent.role else 'unknown'
         targets_str = ', '.join(map(str, available_targets))
 
-        # 获取历史对话消息
-        messages_history = self.context.messages
-
-        # 构建历史对话文本
-        history_text = ""
-        if messages_history:
-            history_text = "\n历史对话：\n" + "\n".join(
-                f"[Round {msg.content.get('round', '?')}] {msg.content.get('message', '')}" for msg in messages_history
-            )
-
-        prompt = f"""你是一个狼人杀游戏的玩家。
-
-【游戏规则】
-- 狼人阵营：狼人每晚选择一名玩家击杀
-- 神职阵营：
-  * 预言家：每晚查验一名玩家的身份
-  * 女巫：有一瓶解药（救被狼人杀的人）和一瓶毒药（毒死一人），同一晚只能使用一瓶
-  * 猎人：死亡时可开枪带走一人
-- 平民阵营：村民，晚上不行动
-- 投票规则：白天所有人投票，票数最多者出局
-
-【你的信息】
-- 角色：{role_name}
-- 座位号：{self.agent_seat}
-
+        # 固定前缀 + 房间共享的公共段 + 该座位的角色段 + 本次决策的上下文
+        prompt = _get_prompt_context(self.context).build(
+            self.context,
+            self.agent_seat,
+            f"""
 【游戏上下文】
 {context_info}
-{history_text}
-
+""",
+            f"""
 【当前任务】
 决策类型：{decision_type}
 可选目标：{targets_str}
@@ -227,30 +367,41 @@ class AgentDecision:
     "targetSeat": 目标座位号数字,
     "reason": "决策原因简短描述"
 }}"""
-
-        response = llm_client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": "你是狼人杀游戏的 AI 玩家，需要根据角色和游戏状态做出合理决策。只返回 JSON 格式结果。"},
-                {"role": "user", "content": prompt}
-            ],
-            stream=False,
-            max_tokens=1000,
-            temperature=0.7
         )
 
-        content = response.choices[0].message.content.strip()
+        try:
+            content = chat_completion(
+                messages=[
+                    {"role": "system", "content": "你是狼人杀游戏的 AI 玩家，需要根据角色和游戏状态做出合理决策。只返回 JSON 格式结果。"},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=1000,
+                temperature=0.7,
+                deadline=get_decision_deadline(self.context, decision_type)
+            )
+        except LLMUnavailableError as e:
+            # 返回 None，由各角色回退到规则决策
+            logger.warning(f"Agent {self.agent_seat} 大模型决策不可用，使用规则决策: {str(e)}")
+            AGENT_FALLBACKS.inc(decision_type=decision_type, reason=e.reason)
+            return None
 
         # 尝试解析 JSON
-        import json
         # 移除可能的 markdown 代码块标记
         content = content.replace('```json', '').replace('```', '').strip()
-        result = json.loads(content)
+        try:
+            result = json.loads(content)
+        except ValueError:
+            logger.warning(f"Agent {self.agent_seat} 大模型返回无法解析，使用规则决策: {content[:100]}")
+            AGENT_FALLBACKS.inc(decision_type=decision_type, reason='invalid_response')
+            return None
+        if not isinstance(result, dict):
+            AGENT_FALLBACKS.inc(decision_type=decision_type, reason='invalid_response')
+            return None
 
         target = result.get('targetSeat')
         if target is not None and target not in available_targets and available_targets:
             # 如果目标无效，随机选择
-            target = random.choice(available_targets)
+            target = self.rng.choice(available_targets)
             result['reason'] = f"{result.get('reason', '')}（目标无效，随机选择）"
 
         logger.debug(f"大模型决策: {decision_type}, 目标: {target}, 原因: {result.get('reason', '')}")
@@ -297,7 +448,7 @@ class WerewolfAgent(AgentDecision):
             if not targets:
                 targets = available_targets
 
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             logger.info(f"[WerewolfAgent] 随机击杀: {target}")
             return {
                 'seat': self.agent_seat,
@@ -344,7 +495,7 @@ class WerewolfAgent(AgentDecision):
             if not targets:
                 targets = available_targets
 
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -354,7 +505,7 @@ class WerewolfAgent(AgentDecision):
             logger.error(f"[WerewolfAgent] decide_vote 失败: {str(e)}", exc_info=True)
             # 返回随机投票作为后备
             targets = [t for t in available_targets if t != self.agent_seat]
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -398,7 +549,7 @@ class SeerAgent(AgentDecision):
             if not targets:
                 targets = available_targets
 
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
 
             # 记录查验
             self.checked_history.append({
@@ -443,7 +594,7 @@ class SeerAgent(AgentDecision):
                     }
 
             # 没有已知狼人，随机投票
-            target = random.choice(available_targets) if available_targets else None
+            target = self.rng.choice(available_targets) if available_targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -453,7 +604,7 @@ class SeerAgent(AgentDecision):
             logger.error(f"[SeerAgent] decide_vote 失败: {str(e)}", exc_info=True)
             # 返回随机投票作为后备
             targets = [t for t in available_targets if t != self.agent_seat]
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -569,7 +720,7 @@ class WitchAgent(AgentDecision):
                 }
 
             # 大模型不可用，随机投票
-            target = random.choice(available_targets) if available_targets else None
+            target = self.rng.choice(available_targets) if available_targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -579,7 +730,7 @@ class WitchAgent(AgentDecision):
             logger.error(f"[WitchAgent] decide_vote 失败: {str(e)}", exc_info=True)
             # 返回随机投票作为后备
             targets = [t for t in available_targets if t != self.agent_seat]
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -612,7 +763,7 @@ class HunterAgent(AgentDecision):
     def decide_vote(self, available_targets: List[int]) -> Dict:
         """猎人投票决策（随机）"""
         try:
-            target = random.choice(available_targets) if available_targets else None
+            target = self.rng.choice(available_targets) if available_targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -622,7 +773,7 @@ class HunterAgent(AgentDecision):
             logger.error(f"[HunterAgent] decide_vote 失败: {str(e)}", exc_info=True)
             # 返回随机投票作为后备
             targets = [t for t in available_targets if t != self.agent_seat]
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -655,7 +806,7 @@ class VillagerAgent(AgentDecision):
     def decide_vote(self, available_targets: List[int]) -> Dict:
         """村民投票决策（随机）"""
         try:
-            target = random.choice(available_targets) if available_targets else None
+            target = self.rng.choice(available_targets) if available_targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -665,7 +816,7 @@ class VillagerAgent(AgentDecision):
             logger.error(f"[VillagerAgent] decide_vote 失败: {str(e)}", exc_info=True)
             # 返回随机投票作为后备
             targets = [t for t in available_targets if t != self.agent_seat]
-            target = random.choice(targets) if targets else None
+            target = self.rng.choice(targets) if targets else None
             return {
                 'voterSeat': self.agent_seat,
                 'targetSeat': target,
@@ -673,8 +824,48 @@ class VillagerAgent(AgentDecision):
             }
 
 
-# Agent 实例缓存（保存每个 Agent 的决策上下文）
-agent_contexts: Dict[str, Dict[int, AgentDecision]] = {}
+# Agent 决策上下文（按房间保存在房间存储中，见 room_store）
+
+def _encode_agents(agents: Dict[int, object]) -> bytes:
+    """房间内各 Agent 的决策状态编码为 JSON"""
+    exported = {
+        str(seat): agent.export_state() if isinstance(agent, AgentDecision) else agent
+        for seat, agent in agents.items()
+    }
+    return json.dumps(exported, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _decode_agents(data: bytes) -> Dict[int, object]:
+    """解码为 {座位: 导出的决策状态}（首次使用时再绑定到游戏上下文）"""
+    return {int(seat): state for seat, state in json.loads(data).items()}
+
+
+_agent_registry = RoomRegistry('agents', _encode_agents, _decode_agents)
+
+# 自上次写回后 Agent 决策状态可能变化的房间（所有决策都经过 get_agent_context），
+# save_agent_contexts 据此跳过状态轮询等没有决策的请求，不重复编码随机数状态
+_dirty_agent_rooms: Set[str] = set()
+
+
+def _create_agent(context: GameStateContext, seat: int) -> AgentDecision:
+    """按座位的角色创建 Agent"""
+    agent = context.players.get(seat)
+    if not agent or not agent.role:
+        raise ValueError(f"Agent {seat} not found or no role assigned")
+
+    if agent.role == Role.WEREWOLF:
+        return WerewolfAgent(context, seat)
+    elif agent.role == Role.SEER:
+        return SeerAgent(context, seat)
+    elif agent.role == Role.WITCH:
+        return WitchAgent(context, seat)
+    elif agent.role == Role.HUNTER:
+        return HunterAgent(context, seat)
+    elif agent.role == Role.VILLAGER:
+        return VillagerAgent(context, seat)
+    else:
+        # 未知角色使用村民逻辑
+        return VillagerAgent(context, seat)
 
 
 def get_agent_context(room_id: str, seat: int, context: GameStateContext) -> AgentDecision:
@@ -689,41 +880,84 @@ def get_agent_context(room_id: str, seat: int, context: GameStateContext) -> Age
     Returns:
         AgentDecision 实例
     """
-    if room_id not in agent_contexts:
-        agent_contexts[room_id] = {}
+    agents = _agent_registry.get(room_id)
+    if agents is None:
+        agents = {}
+        _agent_registry.put(room_id, agents, force=True)
+    # 返回的 Agent 接着做决策（消耗随机数、追加历史），请求结束时需要写回
+    _dirty_agent_rooms.add(room_id)
 
     # 如果已存在该 Agent 的上下文，返回
-    if seat in agent_contexts[room_id]:
-        return agent_contexts[room_id][seat]
+    agent = agents.get(seat)
+    if isinstance(agent, AgentDecision) and agent.context is context:
+        return agent
 
-    # 创建新的 Agent 上下文
-    agent = context.players.get(seat)
-    if not agent or not agent.role:
-        raise ValueError(f"Agent {seat} not found or no role assigned")
+    # 创建新的 Agent 上下文（从存储加载的状态或房间重建后的旧实例需要绑定到当前游戏上下文）
+    exported = agent.export_state() if isinstance(agent, AgentDecision) else agent
+    agent = _create_agent(context, seat)
+    if exported is not None:
+        agent.restore_state(exported)
+    agents[seat] = agent
+    return agent
 
-    if agent.role == Role.WEREWOLF:
-        agent_contexts[room_id][seat] = WerewolfAgent(context, seat)
-    elif agent.role == Role.SEER:
-        agent_contexts[room_id][seat] = SeerAgent(context, seat)
-    elif agent.role == Role.WITCH:
-        agent_contexts[room_id][seat] = WitchAgent(context, seat)
-    elif agent.role == Role.HUNTER:
-        agent_contexts[room_id][seat] = HunterAgent(context, seat)
-    elif agent.role == Role.VILLAGER:
-        agent_contexts[room_id][seat] = VillagerAgent(context, seat)
-    else:
-        # 未知角色使用村民逻辑
-        agent_contexts[room_id][seat] = VillagerAgent(context, seat)
 
-    return agent_contexts[room_id][seat]
+def get_room_agents(room_id: str) -> Dict[int, object]:
+    """本进程已加载的房间 Agent 上下文（不访问存储，用于统计）"""
+    return _agent_registry.peek(room_id) or {}
+
+
+def save_agent_contexts(room_id: str) -> bool:
+    """
+    把房间的 Agent 决策状态写回房间存储（自上次写回后没有决策时跳过）
+
+    异常:
+        VersionConflict: 已被其他进程修改（本进程的缓存已丢弃）
+    """
+    if room_id not in _dirty_agent_rooms:
+        return False
+    agents = _agent_registry.peek(room_id)
+    if agents is None:
+        _dirty_agent_rooms.discard(room_id)
+        return False
+    _agent_registry.put(room_id, agents)
+    _dirty_agent_rooms.discard(room_id)
+    return True
 
 
 def clear_agent_contexts(room_id: str):
     """清除指定房间的 Agent 上下文（用于游戏重置）"""
-    if room_id in agent_contexts:
-        del agent_contexts[room_id]
+    _agent_registry.remove(room_id)
+    _dirty_agent_rooms.discard(room_id)
+    clear_room_prompt_context(room_id)
+    clear_room_history(room_id)
+
+
+def release_agent_contexts(room_id: str):
+    """释放本进程持有的房间 Agent 上下文（房间迁移到其他进程后调用；共享存储中的记录保留）"""
+    if get_store().shared:
+        _agent_registry.evict(room_id)
+    else:
+        _agent_registry.remove(room_id)
+    _dirty_agent_rooms.discard(room_id)
+    clear_room_prompt_context(room_id)
+    clear_room_history(room_id)
+
+
+def hibernate_agent_contexts(room_id: str) -> bool:
+    """休眠房间的 Agent 上下文（房间空闲时调用；下一次 get_agent_context 时恢复），并丢弃提示词缓存"""
+    hibernated = _agent_registry.hibernate(room_id)
+    clear_room_prompt_context(room_id)
+    clear_room_history(room_id)
+    return hibernated
+
+
+def _record_decision(role: str, decision_type: str, started: float):
+    """记录一次 Agent 决策的指标"""
+    AGENT_DECISIONS.inc(role=role, decision_type=decision_type)
+    AGENT_DECISION_DURATION.observe(time.perf_counter() - started, role=role, decision_type=decision_type)
 
 
+@traced('agent.night_action')
 def decide_agent_action(room_id: str, seat: int, role: str, available_targets: List[int], context: GameStateContext) -> Dict:
     """
     为 Agent 决策晚上行动
@@ -738,9 +972,11 @@ def decide_agent_action(room_id: str, seat: int, role: str, available_targets: L
     Returns:
         决策结果 {'seat', 'actionType', 'targetSeat', 'reason'}
     """
+    started = time.perf_counter()
     try:
         agent = get_agent_context(room_id, seat, context)
         decision = agent.decide_night_action(available_targets)
+        _record_decision(role, 'night_action', started)
 
         # 记录决策日志
         logger.debug(f"Agent {seat} ({role}) 决策: {decision.get('actionType', 'unknown')} -> {decision.get('targetSeat', 'None')}, 原因: {decision.get('reason', 'N/A')}")
@@ -757,6 +993,7 @@ def decide_agent_action(room_id: str, seat: int, role: str, available_targets: L
         raise
 
 
+@traced('agent.vote')
 def decide_agent_vote(room_id: str, seat: int, available_targets: List[int], context: GameStateContext) -> Dict:
     """
     为 Agent 决策投票
@@ -770,9 +1007,11 @@ def decide_agent_vote(room_id: str, seat: int, available_targets: List[int], con
     Returns:
         决策结果 {'voterSeat', 'targetSeat', 'reason'}
     """
+    started = time.perf_counter()
     try:
         agent = get_agent_context(room_id, seat, context)
         decision = agent.decide_vote(available_targets)
+        _record_decision(agent.agent.role.value, 'vote', started)
 
         # 记录决策日志
         logger.debug(f"Agent {seat} 投票给 {decision.get('targetSeat', 'None')}, 原因: {decision.get('reason', 'N/A')}")
@@ -5,12 +5,18 @@
 import json
 import logging
 import os
-from datetime import datetime
+import random
+import time
 
 from dotenv import load_dotenv
 from flask import Flask, request, g
 from flask_cors import CORS
 
+import profiling
+import room_store
+import tracing
+from log_pipeline import DailyRotatingFileHandler, LogPipeline
+
 # 加载环境变量
 load_dotenv()
 
@@ -22,93 +28,263 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # ============== 日志配置 ==============
 
+# 日志参数（可在 .env 中覆盖）
+LOG_DIR = os.getenv('LOG_DIR', 'logs')
+LOG_CONSOLE_LEVEL = os.getenv('LOG_CONSOLE_LEVEL', 'DEBUG').upper()
+# 单个日志文件上限（字节）和滚动保留个数，跨天自动切换文件
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', 50 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 10))
+LOG_RETENTION_DAYS = int(os.getenv('LOG_RETENTION_DAYS', 7))
+# 日志队列长度，写入跟不上时丢弃新记录
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+# 请求/响应体的采样率和截断长度（出错的请求总是记录）
+LOG_BODY_SAMPLE_RATE = float(os.getenv('LOG_BODY_SAMPLE_RATE', 0.01))
+LOG_BODY_MAX_CHARS = int(os.getenv('LOG_BODY_MAX_CHARS', 500))
+# 慢请求阈值（秒），慢请求完整记录到 slow_YYYYMMDD.log
+LOG_SLOW_REQUEST_SECONDS = float(os.getenv('LOG_SLOW_REQUEST_SECONDS', 1.0))
+LOG_SLOW_BODY_MAX_CHARS = int(os.getenv('LOG_SLOW_BODY_MAX_CHARS', 64 * 1024))
+
+# 请求追踪：按采样率保留（慢请求总是保留），可选导出到 trace_YYYYMMDD.log
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '1') == '1'
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.01))
+TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', 1.0))
+TRACE_RING_SIZE = int(os.getenv('TRACE_RING_SIZE', 1000))
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', '0') == '1'
+
+# 房间存储后端：memory（默认）/ sqlite / shm，sqlite 和 shm 可在工作进程之间共享、进程重启后恢复
+ROOM_STORE = os.getenv('ROOM_STORE', 'memory')
+ROOM_STORE_PATH = os.getenv('ROOM_STORE_PATH') or None
+# 空闲房间休眠：超过该秒数没有访问的房间只保留编码后的快照（0 表示关闭），
+# 进程内存储中快照保存在 ROOM_HIBERNATE_DIR 目录（留空则保存在内存中）
+ROOM_HIBERNATE_AFTER = float(os.getenv('ROOM_HIBERNATE_AFTER', 600))
+ROOM_HIBERNATE_DIR = os.getenv('ROOM_HIBERNATE_DIR') or None
+# 状态机池：为每组 模式:座位数 预热的状态机数量（0 表示关闭），创建房间时直接取用
+STATE_MACHINE_POOL_SIZE = int(os.getenv('STATE_MACHINE_POOL_SIZE', 8))
+STATE_MACHINE_POOL_KEYS = os.getenv('STATE_MACHINE_POOL_KEYS', 'classic:12')
+# 座位数不少于该值的房间用紧凑座位表保存玩家（默认 0 表示总是使用字典）：
+# 省内存，但逐个玩家访问要创建视图，整局对局比字典慢，只在内存吃紧时开启
+COMPACT_SEATS_FROM = int(os.getenv('COMPACT_SEATS_FROM', 0))
+
+# 多进程模式下的工作进程ID（由 serve.py 设置），各进程写各自的日志文件
+WORKER_ID = os.getenv('WOLF_WORKER_ID')
+LOG_PREFIX_SUFFIX = f'_{WORKER_ID}' if WORKER_ID else ''
+# 共享快照目录（由 serve.py 设置）：房间所有者发布状态快照，其他工作进程据此响应读请求
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR')
+
 # 创建日志目录
-log_dir = 'logs'
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
+if not os.path.exists(LOG_DIR):
+    os.makedirs(LOG_DIR)
 
 # 配置日志格式
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-log_file = os.path.join(log_dir, f'app_{datetime.now().strftime("%Y%m%d")}.log')
 
-# 创建日志处理器
-file_handler = logging.FileHandler(log_file)
+# 慢请求和追踪日志记录器（各自单独文件）
+SLOW_LOGGER_NAME = 'api.slow'
+TRACE_LOGGER_NAME = 'trace'
+_DEDICATED_LOGGERS = (SLOW_LOGGER_NAME, TRACE_LOGGER_NAME)
+
+# 创建日志处理器（按天切分、按大小滚动）
+file_handler = DailyRotatingFileHandler(LOG_DIR, 'app' + LOG_PREFIX_SUFFIX, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_RETENTION_DAYS)
 file_handler.setLevel(logging.DEBUG)
 file_handler.setFormatter(logging.Formatter(log_format))
+file_handler.addFilter(lambda record: record.name not in _DEDICATED_LOGGERS)
 
 # 创建控制台处理器
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
+console_handler.setLevel(LOG_CONSOLE_LEVEL)
 console_handler.setFormatter(logging.Formatter(log_format))
+console_handler.addFilter(lambda record: record.name not in _DEDICATED_LOGGERS)
+
+# 创建慢请求处理器
+slow_handler = DailyRotatingFileHandler(LOG_DIR, 'slow' + LOG_PREFIX_SUFFIX, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_RETENTION_DAYS)
+slow_handler.setLevel(logging.DEBUG)
+slow_handler.setFormatter(logging.Formatter(log_format))
+slow_handler.addFilter(lambda record: record.name == SLOW_LOGGER_NAME)
+
+# 创建追踪处理器（每行一条 JSON）
+trace_handler = DailyRotatingFileHandler(LOG_DIR, 'trace' + LOG_PREFIX_SUFFIX, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_RETENTION_DAYS)
+trace_handler.setLevel(logging.DEBUG)
+trace_handler.setFormatter(logging.Formatter('%(message)s'))
+trace_handler.addFilter(lambda record: record.name == TRACE_LOGGER_NAME)
+
+# 请求线程只入队，后台线程写文件和控制台
+log_pipeline = LogPipeline([file_handler, console_handler, slow_handler, trace_handler], LOG_QUEUE_SIZE)
 
 # 配置应用日志
-app.logger.setLevel(logging.DEBUG)
-app.logger.addHandler(file_handler)
-app.logger.addHandler(console_handler)
+log_pipeline.attach(app.logger)
 
 # 创建专用的 API 日志记录器
 api_logger = logging.getLogger('api')
-api_logger.setLevel(logging.DEBUG)
-api_logger.addHandler(file_handler)
-api_logger.addHandler(console_handler)
+log_pipeline.attach(api_logger)
+
+# 慢请求日志不再传递给 api 日志记录器
+slow_logger = logging.getLogger(SLOW_LOGGER_NAME)
+log_pipeline.attach(slow_logger, propagate=False)
 
 # 创建状态机日志记录器
 state_machine_logger = logging.getLogger('state_machine')
-state_machine_logger.setLevel(logging.DEBUG)
-state_machine_logger.addHandler(file_handler)
-state_machine_logger.addHandler(console_handler)
+log_pipeline.attach(state_machine_logger)
 
-# ============== 请求/响应日志中间件 ==============
+# 创建追踪日志记录器
+trace_logger = logging.getLogger(TRACE_LOGGER_NAME)
+log_pipeline.attach(trace_logger, propagate=False)
+
+log_pipeline.start()
+
+# ============== 房间存储 ==============
+
+if ROOM_STORE != 'memory':
+    room_store.configure_store(ROOM_STORE, ROOM_STORE_PATH)
+    app.logger.info(f'🗄️ 房间存储: {ROOM_STORE} ({ROOM_STORE_PATH or "默认路径"})')
+
+if ROOM_HIBERNATE_AFTER > 0:
+    from hibernation import RoomHibernator
+    room_store.configure_hibernation(ROOM_HIBERNATE_DIR)
+    room_hibernator = RoomHibernator(ROOM_HIBERNATE_AFTER)
+    room_hibernator.start()
+
+from state_machines import ClassicWerewolfStateMachine
+ClassicWerewolfStateMachine.COMPACT_SEATS_FROM = COMPACT_SEATS_FROM or None
+
+if STATE_MACHINE_POOL_SIZE > 0:
+    from state_machines import STATE_MACHINE_POOL
+    for pool_key in filter(None, (k.strip() for k in STATE_MACHINE_POOL_KEYS.split(','))):
+        pool_mode, pool_seats = pool_key.rsplit(':', 1)
+        STATE_MACHINE_POOL.configure(pool_mode, int(pool_seats), STATE_MACHINE_POOL_SIZE)
+    STATE_MACHINE_POOL.start()
+
+
+# ============== 请求追踪 ==============
+
+tracing.COLLECTOR.sample_rate = TRACE_SAMPLE_RATE
+tracing.COLLECTOR.slow_seconds = TRACE_SLOW_SECONDS
+tracing.COLLECTOR.resize(TRACE_RING_SIZE)
+if TRACE_EXPORT:
+    tracing.COLLECTOR.exporter = lambda record: trace_logger.info(json.dumps(record, ensure_ascii=False))
 
 @app.before_request
-def log_request():
-    """记录每个请求"""
-    g.start_time = datetime.now()
+def start_request_trace():
+    """为请求开始一次追踪（按路由模板命名）"""
+    if TRACE_ENABLED:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.trace_token = tracing.start_trace(f"{request.method} {route}", path=request.path)
+
+def finish_request_trace(response):
+    """结束请求追踪（在 log_response 之后注册，见下方）"""
+    token = g.pop('trace_token', None)
+    if token is not None:
+        trace = tracing.finish_trace(token, status=response.status_code)
+        if trace is not None:
+            g.trace_id = trace.trace_id
+    return response
+
+# ============== 请求/响应日志中间件 ==============
 
-    # 记录请求信息
-    request_method = request.method
-    request_path = request.path
+_body_sampler = random.Random()
 
-    # 记录请求体
-    request_data = None
-    if request.method in ['POST', 'PUT', 'PATCH']:
-        if request.is_json:
-            request_data = request.get_json()
-        else:
-            request_data = request.get_data(as_text=True)
 
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-    request_body = json.dumps(request_data, ensure_ascii=False) if request_data else 'None'
-    api_logger.info(f"📨 [{timestamp}] {request_method} {request_path} | 请求体: {request_body}")
+def _body_text(data: bytes, limit: int) -> str:
+    """截断后的请求/响应体文本"""
+    if not data:
+        return 'None'
+    text = data[:limit].decode('utf-8', errors='replace')
+    if len(data) > limit:
+        text += f'...(共 {len(data)} 字节)'
+    return text
+
+
+def _response_data(response) -> bytes:
+    """响应体字节（流式响应不读取）"""
+    if response.direct_passthrough or response.is_streamed:
+        return b''
+    return response.get_data()
+
+@app.before_request
+def log_request():
+    """记录请求开始时间（用于日志和接口延迟指标）"""
+    g.start_time = time.perf_counter()
 
 @app.after_request
 def log_response(response):
-    """记录每个响应"""
-    duration = (datetime.now() - g.start_time).total_seconds()
+    """
+    记录每个请求
 
-    # 记录响应信息
+    每个请求记一行摘要；请求/响应体按采样率记录（出错时总是记录），
+    超过慢请求阈值的请求完整写入慢请求日志。
+    """
+    duration = time.perf_counter() - g.get('start_time', time.perf_counter())
     status_code = response.status_code
+    summary = f"{request.method} {request.path} | HTTP {status_code} | 耗时: {duration:.3f}s"
 
-    # 尝试解析响应体
-    response_data = None
-    if response.is_json:
-        try:
-            response_data = response.get_json()
-        except:
-            response_data = response.get_data(as_text=True)[:200]
+    if status_code >= 400 or _body_sampler.random() < LOG_BODY_SAMPLE_RATE:
+        request_body = _body_text(request.get_data(), LOG_BODY_MAX_CHARS)
+        response_body = _body_text(_response_data(response), LOG_BODY_MAX_CHARS)
+        api_logger.info(f"📤 {summary} | 请求体: {request_body} | 响应体: {response_body}")
     else:
-        response_data = response.get_data(as_text=True)[:200]
+        api_logger.info(f"📤 {summary}")
 
-    response_body = json.dumps(response_data, ensure_ascii=False) if response_data else 'None'
-    api_logger.info(f"📤 HTTP {status_code} | 耗时: {duration:.3f}s | 响应体: {response_body}")
+    if duration >= LOG_SLOW_REQUEST_SECONDS:
+        query = request.query_string.decode('utf-8', errors='replace')
+        slow_logger.warning(
+            f"🐢 {summary}\n"
+            f"  查询参数: {query or 'None'}\n"
+            f"  客户端: {request.remote_addr}\n"
+            f"  追踪ID: {g.get('trace_id', 'None')}\n"
+            f"  请求体: {_body_text(request.get_data(), LOG_SLOW_BODY_MAX_CHARS)}\n"
+            f"  响应体: {_body_text(_response_data(response), LOG_SLOW_BODY_MAX_CHARS)}"
+        )
 
     return response
 
+# after_request 按注册的逆序执行：追踪在日志之后注册，先结束追踪、设置 g.trace_id，慢请求日志才能带上追踪ID
+app.after_request(finish_request_trace)
+
+# ============== 按需剖析 ==============
+
+@app.before_request
+def start_request_profile():
+    """匹配剖析会话的请求开始剖析（没有会话时直接返回）"""
+    if request.blueprint == 'admin':
+        return
+    route = request.url_rule.rule if request.url_rule else None
+    room_id = (request.view_args or {}).get('room_id')
+    g.profile_handles = profiling.PROFILER.begin_request(route, room_id)
+
+@app.teardown_request
+def finish_request_profile(error=None):
+    """结束请求剖析（请求出错时也会执行）"""
+    handles = g.pop('profile_handles', None)
+    if handles:
+        profiling.PROFILER.end_request(handles)
+
+# ============== 接口指标 ==============
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板记录接口延迟"""
+    started = g.get('start_time')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - started, method=request.method,
+                                      route=route, status=str(response.status_code))
+    return response
+
 # 导入蓝图
-from routes import game_routes
+from metrics import HTTP_REQUEST_DURATION
+from routes import admin_routes, game_routes, metrics_routes
 
 # 注册蓝图
 app.register_blueprint(game_routes.bp)
+app.register_blueprint(metrics_routes.bp)
+app.register_blueprint(admin_routes.bp)
+
+# 内部路由只在多进程模式的工作进程中注册
+if WORKER_ID is not None:
+    from routes import internal_routes
+    app.register_blueprint(internal_routes.bp)
+    if SNAPSHOT_DIR:
+        from shared_snapshots import SNAPSHOTS
+        SNAPSHOTS.configure(SNAPSHOT_DIR, owner=WORKER_ID)
 
 @app.errorhandler(404)
 def not_found(error):
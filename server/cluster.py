@@ -0,0 +1,583 @@
+"""
+多进程部署
+路由前端按房间ID一致性哈希把请求转发到固定的工作进程（房间状态保存在工作进程内存中），
+工作进程增减时迁移受影响的房间：原进程导出回放记录 → 新进程逐位重建并校验指纹 → 原进程释放。
+启用共享快照时，GET /state 和 /messages 轮询分配给任意工作进程，由所有者发布的快照响应。
+
+工作进程只监听本机地址，内部接口（/internal/*）不对外转发。
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from shared_snapshots import SharedSnapshots
+
+logger = logging.getLogger('cluster')
+
+# 每个工作进程在哈希环上的虚拟节点数
+DEFAULT_REPLICAS = 160
+# 工作进程启动后等待就绪的最长时间（秒）
+WORKER_READY_TIMEOUT = 30.0
+# 转发给工作进程的请求超时（秒），Agent 接口可能等待大模型
+UPSTREAM_TIMEOUT = 120.0
+# 迁移房间前等待该房间进行中请求结束的最长时间（秒）
+MIGRATION_DRAIN_TIMEOUT = 30.0
+
+# /api/rooms/{roomId}/... 中的房间ID（debug 为调试接口前缀，不是房间）
+_ROOM_PATH_RE = re.compile(r'^/api/rooms/([^/]+)')
+_NON_ROOM_SEGMENTS = {'debug'}
+
+# 可由共享快照响应的读请求
+_SNAPSHOT_READ_RE = re.compile(r'^/api/rooms/[^/]+/(state|messages)$')
+
+# 逐跳头部，不转发
+_HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'te', 'trailer', 'upgrade',
+}
+
+
+def room_id_from_path(path: str) -> Optional[str]:
+    """从请求路径中取房间ID（与 Flask 路由参数一致，已做 URL 解码）"""
+    match = _ROOM_PATH_RE.match(path)
+    if not match or match.group(1) in _NON_ROOM_SEGMENTS:
+        return None
+    return unquote(match.group(1))
+
+
+class HashRing:
+    """带虚拟节点的一致性哈希环：增减节点时只有相邻区间的键改变归属"""
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = DEFAULT_REPLICAS):
+        self.replicas = replicas
+        self._hashes: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: set = set()
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        for i in range(self.replicas):
+            point = self._hash(f'{node}#{i}')
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.discard(node)
+        kept = [(h, owner) for h, owner in zip(self._hashes, self._owners) if owner != node]
+        self._hashes = [h for h, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def get(self, key: str) -> Optional[str]:
+        """键所属的节点（环为空时为 None）"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, self._hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+    def copy(self) -> 'HashRing':
+        ring = HashRing(replicas=self.replicas)
+        ring._hashes = list(self._hashes)
+        ring._owners = list(self._owners)
+        ring.nodes = set(self.nodes)
+        return ring
+
+
+# ============== HTTP 报文 ==============
+
+class HTTPMessage:
+    """HTTP 请求或响应（起始行、头部列表、已解码的报文体）"""
+
+    def __init__(self, start_line: str, headers: List[Tuple[str, str]], body: bytes = b''):
+        self.start_line = start_line
+        self.headers = headers
+        self.body = body
+
+    def header(self, name: str, default: str = '') -> str:
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return default
+
+    def keep_alive(self) -> bool:
+        connection = self.header('connection').lower()
+        if self.start_line.startswith('HTTP/1.0') or self.start_line.endswith('HTTP/1.0'):
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    def serialize(self, extra_headers: Iterable[Tuple[str, str]] = ()) -> bytes:
+        """重新编码（去掉逐跳头部，按实际报文体设置 Content-Length）"""
+        lines = [self.start_line]
+        for name, value in itertools.chain(self.headers, extra_headers):
+            if name.lower() in _HOP_BY_HOP_HEADERS or name.lower() == 'content-length':
+                continue
+            lines.append(f'{name}: {value}')
+        lines.append(f'Content-Length: {len(self.body)}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + self.body
+
+
+async def read_message(reader: asyncio.StreamReader, response_to: Optional[str] = None) -> Optional[HTTPMessage]:
+    """
+    读取一个 HTTP 报文
+
+    参数:
+        reader: 输入流
+        response_to: 读取响应时传入对应请求的方法（HEAD 响应没有报文体）
+
+    返回:
+        报文，连接在报文开始前关闭时为 None
+    """
+    start_line = await reader.readline()
+    while start_line in (b'\r\n', b'\n'):
+        start_line = await reader.readline()
+    if not start_line:
+        return None
+
+    headers = []
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers.append((name.strip(), value.strip()))
+    message = HTTPMessage(start_line.decode('latin-1').rstrip('\r\n'), headers)
+
+    if response_to is not None:
+        status = int(message.start_line.split(' ', 2)[1])
+        if response_to == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            return message
+
+    if message.header('transfer-encoding').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # 跳过 trailer
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        message.body = b''.join(chunks)
+    elif message.header('content-length'):
+        message.body = await reader.readexactly(int(message.header('content-length')))
+    elif response_to is not None:
+        # 没有长度信息的响应读到连接关闭
+        message.body = await reader.read()
+        message.headers.append(('Connection', 'close'))
+    return message
+
+
+def json_response(status: int, data, message: str = '') -> HTTPMessage:
+    """与 API 统一格式一致的 JSON 响应"""
+    body = json.dumps({'code': status, 'message': message, 'data': data}, ensure_ascii=False).encode('utf-8')
+    reason = {200: 'OK', 403: 'Forbidden', 404: 'Not Found', 502: 'Bad Gateway', 503: 'Service Unavailable'}
+    return HTTPMessage(f'HTTP/1.1 {status} {reason.get(status, "")}',
+                       [('Content-Type', 'application/json')], body)
+
+
+# ============== 工作进程 ==============
+
+class Worker:
+    """一个工作进程（槽位ID固定，崩溃重启后沿用同一哈希位置）"""
+
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.worker_id = f'w{index}'
+        self.port = port
+        self.process: Optional[subprocess.Popen] = None
+        self.ready = False
+        self.started_at = 0.0
+        self.restarts = 0
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    async def request(self, message: HTTPMessage, method: str) -> HTTPMessage:
+        """把请求发给工作进程（复用空闲连接，失效时重连一次）"""
+        payload = message.serialize()
+        for attempt in range(2):
+            reused = bool(self._idle)
+            if reused:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+            try:
+                writer.write(payload)
+                await writer.drain()
+                response = await asyncio.wait_for(read_message(reader, response_to=method), UPSTREAM_TIMEOUT)
+                if response is None:
+                    raise ConnectionError('upstream closed connection')
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if not reused or attempt:
+                    raise
+                continue
+            except BaseException:
+                writer.close()
+                raise
+            if response.keep_alive():
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return response
+        raise ConnectionError('unreachable')
+
+    async def call(self, method: str, path: str, data=None) -> Tuple[int, Dict]:
+        """调用工作进程的 JSON 接口，返回 (状态码, 响应 data 字段)"""
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        headers = [('Host', f'127.0.0.1:{self.port}'), ('Content-Type', 'application/json')]
+        response = await self.request(HTTPMessage(f'{method} {path} HTTP/1.1', headers, body), method)
+        status = int(response.start_line.split(' ', 2)[1])
+        try:
+            payload = json.loads(response.body or b'{}')
+        except ValueError:
+            payload = {}
+        return status, payload.get('data') or {}
+
+    def close_connections(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class Cluster:
+    """
+    路由前端 + 工作进程管理
+
+    - 请求按房间ID一致性哈希转发，非房间请求轮询分配
+    - 工作进程崩溃时移出哈希环并重启，就绪后加回并把期间落到其他进程的房间迁回
+    - add_worker / remove_worker 扩缩容时迁移受影响的房间；迁移期间该房间的请求排队等待
+    """
+
+    def __init__(self, worker_count: int, base_port: int, worker_command: List[str],
+                 env: Optional[Dict[str, str]] = None, replicas: int = DEFAULT_REPLICAS,
+                 snapshot_dir: Optional[str] = None):
+        self.base_port = base_port
+        self.worker_command = worker_command
+        self.env = dict(env or {})
+        # 共享快照目录：设置后 GET /state 和 /messages 可由任意工作进程响应
+        self.snapshot_dir = snapshot_dir
+        self.snapshots = SharedSnapshots()
+        if snapshot_dir:
+            self.snapshots.configure(snapshot_dir)
+            self.env['SNAPSHOT_DIR'] = snapshot_dir
+        self.ring = HashRing(replicas=replicas)
+        self.workers: Dict[str, Worker] = {}
+        self.initial_workers = worker_count
+
+        self._round_robin = itertools.count()
+        # 迁移中的房间 → 迁移完成事件
+        self._migrating: Dict[str, asyncio.Event] = {}
+        # 迁移失败时把房间固定在原进程
+        self._pins: Dict[str, str] = {}
+        # 每个房间正在转发的请求数
+        self._inflight: Dict[str, int] = {}
+        self._topology_lock = asyncio.Lock()
+        self._stopping = False
+        self.migrations = 0
+        self.migration_failures = 0
+        self.snapshot_reads = 0
+        self.snapshot_misses = 0
+
+    # ---------- 工作进程生命周期 ----------
+
+    async def start(self):
+        for index in range(self.initial_workers):
+            await self._start_worker(Worker(index, self.base_port + index))
+        for worker in self.workers.values():
+            if worker.ready:
+                self.ring.add(worker.worker_id)
+        logger.info(f"集群已启动: {len(self.ring.nodes)} 个工作进程")
+
+    async def _start_worker(self, worker: Worker) -> bool:
+        env = dict(os.environ, **self.env)
+        env['WOLF_WORKER_ID'] = worker.worker_id
+        command = self.worker_command + ['--port', str(worker.port)]
+        worker.process = subprocess.Popen(command, env=env)
+        worker.started_at = time.time()
+        worker.ready = False
+        self.workers[worker.worker_id] = worker
+
+        deadline = time.monotonic() + WORKER_READY_TIMEOUT
+        while time.monotonic() < deadline:
+            if not worker.alive:
+                break
+            try:
+                status, _ = await worker.call('GET', '/internal/health')
+                if status == 200:
+                    worker.ready = True
+                    logger.info(f"工作进程 {worker.worker_id} 就绪 (pid={worker.process.pid}, port={worker.port})")
+                    return True
+            except (ConnectionError, OSError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(0.2)
+
+        logger.error(f"工作进程 {worker.worker_id} 启动失败")
+        self._terminate(worker)
+        return False
+
+    def _terminate(self, worker: Worker):
+        worker.ready = False
+        worker.close_connections()
+        if worker.alive:
+            worker.process.terminate()
+            try:
+                worker.process.wait(10)
+            except subprocess.TimeoutExpired:
+                worker.process.kill()
+
+    async def add_worker(self) -> Optional[str]:
+        """扩容一个工作进程，并把哈希到它的房间迁过去"""
+        async with self._topology_lock:
+            index = next(i for i in itertools.count() if f'w{i}' not in self.workers)
+            worker = Worker(index, self.base_port + index)
+            if not await self._start_worker(worker):
+                del self.workers[worker.worker_id]
+                return None
+            new_ring = self.ring.copy()
+            new_ring.add(worker.worker_id)
+            await self._rebalance(new_ring)
+            return worker.worker_id
+
+    async def remove_worker(self, worker_id: Optional[str] = None) -> Optional[str]:
+        """缩容一个工作进程（默认编号最大的），先把它的房间迁走再停止"""
+        async with self._topology_lock:
+            candidates = [w for w in self.workers.values() if w.ready]
+            if len(candidates) <= 1:
+                logger.warning("至少保留一个工作进程")
+                return None
+            worker = self.workers.get(worker_id) if worker_id else max(candidates, key=lambda w: w.index)
+            if worker is None:
+                return None
+            new_ring = self.ring.copy()
+            new_ring.remove(worker.worker_id)
+            await self._rebalance(new_ring)
+            self._terminate(worker)
+            del self.workers[worker.worker_id]
+            logger.info(f"工作进程 {worker.worker_id} 已移除")
+            return worker.worker_id
+
+    async def monitor(self, interval: float = 1.0):
+        """巡检工作进程：崩溃的移出哈希环并原位重启，就绪后加回并迁回房间"""
+        while not self._stopping:
+            await asyncio.sleep(interval)
+            for worker in list(self.workers.values()):
+                if self._stopping or worker.alive or worker.process is None:
+                    continue
+                async with self._topology_lock:
+                    if worker.worker_id not in self.workers or worker.alive:
+                        continue
+                    logger.error(f"工作进程 {worker.worker_id} 已退出 (code={worker.process.returncode})，"
+                                 "正在重启（内存房间存储下其房间已丢失）")
+                    worker.ready = False
+                    worker.close_connections()
+                    self.ring.remove(worker.worker_id)
+                    for room_id in [r for r, owner in self._pins.items() if owner == worker.worker_id]:
+                        del self._pins[room_id]
+                    # 丢失房间的快照不能再用于读请求
+                    self.snapshots.purge_owner(worker.worker_id)
+                    worker.restarts += 1
+                    if await self._start_worker(worker):
+                        new_ring = self.ring.copy()
+                        new_ring.add(worker.worker_id)
+                        await self._rebalance(new_ring)
+
+    async def stop(self):
+        self._stopping = True
+        for worker in self.workers.values():
+            self._terminate(worker)
+
+    # ---------- 房间迁移 ----------
+
+    async def _rebalance(self, new_ring: HashRing):
+        """切换到新的哈希环，迁移归属改变的房间（调用方持有拓扑锁）"""
+        moves = []
+        for worker in [w for w in self.workers.values() if w.ready]:
+            try:
+                status, data = await worker.call('GET', '/internal/rooms')
+            except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+                logger.error(f"无法获取工作进程 {worker.worker_id} 的房间列表: {str(e)}")
+                continue
+            for room_id in data.get('rooms', []):
+                target = new_ring.get(room_id)
+                if target == worker.worker_id:
+                    self._pins.pop(room_id, None)
+                elif target is not None:
+                    moves.append((room_id, worker, self.workers[target]))
+
+        # 先挡住受影响房间的新请求，再切换哈希环
+        for room_id, _, _ in moves:
+            self._migrating[room_id] = asyncio.Event()
+        self.ring = new_ring
+
+        for room_id, source, target in moves:
+            try:
+                await self._migrate(room_id, source, target)
+            finally:
+                self._migrating.pop(room_id).set()
+        if moves:
+            logger.info(f"重新均衡完成: 迁移 {len(moves)} 个房间")
+
+    async def _migrate(self, room_id: str, source: Worker, target: Worker):
+        """把房间从 source 迁到 target；失败时固定在原进程"""
+        deadline = time.monotonic() + MIGRATION_DRAIN_TIMEOUT
+        while self._inflight.get(room_id) and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        # 超时后仍有请求在原进程处理该房间：原进程释放时不能复用它的状态机
+        drained = not self._inflight.get(room_id)
+        if not drained:
+            logger.warning(f"房间 {room_id} 等待进行中的请求超时，迁移后原进程丢弃状态机")
+
+        path = f"/internal/rooms/{room_id}"
+        try:
+            status, record = await source.call('GET', f'{path}/export')
+            if status == 404:
+                return
+            if status != 200:
+                raise RuntimeError(f'export failed with HTTP {status}')
+            status, _ = await target.call('POST', f'{path}/import', record)
+            if status != 200:
+                raise RuntimeError(f'import failed with HTTP {status}')
+            await source.call('DELETE', path if drained else f'{path}?recycle=0')
+        except (RuntimeError, ConnectionError, OSError, asyncio.TimeoutError) as e:
+            self.migration_failures += 1
+            self._pins[room_id] = source.worker_id
+            logger.error(f"房间 {room_id} 从 {source.worker_id} 迁移到 {target.worker_id} 失败，保留在原进程: {str(e)}")
+            return
+
+        self._pins.pop(room_id, None)
+        self.migrations += 1
+        logger.info(f"房间 {room_id} 已从 {source.worker_id} 迁移到 {target.worker_id}")
+
+    # ---------- 请求转发 ----------
+
+    async def _pick_worker(self, room_id: Optional[str], query: Dict[str, List[str]]) -> Optional[Worker]:
+        if room_id is not None:
+            event = self._migrating.get(room_id)
+            while event is not None:
+                await event.wait()
+                event = self._migrating.get(room_id)
+            worker_id = self._pins.get(room_id) or self.ring.get(room_id)
+            worker = self.workers.get(worker_id) if worker_id else None
+            return worker if worker is not None and worker.ready else None
+
+        # 非房间请求（如 /metrics）可用 ?worker=w0 指定进程，否则轮询
+        requested = query.get('worker', [None])[0]
+        if requested:
+            worker = self.workers.get(requested)
+            return worker if worker is not None and worker.ready else None
+        ready = [w for w in self.workers.values() if w.ready]
+        if not ready:
+            return None
+        return ready[next(self._round_robin) % len(ready)]
+
+    def status(self) -> Dict:
+        return {
+            'workers': [{
+                'id': w.worker_id,
+                'port': w.port,
+                'pid': w.process.pid if w.process else None,
+                'ready': w.ready,
+                'inRing': w.worker_id in self.ring.nodes,
+                'restarts': w.restarts,
+                'startedAt': w.started_at,
+            } for w in sorted(self.workers.values(), key=lambda w: w.index)],
+            'migrating': list(self._migrating),
+            'pinned': dict(self._pins),
+            'migrations': self.migrations,
+            'migrationFailures': self.migration_failures,
+            'snapshotReads': self.snapshot_reads,
+            'snapshotMisses': self.snapshot_misses,
+        }
+
+    async def dispatch(self, request: HTTPMessage, peer: str) -> HTTPMessage:
+        """转发一个请求，返回响应"""
+        method, target, _ = request.start_line.split(' ', 2)
+        url = urlsplit(target)
+        if url.path.startswith('/internal'):
+            return json_response(404, None, 'Not Found')
+        if url.path == '/cluster/status':
+            return json_response(200, self.status(), 'Cluster status retrieved')
+
+        forwarded = request.header('x-forwarded-for')
+        request.headers.append(('X-Forwarded-For', f'{forwarded}, {peer}' if forwarded else peer))
+
+        room_id = room_id_from_path(url.path)
+        if self.snapshot_dir and method == 'GET' and _SNAPSHOT_READ_RE.match(url.path):
+            # 共享快照读路径：任意工作进程都可响应，没有可用快照时（421）再转发给所有者
+            replica = await self._pick_worker(None, {})
+            if replica is not None:
+                try:
+                    response = await replica.request(request, method)
+                except (ConnectionError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    response = None
+                if response is not None and response.start_line.split(' ', 2)[1] != '421':
+                    self.snapshot_reads += 1
+                    return response
+                self.snapshot_misses += 1
+
+        worker = await self._pick_worker(room_id, parse_qs(url.query))
+        if worker is None:
+            return json_response(503, None, 'No worker available')
+
+        if room_id is not None:
+            self._inflight[room_id] = self._inflight.get(room_id, 0) + 1
+        try:
+            return await worker.request(request, method)
+        except (ConnectionError, OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            logger.error(f"转发到工作进程 {worker.worker_id} 失败: {method} {url.path}: {str(e)}")
+            return json_response(502, None, 'Upstream worker unavailable')
+        finally:
+            if room_id is not None:
+                remaining = self._inflight[room_id] - 1
+                if remaining:
+                    self._inflight[room_id] = remaining
+                else:
+                    del self._inflight[room_id]
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个客户端连接（支持 keep-alive）"""
+        peer = (writer.get_extra_info('peername') or ('unknown',))[0]
+        try:
+            while True:
+                request = await read_message(reader)
+                if request is None:
+                    break
+                response = await self.dispatch(request, peer)
+                keep_alive = request.keep_alive() and response.keep_alive() and not self._stopping
+                writer.write(response.serialize([('Connection', 'keep-alive' if keep_alive else 'close')]))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def default_worker_command() -> List[str]:
+    """工作进程启动命令（serve.py worker）"""
+    return [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serve.py'), 'worker']
@@ -1,9 +1,14 @@
 """
 配置文件
 从配置文件读取配置值
+
+配置在首次访问时才读取（get_settings() 或 `from config import XXX`），
+导入本模块本身不读取文件，缺少 config.json 时不依赖大模型的模块仍可正常导入。
 """
 import json
 import os
+import threading
+from typing import Any, Dict, Optional
 
 # 配置文件路径
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.json')
@@ -21,12 +26,19 @@ def load_config() -> dict:
             '    "base_url": "https://aigc.sankuai.com/v1/openai/native",\n'
             '    "model": "gpt-4.1"\n'
             '  }\n'
+            '}\n'
+            "离线压测可改用本地模拟大模型服务:\n"
+            '{\n'
+            '  "fake_llm": {"enabled": true, "autostart": true, "profile": "normal"}\n'
             '}'
         )
 
     try:
         with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
             config = json.load(f)
+            # 使用本地模拟大模型服务时不需要真实的 openai 配置
+            if config.get('fake_llm', {}).get('enabled'):
+                return config
             # 验证必要的配置项
             if 'openai' not in config:
                 raise ValueError("配置文件缺少 openai 配置段")
@@ -48,17 +60,123 @@ def save_config(config: dict):
         raise RuntimeError(f"配置文件保存失败: {str(e)}")
 
 
-# 加载配置
-_config = load_config()
+def _build_settings(config: dict) -> Dict[str, Any]:
+    """由配置内容计算各配置项（缺省项使用默认值）"""
+    settings: Dict[str, Any] = {}
+
+    # 本地模拟大模型服务（tools/fake_llm_server.py），启用后 Agent 请求全部发往本地
+    fake_llm_config = config.get('fake_llm', {})
+    settings['FAKE_LLM_ENABLED'] = bool(fake_llm_config.get('enabled', False))
+    settings['FAKE_LLM_HOST'] = fake_llm_config.get('host', '127.0.0.1')
+    settings['FAKE_LLM_PORT'] = int(fake_llm_config.get('port', 8765))
+    # 延迟配置名称（见 tools/fake_llm_server.py 的 LATENCY_PROFILES），可在 profiles 中覆盖或新增
+    settings['FAKE_LLM_PROFILE'] = fake_llm_config.get('profile', 'normal')
+    settings['FAKE_LLM_PROFILES'] = fake_llm_config.get('profiles', {})
+    # 是否在首次使用大模型客户端时自动在后台线程启动模拟服务
+    settings['FAKE_LLM_AUTOSTART'] = bool(fake_llm_config.get('autostart', False))
+
+    # 大模型 API 配置
+    if settings['FAKE_LLM_ENABLED']:
+        settings['OPENAI_API_KEY'] = 'fake'
+        settings['OPENAI_BASE_URL'] = f"http://{settings['FAKE_LLM_HOST']}:{settings['FAKE_LLM_PORT']}/v1"
+        settings['OPENAI_MODEL'] = config.get('openai', {}).get('model') or 'fake-model'
+    else:
+        settings['OPENAI_API_KEY'] = config.get('openai', {}).get('api_key', '')
+        settings['OPENAI_BASE_URL'] = config.get('openai', {}).get('base_url', '')
+        settings['OPENAI_MODEL'] = config.get('openai', {}).get('model', '')
+
+    # Agent 决策配置（可选，缺省使用默认值）
+    agent_config = config.get('agent', {})
+
+    # 单次决策调用大模型的最长等待时间（秒）
+    settings['LLM_TIMEOUT_SECONDS'] = float(agent_config.get('llm_timeout_seconds', 15))
+    # 截止时间内的最大重试次数
+    settings['LLM_MAX_RETRIES'] = int(agent_config.get('llm_max_retries', 1))
+    # 决策截止时间相对回合计时器提前的秒数（留给提交动作）
+    settings['DECISION_DEADLINE_MARGIN_SECONDS'] = float(agent_config.get('deadline_margin_seconds', 3))
+
+    # 熔断器：滑动窗口内失败率超过阈值时跳过大模型，冷却后放行一次试探请求
+    settings['CIRCUIT_BREAKER_WINDOW'] = int(agent_config.get('circuit_breaker_window', 20))
+    settings['CIRCUIT_BREAKER_MIN_CALLS'] = int(agent_config.get('circuit_breaker_min_calls', 5))
+    settings['CIRCUIT_BREAKER_FAILURE_RATE'] = float(agent_config.get('circuit_breaker_failure_rate', 0.5))
+    settings['CIRCUIT_BREAKER_COOLDOWN_SECONDS'] = float(agent_config.get('circuit_breaker_cooldown_seconds', 30))
+
+    # 提示词历史：已结束轮次压缩为摘要，当前轮次保留最近事件，整体不超过 token 预算
+    settings['HISTORY_TOKEN_BUDGET'] = int(agent_config.get('history_token_budget', 800))
+    settings['HISTORY_RECENT_WINDOW'] = int(agent_config.get('history_recent_window', 20))
+
+    # 大模型响应缓存（可选，默认关闭；用于回放、压测和回归测试）
+    llm_cache_config = config.get('llm_cache', {})
+    settings['LLM_CACHE_ENABLED'] = bool(llm_cache_config.get('enabled', False))
+    # SQLite 缓存文件路径，置空则只使用内存缓存
+    settings['LLM_CACHE_PATH'] = llm_cache_config.get(
+        'path', os.path.join(os.path.dirname(__file__), 'cache', 'llm_cache.sqlite3'))
+    settings['LLM_CACHE_MEMORY_ENTRIES'] = int(llm_cache_config.get('memory_entries', 1024))
+    settings['LLM_CACHE_MAX_ENTRIES'] = int(llm_cache_config.get('max_entries', 100000))
+    # 条目有效期（秒），0 表示永不过期
+    settings['LLM_CACHE_TTL_SECONDS'] = float(llm_cache_config.get('ttl_seconds', 0))
+    # 离线模式：未命中缓存时不请求模型服务，直接使用规则决策
+    settings['LLM_CACHE_OFFLINE'] = bool(llm_cache_config.get('offline', False))
+
+    return settings
+
+
+# 不依赖 config.json 的默认配置（配置不可用时的调优参数）
+DEFAULT_SETTINGS = _build_settings({})
+
+_settings: Optional[Dict[str, Any]] = None
+# 配置读取失败后不再重复读取文件，直到 reload_settings()
+_settings_unavailable = False
+_settings_lock = threading.Lock()
+
+
+def get_settings() -> Dict[str, Any]:
+    """
+    获取配置项（首次调用时读取并校验 config.json，之后使用缓存）
+
+    Raises:
+        FileNotFoundError / ValueError / RuntimeError: 配置文件缺失、格式错误或缺少大模型配置
+    """
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                settings = _build_settings(load_config())
+                # 验证配置完整性
+                if not settings['OPENAI_API_KEY']:
+                    raise ValueError("配置文件中缺少必需的 openai.api_key")
+                if not settings['OPENAI_BASE_URL']:
+                    raise ValueError("配置文件中缺少必需的 openai.base_url")
+                _settings = settings
+    return _settings
+
+
+def get_setting(name: str, default: Any = None) -> Any:
+    """获取单个配置项（配置不可用时使用默认配置）"""
+    global _settings_unavailable
+    settings = _settings
+    if settings is None:
+        if _settings_unavailable:
+            settings = DEFAULT_SETTINGS
+        else:
+            try:
+                settings = get_settings()
+            except Exception:
+                _settings_unavailable = True
+                settings = DEFAULT_SETTINGS
+    return settings.get(name, default)
+
 
-# 大模型 API 配置
-OPENAI_API_KEY = _config.get('openai', {}).get('api_key', '')
-OPENAI_BASE_URL = _config.get('openai', {}).get('base_url', '')
-OPENAI_MODEL = _config.get('openai', {}).get('model', '')
+def reload_settings():
+    """清除配置缓存（下次访问时重新读取 config.json）"""
+    global _settings, _settings_unavailable
+    with _settings_lock:
+        _settings = None
+        _settings_unavailable = False
 
-# 验证配置完整性
-if not OPENAI_API_KEY:
-    raise ValueError("配置文件中缺少必需的 openai.api_key")
-if not OPENAI_BASE_URL:
-    raise ValueError("配置文件中缺少必需的 openai.base_url")
 
+def __getattr__(name: str) -> Any:
+    """兼容 `from config import OPENAI_MODEL` 等写法：首次访问配置项时才加载配置文件"""
+    if name in DEFAULT_SETTINGS:
+        return get_settings()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
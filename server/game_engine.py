@@ -2,14 +2,21 @@
 游戏引擎（重构版）
 使用状态机架构管理游戏逻辑
 """
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 
+from metrics import Counter, Gauge, Metric, REGISTRY
+from room_store import RoomRegistry, VersionConflict, get_store
+from tracing import traced
 from state_machines import (
-    create_state_machine,
+    EVENT_BUS,
+    STATE_MACHINE_POOL,
     BaseStateMachine,
     GameStateContext,
-    ClassicWerewolfStateMachine
+    ClassicWerewolfStateMachine,
+    Clock
 )
+from state_machines.clock import WALL_CLOCK
 
 
 class GameEngine:
@@ -20,7 +27,8 @@ class GameEngine:
     提供统一的接口供路由层调用
     """
 
-    def __init__(self, room_id: str, mode: str = 'classic', seat_count: int = 12):
+    def __init__(self, room_id: str, mode: str = 'classic', seat_count: int = 12,
+                 clock: Optional[Clock] = None, seed: Optional[int] = None):
         """
         初始化游戏引擎
 
@@ -28,18 +36,25 @@ class GameEngine:
             room_id: 房间ID
             mode: 游戏模式（默认为经典模式）
             seat_count: 座位数
+            clock: 时钟（默认为墙上时钟）
+            seed: 房间随机种子（默认随机生成）
         """
         self.room_id = room_id
         self.mode = mode
         self.seat_count = seat_count
 
-        # 创建状态机实例
-        self.state_machine: BaseStateMachine = create_state_machine(
+        # 从状态机池取出（没有预热的状态机时直接构造）
+        self.state_machine: BaseStateMachine = STATE_MACHINE_POOL.acquire(
             room_id=room_id,
             mode=mode,
-            seat_count=seat_count
+            seat_count=seat_count,
+            clock=clock,
+            seed=seed
         )
+        # 最近一次写回房间存储时的状态标识
+        self._saved_key: Optional[tuple] = None
 
+    @traced('engine.assign_roles')
     def assign_roles(self) -> Dict[int, str]:
         """
         分配角色
@@ -52,6 +67,7 @@ class GameEngine:
         else:
             raise NotImplementedError(f"assign_roles not implemented for mode: {self.mode}")
 
+    @traced('engine.start_round')
     def start_round(self) -> tuple:
         """
         推进游戏到下一阶段
@@ -64,6 +80,7 @@ class GameEngine:
         else:
             raise NotImplementedError(f"start_round not implemented for mode: {self.mode}")
 
+    @traced('engine.submit_vote')
     def submit_vote(self, voter_seat: int, target_seat: int) -> bool:
         """
         提交投票
@@ -81,6 +98,7 @@ class GameEngine:
         )
         return success
 
+    @traced('engine.submit_speech')
     def submit_speech(self, seat: int, text: str) -> bool:
         """
         提交发言
@@ -98,6 +116,7 @@ class GameEngine:
         )
         return success
 
+    @traced('engine.submit_night_action')
     def submit_night_action(self, player_seat: int, role: str,
                            action_type: str, target_seat: Optional[int] = None) -> bool:
         """
@@ -123,6 +142,7 @@ class GameEngine:
         )
         return success
 
+    @traced('engine.advance_speaker')
     def advance_speaker(self) -> bool:
         """
         推进到下一个发言者
@@ -135,6 +155,7 @@ class GameEngine:
         else:
             raise NotImplementedError(f"advance_speaker not implemented for mode: {self.mode}")
 
+    @traced('engine.agent_vote')
     def agent_vote(self, seat: int) -> tuple:
         """
         让 Agent 投票
@@ -150,6 +171,7 @@ class GameEngine:
         else:
             raise NotImplementedError(f"agent_vote not implemented for mode: {self.mode}")
 
+    @traced('engine.get_state')
     def get_state(self) -> Dict:
         """
         获取当前游戏状态
@@ -159,6 +181,24 @@ class GameEngine:
         """
         return self.state_machine.get_state_for_frontend()
 
+    @traced('engine.get_votes')
+    def get_votes(self, offset: int = 0, limit: Optional[int] = None) -> Dict:
+        """
+        分页获取存活玩家的投票状态
+
+        参数:
+            offset: 起始位置
+            limit: 最多返回的玩家数（默认全部）
+
+        返回:
+            {'total', 'offset', 'playerVotes'}
+        """
+        if isinstance(self.state_machine, ClassicWerewolfStateMachine):
+            return self.state_machine.get_player_votes(offset, limit)
+        else:
+            raise NotImplementedError(f"get_votes not implemented for mode: {self.mode}")
+
+    @traced('engine.complete_announcement')
     def complete_announcement(self) -> bool:
         """
         完成播报，转换到待定阶段
@@ -168,10 +208,34 @@ class GameEngine:
         """
         return self.state_machine.complete_announcement()
 
-    def get_messages(self) -> list:
+    @traced('engine.reset')
+    def reset(self, seed: Optional[int] = None):
+        """
+        再来一局：就地重置状态机（复用上下文、玩家对象和处理器），回到等待阶段
+
+        参数:
+            seed: 新的房间随机种子（默认随机生成）
+        """
+        self.state_machine.reset(seed=seed)
+
+    @traced('engine.export_replay')
+    def export_replay(self) -> Dict:
+        """
+        导出回放记录（房间种子 + 动作流）
+
+        返回:
+            回放记录字典
+        """
+        return self.state_machine.export_replay()
+
+    @traced('engine.get_messages')
+    def get_messages(self, after: Optional[str] = None) -> list:
         """
         获取游戏消息列表
 
+        参数:
+            after: 只返回该消息ID之后的消息（可选；ID 不存在时返回空列表）
+
         返回:
             消息列表
         """
@@ -183,7 +247,69 @@ class GameEngine:
                 'type': msg.type,
                 'content': msg.content
             })
-        return messages
+
+        return messages_after(messages, after)
+
+    @classmethod
+    def from_replay(cls, record: Dict) -> 'GameEngine':
+        """
+        由回放记录重建游戏实例（用于在进程间迁移房间）
+
+        在虚拟时钟上逐位回放动作流并校验指纹，之后切换回墙上时钟继续游戏
+
+        参数:
+            record: export_replay() 导出的回放记录
+
+        异常:
+            ValueError: 记录格式不支持或指纹不一致
+        """
+        from state_machines import verify_replay
+
+        matched, state_machine = verify_replay(record)
+        if not matched:
+            raise ValueError(f"Replay fingerprint mismatch for room {record.get('roomId')}")
+        state_machine.clock = WALL_CLOCK
+        state_machine.context.clock = WALL_CLOCK
+
+        engine = cls.__new__(cls)
+        engine.room_id = record['roomId']
+        engine.mode = record['mode']
+        engine.seat_count = record['seatCount']
+        engine.state_machine = state_machine
+        engine._saved_key = None
+        return engine
+
+    def export_snapshot(self) -> bytes:
+        """
+        导出房间的二进制快照（见 state_machines.snapshot）
+
+        与回放记录相比不需要重新执行动作流，恢复更快、体积更小
+        """
+        from state_machines import encode_room
+
+        return encode_room(self.state_machine)
+
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> 'GameEngine':
+        """
+        由二进制快照恢复游戏实例（使用墙上时钟）
+
+        参数:
+            data: export_snapshot() 导出的快照
+
+        异常:
+            ValueError: 不是房间快照或格式版本不支持
+        """
+        from state_machines import decode_room
+
+        state_machine = decode_room(data, clock=WALL_CLOCK)
+        engine = cls.__new__(cls)
+        engine.room_id = state_machine.context.room_id
+        engine.mode = state_machine.mode
+        engine.seat_count = getattr(state_machine, 'seat_count', len(state_machine.context.players))
+        engine.state_machine = state_machine
+        engine._saved_key = None
+        return engine
 
     @property
     def game_state(self) -> GameStateContext:
@@ -191,8 +317,43 @@ class GameEngine:
         return self.state_machine.context
 
 
-# 全局游戏实例管理
-_game_instances: Dict[str, GameEngine] = {}
+def messages_after(messages: List[Dict], after: Optional[str]) -> List[Dict]:
+    """
+    截取某条消息之后的消息
+
+    参数:
+        messages: 消息列表（get_messages 的格式）
+        after: 消息ID（为空时返回全部；ID 不存在时返回空列表）
+    """
+    if not after:
+        return messages
+    for index, msg in enumerate(messages):
+        if msg['id'] == after:
+            return messages[index + 1:]
+    return []
+
+
+# 全局游戏实例管理（保存在可替换的房间存储中，见 room_store）
+
+def _encode_game(engine: GameEngine) -> bytes:
+    """房间编码为二进制快照"""
+    return engine.export_snapshot()
+
+
+def _decode_game(data: bytes) -> GameEngine:
+    """由二进制快照恢复房间"""
+    engine = GameEngine.from_snapshot(data)
+    engine._saved_key = _state_key(engine)
+    return engine
+
+
+def _state_key(engine: GameEngine) -> tuple:
+    """房间状态的变化标识（动作流长度 + 状态版本号）"""
+    context = engine.state_machine.context
+    return len(context.action_log), context.version
+
+
+_games = RoomRegistry('rooms', _encode_game, _decode_game)
 
 
 def get_or_create_game(room_id: str, mode: str = 'classic', seat_count: int = 12) -> GameEngine:
@@ -207,9 +368,16 @@ def get_or_create_game(room_id: str, mode: str = 'classic', seat_count: int = 12
     返回:
         游戏引擎实例
     """
-    if room_id not in _game_instances:
-        _game_instances[room_id] = GameEngine(room_id, mode, seat_count)
-    return _game_instances[room_id]
+    engine = _games.get(room_id)
+    if engine is None:
+        engine = GameEngine(room_id, mode, seat_count)
+        try:
+            _games.put(room_id, engine)
+        except VersionConflict:
+            # 其他进程同时创建了该房间
+            return _games.get(room_id)
+        engine._saved_key = _state_key(engine)
+    return engine
 
 
 def get_game(room_id: str) -> Optional[GameEngine]:
@@ -222,21 +390,150 @@ def get_game(room_id: str) -> Optional[GameEngine]:
     返回:
         游戏引擎实例，如果不存在则返回 None
     """
-    return _game_instances.get(room_id)
+    return _games.get(room_id)
 
 
-def remove_game(room_id: str) -> bool:
+def peek_game(room_id: str) -> Optional[GameEngine]:
+    """
+    获取本进程已加载的游戏实例（不访问存储）
+
+    参数:
+        room_id: 房间ID
+    """
+    return _games.peek(room_id)
+
+
+def save_game(engine: GameEngine) -> bool:
+    """
+    把房间的变更写回存储（状态没有变化时跳过）
+
+    参数:
+        engine: 游戏引擎实例
+
+    返回:
+        是否写入
+
+    异常:
+        VersionConflict: 房间已被其他进程修改（本进程的缓存已丢弃）
+    """
+    key = _state_key(engine)
+    if engine._saved_key == key:
+        return False
+    _games.put(engine.room_id, engine)
+    engine._saved_key = key
+    return True
+
+
+def remove_game(room_id: str, recycle: bool = True) -> bool:
     """
     移除游戏实例
 
     参数:
         room_id: 房间ID
+        recycle: 是否把状态机归还到池中复用（可能仍有请求在使用该房间时传 False，直接丢弃）
 
     返回:
         是否成功移除
     """
-    if room_id in _game_instances:
-        del _game_instances[room_id]
-        return True
-    return False
+    engine = _games.peek(room_id)
+    removed = _games.remove(room_id)
+    if engine is not None and recycle:
+        # 房间已不在注册表中，状态机归还到池中复用
+        STATE_MACHINE_POOL.release(engine.state_machine)
+    return removed
+
+
+def release_game(room_id: str, recycle: bool = True) -> bool:
+    """
+    释放本进程持有的房间（迁移到其他进程后调用）
+    共享存储中只丢弃进程内缓存，进程内存储中直接删除
 
+    参数:
+        room_id: 房间ID
+        recycle: 是否复用状态机（迁移前未等到进行中的请求结束时传 False）
+    """
+    if get_store().shared:
+        return _games.evict(room_id)
+    return remove_game(room_id, recycle=recycle)
+
+
+def list_game_ids() -> List[str]:
+    """
+    列出当前进程持有的房间ID（含休眠的房间）
+
+    返回:
+        房间ID列表
+    """
+    return _games.cached_ids() + _games.hibernated_ids()
+
+
+def hibernate_idle_games(idle_seconds: float) -> List[str]:
+    """
+    休眠超过 idle_seconds 没有访问的房间（丢弃活对象，下一次 get_game 时透明恢复）
+
+    参数:
+        idle_seconds: 空闲时长（秒）
+
+    返回:
+        本次休眠的房间ID列表
+    """
+    cutoff = time.monotonic() - idle_seconds
+    return [room_id for room_id in _games.idle_ids(idle_seconds) if _games.hibernate(room_id, idle_since=cutoff)]
+
+
+def restore_game(record: Dict) -> GameEngine:
+    """
+    由回放记录恢复房间（覆盖同名房间）
+
+    参数:
+        record: 回放记录
+
+    返回:
+        恢复后的游戏引擎实例
+    """
+    engine = GameEngine.from_replay(record)
+    _games.put(engine.room_id, engine, force=True)
+    engine._saved_key = _state_key(engine)
+    return engine
+
+
+def _collect_room_metrics() -> List[Metric]:
+    """抓取时统计房间指标（按阶段的房间数、消息日志大小）"""
+    rooms = Gauge('wolf_rooms', 'Active rooms by mode and phase', ('mode', 'phase'))
+    message_total = Gauge('wolf_room_messages', 'Messages held in room logs across all rooms')
+    message_max = Gauge('wolf_room_messages_max', 'Largest message log among active rooms')
+    hibernated = Gauge('wolf_rooms_hibernated', 'Idle rooms held as encoded snapshots instead of live objects')
+
+    total = largest = 0
+    for game in _games.cached():
+        context = game.game_state
+        rooms.inc(mode=game.mode, phase=context.phase)
+        count = len(context.messages)
+        total += count
+        largest = max(largest, count)
+    message_total.set(total)
+    message_max.set(largest)
+    hibernated.set(len(_games.hibernated_ids()))
+
+    pool_idle = Gauge('wolf_state_machine_pool_idle', 'Warm state machines waiting in the pool', ('pool',))
+    pool_acquires = Counter('wolf_state_machine_pool_acquires', 'State machines taken from the pool', ('result',))
+    pool_stats = STATE_MACHINE_POOL.stats()
+    for pool, count in pool_stats['idle'].items():
+        pool_idle.set(count, pool=pool)
+    pool_acquires.inc(pool_stats['hits'], result='hit')
+    pool_acquires.inc(pool_stats['misses'], result='miss')
+
+    events_published = Counter('wolf_events_published', 'Engine events published to the event bus')
+    events_pending = Gauge('wolf_events_pending', 'Events waiting in each subscriber queue', ('subscriber',))
+    events_dropped = Counter('wolf_events_dropped', 'Events dropped because a subscriber queue was full',
+                             ('subscriber',))
+    event_stats = EVENT_BUS.stats()
+    events_published.inc(event_stats['published'])
+    for subscriber in event_stats['subscribers']:
+        events_pending.inc(subscriber['pending'], subscriber=subscriber['name'])
+        events_dropped.inc(subscriber['dropped'], subscriber=subscriber['name'])
+    return [rooms, message_total, message_max, hibernated, pool_idle, pool_acquires,
+            events_published, events_pending, events_dropped]
+
+
+REGISTRY.register_collector(_collect_room_metrics)
@@ -0,0 +1,60 @@
+"""
+空闲房间休眠
+后台线程定期检查本进程持有的房间，超过空闲时长没有访问的房间编码为快照（见 state_machines.snapshot），
+丢弃状态机、消息列表、Agent 实例和提示词缓存等活对象；下一次 get_game 时透明恢复。
+"""
+import logging
+import sys
+import threading
+from typing import List
+
+import game_engine
+
+logger = logging.getLogger('api')
+
+
+class RoomHibernator:
+    """
+    空闲房间休眠的后台线程
+
+    参数:
+        idle_seconds: 空闲时长（秒），超过后休眠
+        interval: 检查间隔（秒，默认为空闲时长的 1/4，最长 60 秒）
+    """
+
+    def __init__(self, idle_seconds: float, interval: float = None):
+        self.idle_seconds = idle_seconds
+        self.interval = interval if interval is not None else min(60.0, max(1.0, idle_seconds / 4))
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def sweep(self) -> List[str]:
+        """休眠一次当前空闲的房间，返回本次休眠的房间ID"""
+        room_ids = game_engine.hibernate_idle_games(self.idle_seconds)
+        # Agent 决策上下文（只在已加载 agent_decision 时）
+        agent_module = sys.modules.get('agent_decision')
+        if agent_module is not None:
+            for room_id in room_ids:
+                agent_module.hibernate_agent_contexts(room_id)
+        return room_ids
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                room_ids = self.sweep()
+            except Exception as e:
+                logger.error(f"❌ [hibernate] 房间休眠失败: {str(e)}")
+                continue
+            if room_ids:
+                logger.info(f"💤 [hibernate] 休眠 {len(room_ids)} 个空闲房间")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='room-hibernator', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,208 @@
+"""
+大模型响应缓存
+
+以 (模型, 规范化后的提示词, 采样参数) 的哈希为键缓存模型输出，
+内存 LRU 在前，SQLite 磁盘存储在后，支持条数上限（LRU 淘汰）和 TTL 过期。
+回放、压测和回归测试中同样的局面反复出现，命中缓存即可不依赖模型服务运行对局。
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('agent_decision')
+
+
+def normalize_prompt(text: str) -> str:
+    """规范化提示词：去掉首尾空白和行尾空白，统一换行符"""
+    lines = text.replace('\r\n', '\n').strip().split('\n')
+    return '\n'.join(line.rstrip() for line in lines)
+
+
+def make_cache_key(model: str, messages: List[Dict], **params) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model: 模型名称
+        messages: 对话消息
+        **params: 采样参数（max_tokens、temperature 等）
+
+    Returns:
+        十六进制 SHA-256 摘要
+    """
+    payload = {
+        'model': model,
+        'messages': [
+            {'role': m.get('role'), 'content': normalize_prompt(m.get('content') or '')}
+            for m in messages
+        ],
+        'params': params,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    两级响应缓存：内存 LRU + SQLite 磁盘存储
+
+    磁盘条目记录写入时间和最近访问时间，超过 TTL 的条目视为过期，
+    超过条数上限时按最近访问时间淘汰最旧的条目（每 EVICT_INTERVAL 次写入检查一次）。
+    内存命中不逐次写盘，访问时间先记在内存里，攒满 EVICT_INTERVAL 条或淘汰前批量写回，
+    否则最常用的键只在内存中命中，磁盘上的访问时间停留在写入时，反而最先被淘汰。
+    """
+
+    EVICT_INTERVAL = 100
+
+    def __init__(self, path: Optional[str] = None, memory_entries: int = 1024,
+                 max_entries: int = 100000, ttl_seconds: float = 0):
+        """
+        Args:
+            path: SQLite 文件路径，为 None 时只使用内存
+            memory_entries: 内存 LRU 条数上限
+            max_entries: 磁盘条数上限
+            ttl_seconds: 条目有效期（秒），0 表示永不过期
+        """
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: OrderedDict = OrderedDict()  # {key: (created_at, value)}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes_since_evict = 0
+        self._touched: Dict[str, float] = {}  # 内存命中、尚未写回磁盘的访问时间 {key: accessed_at}
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)')
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回 None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    if self._db is not None:
+                        self._touched[key] = now
+                        if len(self._touched) >= self.EVICT_INTERVAL:
+                            self._flush_touched()
+                            self._db.commit()
+                    return entry[1]
+                del self._memory[key]
+                self._touched.pop(key, None)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, created_at FROM llm_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created_at = row
+                    if not self._expired(created_at, now):
+                        self._db.execute('UPDATE llm_cache SET accessed_at = ? WHERE key = ?', (now, key))
+                        self._db.commit()
+                        self._remember(key, created_at, value)
+                        self.hits += 1
+                        return value
+                    self._db.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str):
+        """写入缓存"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._touched.pop(key, None)
+            if self._db is None:
+                return
+
+            self._db.execute(
+                'INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now)
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= self.EVICT_INTERVAL:
+                self._evict(now)
+            self._db.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM llm_cache')
+                self._db.commit()
+
+    def stats(self) -> Dict:
+        """缓存统计"""
+        with self._lock:
+            disk_entries = 0
+            if self._db is not None:
+                disk_entries = self._db.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memoryEntries': len(self._memory),
+                'diskEntries': disk_entries,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, created_at: float, value: str):
+        """写入内存 LRU（调用方需持有锁）"""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_touched(self):
+        """把内存命中的访问时间批量写回磁盘（调用方需持有锁并提交）"""
+        if self._touched:
+            self._db.executemany(
+                'UPDATE llm_cache SET accessed_at = ? WHERE key = ?',
+                [(accessed_at, key) for key, accessed_at in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _evict(self, now: float):
+        """淘汰过期和超出上限的磁盘条目（调用方需持有锁）"""
+        self._writes_since_evict = 0
+        self._flush_touched()
+        if self.ttl_seconds > 0:
+            self._db.execute('DELETE FROM llm_cache WHERE created_at < ?', (now - self.ttl_seconds,))
+
+        count = self._db.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                'DELETE FROM llm_cache WHERE key IN '
+                '(SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)',
+                (overflow,)
+            )
+            logger.debug(f"[LLMResponseCache] 淘汰 {overflow} 条缓存")
@@ -0,0 +1,186 @@
+"""
+大模型调用保护
+
+为 Agent 的大模型调用提供截止时间、重试和熔断，
+保证无论模型服务延迟如何，游戏节奏都有上限。
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+
+from state_machines.clock import WALL_CLOCK, Clock, VirtualClock
+from tracing import span
+
+logger = logging.getLogger('agent_decision')
+
+T = TypeVar('T')
+
+# 单次请求至少需要的剩余时间（秒），不足则直接放弃
+MIN_ATTEMPT_SECONDS = 0.5
+
+
+def _sleep(clock: Clock, seconds: float):
+    """按时钟等待（虚拟时钟直接推进，测试和模拟中不真正等待）"""
+    if isinstance(clock, VirtualClock):
+        clock.advance(seconds)
+    else:
+        time.sleep(seconds)
+
+
+class LLMUnavailableError(Exception):
+    """大模型当前不可用（熔断、超时或截止时间不足），调用方应使用规则决策"""
+
+    def __init__(self, message: str, reason: str = 'error'):
+        super().__init__(message)
+        # 不可用原因：circuit_open / timeout / error / deadline / offline_miss / no_client
+        self.reason = reason
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    在滑动窗口内统计调用结果，失败率超过阈值时打开，
+    打开期间直接拒绝请求；冷却时间过后进入半开状态，只放行一次试探请求，
+    试探成功则关闭，失败则重新打开。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window_size: int = 20, min_calls: int = 5,
+                 failure_rate_threshold: float = 0.5, cooldown_seconds: float = 30.0,
+                 clock: Clock = WALL_CLOCK):
+        """
+        Args:
+            window_size: 滑动窗口大小（最近 N 次调用）
+            min_calls: 窗口内至少有多少次调用才开始计算失败率
+            failure_rate_threshold: 触发熔断的失败率
+            cooldown_seconds: 打开后多久允许试探请求
+            clock: 计算冷却时间的时钟（测试可传入虚拟时钟）
+        """
+        self.clock = clock
+        self.min_calls = min_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.cooldown_seconds = cooldown_seconds
+
+        self._outcomes = deque(maxlen=window_size)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """当前状态：closed / open / half_open"""
+        return self._state
+
+    def allow_request(self) -> bool:
+        """是否允许发起调用"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if self.clock.now() - self._opened_at < self.cooldown_seconds:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+                logger.info("[CircuitBreaker] 冷却结束，进入半开状态")
+
+            if self._state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    return False
+                self._probe_in_flight = True
+
+            return True
+
+    def record_success(self):
+        """记录一次成功调用"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                logger.info("[CircuitBreaker] 试探请求成功，熔断器关闭")
+                self._state = self.CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self):
+        """记录一次失败调用"""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._trip()
+                return
+
+            self._outcomes.append(False)
+            if len(self._outcomes) < self.min_calls:
+                return
+
+            failures = sum(1 for ok in self._outcomes if not ok)
+            if failures / len(self._outcomes) >= self.failure_rate_threshold:
+                self._trip()
+
+    def _trip(self):
+        """打开熔断器（调用方需持有锁）"""
+        self._state = self.OPEN
+        self._opened_at = self.clock.now()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+        logger.warning(f"[CircuitBreaker] 大模型失败率过高，熔断 {self.cooldown_seconds:.0f}s")
+
+
+def call_with_deadline(func: Callable[[float], T], deadline: float, max_retries: int = 0,
+                       breaker: Optional[CircuitBreaker] = None,
+                       backoff_seconds: float = 0.2, clock: Clock = WALL_CLOCK) -> T:
+    """
+    在截止时间内调用 func，失败时按指数退避重试
+
+    Args:
+        func: 被调用函数，参数为本次调用允许的超时时间（秒）
+        deadline: 截止时间戳（clock 口径）
+        max_retries: 最大重试次数
+        breaker: 熔断器（可选）
+        backoff_seconds: 首次重试前的退避时间
+        clock: 时钟（默认墙上时钟，测试可传入虚拟时钟）
+
+    Returns:
+        func 的返回值
+
+    Raises:
+        LLMUnavailableError: 熔断打开、截止时间不足或重试耗尽
+    """
+    last_error: Optional[Exception] = None
+
+    for attempt in range(max_retries + 1):
+        remaining = deadline - clock.now()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            break
+
+        if breaker is not None and not breaker.allow_request():
+            raise LLMUnavailableError("熔断器已打开，跳过大模型调用", reason='circuit_open')
+
+        try:
+            with span('llm.attempt', attempt=attempt + 1, timeout=round(remaining, 3)):
+                result = func(remaining)
+        except Exception as e:
+            last_error = e
+            if breaker is not None:
+                breaker.record_failure()
+            logger.warning(f"[call_with_deadline] 第 {attempt + 1} 次调用失败: {str(e)}")
+
+            # 退避不能越过截止时间
+            delay = min(backoff_seconds * (2 ** attempt),
+                        deadline - clock.now() - MIN_ATTEMPT_SECONDS)
+            if attempt < max_retries and delay > 0:
+                with span('llm.backoff', seconds=round(delay, 3)):
+                    _sleep(clock, delay)
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    if last_error is not None:
+        reason = 'timeout' if 'timeout' in type(last_error).__name__.lower() else 'error'
+        raise LLMUnavailableError(f"大模型调用失败: {str(last_error)}", reason=reason) from last_error
+    raise LLMUnavailableError("距离截止时间不足，跳过大模型调用", reason='deadline')
@@ -0,0 +1,121 @@
+"""
+日志管道
+请求线程只把日志记录放进有界队列，由后台线程写文件和控制台；
+文件按天切分并按大小滚动，队列满时丢弃记录而不是阻塞请求。
+"""
+import atexit
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Iterable, Optional
+
+try:
+    from metrics import LOG_RECORDS_DROPPED
+except ImportError:
+    LOG_RECORDS_DROPPED = None
+
+
+class DailyRotatingFileHandler(RotatingFileHandler):
+    """
+    按天切分、按大小滚动的文件处理器
+
+    文件名为 {prefix}_YYYYMMDD.log，单个文件超过 max_bytes 时滚动为 .1、.2 ...，
+    跨天时切换到新文件并清理超过保留天数的旧文件。
+    """
+
+    def __init__(self, log_dir: str, prefix: str, max_bytes: int = 0, backup_count: int = 0,
+                 retention_days: int = 0):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.retention_days = retention_days
+        self._day = self._today()
+        super().__init__(self._path(self._day), maxBytes=max_bytes, backupCount=backup_count,
+                         encoding='utf-8', delay=True)
+
+    @staticmethod
+    def _today() -> str:
+        return time.strftime('%Y%m%d')
+
+    def _path(self, day: str) -> str:
+        return os.path.join(self.log_dir, f'{self.prefix}_{day}.log')
+
+    def shouldRollover(self, record) -> bool:
+        if self._today() != self._day:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self):
+        today = self._today()
+        if today == self._day:
+            super().doRollover()
+            return
+
+        # 跨天：切换到新文件
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._day = today
+        self.baseFilename = os.path.abspath(self._path(today))
+        self._purge_expired()
+
+    def _purge_expired(self):
+        """删除超过保留天数的日志文件"""
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        for name in os.listdir(self.log_dir):
+            if not name.startswith(f'{self.prefix}_'):
+                continue
+            path = os.path.join(self.log_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class DroppingQueueHandler(QueueHandler):
+    """队列满时丢弃记录的 QueueHandler（不阻塞请求线程）"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if LOG_RECORDS_DROPPED is not None:
+                LOG_RECORDS_DROPPED.inc()
+
+
+class LogPipeline:
+    """后台日志写入管道"""
+
+    def __init__(self, handlers: Iterable[logging.Handler], queue_size: int = 10000):
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener = QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._started = False
+
+    def attach(self, logger: logging.Logger, level: int = logging.DEBUG, propagate: Optional[bool] = None):
+        """让 logger 经由队列输出"""
+        logger.setLevel(level)
+        logger.addHandler(self.handler)
+        if propagate is not None:
+            logger.propagate = propagate
+
+    def start(self):
+        if not self._started:
+            self.listener.start()
+            self._started = True
+            atexit.register(self.stop)
+
+    def stop(self):
+        """停止后台线程（会先写完队列中剩余的记录）"""
+        if self._started:
+            self._started = False
+            self.listener.stop()
@@ -0,0 +1,247 @@
+"""
+Prometheus 指标
+标准库实现的计数器、仪表盘和直方图，以 Prometheus 文本格式（0.0.4）输出，由 GET /metrics 暴露。
+所有指标在本模块集中定义；按需采集的指标（如房间数）通过 collector 在抓取时计算。
+"""
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认直方图桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 指标样本：(指标名后缀, 标签字典, 值)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + '}'
+
+
+class Metric:
+    """指标基类"""
+
+    type_name = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...]) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [('_total', self._labels(k), v) for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    """可增可减的仪表盘"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [('', self._labels(k), v) for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    """累积桶直方图"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # {标签: [各桶计数..., 总和, 总数]}
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> List[Sample]:
+        result = []
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, state in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                result.append(('_bucket', {**labels, 'le': _format_value(bound)}, cumulative))
+            result.append(('_bucket', {**labels, 'le': '+Inf'}, state[-1]))
+            result.append(('_sum', labels, state[-2]))
+            result.append(('_count', labels, state[-1]))
+        return result
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Callable[[], Iterable[Metric]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Metric]]):
+        """注册抓取时调用的采集函数（返回临时构建的指标）"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """输出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            metrics.extend(collector())
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            for suffix, labels, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def _gauge(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def _histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+               buckets: Optional[Sequence[float]] = None) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets or DEFAULT_BUCKETS))
+
+
+# ============== 指标定义 ==============
+
+# HTTP
+HTTP_REQUEST_DURATION = _histogram(
+    'wolf_http_request_duration_seconds', 'HTTP request latency by route',
+    ('method', 'route', 'status'),
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+)
+
+# 状态机
+PHASE_DURATION = _histogram(
+    'wolf_phase_duration_seconds', 'Time spent in each state machine phase (room clock)',
+    ('mode', 'phase'),
+    (1, 5, 10, 20, 30, 60, 120, 180, 300, 600, 1200)
+)
+
+# Agent 决策
+AGENT_DECISIONS = _counter(
+    'wolf_agent_decisions', 'Agent decisions by role and decision type',
+    ('role', 'decision_type')
+)
+AGENT_DECISION_DURATION = _histogram(
+    'wolf_agent_decision_duration_seconds', 'Agent decision latency including prompt build and LLM call',
+    ('role', 'decision_type'),
+    (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+)
+AGENT_FALLBACKS = _counter(
+    'wolf_agent_fallbacks', 'Agent decisions that fell back to rule-based logic',
+    ('decision_type', 'reason')
+)
+
+# 大模型
+LLM_INFLIGHT = _gauge('wolf_llm_inflight_requests', 'LLM calls currently waiting on the provider')
+LLM_REQUESTS = _counter(
+    'wolf_llm_requests', 'LLM calls by outcome (ok, cache_hit, timeout, error, circuit_open, deadline, ...)',
+    ('outcome',)
+)
+LLM_REQUEST_DURATION = _histogram(
+    'wolf_llm_request_duration_seconds', 'LLM call latency including retries', (),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0)
+)
+LLM_TOKENS = _counter('wolf_llm_tokens', 'LLM token usage reported by the provider', ('type',))
+
+# 日志
+LOG_RECORDS_DROPPED = _counter('wolf_log_records_dropped', 'Log records dropped because the log queue was full')
+
+
+def render() -> str:
+    """输出所有指标"""
+    return REGISTRY.render()
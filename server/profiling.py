@@ -0,0 +1,468 @@
+"""
+按需剖析
+管理接口可以针对某个房间或路由开启剖析会话，覆盖之后的 N 个请求或 N 秒：
+- cprofile: 在匹配的请求内启用 cProfile，结束后汇总为 pstats 报告
+- sampling: 后台线程定时采样处理匹配请求的线程栈，开销与请求内的调用次数无关
+
+内存方面，按房间统计 GameStateContext 各字段、消息列表、agent_contexts 和提示词缓存的深度大小，
+开启 tracemalloc 时附带分配位置排行以及与上一次快照的差异。
+"""
+import cProfile
+import io
+import itertools
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import fields
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+MODES = ('cprofile', 'sampling')
+
+# 单个会话的上限，防止忘记关闭
+MAX_SESSION_REQUESTS = 10000
+MAX_SESSION_SECONDS = 600.0
+# 采样间隔范围（毫秒）
+MIN_SAMPLE_INTERVAL_MS = 1.0
+DEFAULT_SAMPLE_INTERVAL_MS = 5.0
+# 采样保留的最大栈深度
+MAX_STACK_DEPTH = 64
+
+
+class ProfileSession:
+    """一次剖析会话"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, mode: str, room_id: Optional[str] = None, route: Optional[str] = None,
+                 max_requests: Optional[int] = None, seconds: Optional[float] = None,
+                 interval_ms: float = DEFAULT_SAMPLE_INTERVAL_MS):
+        """
+        参数:
+            mode: 'cprofile' 或 'sampling'
+            room_id: 只剖析该房间的请求（可选）
+            route: 只剖析该路由模板的请求，如 '/api/rooms/<room_id>/state'（可选）
+            max_requests: 剖析的请求数上限
+            seconds: 会话持续时间
+            interval_ms: 采样间隔（sampling 模式）
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if max_requests is None and seconds is None:
+            raise ValueError("requests or seconds is required")
+        if max_requests is not None and not 0 < max_requests <= MAX_SESSION_REQUESTS:
+            raise ValueError(f"requests must be between 1 and {MAX_SESSION_REQUESTS}")
+        if seconds is not None and not 0 < seconds <= MAX_SESSION_SECONDS:
+            raise ValueError(f"seconds must be between 0 and {MAX_SESSION_SECONDS}")
+
+        self.session_id = next(self._ids)
+        self.mode = mode
+        self.room_id = room_id
+        self.route = route
+        self.max_requests = max_requests
+        self.started_at = time.time()
+        self.expires_at = self.started_at + (seconds if seconds is not None else MAX_SESSION_SECONDS)
+        self.interval = max(interval_ms, MIN_SAMPLE_INTERVAL_MS) / 1000
+
+        self.requests_started = 0
+        self.requests_profiled = 0
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+        # cProfile 结果
+        self._stats: Optional[pstats.Stats] = None
+        # 采样结果：{栈（由外到内）: 次数}
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._threads: Dict[int, int] = {}
+        self._sampler: Optional[threading.Thread] = None
+
+        if mode == 'sampling':
+            self._sampler = threading.Thread(target=self._sample_loop, name=f'profiler-{self.session_id}',
+                                             daemon=True)
+            self._sampler.start()
+
+    @property
+    def active(self) -> bool:
+        return self.finished_at is None
+
+    def matches(self, route: Optional[str], room_id: Optional[str]) -> bool:
+        if not self.active:
+            return False
+        if self.room_id is not None and room_id != self.room_id:
+            return False
+        if self.route is not None and route != self.route:
+            return False
+        return True
+
+    def _check_limits(self):
+        """达到请求数或时间上限时结束会话（调用方需持有锁）"""
+        if self.finished_at is not None:
+            return
+        if time.time() >= self.expires_at:
+            self.finished_at = time.time()
+        elif self.max_requests is not None and self.requests_profiled >= self.max_requests \
+                and not self._threads:
+            self.finished_at = time.time()
+
+    def begin_request(self) -> Optional[Any]:
+        """
+        匹配的请求开始时调用
+
+        返回:
+            请求句柄（交给 end_request），会话已满时为 None
+        """
+        with self._lock:
+            self._check_limits()
+            if not self.active:
+                return None
+            if self.max_requests is not None and self.requests_started >= self.max_requests:
+                return None
+            self.requests_started += 1
+
+            if self.mode == 'sampling':
+                ident = threading.get_ident()
+                self._threads[ident] = self._threads.get(ident, 0) + 1
+                return ident
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 当前线程已有其他剖析器
+            with self._lock:
+                self.requests_started -= 1
+            return None
+        return profiler
+
+    def end_request(self, handle: Any):
+        """匹配的请求结束时调用"""
+        if self.mode == 'cprofile':
+            handle.disable()
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(handle)
+                else:
+                    self._stats.add(handle)
+                self.requests_profiled += 1
+                self._check_limits()
+            return
+
+        with self._lock:
+            remaining = self._threads.get(handle, 0) - 1
+            if remaining > 0:
+                self._threads[handle] = remaining
+            else:
+                self._threads.pop(handle, None)
+            self.requests_profiled += 1
+            self._check_limits()
+
+    def stop(self):
+        with self._lock:
+            if self.finished_at is None:
+                self.finished_at = time.time()
+
+    def _sample_loop(self):
+        """采样线程：定时抓取处理匹配请求的线程栈"""
+        while True:
+            with self._lock:
+                self._check_limits()
+                if not self.active:
+                    return
+                threads = list(self._threads)
+            if threads:
+                frames = sys._current_frames()
+                with self._lock:
+                    for ident in threads:
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            self._stacks[_frame_stack(frame)] += 1
+                            self._samples += 1
+            time.sleep(self.interval)
+
+    def summary(self) -> Dict:
+        return {
+            'id': self.session_id,
+            'mode': self.mode,
+            'roomId': self.room_id,
+            'route': self.route,
+            'maxRequests': self.max_requests,
+            'requestsProfiled': self.requests_profiled,
+            'startedAt': self.started_at,
+            'expiresAt': self.expires_at,
+            'finishedAt': self.finished_at,
+            'active': self.active,
+        }
+
+    def report(self, top: int = 30, sort: str = 'cumulative') -> Dict:
+        """剖析报告（会话进行中也可查看当前结果）"""
+        with self._lock:
+            self._check_limits()
+            result = self.summary()
+            if self.mode == 'cprofile':
+                result['report'] = _format_pstats(self._stats, top, sort)
+            else:
+                result.update(_summarize_samples(self._stacks, self._samples, self.interval, top))
+        return result
+
+
+def _frame_stack(frame) -> Tuple[str, ...]:
+    """线程栈（由外到内），每层为 file:function:line"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        stack.append(f"{code.co_filename}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _format_pstats(stats: Optional[pstats.Stats], top: int, sort: str) -> str:
+    if stats is None:
+        return ''
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats(sort).print_stats(top)
+    return stream.getvalue()
+
+
+def _summarize_samples(stacks: Counter, samples: int, interval: float, top: int) -> Dict:
+    """汇总采样结果：函数自身/累计占比和最热的完整栈（folded 格式，可直接生成火焰图）"""
+    self_counts: Counter = Counter()
+    total_counts: Counter = Counter()
+    for stack, count in stacks.items():
+        if not stack:
+            continue
+        self_counts[_function_of(stack[-1])] += count
+        for function in set(_function_of(entry) for entry in stack):
+            total_counts[function] += count
+
+    def ranked(counter: Counter) -> List[Dict]:
+        return [
+            {'function': function, 'samples': count, 'percent': round(count * 100 / samples, 2)}
+            for function, count in counter.most_common(top)
+        ]
+
+    return {
+        'samples': samples,
+        'intervalMs': interval * 1000,
+        'selfTop': ranked(self_counts) if samples else [],
+        'cumulativeTop': ranked(total_counts) if samples else [],
+        'stacks': [f"{';'.join(stack)} {count}" for stack, count in stacks.most_common(top)],
+    }
+
+
+def _function_of(entry: str) -> str:
+    """file:function:line → file:function"""
+    return entry.rsplit(':', 1)[0]
+
+
+class Profiler:
+    """剖析会话管理（请求钩子在没有会话时立即返回）"""
+
+    def __init__(self, history: int = 20):
+        self._sessions: Dict[int, ProfileSession] = {}
+        self._history = history
+        self._lock = threading.Lock()
+
+    def start(self, **kwargs) -> ProfileSession:
+        session = ProfileSession(**kwargs)
+        with self._lock:
+            self._sessions[session.session_id] = session
+            # 只保留最近的已结束会话
+            finished = [s for s in self._sessions.values() if not s.active]
+            for old in finished[:max(0, len(self._sessions) - self._history)]:
+                del self._sessions[old.session_id]
+        return session
+
+    def get(self, session_id: int) -> Optional[ProfileSession]:
+        return self._sessions.get(session_id)
+
+    def sessions(self) -> List[ProfileSession]:
+        return list(self._sessions.values())
+
+    def stop(self, session_id: int) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        session.stop()
+        return True
+
+    def begin_request(self, route: Optional[str], room_id: Optional[str]) -> List[Tuple[ProfileSession, Any]]:
+        """请求开始：返回匹配会话的句柄列表"""
+        if not self._sessions:
+            return []
+        handles = []
+        for session in list(self._sessions.values()):
+            if session.matches(route, room_id):
+                handle = session.begin_request()
+                if handle is not None:
+                    handles.append((session, handle))
+        return handles
+
+    def end_request(self, handles: Iterable[Tuple[ProfileSession, Any]]):
+        for session, handle in reversed(list(handles)):
+            session.end_request(handle)
+
+
+PROFILER = Profiler()
+
+
+# ============== 内存 ==============
+
+# 深度统计时不展开的类型（共享或不属于房间的对象）
+_OPAQUE_TYPES = (type, type(sys), type(len), type(_frame_stack), threading.Thread)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    对象及其引用对象的总大小（字节），seen 中的对象不重复计算
+
+    用于把内存归属到房间的各个字段；共享对象（类、模块、函数、时钟等）应预先放入 seen
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    pending = [obj]
+    while pending:
+        current = pending.pop()
+        if id(current) in seen or isinstance(current, _OPAQUE_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+
+        if isinstance(current, dict):
+            pending.extend(current.keys())
+            pending.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            pending.extend(current)
+        elif isinstance(current, (str, bytes, int, float, bool)) or current is None:
+            continue
+        else:
+            if hasattr(current, '__dict__'):
+                pending.append(current.__dict__)
+            for slot in getattr(type(current), '__slots__', ()):
+                if hasattr(current, slot):
+                    pending.append(getattr(current, slot))
+    return total
+
+
+def room_memory_report(room_id: str, context, extra: Optional[Dict[str, Any]] = None) -> Dict:
+    """
+    房间内存归属：GameStateContext 各字段、消息列表和其他房间级对象（agent_contexts、提示词缓存等）
+
+    参数:
+        room_id: 房间ID
+        context: 房间的 GameStateContext
+        extra: {名称: 对象}，其他归属于房间的对象
+    """
+    # 时钟由多个房间共享，不计入
+    shared = {id(context)}
+    if getattr(context, 'clock', None) is not None:
+        shared.add(id(context.clock))
+
+    field_sizes = {}
+    seen = set(shared)
+    for f in fields(context):
+        if f.name == 'clock':
+            continue
+        field_sizes[f.name] = deep_sizeof(getattr(context, f.name), seen)
+
+    messages = context.messages
+    per_type: Counter = Counter()
+    for message in messages:
+        per_type[message.type] += 1
+
+    extra_sizes = {}
+    for name, obj in (extra or {}).items():
+        # 不重复计算上下文本身已统计的对象（Agent 持有上下文和玩家的引用）
+        extra_sizes[name] = deep_sizeof(obj, seen)
+
+    return {
+        'roomId': room_id,
+        'contextBytes': sys.getsizeof(context) + sum(field_sizes.values()),
+        'fields': dict(sorted(field_sizes.items(), key=lambda item: item[1], reverse=True)),
+        'messages': {
+            'count': len(messages),
+            'bytes': field_sizes.get('messages', 0),
+            'byType': dict(per_type.most_common()),
+        },
+        'actionLogEntries': len(context.action_log),
+        'extra': extra_sizes,
+    }
+
+
+class TracemallocTracker:
+    """tracemalloc 控制：开启/关闭、快照排行和与上一次快照的差异"""
+
+    def __init__(self):
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._previous = None
+
+    def stop(self):
+        with self._lock:
+            self._previous = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def snapshot(self, top: int = 20, group_by: str = 'lineno', path_filter: Optional[str] = None) -> Dict:
+        """
+        拍摄快照
+
+        参数:
+            top: 排行条数
+            group_by: 'lineno' / 'filename' / 'traceback'
+            path_filter: 只统计路径包含该字符串的分配（如 'server/'）
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        with self._lock:
+            previous, self._previous = self._previous, snapshot
+
+        if path_filter:
+            path_filters = (tracemalloc.Filter(True, f'*{path_filter}*'),)
+            snapshot = snapshot.filter_traces(path_filters)
+            if previous is not None:
+                previous = previous.filter_traces(path_filters)
+
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            'tracedBytes': current,
+            'peakBytes': peak,
+            'top': [_format_stat(stat) for stat in snapshot.statistics(group_by)[:top]],
+        }
+        if previous is not None:
+            result['diff'] = [_format_stat(stat) for stat in snapshot.compare_to(previous, group_by)[:top]]
+        return result
+
+
+def _format_stat(stat) -> Dict:
+    result = {
+        'location': [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        'bytes': stat.size,
+        'count': stat.count,
+    }
+    if hasattr(stat, 'size_diff'):
+        result['bytesDiff'] = stat.size_diff
+        result['countDiff'] = stat.count_diff
+    return result
+
+
+TRACEMALLOC = TracemallocTracker()
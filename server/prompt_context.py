@@ -0,0 +1,190 @@
+"""
+Agent 提示词上下文缓存
+
+提示词分为三段：
+- 固定前缀：游戏规则，所有调用逐字节相同，便于模型服务的前缀缓存命中
+- 公共段：轮次、存活玩家、昨晚死亡、历史对话，同一状态版本内所有座位共享
+- 角色段：座位视角的私有信息，同一状态版本内每个座位只构建一次
+
+公共段和角色段按 context.version 缓存，状态不变时不会重复构建。
+"""
+import threading
+from typing import Dict, Tuple
+
+from prompt_history import get_room_history
+from state_machines import Role
+from state_machines.state_context import GameStateContext
+from tracing import traced
+
+# 固定前缀（所有 Agent、所有调用共享，不要插入任何变量）
+STATIC_PREFIX = """你是一个狼人杀游戏的玩家。
+
+【游戏规则】
+- 狼人阵营：狼人每晚选择一名玩家击杀
+- 神职阵营：
+  * 预言家：每晚查验一名玩家的身份
+  * 女巫：有一瓶解药（救被狼人杀的人）和一瓶毒药（毒死一人），同一晚只能使用一瓶
+  * 猎人：死亡时可开枪带走一人
+- 平民阵营：村民，晚上不行动
+- 投票规则：白天所有人投票，票数最多者出局
+"""
+
+
+def build_public_section(context: GameStateContext, history_text: str) -> str:
+    """构建公共段（所有座位可见的信息）"""
+    last_dead = context.last_dead_player
+    last_dead_text = f"{last_dead.get('seat', '无')}号（{last_dead.get('killed_by', 'N/A')}）" if last_dead else '无'
+    return f"""
+【游戏状态】
+当前轮次：第 {context.round} 轮
+存活玩家：{', '.join(map(str, context.get_alive_players()))}
+昨晚死亡：{last_dead_text}
+
+【历史对话】
+{history_text if history_text else '暂无对话'}
+"""
+
+
+def build_role_section(context: GameStateContext, seat: int) -> str:
+    """构建角色段（只有该座位能看到的信息）"""
+    agent = context.players.get(seat)
+    role_name = agent.role.value if agent and agent.role else 'unknown'
+
+    # === 角色信息（不同角色能看到不同的内容）===
+    role_info = ""
+    if agent and agent.role == Role.WEREWOLF:
+        # 狼人视角：看到所有狼人队友的身份
+        if context.werewolf_context:
+            teammates = context.werewolf_context.get('teammates', [])
+            werewolf_info = [f"{s}号是狼人" for s in teammates]
+            role_info = "狼人视角：\n" + "\n".join(werewolf_info)
+        else:
+            role_info = "狼人视角：\n无队友信息"
+    elif agent and agent.role in (Role.SEER, Role.WITCH, Role.HUNTER, Role.VILLAGER):
+        # 预言家、女巫、猎人、村民：只能看到自己的角色
+        role_info = f"神职/村民视角：\n{seat}号是{role_name}"
+
+    # === 动作信息（不同角色特有的夜晚行动信息）===
+    action_info = ""
+    if agent and agent.role == Role.WEREWOLF:
+        # 狼人：知道昨晚杀的人
+        if context.last_dead_player and context.last_dead_player.get('killed_by') == 'werewolf':
+            action_info = f"\n夜晚行动信息：\n昨晚击杀了{context.last_dead_player.get('seat', '未知')}号"
+    elif agent and agent.role == Role.SEER:
+        # 预言家：查看历史
+        if context.seer_context:
+            action_info = "\n夜晚行动信息：\n" + "\n".join(
+                f"第{c.get('round', '?')}晚查了{c.get('seat', '?')}号，结果是{c.get('result', '?')}"
+                for c in context.seer_context
+            )
+    elif agent and agent.role == Role.WITCH:
+        # 女巫：药水状态和使用历史
+        if context.witch_context:
+            action_info = f"\n夜晚行动信息：\n解药状态：{'有' if context.witch_context.get('has_save_potion') else '已使用'}\n毒药状态：{'有' if context.witch_context.get('has_poison_potion') else '已使用'}"
+            saved = context.witch_context.get('saved_history', [])
+            if saved:
+                action_info += f"\n救过的玩家：{', '.join(map(str, saved))}"
+    # 猎人和村民：没有特殊夜晚行动信息
+
+    return f"""
+【角色信息】
+座位号：{seat}
+角色：{role_name}
+{role_info}
+{action_info}
+"""
+
+
+class RoomPromptContext:
+    """
+    单个房间的提示词上下文缓存
+
+    公共段每个状态版本构建一次，角色段每个状态版本每个座位构建一次。
+    """
+
+    def __init__(self, room_id: str, history_token_budget: int = 800, history_recent_window: int = 20):
+        self.room_id = room_id
+        self.history_token_budget = history_token_budget
+        self.history_recent_window = history_recent_window
+
+        self._public: Tuple[int, str] = (-1, '')  # (状态版本, 公共段)
+        self._roles: Dict[int, Tuple[int, str]] = {}  # {座位: (状态版本, 角色段)}
+        self._lock = threading.Lock()
+
+    def public_section(self, context: GameStateContext) -> str:
+        """获取公共段（按状态版本缓存）"""
+        version, text = self._public
+        if version == context.version:
+            return text
+
+        with self._lock:
+            version, text = self._public
+            if version != context.version:
+                history = get_room_history(self.room_id, self.history_token_budget, self.history_recent_window)
+                text = build_public_section(context, history.render(context))
+                self._public = (context.version, text)
+            return text
+
+    def role_section(self, context: GameStateContext, seat: int) -> str:
+        """获取角色段（按状态版本和座位缓存）"""
+        cached = self._roles.get(seat)
+        if cached and cached[0] == context.version:
+            return cached[1]
+
+        text = build_role_section(context, seat)
+        self._roles[seat] = (context.version, text)
+        return text
+
+    @traced('agent.prompt_build')
+    def build(self, context: GameStateContext, seat: int, private_text: str, task_text: str) -> str:
+        """
+        拼装完整提示词：固定前缀 + 公共段 + 角色段 + 私有补充 + 任务
+
+        Args:
+            context: 游戏状态上下文
+            seat: 座位号
+            private_text: 调用方补充的私有信息（可为空）
+            task_text: 任务说明
+
+        Returns:
+            完整提示词
+        """
+        return (
+            STATIC_PREFIX
+            + self.public_section(context)
+            + self.role_section(context, seat)
+            + private_text
+            + task_text
+        )
+
+
+# 房间提示词上下文缓存 {room_id: RoomPromptContext}
+_room_prompt_contexts: Dict[str, RoomPromptContext] = {}
+_room_prompt_contexts_lock = threading.Lock()
+
+
+def get_room_prompt_context(room_id: str, history_token_budget: int = 800,
+                            history_recent_window: int = 20) -> RoomPromptContext:
+    """
+    获取房间提示词上下文（不存在则创建）
+
+    Args:
+        room_id: 房间 ID
+        history_token_budget: 历史文本的 token 上限
+        history_recent_window: 当前轮次最多保留的事件条数
+
+    Returns:
+        RoomPromptContext 实例
+    """
+    prompt_context = _room_prompt_contexts.get(room_id)
+    if prompt_context is None:
+        with _room_prompt_contexts_lock:
+            prompt_context = _room_prompt_contexts.setdefault(
+                room_id, RoomPromptContext(room_id, history_token_budget, history_recent_window)
+            )
+    return prompt_context
+
+
+def clear_room_prompt_context(room_id: str):
+    """清除指定房间的提示词上下文缓存（用于游戏重置）"""
+    _room_prompt_contexts.pop(room_id, None)
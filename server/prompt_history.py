@@ -0,0 +1,188 @@
+"""
+Agent 提示词历史管理
+
+每个房间维护一份共享的历史：已结束的轮次压缩为一行摘要（每轮只计算一次），
+当前轮次保留最近的若干条事件，整体控制在 token 预算以内。
+所有 Agent 共用同一份历史，提示词长度不再随对局进行线性增长。
+"""
+import threading
+from typing import Dict, List, Optional
+
+from state_machines.state_context import GameMessage, GameStateContext
+
+# 阶段名称（用于事件描述）
+PHASE_NAMES = {
+    'waiting': '等待阶段',
+    'role_assigned': '角色分配',
+    'day_discussion': '白天讨论',
+    'day_voting': '白天投票',
+    'night_action': '夜晚行动',
+    'game_over': '游戏结束',
+}
+
+ROLE_NAMES = {
+    'werewolf': '狼人',
+    'villager': '村民',
+    'seer': '预言家',
+    'witch': '女巫',
+    'hunter': '猎人',
+}
+
+KILLED_BY_TEXT = {
+    'vote': '被投票出局',
+    'werewolf': '夜里被狼人杀害',
+    'witch': '夜里被毒杀',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中文约 1 字 1 token，ASCII 约 4 字符 1 token"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+
+def format_message(msg: GameMessage) -> str:
+    """将一条游戏消息格式化为一行事件描述，无需展示的消息返回空字符串"""
+    content = msg.content or {}
+    round_num = content.get('round', '?')
+
+    if msg.type == 'phase_change':
+        phase = content.get('phase', '')
+        return f"[第{round_num}轮] 进入{PHASE_NAMES.get(phase, phase)}"
+    if msg.type == 'player_death':
+        role = ROLE_NAMES.get(content.get('role'), content.get('role', '未知'))
+        reason = KILLED_BY_TEXT.get(content.get('killed_by'), '死亡')
+        return f"[第{round_num}轮] {content.get('seat')}号{reason}（{role}）"
+    if msg.type == 'game_end':
+        winner = '狼人' if content.get('winner') == 'werewolf' else '好人'
+        return f"[第{round_num}轮] 游戏结束，{winner}阵营获胜"
+
+    text = content.get('message', '')
+    return f"[第{round_num}轮] {text}" if text else ''
+
+
+class RoomHistory:
+    """
+    单个房间的历史管理器
+
+    增量消费 context.messages：已结束轮次的事件压缩为摘要并缓存，
+    当前轮次的事件放入最近事件窗口。
+    """
+
+    def __init__(self, token_budget: int = 800, recent_window: int = 20):
+        """
+        Args:
+            token_budget: 历史文本的 token 上限
+            recent_window: 当前轮次最多保留的事件条数
+        """
+        self.token_budget = token_budget
+        self.recent_window = recent_window
+
+        self._messages: Optional[List[GameMessage]] = None  # 正在跟踪的消息列表
+        self._cursor = 0  # 已消费的消息数
+        self._last: Optional[GameMessage] = None  # 最后消费的消息
+        self._events: Dict[int, List[str]] = {}  # 每轮的事件描述
+        self._summaries: Dict[int, str] = {}  # 已结束轮次的摘要（只计算一次）
+        self._lock = threading.Lock()
+
+    def render(self, context: GameStateContext) -> str:
+        """
+        渲染历史文本：已结束轮次摘要 + 当前轮次最近事件
+
+        Args:
+            context: 游戏状态上下文
+
+        Returns:
+            历史文本，没有历史时为空字符串
+        """
+        with self._lock:
+            self._sync(context)
+            finished = sorted(r for r in self._events if r < context.round)
+            for round_num in finished:
+                if round_num not in self._summaries:
+                    self._summaries[round_num] = self._summarize_round(round_num, self._events[round_num])
+            summaries = [self._summaries[r] for r in finished]
+            recent = [
+                line
+                for r in sorted(self._events) if r >= context.round
+                for line in self._events[r]
+            ][-self.recent_window:]
+
+        # 超出预算时优先保留最近的内容：先丢最早的摘要，再丢最早的事件
+        lines = summaries + recent
+        total = sum(estimate_tokens(line) + 1 for line in lines)
+        while lines and total > self.token_budget:
+            total -= estimate_tokens(lines[0]) + 1
+            lines.pop(0)
+
+        return "\n".join(lines)
+
+    def get_round_summary(self, round_num: int) -> Optional[str]:
+        """获取已结束轮次的摘要"""
+        return self._summaries.get(round_num)
+
+    def _sync(self, context: GameStateContext):
+        """增量消费新增消息（调用方需持有锁）"""
+        messages = context.messages
+        if (messages is not self._messages or len(messages) < self._cursor
+                or (self._cursor and messages[self._cursor - 1] is not self._last)):
+            # 消息列表被替换或截断（如房间重置）：就地清空后新对局的消息可能已超过游标，
+            # 因此还要确认游标前的最后一条仍是同一消息，否则从头开始
+            self._messages = messages
+            self._cursor = 0
+            self._events.clear()
+            self._summaries.clear()
+
+        for msg in messages[self._cursor:]:
+            line = format_message(msg)
+            if not line:
+                continue
+            round_num = (msg.content or {}).get('round')
+            if not isinstance(round_num, int):
+                round_num = context.round
+            self._events.setdefault(round_num, []).append(line)
+            # 迟到的旧轮次消息使该轮摘要失效
+            self._summaries.pop(round_num, None)
+        self._cursor = len(messages)
+        self._last = messages[-1] if messages else None
+
+    def _summarize_round(self, round_num: int, events: List[str]) -> str:
+        """将一轮的事件压缩为一行摘要"""
+        prefix = f"[第{round_num}轮] "
+        outcomes = []
+        for line in events:
+            body = line[len(prefix):] if line.startswith(prefix) else line
+            if body.startswith('进入'):
+                continue  # 阶段切换不进入摘要
+            if body not in outcomes:
+                outcomes.append(body)
+        return f"第{round_num}轮摘要：{'；'.join(outcomes) if outcomes else '无人出局'}"
+
+
+# 房间历史缓存 {room_id: RoomHistory}
+_room_histories: Dict[str, RoomHistory] = {}
+_room_histories_lock = threading.Lock()
+
+
+def get_room_history(room_id: str, token_budget: int = 800, recent_window: int = 20) -> RoomHistory:
+    """
+    获取房间历史管理器（不存在则创建）
+
+    Args:
+        room_id: 房间 ID
+        token_budget: 历史文本的 token 上限
+        recent_window: 当前轮次最多保留的事件条数
+
+    Returns:
+        RoomHistory 实例
+    """
+    history = _room_histories.get(room_id)
+    if history is None:
+        with _room_histories_lock:
+            history = _room_histories.setdefault(room_id, RoomHistory(token_budget, recent_window))
+    return history
+
+
+def clear_room_history(room_id: str):
+    """清除指定房间的历史（用于游戏重置）"""
+    _room_histories.pop(room_id, None)
@@ -0,0 +1,571 @@
+"""
+房间存储
+房间状态（GameEngine）和 Agent 决策上下文按 命名空间 + 房间ID 保存在可替换的存储后端中，
+每条记录带版本号，保存时比较并交换（版本号不一致说明其他进程已修改，抛出 VersionConflict）。
+
+后端:
+    memory  进程内字典，直接保存对象（默认，最快，进程退出即丢失）
+    sqlite  SQLite 文件（WAL），进程重启后可恢复，多个工作进程可共享
+    shm     共享内存目录（/dev/shm 下的 tmpfs 文件），多个工作进程共享，机器重启丢失
+
+RoomRegistry 在存储之上维护进程内缓存：版本号未变时直接复用已解码的对象。
+空闲的房间可以休眠（hibernate）：丢弃进程内的活对象，只保留编码后的字节（进程内存储中保存在内存或磁盘文件里），
+下一次 get 时透明恢复。
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+class VersionConflict(Exception):
+    """保存时版本号不一致（记录已被其他进程修改或创建）"""
+
+
+class RoomStore:
+    """
+    房间存储接口
+
+    - serializes: 是否保存编码后的字节（False 表示直接保存对象）
+    - shared: 是否可被多个进程共享（共享存储中释放房间只需丢弃进程内缓存）
+    """
+
+    name = ''
+    serializes = True
+    shared = False
+
+    def version(self, namespace: str, room_id: str) -> Optional[int]:
+        """当前版本号（不存在时为 None）"""
+        raise NotImplementedError
+
+    def load(self, namespace: str, room_id: str) -> Optional[Tuple[Any, int]]:
+        """读取 (值, 版本号)，不存在时为 None"""
+        raise NotImplementedError
+
+    def save(self, namespace: str, room_id: str, value: Any, expected_version: Optional[int]) -> int:
+        """
+        比较并交换
+
+        参数:
+            expected_version: 期望的当前版本号（None 表示记录应当不存在）
+
+        返回:
+            新版本号
+
+        异常:
+            VersionConflict: 当前版本号与期望不一致
+        """
+        raise NotImplementedError
+
+    def overwrite(self, namespace: str, room_id: str, value: Any) -> int:
+        """不比较版本直接写入（用于迁移导入），返回新版本号"""
+        while True:
+            try:
+                return self.save(namespace, room_id, value, self.version(namespace, room_id))
+            except VersionConflict:
+                continue
+
+    def delete(self, namespace: str, room_id: str) -> bool:
+        raise NotImplementedError
+
+    def room_ids(self, namespace: str) -> List[str]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class HibernatedRecord:
+    """
+    休眠房间的编码结果（进程内存储中代替活对象）
+    配置了休眠目录（configure_hibernation）时写入磁盘文件，否则保存在内存中
+    """
+
+    __slots__ = ('data', 'path')
+
+    def __init__(self, data: bytes, name: str):
+        if _hibernate_dir:
+            self.path = os.path.join(_hibernate_dir, quote(name, safe=''))
+            with open(self.path, 'wb') as f:
+                f.write(data)
+            self.data = None
+        else:
+            self.path = None
+            self.data = data
+
+    def read(self) -> bytes:
+        if self.path is None:
+            return self.data
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def discard(self):
+        """删除磁盘文件（已恢复或记录已删除）"""
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class MemoryRoomStore(RoomStore):
+    """进程内存储（直接保存对象）"""
+
+    name = 'memory'
+    serializes = False
+
+    def __init__(self):
+        self._records: Dict[Tuple[str, str], Tuple[Any, int]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, namespace, room_id):
+        record = self._records.get((namespace, room_id))
+        return record[1] if record is not None else None
+
+    def load(self, namespace, room_id):
+        return self._records.get((namespace, room_id))
+
+    def save(self, namespace, room_id, value, expected_version):
+        key = (namespace, room_id)
+        with self._lock:
+            record = self._records.get(key)
+            current = record[1] if record is not None else None
+            if current != expected_version:
+                raise VersionConflict(f"{namespace}/{room_id}: expected version {expected_version}, found {current}")
+            version = (current or 0) + 1
+            self._records[key] = (value, version)
+        if record is not None and isinstance(record[0], HibernatedRecord):
+            record[0].discard()
+        return version
+
+    def swap(self, namespace: str, room_id: str, expected: Any, value: Any) -> bool:
+        """
+        替换记录中的对象而不改变版本号（休眠和恢复：房间状态本身没有变化）
+
+        参数:
+            expected: 期望的当前对象（按身份比较，不一致时不替换）
+        """
+        key = (namespace, room_id)
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or record[0] is not expected:
+                return False
+            self._records[key] = (value, record[1])
+            return True
+
+    def delete(self, namespace, room_id):
+        with self._lock:
+            record = self._records.pop((namespace, room_id), None)
+        if record is not None and isinstance(record[0], HibernatedRecord):
+            record[0].discard()
+        return record is not None
+
+    def room_ids(self, namespace):
+        return [room_id for ns, room_id in list(self._records) if ns == namespace]
+
+
+class SQLiteRoomStore(RoomStore):
+    """SQLite 存储（每个线程一个连接，WAL 模式）"""
+
+    name = 'sqlite'
+    shared = True
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS room_state (
+                namespace TEXT NOT NULL,
+                room_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (namespace, room_id)
+            )
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 自动提交模式，每条写语句各自是一个事务
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def version(self, namespace, room_id):
+        row = self._conn().execute(
+            'SELECT version FROM room_state WHERE namespace = ? AND room_id = ?', (namespace, room_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load(self, namespace, room_id):
+        row = self._conn().execute(
+            'SELECT data, version FROM room_state WHERE namespace = ? AND room_id = ?', (namespace, room_id)
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def save(self, namespace, room_id, value, expected_version):
+        conn = self._conn()
+        if expected_version is None:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO room_state (namespace, room_id, version, data, updated_at) VALUES (?, ?, 1, ?, ?)',
+                (namespace, room_id, value, time.time())
+            )
+            version = 1
+        else:
+            cursor = conn.execute(
+                'UPDATE room_state SET version = version + 1, data = ?, updated_at = ? '
+                'WHERE namespace = ? AND room_id = ? AND version = ?',
+                (value, time.time(), namespace, room_id, expected_version)
+            )
+            version = expected_version + 1
+        if cursor.rowcount != 1:
+            raise VersionConflict(f"{namespace}/{room_id}: expected version {expected_version}, "
+                                  f"found {self.version(namespace, room_id)}")
+        return version
+
+    def delete(self, namespace, room_id):
+        cursor = self._conn().execute(
+            'DELETE FROM room_state WHERE namespace = ? AND room_id = ?', (namespace, room_id)
+        )
+        return cursor.rowcount > 0
+
+    def room_ids(self, namespace):
+        rows = self._conn().execute('SELECT room_id FROM room_state WHERE namespace = ?', (namespace,))
+        return [row[0] for row in rows]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SharedMemoryRoomStore(RoomStore):
+    """
+    共享内存存储（tmpfs 目录，每条记录一个文件）
+
+    文件内容为 8 字节版本号 + 数据，写入临时文件后原子替换，读取不加锁；
+    保存时对记录的锁文件加排他锁（flock），保证比较并交换在进程间是原子的。
+    """
+
+    name = 'shm'
+    shared = True
+
+    _VERSION_BYTES = 8
+
+    def __init__(self, directory: str):
+        if fcntl is None:
+            raise RuntimeError('Shared memory room store requires fcntl (POSIX)')
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._thread_locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _path(self, namespace: str, room_id: str) -> str:
+        return os.path.join(self.directory, f"{namespace}.{quote(room_id, safe='')}.room")
+
+    def _read(self, path: str, size: int = -1) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read(size)
+        except FileNotFoundError:
+            return None
+
+    def version(self, namespace, room_id):
+        header = self._read(self._path(namespace, room_id), self._VERSION_BYTES)
+        return int.from_bytes(header, 'big') if header else None
+
+    def load(self, namespace, room_id):
+        content = self._read(self._path(namespace, room_id))
+        if not content:
+            return None
+        return content[self._VERSION_BYTES:], int.from_bytes(content[:self._VERSION_BYTES], 'big')
+
+    @contextmanager
+    def _locked(self, path: str):
+        """进程内线程锁 + 进程间文件锁"""
+        with self._guard:
+            thread_lock = self._thread_locks.setdefault(path, threading.Lock())
+        with thread_lock:
+            fd = os.open(f'{path}.lock', os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def save(self, namespace, room_id, value, expected_version):
+        path = self._path(namespace, room_id)
+        with self._locked(path):
+            current = self.version(namespace, room_id)
+            if current != expected_version:
+                raise VersionConflict(f"{namespace}/{room_id}: expected version {expected_version}, found {current}")
+            version = (current or 0) + 1
+            temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(version.to_bytes(self._VERSION_BYTES, 'big'))
+                f.write(value)
+            os.replace(temp_path, path)
+            return version
+
+    def delete(self, namespace, room_id):
+        path = self._path(namespace, room_id)
+        with self._locked(path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False
+        try:
+            os.remove(f'{path}.lock')
+        except FileNotFoundError:
+            pass
+        with self._guard:
+            self._thread_locks.pop(path, None)
+        return True
+
+    def room_ids(self, namespace):
+        prefix = f'{namespace}.'
+        return [
+            unquote(name[len(prefix):-len('.room')])
+            for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name.endswith('.room')
+        ]
+
+
+STORE_BACKENDS: Dict[str, Callable[[Optional[str]], RoomStore]] = {
+    'memory': lambda path: MemoryRoomStore(),
+    'sqlite': lambda path: SQLiteRoomStore(path or os.path.join('data', 'rooms.sqlite3')),
+    'shm': lambda path: SharedMemoryRoomStore(path or os.path.join('/dev/shm', 'wolf-rooms')),
+}
+
+_store: RoomStore = MemoryRoomStore()
+_registries: List['RoomRegistry'] = []
+# 进程内存储中休眠房间的保存目录（None 表示保存在内存中）
+_hibernate_dir: Optional[str] = None
+
+
+def create_store(backend: str, path: Optional[str] = None) -> RoomStore:
+    """
+    创建存储后端
+
+    参数:
+        backend: 'memory' / 'sqlite' / 'shm'
+        path: SQLite 文件路径或共享内存目录（可选）
+    """
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"Unknown room store backend: {backend}, supported: {', '.join(STORE_BACKENDS)}")
+    return STORE_BACKENDS[backend](path)
+
+
+def configure_store(backend: str, path: Optional[str] = None) -> RoomStore:
+    """切换全局存储后端（清空各注册表的进程内缓存）"""
+    global _store
+    store = create_store(backend, path)
+    _store.close()
+    _store = store
+    for registry in _registries:
+        registry.clear_cache()
+    return store
+
+
+def get_store() -> RoomStore:
+    return _store
+
+
+def configure_hibernation(directory: Optional[str]):
+    """设置进程内存储中休眠房间的保存目录（None 表示保存在内存中）"""
+    global _hibernate_dir
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _hibernate_dir = directory or None
+
+
+class RoomRegistry:
+    """
+    某个命名空间下房间对象的访问（带进程内缓存）
+
+    参数:
+        namespace: 命名空间（如 'rooms'、'agents'）
+        encode: 对象 → 字节（序列化后端使用）
+        decode: 字节 → 对象
+        store: 固定使用的存储（默认跟随全局存储，用于基准测试）
+    """
+
+    def __init__(self, namespace: str, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 store: Optional[RoomStore] = None):
+        self.namespace = namespace
+        self.encode = encode
+        self.decode = decode
+        self._store = store
+        # 房间ID → (对象, 版本号, 编码后的字节)
+        self._cache: Dict[str, Tuple[Any, int, Optional[bytes]]] = {}
+        # 房间ID → 最近一次访问时间（time.monotonic()）
+        self._last_used: Dict[str, float] = {}
+        # 本进程休眠的房间ID
+        self._hibernated: set = set()
+        # 休眠和恢复互斥
+        self._lock = threading.Lock()
+        _registries.append(self)
+
+    @property
+    def store(self) -> RoomStore:
+        return self._store if self._store is not None else _store
+
+    def get(self, room_id: str) -> Optional[Any]:
+        """读取对象（存储中的版本号未变时复用进程内缓存，休眠的房间透明恢复）"""
+        # 先记录访问时间再读缓存，休眠时据此放弃正在被访问的房间
+        self._last_used[room_id] = time.monotonic()
+        store = self.store
+        version = store.version(self.namespace, room_id)
+        if version is None:
+            self._forget(room_id)
+            return None
+        cached = self._cache.get(room_id)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+
+        record = store.load(self.namespace, room_id)
+        if record is not None and not store.serializes and isinstance(record[0], HibernatedRecord):
+            record = self._rehydrate(store, room_id)
+        if record is None:
+            self._forget(room_id)
+            return None
+        value, version = record
+        if store.serializes:
+            obj = self.decode(value)
+            self._cache[room_id] = (obj, version, value)
+        else:
+            obj = value
+            self._cache[room_id] = (obj, version, None)
+        self._hibernated.discard(room_id)
+        return obj
+
+    def _rehydrate(self, store: RoomStore, room_id: str) -> Optional[Tuple[Any, int]]:
+        """恢复进程内存储中休眠的对象（并发的读取只解码一次）"""
+        with self._lock:
+            record = store.load(self.namespace, room_id)
+            if record is None or not isinstance(record[0], HibernatedRecord):
+                return record
+            hibernated, version = record
+            obj = self.decode(hibernated.read())
+            if not store.swap(self.namespace, room_id, hibernated, obj):
+                return store.load(self.namespace, room_id)
+            hibernated.discard()
+            return obj, version
+
+    def _forget(self, room_id: str):
+        self._cache.pop(room_id, None)
+        self._last_used.pop(room_id, None)
+        self._hibernated.discard(room_id)
+
+    def peek(self, room_id: str) -> Optional[Any]:
+        """进程内已加载的对象（不访问存储）"""
+        cached = self._cache.get(room_id)
+        return cached[0] if cached is not None else None
+
+    def put(self, room_id: str, obj: Any, force: bool = False) -> int:
+        """
+        保存对象（与进程内缓存的版本号比较并交换；编码结果未变时跳过）
+
+        参数:
+            force: 不比较版本号直接覆盖
+
+        异常:
+            VersionConflict: 存储中的记录已被其他进程修改
+        """
+        store = self.store
+        cached = self._cache.get(room_id)
+        data = self.encode(obj) if store.serializes else None
+        if not force and cached is not None and cached[0] is obj and data is not None and data == cached[2]:
+            return cached[1]
+
+        value = data if store.serializes else obj
+        try:
+            if force:
+                version = store.overwrite(self.namespace, room_id, value)
+            else:
+                version = store.save(self.namespace, room_id, value, cached[1] if cached is not None else None)
+        except VersionConflict:
+            self._cache.pop(room_id, None)
+            raise
+        self._cache[room_id] = (obj, version, data)
+        self._last_used[room_id] = time.monotonic()
+        self._hibernated.discard(room_id)
+        return version
+
+    def remove(self, room_id: str) -> bool:
+        """从存储中删除"""
+        self._forget(room_id)
+        return self.store.delete(self.namespace, room_id)
+
+    def evict(self, room_id: str) -> bool:
+        """只丢弃进程内缓存（共享存储中的记录保留）"""
+        held = room_id in self._cache or room_id in self._hibernated
+        self._forget(room_id)
+        return held
+
+    def hibernate(self, room_id: str, idle_since: Optional[float] = None) -> bool:
+        """
+        休眠房间：丢弃进程内的活对象，下一次 get 时恢复
+        进程内存储中把对象替换为编码后的字节，序列化存储中记录已是字节，只需丢弃缓存
+
+        参数:
+            idle_since: 房间在此时间（time.monotonic()）之后被访问过则放弃休眠
+
+        返回:
+            是否已休眠
+        """
+        store = self.store
+        cached = self._cache.get(room_id)
+        if cached is None:
+            return False
+        obj = cached[0]
+        hibernated = None if store.serializes else HibernatedRecord(
+            self.encode(obj), f'{os.getpid()}.{self.namespace}.{room_id}')
+        with self._lock:
+            # 编码期间房间可能被访问或修改
+            if ((idle_since is not None and self._last_used.get(room_id, 0) > idle_since)
+                    or self._cache.get(room_id) is not cached
+                    or (hibernated is not None and not store.swap(self.namespace, room_id, obj, hibernated))):
+                if hibernated is not None:
+                    hibernated.discard()
+                return False
+            del self._cache[room_id]
+            self._hibernated.add(room_id)
+        return True
+
+    def idle_ids(self, idle_seconds: float) -> List[str]:
+        """进程内已加载且超过 idle_seconds 没有访问的房间ID"""
+        cutoff = time.monotonic() - idle_seconds
+        return [room_id for room_id in list(self._cache) if self._last_used.get(room_id, 0) <= cutoff]
+
+    def cached_ids(self) -> List[str]:
+        """进程内已加载的房间ID"""
+        return list(self._cache)
+
+    def hibernated_ids(self) -> List[str]:
+        """本进程休眠的房间ID"""
+        return list(self._hibernated)
+
+    def cached(self) -> List[Any]:
+        """进程内已加载的对象"""
+        return [entry[0] for entry in list(self._cache.values())]
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._last_used.clear()
+        self._hibernated.clear()
@@ -0,0 +1,191 @@
+"""
+管理 API 路由
+按需剖析（按房间/路由的 cProfile 或采样剖析）和房间内存统计
+
+鉴权：配置环境变量 ADMIN_TOKEN 后，请求需携带请求头 X-Admin-Token；
+未配置时只在调试模式（DEBUG_MODE = True）下可用。
+"""
+import hmac
+import logging
+import os
+import sys
+
+from flask import Blueprint, request
+
+from game_engine import get_game
+from profiling import PROFILER, TRACEMALLOC, room_memory_report
+from routes.game_routes import success_response, error_response
+
+# 导入调试配置
+try:
+    from debug_config import DEBUG_MODE
+    DEBUG_AVAILABLE = True
+except ImportError:
+    DEBUG_AVAILABLE = False
+
+bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+# 获取日志记录器
+logger = logging.getLogger('api')
+
+
+@bp.before_request
+def check_admin_access():
+    """校验管理权限"""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if admin_token:
+        provided = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(provided, admin_token):
+            return error_response(403, "Invalid admin token")
+    elif not DEBUG_AVAILABLE or not DEBUG_MODE:
+        return error_response(403, "Admin API requires ADMIN_TOKEN or debug mode")
+
+
+# ============== 剖析 ==============
+
+@bp.route('/profiles', methods=['POST'])
+def start_profile():
+    """
+    开启剖析会话
+    POST /admin/profiles
+
+    请求体:
+        {
+            "mode": "cprofile",          // 或 "sampling"
+            "roomId": "classic",         // 可选，只剖析该房间的请求
+            "route": "/api/rooms/<room_id>/state",  // 可选，只剖析该路由
+            "requests": 50,              // 剖析之后的 N 个请求
+            "seconds": 30,               // 或持续 N 秒（两者至少提供一个）
+            "intervalMs": 5              // 采样间隔（sampling 模式）
+        }
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        session = PROFILER.start(
+            mode=data.get('mode', 'cprofile'),
+            room_id=data.get('roomId'),
+            route=data.get('route'),
+            max_requests=int(data['requests']) if data.get('requests') is not None else None,
+            seconds=float(data['seconds']) if data.get('seconds') is not None else None,
+            interval_ms=float(data.get('intervalMs', 5))
+        )
+    except (TypeError, ValueError) as e:
+        return error_response(400, str(e))
+
+    logger.info(f"🔬 [profile] 开启剖析会话 {session.session_id}: {session.summary()}")
+    return success_response(session.summary(), "Profile session started")
+
+
+@bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """
+    列出剖析会话
+    GET /admin/profiles
+    """
+    return success_response([session.summary() for session in PROFILER.sessions()], "Profile sessions retrieved")
+
+
+@bp.route('/profiles/<int:session_id>', methods=['GET'])
+def get_profile(session_id):
+    """
+    获取剖析报告（进行中的会话返回当前结果）
+    GET /admin/profiles/{id}?top=30&sort=cumulative
+    """
+    session = PROFILER.get(session_id)
+    if session is None:
+        return error_response(404, f"Profile session {session_id} not found")
+    try:
+        top = int(request.args.get('top', 30))
+    except ValueError:
+        return error_response(400, "Invalid top")
+    sort = request.args.get('sort', 'cumulative')
+    try:
+        return success_response(session.report(top, sort), "Profile report retrieved")
+    except KeyError:
+        return error_response(400, f"Invalid sort key: {sort}")
+
+
+@bp.route('/profiles/<int:session_id>', methods=['DELETE'])
+def stop_profile(session_id):
+    """
+    提前结束剖析会话
+    DELETE /admin/profiles/{id}
+    """
+    if not PROFILER.stop(session_id):
+        return error_response(404, f"Profile session {session_id} not found")
+    return success_response(PROFILER.get(session_id).summary(), "Profile session stopped")
+
+
+# ============== 内存 ==============
+
+@bp.route('/rooms/<room_id>/memory', methods=['GET'])
+def get_room_memory(room_id):
+    """
+    房间内存归属
+    GET /admin/rooms/{roomId}/memory
+
+    统计 GameStateContext 各字段、消息列表、agent_contexts 和提示词缓存的深度大小
+    """
+    game = get_game(room_id)
+    if not game:
+        return error_response(404, f"Game room {room_id} not found")
+
+    # 只统计已加载的模块，不为统计触发大模型相关模块的导入
+    extra = {}
+    agent_module = sys.modules.get('agent_decision')
+    if agent_module is not None:
+        extra['agentContexts'] = agent_module.get_room_agents(room_id)
+    prompt_module = sys.modules.get('prompt_context')
+    if prompt_module is not None:
+        extra['promptContext'] = prompt_module._room_prompt_contexts.get(room_id)
+    history_module = sys.modules.get('prompt_history')
+    if history_module is not None:
+        extra['promptHistory'] = history_module._room_histories.get(room_id)
+
+    return success_response(room_memory_report(room_id, game.game_state, extra), "Room memory retrieved")
+
+
+@bp.route('/tracemalloc/start', methods=['POST'])
+def start_tracemalloc():
+    """
+    开启 tracemalloc
+    POST /admin/tracemalloc/start
+
+    请求体:
+        {"frames": 1}   // 每条分配记录的栈深度
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        frames = int(data.get('frames', 1))
+    except (TypeError, ValueError):
+        return error_response(400, "Invalid frames")
+    TRACEMALLOC.start(max(1, frames))
+    logger.info(f"🔬 [tracemalloc] 开启，栈深度 {frames}")
+    return success_response({'tracing': True}, "Tracemalloc started")
+
+
+@bp.route('/tracemalloc/snapshot', methods=['GET'])
+def tracemalloc_snapshot():
+    """
+    拍摄 tracemalloc 快照（返回分配排行以及与上一次快照的差异）
+    GET /admin/tracemalloc/snapshot?top=20&groupBy=lineno&path=server/
+    """
+    try:
+        top = int(request.args.get('top', 20))
+        result = TRACEMALLOC.snapshot(top, request.args.get('groupBy', 'lineno'), request.args.get('path'))
+    except ValueError as e:
+        return error_response(400, str(e))
+    except RuntimeError as e:
+        return error_response(409, str(e))
+    return success_response(result, "Tracemalloc snapshot taken")
+
+
+@bp.route('/tracemalloc/stop', methods=['POST'])
+def stop_tracemalloc():
+    """
+    关闭 tracemalloc
+    POST /admin/tracemalloc/stop
+    """
+    TRACEMALLOC.stop()
+    logger.info("🔬 [tracemalloc] 关闭")
+    return success_response({'tracing': False}, "Tracemalloc stopped")
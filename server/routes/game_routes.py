@@ -3,9 +3,14 @@
 使用状态机架构处理所有游戏相关的 HTTP 请求
 """
 import logging
+import sys
 
 from flask import Blueprint, request, jsonify
-from game_engine import get_or_create_game, get_game
+
+import tracing
+from game_engine import get_or_create_game, get_game, messages_after, peek_game, save_game
+from room_store import VersionConflict
+from shared_snapshots import SNAPSHOTS
 
 # 导入调试配置
 try:
@@ -16,6 +21,10 @@ except ImportError:
 
 bp = Blueprint('game', __name__, url_prefix='/api/rooms')
 
+# 投票状态分页大小
+DEFAULT_VOTES_PAGE = 50
+MAX_VOTES_PAGE = 200
+
 # 获取日志记录器
 logger = logging.getLogger('api')
 
@@ -40,6 +49,46 @@ def error_response(code, message, data=None):
     }), code if code < 500 else 500
 
 
+def not_owned_response(room_id):
+    """多进程模式下本进程不持有该房间且没有可用快照（路由前端据此转发给所有者）"""
+    return error_response(421, f"Game room {room_id} is not owned by this worker")
+
+
+@bp.after_request
+def persist_room(response):
+    """
+    房间状态变化后写回房间存储，多进程模式下再发布共享快照（供其他工作进程响应读请求）
+    写回时版本冲突（其他进程已修改该房间）的写请求返回 409，客户端重试即可
+    """
+    if not request.view_args or 'room_id' not in request.view_args:
+        return response
+    room_id = request.view_args['room_id']
+    game = peek_game(room_id)
+    if game is None:
+        return response
+
+    try:
+        save_game(game)
+        # Agent 决策上下文（只在已加载 agent_decision 时）
+        agent_module = sys.modules.get('agent_decision')
+        if agent_module is not None:
+            agent_module.save_agent_contexts(room_id)
+    except VersionConflict as e:
+        logger.warning(f"⚠️ [store] 房间 {room_id} 版本冲突: {str(e)}")
+        if request.method == 'GET':
+            return response
+        conflict, code = error_response(409, f"Game room {room_id} was modified concurrently, please retry")
+        conflict.status_code = code
+        return conflict
+
+    if SNAPSHOTS.enabled:
+        try:
+            SNAPSHOTS.publish(game)
+        except OSError as e:
+            logger.error(f"❌ [snapshot] 房间 {room_id} 快照发布失败: {str(e)}")
+    return response
+
+
 # ============== API 接口 ==============
 
 @bp.route('/<room_id>/assign-roles', methods=['POST'])
@@ -90,6 +139,12 @@ def get_game_state(room_id):
     try:
         game = get_game(room_id)
         if not game:
+            if SNAPSHOTS.enabled:
+                # 多进程模式：读取所有者发布的快照
+                state = SNAPSHOTS.read_state(room_id)
+                if state is None:
+                    return not_owned_response(room_id)
+                return success_response(state, "Game state retrieved successfully")
             logger.warning(f"⚠️ [get_state] 房间不存在: {room_id}")
             return error_response(404, f"Game room {room_id} not found")
 
@@ -263,26 +318,19 @@ def get_game_messages(room_id):
     logger.debug(f"📨 [messages] 房间: {room_id}, 最后消息ID: {last_message_id or '无'}")
     try:
         game = get_game(room_id)
-        if not game:
+        if game:
+            # 获取消息列表（指定 after 时只返回该消息之后的消息）
+            messages = game.get_messages(after=last_message_id)
+        elif SNAPSHOTS.enabled:
+            # 多进程模式：读取所有者发布的快照
+            snapshot = SNAPSHOTS.read_messages(room_id)
+            if snapshot is None:
+                return not_owned_response(room_id)
+            messages = messages_after(snapshot, last_message_id)
+        else:
             logger.warning(f"⚠️ [messages] 房间不存在: {room_id}")
             return error_response(404, f"Game room {room_id} not found")
 
-        # 获取消息列表
-        all_messages = game.get_messages()
-        messages = []
-
-        if last_message_id:
-            # 获取某个消息之后的所有消息
-            found = False
-            for msg in all_messages:
-                if found:
-                    messages.append(msg)
-                if msg['id'] == last_message_id:
-                    found = True
-        else:
-            # 获取所有消息
-            messages = all_messages
-
         logger.debug(f"📤 [messages] 返回 {len(messages)} 条消息")
         response = {
             'messages': messages
@@ -293,6 +341,33 @@ def get_game_messages(room_id):
         return error_response(500, f"Error getting messages: {str(e)}")
 
 
+@bp.route('/<room_id>/votes', methods=['GET'])
+def get_player_votes(room_id):
+    """
+    分页获取存活玩家的投票状态（大房间的状态中只有票数排行）
+    GET /rooms/{roomId}/votes?offset=0&limit=50
+    """
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(MAX_VOTES_PAGE, max(1, int(request.args.get('limit', DEFAULT_VOTES_PAGE))))
+    except ValueError:
+        return error_response(400, "offset and limit must be integers")
+
+    try:
+        game = get_game(room_id)
+        if not game:
+            if SNAPSHOTS.enabled:
+                return not_owned_response(room_id)
+            logger.warning(f"⚠️ [votes] 房间不存在: {room_id}")
+            return error_response(404, f"Game room {room_id} not found")
+
+        votes = game.get_votes(offset, limit)
+        return success_response(votes, "Votes retrieved successfully")
+    except Exception as e:
+        logger.error(f"❌ [votes] 错误: {str(e)}", exc_info=True)
+        return error_response(500, f"Error getting votes: {str(e)}")
+
+
 @bp.route('/<room_id>/complete-announcement', methods=['POST'])
 def complete_announcement(room_id):
     """
@@ -500,6 +575,87 @@ def health_check(room_id):
         return error_response(500, f"Health check failed: {str(e)}")
 
 
+@bp.route('/<room_id>/replay', methods=['GET'])
+def export_replay(room_id):
+    """
+    导出对局回放记录（房间种子 + 动作流）
+    GET /rooms/{roomId}/replay
+
+    回放记录包含所有玩家身份，只有游戏结束后或调试模式下才能导出
+    本地回放: python -m tools.replay replay.json
+    """
+    try:
+        game = get_game(room_id)
+        if not game:
+            return error_response(404, f"Game room {room_id} not found")
+
+        debug_enabled = DEBUG_AVAILABLE and DEBUG_MODE
+        if game.state_machine.context.result == 'ongoing' and not debug_enabled:
+            return error_response(403, "Replay is only available after the game is over")
+
+        return success_response(game.export_replay(), "Replay exported successfully")
+    except Exception as e:
+        logger.error(f"❌ [replay] 错误: {str(e)}", exc_info=True)
+        return error_response(500, f"Error exporting replay: {str(e)}")
+
+
+@bp.route('/<room_id>/reset', methods=['POST'])
+def reset_game(room_id):
+    """
+    再来一局：房间回到等待阶段（复用房间的状态机，不重新构造）
+    POST /rooms/{roomId}/reset
+
+    只有游戏结束后或调试模式下才能重置；之后重新调用 assign-roles 开始新对局
+    """
+    try:
+        game = get_game(room_id)
+        if not game:
+            return error_response(404, f"Game room {room_id} not found")
+
+        debug_enabled = DEBUG_AVAILABLE and DEBUG_MODE
+        if game.state_machine.context.result == 'ongoing' and game.state_machine.context.phase != 'waiting' \
+                and not debug_enabled:
+            return error_response(409, "Game is still in progress")
+
+        game.reset()
+        # Agent 决策上下文和提示词缓存属于上一局（只在已加载 agent_decision 时）
+        agent_module = sys.modules.get('agent_decision')
+        if agent_module is not None:
+            agent_module.clear_agent_contexts(room_id)
+
+        logger.info(f"🔄 [reset] 房间 {room_id} 已重置")
+        return success_response(game.get_state(), "Game reset successfully")
+    except Exception as e:
+        logger.error(f"❌ [reset] 错误: {str(e)}", exc_info=True)
+        return error_response(500, f"Error resetting game: {str(e)}")
+
+
+@bp.route('/debug/traces', methods=['GET'])
+def get_slowest_traces():
+    """
+    获取各路由最近最慢的请求追踪（调试接口）
+    GET /rooms/debug/traces?route=POST%20/api/rooms/<room_id>/agent-vote&limit=5
+
+    route 为 "方法 路由模板"，省略时返回所有路由
+    每条追踪包含各 span（engine.* / sm.* / agent.* / llm.*）的起始偏移和耗时（毫秒）
+
+    注意：需要后端 DEBUG_MODE = True
+    """
+    if not DEBUG_AVAILABLE or not DEBUG_MODE:
+        return error_response(403, "Debug mode is not enabled")
+
+    try:
+        route = request.args.get('route')
+        limit = int(request.args.get('limit', 5))
+        return success_response({
+            'sampleRate': tracing.COLLECTOR.sample_rate,
+            'slowSeconds': tracing.COLLECTOR.slow_seconds,
+            'traces': tracing.COLLECTOR.slowest(route, limit)
+        }, "Traces retrieved successfully")
+    except ValueError:
+        return error_response(400, "Invalid limit")
+
+
 @bp.route('/debug/set-player-role', methods=['POST'])
 def set_player_role_api():
     """
@@ -0,0 +1,83 @@
+"""
+内部路由（多进程模式）
+供 serve.py 的路由前端在工作进程之间迁移房间，只在工作进程中注册，且只监听本机地址
+"""
+import logging
+import sys
+
+from flask import Blueprint, request
+
+from game_engine import get_game, list_game_ids, release_game, restore_game
+from routes.game_routes import success_response, error_response
+from shared_snapshots import SNAPSHOTS
+
+bp = Blueprint('internal', __name__, url_prefix='/internal')
+
+# 获取日志记录器
+logger = logging.getLogger('api')
+
+
+@bp.route('/health', methods=['GET'])
+def health():
+    """
+    工作进程就绪检查
+    GET /internal/health
+    """
+    return success_response({'rooms': len(list_game_ids())}, "Worker is ready")
+
+
+@bp.route('/rooms', methods=['GET'])
+def list_rooms():
+    """
+    列出本进程持有的房间
+    GET /internal/rooms
+    """
+    return success_response({'rooms': list_game_ids()}, "Rooms retrieved")
+
+
+@bp.route('/rooms/<room_id>/export', methods=['GET'])
+def export_room(room_id):
+    """
+    导出房间（回放记录）
+    GET /internal/rooms/{roomId}/export
+    """
+    game = get_game(room_id)
+    if not game:
+        return error_response(404, f"Game room {room_id} not found")
+    return success_response(game.export_replay(), "Room exported")
+
+
+@bp.route('/rooms/<room_id>/import', methods=['POST'])
+def import_room(room_id):
+    """
+    导入房间（由回放记录重建并校验指纹）
+    POST /internal/rooms/{roomId}/import
+    """
+    record = request.get_json(silent=True) or {}
+    if record.get('roomId') != room_id:
+        return error_response(400, "Room id mismatch")
+    try:
+        game = restore_game(record)
+    except (KeyError, ValueError) as e:
+        logger.error(f"❌ [internal] 房间 {room_id} 导入失败: {str(e)}")
+        return error_response(409, str(e))
+    SNAPSHOTS.publish(game)
+    logger.info(f"📦 [internal] 房间 {room_id} 已导入（{len(record.get('actions', []))} 个动作）")
+    return success_response({'roomId': room_id}, "Room imported")
+
+
+@bp.route('/rooms/<room_id>', methods=['DELETE'])
+def drop_room(room_id):
+    """
+    移除房间（迁移完成后由原进程释放）
+    DELETE /internal/rooms/{roomId}?recycle=0
+
+    recycle=0 表示迁移前未等到该房间进行中的请求结束，状态机不归还到池中
+    """
+    removed = release_game(room_id, recycle=request.args.get('recycle', '1') != '0')
+    SNAPSHOTS.unpublish(room_id)
+    # Agent 上下文随房间释放（只在已加载 agent_decision 时）
+    agent_module = sys.modules.get('agent_decision')
+    if agent_module is not None:
+        agent_module.release_agent_contexts(room_id)
+    return success_response({'removed': removed}, "Room dropped")
@@ -0,0 +1,19 @@
+"""
+指标路由
+以 Prometheus 文本格式暴露房间、接口和大模型调用指标
+"""
+from flask import Blueprint, Response
+
+import metrics
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    获取 Prometheus 指标
+
+    GET /metrics
+    """
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,94 @@
+"""
+生产部署入口（多进程）
+
+    python serve.py --workers 4 --port 5010
+
+启动路由前端（监听 --port）和 N 个工作进程（监听 127.0.0.1:--worker-base-port + i）。
+请求按房间ID一致性哈希转发到固定的工作进程，房间状态只在该进程内存中。
+所有者在状态变化后把房间快照发布到共享内存（/dev/shm），GET /state 和 /messages 可由任意工作进程响应。
+
+运行时扩缩容（向前端进程发送信号）：
+    kill -TTIN <pid>   增加一个工作进程
+    kill -TTOU <pid>   移除一个工作进程（先迁走其房间）
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import sys
+import tempfile
+
+
+def run_worker(port: int):
+    """工作进程：在本机端口上运行 Flask 应用（多线程）"""
+    from werkzeug.serving import make_server
+
+    from app import app
+
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    app.logger.info(f"🚀 工作进程 {os.getenv('WOLF_WORKER_ID')} 启动在 http://127.0.0.1:{port}")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.serve_forever()
+
+
+async def run_cluster(args):
+    """路由前端：启动工作进程，转发请求，处理扩缩容信号"""
+    from cluster import Cluster, default_worker_command
+
+    snapshot_dir = None
+    if not args.no_shared_reads:
+        # 共享快照放在 tmpfs（共享内存）中，没有 /dev/shm 时退回临时目录
+        shm_root = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+        snapshot_dir = os.path.join(shm_root, f'wolf-snapshots-{os.getpid()}')
+
+    cluster = Cluster(args.workers, args.worker_base_port, default_worker_command(), snapshot_dir=snapshot_dir)
+    await cluster.start()
+
+    server = await asyncio.start_server(cluster.handle_client, args.host, args.port, backlog=1024)
+    monitor = asyncio.ensure_future(cluster.monitor())
+    stopped = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    loop.add_signal_handler(signal.SIGTTIN, lambda: asyncio.ensure_future(cluster.add_worker()))
+    loop.add_signal_handler(signal.SIGTTOU, lambda: asyncio.ensure_future(cluster.remove_worker()))
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopped.set)
+
+    logging.getLogger('cluster').info(
+        f"🚀 服务启动在 http://{args.host}:{args.port}（{args.workers} 个工作进程，pid={os.getpid()}）")
+    await stopped.wait()
+
+    server.close()
+    monitor.cancel()
+    await cluster.stop()
+    if snapshot_dir:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='狼人杀游戏后端（多进程部署）')
+    subparsers = parser.add_subparsers(dest='command')
+
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5010)))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--worker-base-port', type=int, default=int(os.getenv('WORKER_BASE_PORT', 5100)))
+    parser.add_argument('--no-shared-reads', action='store_true',
+                        help='关闭共享快照读路径（读请求也只由房间所有者响应）')
+
+    worker_parser = subparsers.add_parser('worker', help='运行单个工作进程（由前端启动）')
+    worker_parser.add_argument('--port', type=int, required=True)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.command == 'worker':
+        run_worker(args.port)
+    else:
+        asyncio.run(run_cluster(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""
+共享快照（多进程读路径）
+房间的所有者进程在状态变化后把渲染好的状态和消息列表发布到共享目录（默认 /dev/shm 下的 tmpfs，即共享内存），
+其他工作进程直接读取快照响应 GET /state 和 GET /messages，不必转发给所有者；写请求仍由所有者处理。
+
+- 快照先写临时文件再原子替换，读者不会读到写了一半的内容
+- 读者按文件 inode/mtime 缓存解析结果，快照不变时一次读取只需一次 stat
+- 倒计时字段在读取时按 (开始时间, 时长) 重新计算，与所有者渲染的结果一致
+- 超过 validUntil 的快照不再使用（如夜晚角色超时，需要所有者推进状态）
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+
+class SharedSnapshots:
+    """房间快照的发布（所有者）和读取（其他工作进程）"""
+
+    def __init__(self):
+        self.directory: Optional[str] = None
+        self.owner: Optional[str] = None
+        # 房间ID → 已发布的 (状态版本, 消息版本)
+        self._published: Dict[str, Tuple] = {}
+        self._room_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        # 文件路径 → (文件标识, 解析结果)
+        self._cache: Dict[str, Tuple[Tuple, Dict]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None
+
+    def configure(self, directory: str, owner: Optional[str] = None):
+        """
+        启用共享快照
+
+        参数:
+            directory: 快照目录（所有工作进程相同）
+            owner: 本进程的标识（写入快照，释放房间时只删除自己发布的快照）
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.owner = owner
+
+    def _path(self, room_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{quote(room_id, safe='')}.{kind}.json")
+
+    def _room_lock(self, room_id: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._room_locks.get(room_id)
+            if lock is None:
+                lock = self._room_locks[room_id] = threading.Lock()
+            return lock
+
+    @staticmethod
+    def _write(path: str, payload: Dict):
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    def _load(self, path: str) -> Optional[Dict]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._cache.pop(path, None)
+            return None
+        file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._cache.get(path)
+        if cached is not None and cached[0] == file_key:
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                payload = json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        self._cache[path] = (file_key, payload)
+        return payload
+
+    # ---------- 所有者 ----------
+
+    def publish(self, engine) -> bool:
+        """
+        发布房间快照（状态没有变化时跳过）
+
+        参数:
+            engine: 游戏引擎实例
+
+        返回:
+            是否写入了快照
+        """
+        if not self.enabled:
+            return False
+        room_id = engine.room_id
+        context = engine.game_state
+        with self._room_lock(room_id):
+            published = self._published.get(room_id)
+            if published is not None and published[0] == (len(context.action_log), context.version):
+                return False
+
+            # 渲染状态可能推进游戏（夜晚角色超时），渲染之后再取版本
+            state = engine.get_state()
+            hints = engine.state_machine.get_snapshot_hints()
+            state_key = (len(context.action_log), context.version)
+            self._write(self._path(room_id, 'state'), {'owner': self.owner, 'state': state, **hints})
+
+            messages_key = (len(context.messages), context.messages[-1].id if context.messages else None)
+            if published is None or published[1] != messages_key:
+                self._write(self._path(room_id, 'messages'), {'owner': self.owner, 'messages': engine.get_messages()})
+            self._published[room_id] = (state_key, messages_key)
+            return True
+
+    def unpublish(self, room_id: str):
+        """删除本进程发布的房间快照（房间已迁移到其他进程时保留新所有者的快照）"""
+        if not self.enabled:
+            return
+        with self._room_lock(room_id):
+            self._published.pop(room_id, None)
+            for kind in ('state', 'messages'):
+                path = self._path(room_id, kind)
+                payload = self._load(path)
+                if payload is not None and payload.get('owner') == self.owner:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                    self._cache.pop(path, None)
+        with self._locks_guard:
+            self._room_locks.pop(room_id, None)
+
+    def purge_owner(self, owner: str) -> int:
+        """删除某个进程发布的所有快照（进程崩溃后其房间已丢失），返回删除的文件数"""
+        if not self.enabled:
+            return 0
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            payload = self._load(path)
+            if payload is not None and payload.get('owner') == owner:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+                self._cache.pop(path, None)
+        return removed
+
+    # ---------- 读者 ----------
+
+    def read_state(self, room_id: str, now: Optional[float] = None) -> Optional[Dict]:
+        """
+        读取房间状态快照
+
+        返回:
+            与 GameEngine.get_state() 相同格式的状态；没有快照或快照已失效时为 None
+        """
+        if not self.enabled:
+            return None
+        payload = self._load(self._path(room_id, 'state'))
+        if payload is None:
+            return None
+        now = time.time() if now is None else now
+        valid_until = payload.get('validUntil')
+        if valid_until is not None and now >= valid_until:
+            return None
+
+        state = dict(payload['state'])
+        for field, (start, duration) in payload.get('timers', {}).items():
+            state[field] = max(0, duration - int(now - start))
+        for field, expires_at in payload.get('expires', {}).items():
+            if now >= expires_at:
+                state.pop(field, None)
+        return state
+
+    def read_messages(self, room_id: str) -> Optional[List[Dict]]:
+        """读取房间消息列表快照（没有快照时为 None）"""
+        if not self.enabled:
+            return None
+        payload = self._load(self._path(room_id, 'messages'))
+        return payload['messages'] if payload is not None else None
+
+
+SNAPSHOTS = SharedSnapshots()
@@ -4,9 +4,18 @@
 """
 from .base_state_machine import BaseStateMachine
 from .classic_werewolf_state_machine import ClassicWerewolfStateMachine
+from .quick_mode_state_machine import QuickModeStateMachine
+from .large_room_state_machine import LargeRoomStateMachine
+from .clock import Clock, WallClock, VirtualClock
 from .state_context import GameStateContext, Player, GameMessage
+from .seat_table import SeatTable, SeatView
 from .state_enums import GameMode, Role, GameResult, KilledBy
 from .state_machine_factory import create_state_machine, register_state_machine, get_supported_modes
+from .state_machine_pool import StateMachinePool, STATE_MACHINE_POOL
+from .events import (
+    EVENT_BUS, EventBus, Subscription,
+    GameEvent, PhaseChanged, MessageAdded, ActionHandled, TimerExpired
+)
 
 __all__ = [
     # 枚举
@@ -18,13 +27,61 @@ __all__ = [
     'GameStateContext',
     'Player',
     'GameMessage',
+    'SeatTable',
+    'SeatView',
+    # 时钟
+    'Clock',
+    'WallClock',
+    'VirtualClock',
     # 基类
     'BaseStateMachine',
     # 具体实现
     'ClassicWerewolfStateMachine',
+    'QuickModeStateMachine',
+    'LargeRoomStateMachine',
     # 工厂
     'create_state_machine',
     'register_state_machine',
     'get_supported_modes',
+    # 状态机池
+    'StateMachinePool',
+    'STATE_MACHINE_POOL',
+    # 事件总线
+    'EventBus',
+    'EVENT_BUS',
+    'Subscription',
+    'GameEvent',
+    'PhaseChanged',
+    'MessageAdded',
+    'ActionHandled',
+    'TimerExpired',
+    # 回放
+    'replay_game',
+    'verify_replay',
+    'state_fingerprint',
+    # 快照
+    'encode_context',
+    'decode_context',
+    'encode_room',
+    'decode_room',
 ]
 
+# 回放和快照模块只在使用时加载（服务启动时不需要）
+_LAZY_EXPORTS = {
+    'replay_game': '.replay',
+    'verify_replay': '.replay',
+    'state_fingerprint': '.replay',
+    'encode_context': '.snapshot',
+    'decode_context': '.snapshot',
+    'encode_room': '.snapshot',
+    'decode_room': '.snapshot',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
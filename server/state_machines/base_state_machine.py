@@ -3,26 +3,110 @@
 定义所有状态机的通用接口和核心功能
 """
 import logging
+import random
+import threading
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import Dict, Tuple, Optional, Any
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Optional, Any, Type
 
-from .state_context import GameStateContext
+from .clock import Clock, WALL_CLOCK
+from .events import EVENT_BUS, ActionHandled, EventBus, GameEvent, MessageAdded, PhaseChanged
+from .state_context import GameMessage, GameStateContext
 
 logger = logging.getLogger('state_machine')
 
+# 导入指标和追踪（可选，状态机单独使用时不可用）
+try:
+    from metrics import PHASE_DURATION
+except ImportError:
+    PHASE_DURATION = None
+
+try:
+    from tracing import active as trace_active, span as trace_span
+except ImportError:
+    trace_active = None
+
+
+def _new_seed() -> int:
+    """随机生成房间种子"""
+    return random.SystemRandom().getrandbits(63)
+
+
+class RoomLock:
+    """
+    房间锁（可重入）
+    最外层释放时把持有期间暂存的事件取出，释放房间锁之后再发布：
+    订阅者队列满（block 策略）时只拖慢发布事件的请求线程，不阻塞同一房间的其他操作。
+    发布锁在释放房间锁之前取得，同一房间的事件仍按操作顺序发布
+    """
+
+    __slots__ = ('_state_machine', '_lock', '_depth', '_publish_lock')
+
+    def __init__(self, state_machine: 'BaseStateMachine'):
+        self._state_machine = state_machine
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._publish_lock = threading.Lock()
+
+    def __enter__(self) -> 'RoomLock':
+        self._lock.acquire()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        state_machine = self._state_machine
+        if self._depth or not state_machine._pending_events:
+            self._lock.release()
+            return False
+
+        events = state_machine._pending_events
+        state_machine._pending_events = []
+        self._publish_lock.acquire()
+        self._lock.release()
+        try:
+            state_machine._publish_events(events)
+        finally:
+            self._publish_lock.release()
+        return False
+
 
 class BaseStateMachine(ABC):
     """
     状态机基类 - 定义核心接口
     所有游戏模式的状态机都继承自这个基类
+
+    同一房间的操作由房间锁（self._lock，可重入）串行执行：操作、状态渲染、超时检查和重置都持有该锁，
+    多个请求线程同时操作一个房间时动作流完整、回放可逐位复现；操作中产生的事件在释放房间锁之后发布
     """
 
-    def __init__(self, room_id: str, mode: str, context: GameStateContext):
+    def __init__(self, room_id: str, mode: str, context: GameStateContext, clock: Optional[Clock] = None,
+                 seed: Optional[int] = None):
         self.room_id = room_id
         self.mode = mode
         self.context = context
 
+        # 时钟：生产环境使用墙上时钟，模拟/测试可注入虚拟时钟
+        self.clock = clock or WALL_CLOCK
+        self.context.clock = self.clock
+        self.context.created_at = self.clock.now()
+
+        # 房间随机数生成器：所有游戏规则中的随机（洗牌、平票）都从这里取，种子随动作流记录用于回放
+        if seed is None:
+            seed = _new_seed()
+        self.context.seed = seed
+        self.rng = random.Random(seed)
+
+        # 房间锁（同一线程内的嵌套操作可重入）
+        self._lock = RoomLock(self)
+
+        # 当前操作的时间（操作进行中冻结，保证一次操作内所有时间戳一致、回放可逐位复现）
+        self._op_time: Optional[float] = None
+
+        # 事件总线（None 表示不发布，如回放）；操作进行中的事件暂存在这里（受房间锁保护），释放房间锁后一起发布
+        self.event_bus: Optional[EventBus] = EVENT_BUS
+        self._pending_events: List[GameEvent] = []
+
         # 阶段转换规则：{当前阶段: {next_phase: 下一阶段, duration: 持续时间}}
         self._phase_transitions: Dict[str, Dict[str, Any]] = {}
 
@@ -35,6 +119,39 @@ class BaseStateMachine(ABC):
         # 初始化该模式的所有阶段和动作处理器
         self.initialize()
 
+    def reset(self, room_id: Optional[str] = None, seed: Optional[int] = None, clock: Optional[Clock] = None):
+        """
+        就地重置为新对局（再来一局、状态机池复用）
+        复用上下文、玩家对象和已注册的阶段/动作处理器，不重新构造状态机
+
+        参数:
+            room_id: 新的房间ID（默认不变）
+            seed: 新的房间随机种子（默认随机生成）
+            clock: 新的时钟（默认不变）
+        """
+        with self._lock:
+            if room_id is not None:
+                self.room_id = room_id
+            if clock is not None:
+                self.clock = clock
+            self._op_time = None
+            self._pending_events.clear()
+            self.context.reset(room_id)
+            self.context.clock = self.clock
+            self.context.created_at = self.clock.now()
+            if seed is None:
+                seed = _new_seed()
+            self.context.seed = seed
+            self.rng.seed(seed)
+            self._on_reset()
+
+    def _on_reset(self) -> None:
+        """
+        重置后的模式特定处理
+        子类可以重写此方法恢复上下文之外的对局状态
+        """
+        pass
+
     @abstractmethod
     def initialize(self) -> None:
         """
@@ -74,8 +191,14 @@ class BaseStateMachine(ABC):
             是否转换成功
         """
         # 直接进入下一阶段
+        self._touch()
+        now = self.now()
+        previous_phase = self.context.phase
+        if PHASE_DURATION is not None and self.context.phase_start_time > 0:
+            PHASE_DURATION.observe(now - self.context.phase_start_time,
+                                   mode=self.mode, phase=previous_phase)
         self.context.phase = next_phase
-        self.context.phase_start_time = datetime.now().timestamp()
+        self.context.phase_start_time = now
 
         # 获取阶段持续时间
         if next_phase in self._phase_transitions:
@@ -86,7 +209,7 @@ class BaseStateMachine(ABC):
         if announcement_content:
             # 设置播报信息（附加信息，不影响游戏状态）
             self.context.extensions['announcement'] = announcement_content
-            self.context.extensions['announcement_time'] = datetime.now().timestamp()
+            self.context.extensions['announcement_time'] = now
         else:
             # 清除播报信息
             self.context.extensions.pop('announcement', None)
@@ -102,6 +225,14 @@ class BaseStateMachine(ABC):
             'round': self.context.round
         })
 
+        if self._events_wanted():
+            self._emit(PhaseChanged,
+                       previous_phase=previous_phase,
+                       phase=self.context.phase,
+                       round=self.context.round,
+                       duration=self.context.phase_duration,
+                       announcement=self.context.extensions.get('announcement'))
+
         return True
 
 
@@ -140,11 +271,15 @@ class BaseStateMachine(ABC):
             return False, f"Unknown action: {action}", None
 
         handler = self._action_handlers[action]
-        try:
-            success, message, data = handler(payload)
+        with self._operation('action', action=action, payload=dict(payload) if payload else {}):
+            try:
+                success, message, data = handler(payload)
+            except Exception as e:
+                success, message, data = False, str(e), None
+            # 处理器可能修改了状态（包括超时推进），保守地递增版本
+            self._touch()
+            self._emit_action(action, payload, success, message)
             return success, message, data
-        except Exception as e:
-            return False, str(e), None
 
     def get_state_for_frontend(self) -> Dict[str, Any]:
         """
@@ -154,10 +289,17 @@ class BaseStateMachine(ABC):
         返回:
             状态字典（使用 camelCase）
         """
+        # 持有房间锁：渲染时可能清除过期播报，也不能读到其他线程操作中途的状态
+        with self._lock:
+            return self._build_state()
+
+    def _build_state(self) -> Dict[str, Any]:
+        """组装前端状态（调用方持有房间锁）"""
         # 计算阶段剩余时间
+        now = self.now()
         phase_time_left = 0
         if self.context.phase_start_time > 0 and self.context.phase_duration > 0:
-            elapsed = datetime.now().timestamp() - self.context.phase_start_time
+            elapsed = now - self.context.phase_start_time
             phase_time_left = max(0, self.context.phase_duration - int(elapsed))
 
         base_state = {
@@ -175,7 +317,7 @@ class BaseStateMachine(ABC):
         if 'announcement' in self.context.extensions:
             announcement_time = self.context.extensions.get('announcement_time', 0)
             # 播报只显示 5 秒后自动清除
-            if announcement_time and (datetime.now().timestamp() - announcement_time) < 5:
+            if announcement_time and (now - announcement_time) < 5:
                 base_state['announcement'] = self.context.extensions['announcement']
             else:
                 # 超时清除播报信息
@@ -198,17 +340,160 @@ class BaseStateMachine(ABC):
         """
         return {}
 
+    def get_snapshot_hints(self) -> Dict[str, Any]:
+        """
+        共享快照的渲染提示（与 get_state_for_frontend 对应，读取快照时据此更新随时间变化的字段）
+        子类可以重写此方法添加特定模式的计时字段
+
+        返回:
+            {
+                'timers': {字段: (开始时间, 时长)},   // 剩余时间按读取时间重新计算
+                'expires': {字段: 过期时间},          // 过期后从状态中移除
+                'validUntil': 时间戳或 None           // 之后读取状态会推进游戏，快照失效
+            }
+        """
+        timers = {}
+        if self.context.phase_start_time > 0 and self.context.phase_duration > 0:
+            timers['phaseTimeLeft'] = (self.context.phase_start_time, self.context.phase_duration)
+
+        expires = {}
+        announcement_time = self.context.extensions.get('announcement_time', 0)
+        if 'announcement' in self.context.extensions and announcement_time:
+            expires['announcement'] = announcement_time + 5
+
+        return {'timers': timers, 'expires': expires, 'validUntil': None}
+
+    def next_deadline(self) -> Optional[float]:
+        """
+        获取当前阶段下一个计时截止时间
+        子类可以重写此方法（模拟器据此推进虚拟时钟）
+
+        返回:
+            截止时间戳，没有计时则返回 None
+        """
+        return None
+
+    def check_timeouts(self) -> bool:
+        """
+        检查并处理已到期的计时（如夜晚角色超时）
+        子类可以重写此方法
+
+        返回:
+            是否推进了状态
+        """
+        return False
+
+    def export_replay(self) -> Dict[str, Any]:
+        """
+        导出回放记录（种子 + 动作流），可用 state_machines.replay 逐位复现本局
+
+        返回:
+            回放记录字典（可直接 JSON 序列化）
+        """
+        from .replay import REPLAY_FORMAT_VERSION, state_fingerprint
+        with self._lock:
+            return {
+                'formatVersion': REPLAY_FORMAT_VERSION,
+                'roomId': self.room_id,
+                'mode': self.mode,
+                'seatCount': len(self.context.players),
+                'seed': self.context.seed,
+                'createdAt': self.context.created_at,
+                'actions': list(self.context.action_log),
+                'fingerprint': state_fingerprint(self.context),
+            }
+
+    def now(self) -> float:
+        """当前时间（操作进行中返回该操作开始的时间）"""
+        return self._op_time if self._op_time is not None else self.clock.now()
+
+    @contextmanager
+    def _operation(self, op: str, **data):
+        """
+        执行一个改变状态的操作：记录到动作流（用于回放），并在操作期间冻结时间
+        嵌套调用时只有最外层操作会被记录
+
+        参数:
+            op: 操作名（'assign_roles', 'start_round', 'action', 'advance_speaker', 'timeout'）
+            **data: 操作参数（需可 JSON 序列化）
+        """
+        # 持有房间锁直到操作结束：其他线程的操作排队等待，不会被当成嵌套调用而漏记
+        with self._lock:
+            if self._op_time is not None:
+                yield
+                return
+
+            self._op_time = self.clock.now()
+            entry = {'t': self._op_time, 'op': op}
+            entry.update(data)
+            self.context.action_log.append(entry)
+            try:
+                if trace_active is None or not trace_active():
+                    yield
+                else:
+                    with trace_span(f"sm.{data.get('action', op)}", phase=self.context.phase):
+                        yield
+            finally:
+                self._op_time = None
+
+    def _touch(self):
+        """标记状态已变更（递增状态版本号）"""
+        self.context.version += 1
+
     def _add_message(self, msg_type: str, content: Dict):
         """添加游戏消息"""
-        msg_id = f"{int(datetime.now().timestamp() * 1000)}"
-        from .state_context import GameMessage
+        now = self.now()
+        # 时间戳后附加序号：同一毫秒（或虚拟时钟未推进）内的消息ID也不会重复
+        msg_id = f"{int(now * 1000)}-{len(self.context.messages)}"
         message = GameMessage(
             id=msg_id,
-            timestamp=datetime.now().timestamp(),
+            timestamp=now,
             type=msg_type,
             content=content
         )
         self.context.messages.append(message)
+        self._touch()
+
+        if self._events_wanted():
+            self._emit(MessageAdded, message_id=msg_id, message_type=msg_type, content=content)
+
+    # === 事件 ===
+
+    def _events_wanted(self) -> bool:
+        """是否有订阅者接收本房间的事件（没有时不构造事件）"""
+        return self.event_bus is not None and self.event_bus.wants(self.room_id)
+
+    def _emit(self, event_type: Type[GameEvent], **fields):
+        """
+        发布事件（操作进行中先暂存，操作结束后按发生顺序发布，订阅者不会读到操作中途的状态）
+
+        参数:
+            event_type: 事件类型
+            **fields: 事件字段（房间、模式、版本号和时间自动填写）
+        """
+        event = event_type(room_id=self.room_id, mode=self.mode, version=self.context.version,
+                           timestamp=self.now(), **fields)
+        if self._op_time is not None:
+            self._pending_events.append(event)
+        else:
+            self.event_bus.publish(event)
+
+    def _emit_action(self, action: str, payload: Optional[Dict], success: bool, message: str):
+        """发布动作处理完成事件（播报只在本次动作中产生时附带）"""
+        if not self._events_wanted():
+            return
+        extensions = self.context.extensions
+        announcement = extensions.get('announcement') if extensions.get('announcement_time') == self.now() else None
+        self._emit(ActionHandled, action=action, payload=dict(payload) if payload else {},
+                   success=success, message=message, announcement=announcement)
+
+    def _publish_events(self, events: List[GameEvent]):
+        """发布操作期间暂存的事件（由 RoomLock 在释放房间锁之后调用）"""
+        bus = self.event_bus
+        if bus is None:
+            return
+        for event in events:
+            bus.publish(event)
 
     def _register_phase_transition(self, phase: str, next_phase: str, duration: int,
                                    handler: Optional[callable] = None):
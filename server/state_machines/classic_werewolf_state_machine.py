@@ -3,11 +3,13 @@
 实现经典狼人杀游戏的完整状态机逻辑
 """
 import logging
-import random
-from typing import Dict, Tuple, Any, Optional
+from typing import Dict, List, Tuple, Any, Optional
 
 from .base_state_machine import BaseStateMachine
-from .state_context import GameStateContext
+from .clock import Clock
+from .events import TimerExpired
+from .seat_table import SeatTable
+from .state_context import GameStateContext, Player
 from .state_enums import Role, GameResult, KilledBy
 
 # 导入调试配置
@@ -44,10 +46,22 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         Role.VILLAGER, Role.VILLAGER, Role.VILLAGER, Role.VILLAGER
     ]
 
-    def __init__(self, room_id: str, seat_count: int = 12):
+    # 座位数不少于该值时用紧凑座位表（SeatTable）保存玩家，None（默认）表示总是使用字典
+    COMPACT_SEATS_FROM: Optional[int] = None
+
+    # 游戏模式和阶段时长（秒），子类可覆盖
+    MODE = 'classic'
+    DISCUSSION_DURATION = 120
+    VOTING_DURATION = 20
+    NIGHT_DURATION = 120
+
+    def __init__(self, room_id: str, seat_count: int = 12, clock: Optional[Clock] = None,
+                 seed: Optional[int] = None):
         self.seat_count = seat_count
-        context = GameStateContext(room_id=room_id, mode='classic')
-        super().__init__(room_id, 'classic', context)
+        context = GameStateContext(room_id=room_id, mode=self.MODE)
+        if self.COMPACT_SEATS_FROM is not None and seat_count >= self.COMPACT_SEATS_FROM:
+            context.players = SeatTable(seat_count)
+        super().__init__(room_id, self.MODE, context, clock, seed)
 
         # 初始化玩家
         self._init_players()
@@ -57,9 +71,12 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         # 注册阶段转换规则
         self._register_phase_transition('waiting', 'role_assigned', 0, self._on_role_assigned)
         self._register_phase_transition('role_assigned', 'day_discussion', 0, self._on_day_discussion_start)
-        self._register_phase_transition('day_discussion', 'day_voting', 120, self._on_day_voting_start)  # 讨论2分钟
-        self._register_phase_transition('day_voting', 'night_action', 20, self._on_night_action_start)  # 投票20秒
-        self._register_phase_transition('night_action', 'day_discussion', 120, self._on_new_day)  # 晚上行动2分钟
+        self._register_phase_transition('day_discussion', 'day_voting', self.DISCUSSION_DURATION,
+                                        self._on_day_voting_start)  # 讨论2分钟
+        self._register_phase_transition('day_voting', 'night_action', self.VOTING_DURATION,
+                                        self._on_night_action_start)  # 投票20秒
+        self._register_phase_transition('night_action', 'day_discussion', self.NIGHT_DURATION,
+                                        self._on_new_day)  # 晚上行动2分钟
         self._register_phase_transition('night_action', 'game_over', 0, self._on_game_over)  # 游戏结束
 
         # 注册动作处理器
@@ -68,33 +85,41 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         self._register_action_handler('night_action', self._handle_night_action)
         self._register_action_handler('advance_speaker', self._handle_advance_speaker)
 
-    def assign_roles(self) -> Dict[int, str]:
+    def assign_roles(self, role_pool: Optional[List[Role]] = None,
+                     fixed_roles: Optional[Dict[int, Role]] = None) -> Dict[int, str]:
         """
         分配角色
 
+        参数:
+            role_pool: 自定义角色池（可选，长度需等于座位数），默认按座位数生成
+            fixed_roles: 固定座位角色（可选，回放时传入；默认读取调试配置）
+
         返回:
             {座位号: 角色名称}
         """
         # 获取角色池
-        if self.seat_count == 12:
+        if role_pool is not None:
+            if len(role_pool) != self.seat_count:
+                raise ValueError(f"角色池数量 {len(role_pool)} 与座位数 {self.seat_count} 不一致")
+            roles = list(role_pool)
+        elif self.seat_count == 12:
             roles = self.DEFAULT_ROLES_12P.copy()
         else:
             roles = self._get_custom_roles(self.seat_count)
 
         # 检查是否有固定角色配置（调试模式）
-        fixed_roles: Dict[int, Role] = {}
-        if DEBUG_AVAILABLE:
-            for seat in range(1, self.seat_count + 1):
-                player_role = get_player_role(self.room_id, seat)
-                if player_role:
-                    try:
-                        # 将字符串转换为 Role 枚举
-                        fixed_role = Role[player_role.upper()]
-                        fixed_roles[seat] = fixed_role
-                        logger.info(f"🎯 [assign_roles] 固定座位 {seat} 的角色为: {player_role}")
-                    except KeyError:
-                        logger.warning(f"⚠️ [assign_roles] 无效的角色名: {player_role}")
-
+        if fixed_roles is None:
+            fixed_roles = self._get_debug_fixed_roles()
+
+        with self._operation(
+            'assign_roles',
+            rolePool=[r.value for r in role_pool] if role_pool is not None else None,
+            fixedRoles={str(seat): role.value for seat, role in fixed_roles.items()}
+        ):
+            return self._assign_roles(roles, fixed_roles)
+
+    def _assign_roles(self, roles: List[Role], fixed_roles: Dict[int, Role]) -> Dict[int, str]:
+        """按角色池和固定角色分配角色（使用房间随机数生成器洗牌）"""
         # 统计固定角色的类型和数量
         fixed_role_counts = {}
         for role in fixed_roles.values():
@@ -111,8 +136,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             roles = remaining_roles
             logger.info(f"🎯 [assign_roles] 剩余角色池: {[r.value for r in roles]}")
 
-        # 随机洗牌剩余角色
-        random.shuffle(roles)
+        # 随机洗牌剩余角色（使用房间随机数生成器）
+        self.rng.shuffle(roles)
 
         # 为每个玩家分配角色
         role_index = 0
@@ -142,11 +167,32 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             for seat, player in self.context.players.items()
         }
 
+    def _get_debug_fixed_roles(self) -> Dict[int, Role]:
+        """读取调试配置中的固定座位角色"""
+        fixed_roles: Dict[int, Role] = {}
+        if DEBUG_AVAILABLE:
+            for seat in range(1, self.seat_count + 1):
+                player_role = get_player_role(self.room_id, seat)
+                if player_role:
+                    try:
+                        # 将字符串转换为 Role 枚举
+                        fixed_role = Role[player_role.upper()]
+                        fixed_roles[seat] = fixed_role
+                        logger.info(f"🎯 [assign_roles] 固定座位 {seat} 的角色为: {player_role}")
+                    except KeyError:
+                        logger.warning(f"⚠️ [assign_roles] 无效的角色名: {player_role}")
+        return fixed_roles
+
     def _init_players(self):
-        """初始化玩家对象"""
+        """初始化玩家对象（已有的玩家对象保留）"""
+        players = self.context.players
         for seat in range(1, self.seat_count + 1):
-            self.context.players[seat] = self.context.get_player_by_seat(seat) or \
-                                      __import__('state_machines.state_context', fromlist=['Player']).Player(seat=seat)
+            if seat not in players:
+                players[seat] = Player(seat=seat)
+
+    def _on_reset(self) -> None:
+        """重置后补齐座位"""
+        self._init_players()
 
     def _get_custom_roles(self, count: int) -> list:
         """根据玩家数获取自定义角色配置"""
@@ -163,6 +209,10 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
     def start_round(self) -> Tuple[str, int]:
         """推进游戏到下一阶段"""
+        with self._operation('start_round'):
+            return self._start_round()
+
+    def _start_round(self) -> Tuple[str, int]:
         current_phase = self.context.phase
         next_phase, duration = self.get_next_phase(current_phase)
 
@@ -222,8 +272,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
         # 初始化晚上行动状态
         self.context.night_current_role = 'werewolf'  # 狼人先行动
-        from datetime import datetime
-        self.context.night_action_start_time = datetime.now().timestamp()
+        now = self.now()
+        self.context.night_action_start_time = now
         self.context.night_actions_completed = []
         self.context.seer_checked = None
         self.context.werewolf_killed = None
@@ -232,12 +282,11 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
         # 初始化每个角色的开始时间
         self.context.night_role_start_times = {}
-        self.context.night_role_start_times['werewolf'] = datetime.now().timestamp()
+        self.context.night_role_start_times['werewolf'] = now
 
         # 播报狼人开始行动
-        from datetime import datetime
         self.context.extensions['announcement'] = '🐺 天黑请闭眼，狼人请睁眼选择目标'
-        self.context.extensions['announcement_time'] = datetime.now().timestamp()
+        self.context.extensions['announcement_time'] = now
         self.context.extensions['action_role'] = 'werewolf'
 
     def _on_new_day(self):
@@ -315,30 +364,12 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         参数:
             payload: {'playerSeat': 玩家座位, 'role': 角色, 'actionType': 动作类型, 'targetSeat': 目标座位}
         """
-        # 检查当前角色是否超时（超过1分钟自动跳过）
-        from datetime import datetime
+        # 检查当前角色是否超时（超过时限自动跳过）
         current_role = self.context.night_current_role
         logger.debug(f"[_handle_night_action] timeout check - current_role: {current_role}, night_role_start_times: {self.context.night_role_start_times}")
-        if current_role and current_role in self.context.night_role_start_times:
-            elapsed_time = datetime.now().timestamp() - self.context.night_role_start_times[current_role]
-            logger.debug(f"[_handle_night_action] elapsed_time for {current_role}: {elapsed_time:.1f}s")
-            if elapsed_time > 60:
-                logger.info(f"[_handle_night_action] Role {current_role} timeout ({elapsed_time:.1f}s), skipping to next role")
-                # 将当前角色标记为已完成
-                if current_role not in self.context.night_actions_completed:
-                    self.context.night_actions_completed.append(current_role)
-                # 推进到下一个角色
-                next_role = self._get_next_night_role(current_role)
-                if next_role:
-                    self.context.night_current_role = next_role
-                    self._announce_night_role_start(next_role)
-                    self.context.night_role_start_times[next_role] = datetime.now().timestamp()
-                    logger.debug(f"[_handle_night_action] Advanced to next role: {next_role}")
-                else:
-                    logger.debug(f"[_handle_night_action] All roles completed, transitioning to day_discussion")
-                    self.transition_to('day_discussion')
-                # 超时情况下，拒绝当前动作
-                return False, f"Role {current_role} timeout, action not accepted", None
+        if self._expire_night_role(self.now()):
+            # 超时情况下，拒绝当前动作
+            return False, f"Role {current_role} timeout, action not accepted", None
 
         logger.debug(f"[_handle_night_action] payload: {payload}")
         player_seat = payload.get('playerSeat')
@@ -360,7 +391,44 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             logger.warning(f"[_handle_night_action] Not your turn. Current: {current_role}, Your: {role}")
             return False, f"Not your turn. Current: {current_role}, Your: {role}", None
 
-        # 根据角色和动作类型处理
+        success, message, announcement_text = self._apply_night_action(player_seat, role, action_type, target_seat)
+        if not success:
+            return False, message, None
+
+        # 记录角色已完成行动
+        if role not in self.context.night_actions_completed:
+            self.context.night_actions_completed.append(role)
+            logger.debug(f"[_handle_night_action] Added {role} to night_actions_completed: {self.context.night_actions_completed}")
+
+        # 角色行动完成，推进到下一个角色或结束晚上阶段
+        next_role = self._get_next_night_role(role)
+        logger.debug(f"[_handle_night_action] next_role: {next_role}")
+        if next_role:
+            self.context.night_current_role = next_role
+            # 播报下一个角色开始行动
+            self._announce_night_role_start(next_role)
+            # 更新下一个角色的开始时间
+            self.context.night_role_start_times[next_role] = self.now()
+            logger.debug(f"[_handle_night_action] Advanced to next role: {next_role}")
+        else:
+            # 所有人都行动完成，转换到新一天
+            logger.debug(f"[_handle_night_action] All roles completed, transitioning to day_discussion")
+            self.transition_to('day_discussion')
+
+        return True, "Night action submitted successfully", {
+            'action': action_type,
+            'targetSeat': target_seat,
+            'announcement': announcement_text
+        }
+
+    def _apply_night_action(self, player_seat: int, role: str, action_type: str,
+                            target_seat: Optional[int]) -> Tuple[bool, str, Optional[str]]:
+        """
+        执行一个夜晚动作（击杀/查验/解药/毒药），不推进行动顺序
+
+        返回:
+            (success, message, 播报文本)
+        """
         announcement_text = None
 
         if action_type == 'kill' and role == 'werewolf':
@@ -380,9 +448,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
             # 检查是否所有狼人都选择了目标
             werewolf_choices = self.context.extensions.get('werewolf_choices', {})
-            werewolf_players = [p for p in self.context.players.values() if p.alive and p.role == Role.WEREWOLF]
 
-            if len(werewolf_choices) >= len(werewolf_players):
+            if len(werewolf_choices) >= self._alive_werewolf_count():
                 # 所有狼人都选择了，执行最终击杀
                 self._execute_werewolf_kill()
         elif action_type == 'check' and role == 'seer':
@@ -442,32 +509,76 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             logger.error(f"[_handle_night_action] Invalid action type: {action_type}, role: {role}")
             return False, "Invalid action type", None
 
-        # 记录角色已完成行动
-        if role not in self.context.night_actions_completed:
-            self.context.night_actions_completed.append(role)
-            logger.debug(f"[_handle_night_action] Added {role} to night_actions_completed: {self.context.night_actions_completed}")
+        return True, "Night action applied", announcement_text
 
-        # 角色行动完成，推进到下一个角色或结束晚上阶段
-        next_role = self._get_next_night_role(role)
-        logger.debug(f"[_handle_night_action] next_role: {next_role}")
+    def _alive_werewolf_count(self) -> int:
+        """存活狼人数"""
+        return sum(1 for p in self.context.players.values() if p.alive and p.role == Role.WEREWOLF)
+
+    def _expire_night_role(self, now: float) -> bool:
+        """
+        当前夜晚角色超时则标记为已完成并推进到下一个角色（或新的一天）
+
+        参数:
+            now: 当前时间戳
+
+        返回:
+            是否发生了超时推进
+        """
+        if not self._night_role_expired(now):
+            return False
+
+        current_role = self.context.night_current_role
+        elapsed_time = now - self.context.night_role_start_times[current_role]
+        logger.info(f"[_expire_night_role] Role {current_role} timeout ({elapsed_time:.1f}s), skipping to next role")
+        self._touch()
+        # 将当前角色标记为已完成
+        if current_role not in self.context.night_actions_completed:
+            self.context.night_actions_completed.append(current_role)
+        # 推进到下一个角色
+        next_role = self._get_next_night_role(current_role)
+        if self._events_wanted():
+            self._emit(TimerExpired, timer='night_role', phase=self.context.phase,
+                       role=current_role, next_role=next_role)
         if next_role:
             self.context.night_current_role = next_role
-            # 播报下一个角色开始行动
             self._announce_night_role_start(next_role)
-            # 更新下一个角色的开始时间
-            from datetime import datetime
-            self.context.night_role_start_times[next_role] = datetime.now().timestamp()
-            logger.debug(f"[_handle_night_action] Advanced to next role: {next_role}")
+            self.context.night_role_start_times[next_role] = now
+            logger.debug(f"[_expire_night_role] Advanced to next role: {next_role}")
         else:
-            # 所有人都行动完成，转换到新一天
-            logger.debug(f"[_handle_night_action] All roles completed, transitioning to day_discussion")
+            logger.debug(f"[_expire_night_role] All roles completed, transitioning to day_discussion")
             self.transition_to('day_discussion')
+        return True
 
-        return True, "Night action submitted successfully", {
-            'action': action_type,
-            'targetSeat': target_seat,
-            'announcement': announcement_text
-        }
+    def _night_role_expired(self, now: float) -> bool:
+        """当前夜晚角色是否已超时"""
+        current_role = self.context.night_current_role
+        start_time = self.context.night_role_start_times.get(current_role) if current_role else None
+        return start_time is not None and now - start_time > self.context.night_role_time_limit
+
+    def next_deadline(self) -> Optional[float]:
+        """获取当前阶段下一个计时截止时间（发言/投票/夜晚角色）"""
+        ctx = self.context
+        if ctx.phase == 'day_discussion':
+            return ctx.speaking_start_time + ctx.speaking_time_limit
+        if ctx.phase == 'day_voting':
+            return ctx.voting_start_time + ctx.voting_time_limit
+        if ctx.phase == 'night_action':
+            start_time = ctx.night_role_start_times.get(ctx.night_current_role)
+            if start_time is not None:
+                # 超时判断是严格大于，截止时间之后一点点才算到期
+                return start_time + ctx.night_role_time_limit + 0.001
+        return None
+
+    def check_timeouts(self) -> bool:
+        """检查并处理夜晚角色超时"""
+        with self._lock:
+            if self.context.phase != 'night_action':
+                return False
+            if not self._night_role_expired(self.now()):
+                return False
+            with self._operation('timeout'):
+                return self._expire_night_role(self.now())
 
     def _get_next_night_role(self, current_role: str) -> Optional[str]:
         """获取下一个需要行动的角色"""
@@ -487,9 +598,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         announcement_text = announcement_map.get(role, '')
 
         # 设置播报内容到扩展字段
-        from datetime import datetime
         self.context.extensions['announcement'] = announcement_text
-        self.context.extensions['announcement_time'] = datetime.now().timestamp()
+        self.context.extensions['announcement_time'] = self.now()
         self.context.extensions['action_role'] = role
 
     def _announce_night_role_action(self, role: str, announcement_text: Optional[str]):
@@ -498,16 +608,13 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             return
 
         # 设置播报内容到扩展字段（不影响游戏状态）
-        from datetime import datetime
         self.context.extensions['announcement'] = announcement_text
-        self.context.extensions['announcement_time'] = datetime.now().timestamp()
+        self.context.extensions['announcement_time'] = self.now()
         self.context.extensions['action_role'] = role  # 记录播报给谁
 
-    def _execute_werewolf_kill(self):
-        """执行狼人最终击杀逻辑（所有狼人都选择后调用）"""
+    def _choose_werewolf_target(self) -> Optional[int]:
+        """统计狼人的选择，返回票数最多的目标（平票时随机选择），没有选择时返回 None"""
         werewolf_choices = self.context.extensions.get('werewolf_choices', {})
-        if not werewolf_choices:
-            return
 
         # 统计票数，选择最多票的目标
         vote_counts = {}
@@ -516,14 +623,20 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
                 vote_counts[target] = vote_counts.get(target, 0) + 1
 
         if not vote_counts:
-            return  # 没有狼人选择，不执行击杀
+            return None
 
         # 找出票数最多的目标
         max_votes = max(vote_counts.values())
         voted_outs = [seat for seat, count in vote_counts.items() if count == max_votes]
 
         # 平票处理：随机选择
-        killed = random.choice(voted_outs) if len(voted_outs) > 1 else voted_outs[0]
+        return self.rng.choice(voted_outs) if len(voted_outs) > 1 else voted_outs[0]
+
+    def _execute_werewolf_kill(self):
+        """执行狼人最终击杀逻辑（所有狼人都选择后调用）"""
+        killed = self._choose_werewolf_target()
+        if killed is None:
+            return  # 没有狼人选择，不执行击杀
 
         # 执行击杀
         self.context.werewolf_killed = killed
@@ -549,9 +662,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             # 播报击杀结果
             announcement_lines = [f'🐺 狼人投票击杀了 {killed}号玩家']
             announcement_text = '\n'.join(announcement_lines)
-            from datetime import datetime
             self.context.extensions['announcement'] = announcement_text
-            self.context.extensions['announcement_time'] = datetime.now().timestamp()
+            self.context.extensions['announcement_time'] = self.now()
 
         # 清空狼人选择，为下一轮做准备
         self.context.extensions['werewolf_choices'] = {}
@@ -573,7 +685,7 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             return True, "All speakers finished, moving to voting", None
 
         self.context.current_speaker_index = next_index
-        self.context.speaking_start_time = __import__('datetime').datetime.now().timestamp()
+        self.context.speaking_start_time = self.now()
 
         return True, "Speaker advanced successfully", {
             'currentSpeaker': self.context.speaking_order[next_index]
@@ -581,30 +693,56 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
     # === 内部方法 ===
 
+    def current_speakers(self) -> List[int]:
+        """当前可以发言的座位号（经典模式每次一人）"""
+        order = self.context.speaking_order
+        index = self.context.current_speaker_index
+        return order[index:index + 1]
+
     def _init_speaking_order(self):
         """初始化发言顺序"""
-        from datetime import datetime
         self.context.speaking_order = self.context.get_alive_players()
         self.context.current_speaker_index = 0
-        self.context.speaking_start_time = datetime.now().timestamp()
+        self.context.speaking_start_time = self.now()
 
     def advance_speaker(self) -> bool:
         """
         推进到下一个发言者
         返回: 是否成功推进
         """
-        success, message, data = self._handle_advance_speaker({})
+        with self._operation('advance_speaker'):
+            success, message, data = self._handle_advance_speaker({})
+            self._touch()
+            self._emit_action('advance_speaker', None, success, message)
         return success
 
+    def get_player_votes(self, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        分页获取存活玩家的投票状态（按座位号顺序）
+
+        参数:
+            offset: 起始位置
+            limit: 最多返回的玩家数（默认全部）
+
+        返回:
+            {'total': 存活人数, 'offset': 起始位置, 'playerVotes': {座位号: {'hasVoted', 'votedFor'}}}
+        """
+        with self._lock:
+            alive = self.context.get_alive_players()
+            page = alive[offset:] if limit is None else alive[offset:offset + limit]
+            players = self.context.players
+            player_votes = {}
+            for seat in page:
+                player = players[seat]
+                player_votes[seat] = {'hasVoted': player.has_voted, 'votedFor': player.voted_for}
+            return {'total': len(alive), 'offset': offset, 'playerVotes': player_votes}
+
     def _init_voting(self):
         """初始化投票"""
-        from datetime import datetime
         # 重置所有玩家的投票状态
-        for player in self.context.players.values():
-            player.has_voted = False
-            player.voted_for = None
+        self.context.clear_votes()
 
-        self.context.voting_start_time = datetime.now().timestamp()
+        self.context.voting_start_time = self.now()
         self.context.voting_voted_count = 0
         self.context.voting_result = None
 
@@ -642,11 +780,16 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         # 让 Agent 做出投票决策
         decision = decide_agent_vote(self.room_id, seat, available_targets, self.context)
 
-        # 调用统一的投票处理器，确保逻辑一致
-        return self._handle_vote({
+        # 调用统一的投票处理器，确保逻辑一致（按普通投票动作记录，回放不需要重新决策）
+        payload = {
             'voterSeat': decision['voterSeat'],
             'targetSeat': decision['targetSeat']
-        })
+        }
+        with self._operation('action', action='vote', payload=payload):
+            success, message, data = self._handle_vote(payload)
+            self._touch()
+            self._emit_action('vote', payload, success, message)
+        return success, message, data
 
     def _calculate_voting_result(self):
         """计算投票结果"""
@@ -677,7 +820,7 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         voted_outs = [seat for seat, count in vote_counts.items() if count == max_votes]
 
         # 平票处理：随机选择
-        voted_out = random.choice(voted_outs) if len(voted_outs) > 1 else voted_outs[0]
+        voted_out = self.rng.choice(voted_outs) if len(voted_outs) > 1 else voted_outs[0]
 
         # 构建投票结果播报文本
         announcement_lines = ['🗳️ 投票结果：']
@@ -700,9 +843,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         }
 
         # 设置播报内容到扩展字段（不影响游戏状态）
-        from datetime import datetime
         self.context.extensions['announcement'] = announcement_text
-        self.context.extensions['announcement_time'] = datetime.now().timestamp()
+        self.context.extensions['announcement_time'] = self.now()
 
         # 投票完成后转移到晚上行动阶段
         if not self._check_game_over():
@@ -822,7 +964,7 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
     def _get_extended_state(self) -> Dict[str, Any]:
         """获取经典狼人杀的扩展状态"""
-        from datetime import datetime
+        now = self.now()
         logger.debug(f"[classic_werewolf] _get_extended_state called, phase: {self.context.phase}")
 
         extended_state = {}
@@ -833,8 +975,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
             if self.context.speaking_order and self.context.current_speaker_index < len(self.context.speaking_order):
                 current_speaker = self.context.speaking_order[self.context.current_speaker_index]
 
-            elapsed_time = datetime.now().timestamp() - self.context.speaking_start_time
-            time_left = max(0, 60 - int(elapsed_time))  # 60秒发言时间
+            elapsed_time = now - self.context.speaking_start_time
+            time_left = max(0, self.context.speaking_time_limit - int(elapsed_time))
 
             extended_state.update({
                 'speakingOrder': self.context.speaking_order,
@@ -845,8 +987,8 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
         # 如果在投票阶段，返回投票相关信息
         elif self.context.phase == 'day_voting':
-            elapsed_time = datetime.now().timestamp() - self.context.voting_start_time
-            time_left = max(0, 20 - int(elapsed_time))  # 20秒投票时间
+            elapsed_time = now - self.context.voting_start_time
+            time_left = max(0, self.context.voting_time_limit - int(elapsed_time))
 
             extended_state.update({
                 'votingTimeLeft': time_left,
@@ -866,27 +1008,14 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
 
         # 如果在晚上行动阶段，返回晚上行动相关信息
         elif self.context.phase == 'night_action':
+            # 如果超时，自动推进到下一个角色（与提交动作时的超时处理一致）
+            self.check_timeouts()
+
             # 计算当前角色行动时间（使用该角色的独立开始时间）
-            from datetime import datetime
             current_role = self.context.night_current_role
-            if current_role and current_role in self.context.night_role_start_times:
-                elapsed_time = datetime.now().timestamp() - self.context.night_role_start_times[current_role]
-            else:
-                elapsed_time = 0
-                time_left = 0
-
-            time_left = max(0, 60 - int(elapsed_time))  # 60秒行动时间
-
-            # 如果超时，自动推进到下一个角色
-            if time_left <= 0 and self.context.night_current_role:
-                current_role = self.context.night_current_role
-                next_role = self._get_next_night_role(current_role)
-                if next_role:
-                    self.context.night_current_role = next_role
-                    self.context.night_role_start_times[next_role] = datetime.now().timestamp()
-                else:
-                    # 所有人都行动完成，转换到新一天
-                    self.transition_to('day_discussion')
+            start_time = self.context.night_role_start_times.get(current_role) if current_role else None
+            elapsed_time = now - start_time if start_time is not None else 0
+            time_left = max(0, self.context.night_role_time_limit - int(elapsed_time))
 
             extended_state.update({
                 'currentRole': self.context.night_current_role,
@@ -898,3 +1027,20 @@ class ClassicWerewolfStateMachine(BaseStateMachine):
         logger.debug(f"[classic_werewolf] returning extended_state: {extended_state}")
         return extended_state
 
+    def get_snapshot_hints(self) -> Dict[str, Any]:
+        """共享快照的渲染提示（发言/投票/夜晚角色倒计时）"""
+        hints = super().get_snapshot_hints()
+        ctx = self.context
+        if ctx.phase == 'day_discussion':
+            hints['timers']['speakingTimeLeft'] = (ctx.speaking_start_time, ctx.speaking_time_limit)
+        elif ctx.phase == 'day_voting':
+            hints['timers']['votingTimeLeft'] = (ctx.voting_start_time, ctx.voting_time_limit)
+        elif ctx.phase == 'night_action':
+            current_role = ctx.night_current_role
+            start_time = ctx.night_role_start_times.get(current_role) if current_role else None
+            if start_time is not None:
+                hints['timers']['nightTimeLeft'] = (start_time, ctx.night_role_time_limit)
+                # 角色超时后读取状态会推进到下一个角色，需要由所有者渲染
+                hints['validUntil'] = start_time + ctx.night_role_time_limit
+        return hints
+
@@ -0,0 +1,75 @@
+"""
+时钟抽象
+状态机通过注入的时钟获取当前时间：生产环境使用墙上时钟，模拟和测试使用虚拟时钟，
+虚拟时钟可以直接跳到下一个截止时间，让计时阶段以模拟速度运行
+"""
+import threading
+import time
+
+
+class Clock:
+    """时钟接口"""
+
+    def now(self) -> float:
+        """当前时间戳（秒）"""
+        raise NotImplementedError
+
+
+class WallClock(Clock):
+    """墙上时钟（生产环境）"""
+
+    # 直接绑定 time.time，避免热点路径上的额外调用和 datetime 对象分配
+    now = staticmethod(time.time)
+
+
+class VirtualClock(Clock):
+    """
+    虚拟时钟（模拟和测试）
+    时间只在显式推进时前进
+    """
+
+    def __init__(self, start: float = 1_000_000_000.0):
+        """
+        参数:
+            start: 起始时间戳（默认取一个固定值，便于复现）
+        """
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> float:
+        """
+        向前推进时间
+
+        参数:
+            seconds: 推进的秒数（不能为负）
+
+        返回:
+            推进后的时间戳
+        """
+        if seconds < 0:
+            raise ValueError("Virtual clock cannot move backwards")
+        with self._lock:
+            self._now += seconds
+            return self._now
+
+    def advance_to(self, timestamp: float) -> float:
+        """
+        推进到指定时间（早于当前时间则不变）
+
+        参数:
+            timestamp: 目标时间戳
+
+        返回:
+            推进后的时间戳
+        """
+        with self._lock:
+            if timestamp > self._now:
+                self._now = timestamp
+            return self._now
+
+
+# 进程内共享的墙上时钟
+WALL_CLOCK = WallClock()
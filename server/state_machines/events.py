@@ -0,0 +1,296 @@
+"""
+引擎事件总线
+状态机在阶段转换、添加消息、处理动作和计时到期时发布带类型的事件，
+下游（推送、持久化、指标、Agent 预生成）订阅后从各自的有界队列中读取，不再轮询和比对状态。
+每个订阅者一个队列，队列满时按订阅时选择的策略处理（丢弃最旧、丢弃最新或限时阻塞发布方）。
+"""
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, ClassVar, Deque, Dict, Iterable, List, Optional, Tuple, Type
+
+logger = logging.getLogger('state_machine')
+
+# 队列满时的处理策略
+OVERFLOW_DROP_OLDEST = 'drop_oldest'  # 丢弃队列中最旧的事件（推送只关心最新状态）
+OVERFLOW_DROP_NEWEST = 'drop_newest'  # 丢弃新事件（已入队的前缀保持完整）
+OVERFLOW_BLOCK = 'block'              # 发布方最多等待 block_timeout 秒，仍然满则丢弃新事件（会拖慢处理请求的线程）
+
+OVERFLOW_POLICIES = (OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST, OVERFLOW_BLOCK)
+
+# 默认队列长度
+DEFAULT_QUEUE_SIZE = 1000
+
+
+# === 事件类型 ===
+
+@dataclass
+class GameEvent:
+    """
+    事件基类
+    version 为发布时的状态版本号，timestamp 为房间时钟时间（操作进行中为该操作的时间）；
+    同一个事件对象会交给所有订阅者，事件中的字典也与状态共享，订阅者只能读取
+    """
+    type: ClassVar[str] = 'event'
+
+    room_id: str
+    mode: str
+    version: int
+    timestamp: float
+
+
+@dataclass
+class PhaseChanged(GameEvent):
+    """阶段转换（阶段处理器执行完成后发布）"""
+    type: ClassVar[str] = 'phase_changed'
+
+    previous_phase: str
+    phase: str
+    round: int
+    duration: int
+    announcement: Optional[str]
+
+
+@dataclass
+class MessageAdded(GameEvent):
+    """游戏消息（与 context.messages 中新增的消息一一对应）"""
+    type: ClassVar[str] = 'message_added'
+
+    message_id: str
+    message_type: str
+    content: Dict[str, Any]
+
+
+@dataclass
+class ActionHandled(GameEvent):
+    """玩家动作处理完成（包括被拒绝的动作），announcement 为该动作产生的播报"""
+    type: ClassVar[str] = 'action_handled'
+
+    action: str
+    payload: Dict[str, Any]
+    success: bool
+    message: str
+    announcement: Optional[str]
+
+
+@dataclass
+class TimerExpired(GameEvent):
+    """计时到期（如夜晚角色超时），next_role 为接着行动的角色，None 表示进入下一阶段"""
+    type: ClassVar[str] = 'timer_expired'
+
+    timer: str
+    phase: str
+    role: Optional[str]
+    next_role: Optional[str]
+
+
+# === 订阅 ===
+
+class Subscription:
+    """
+    一个订阅者的有界事件队列
+    发布方调用 offer 入队，订阅者线程调用 get / drain 读取
+    """
+
+    def __init__(self, bus: 'EventBus', name: str, room_id: Optional[str],
+                 event_types: Optional[Tuple[Type[GameEvent], ...]], maxsize: int,
+                 overflow: str, block_timeout: float):
+        self.bus = bus
+        self.name = name
+        self.room_id = room_id
+        self.event_types = frozenset(event_types) if event_types else None
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.closed = False
+        self._queue: Deque[GameEvent] = deque()
+        self._cond = threading.Condition(threading.Lock())
+
+    def offer(self, event: GameEvent) -> bool:
+        """
+        事件入队（由总线调用，不抛出异常）
+
+        返回:
+            事件是否入队（不关心的类型也返回 False）
+        """
+        if self.event_types is not None and type(event) not in self.event_types:
+            return False
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == OVERFLOW_BLOCK:
+                    self._cond.wait_for(lambda: self.closed or len(self._queue) < self.maxsize,
+                                        self.block_timeout)
+                if self.closed:
+                    return False
+                if len(self._queue) >= self.maxsize:
+                    self.dropped += 1
+                    if self.overflow != OVERFLOW_DROP_OLDEST:
+                        return False
+                    self._queue.popleft()
+            self._queue.append(event)
+            self._cond.notify_all()
+        return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[GameEvent]:
+        """
+        取出一个事件
+
+        参数:
+            timeout: 队列为空时最多等待的秒数（None 表示一直等待）
+
+        返回:
+            事件，超时或订阅已关闭时返回 None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._queue or self.closed, timeout):
+                return None
+            if not self._queue:
+                return None
+            event = self._queue.popleft()
+            self._cond.notify_all()
+            return event
+
+    def drain(self, max_items: Optional[int] = None) -> List[GameEvent]:
+        """取出队列中已有的事件（不等待）"""
+        with self._cond:
+            count = len(self._queue) if max_items is None else min(max_items, len(self._queue))
+            events = [self._queue.popleft() for _ in range(count)]
+            if events:
+                self._cond.notify_all()
+            return events
+
+    def pending(self) -> int:
+        """队列中等待读取的事件数"""
+        return len(self._queue)
+
+    def close(self):
+        """取消订阅，唤醒等待中的读取方和发布方"""
+        self.bus.unsubscribe(self)
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def __enter__(self) -> 'Subscription':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        """逐个读取事件直到订阅关闭"""
+        while True:
+            event = self.get()
+            if event is None:
+                return
+            yield event
+
+
+# === 总线 ===
+
+class EventBus:
+    """
+    进程内发布/订阅总线
+    订阅者可以只订阅某个房间或某些事件类型；发布方在没有订阅者时不构造事件（见 wants）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 订阅列表写时复制，发布时不加锁读取
+        self._global: Tuple[Subscription, ...] = ()
+        self._by_room: Dict[str, Tuple[Subscription, ...]] = {}
+        self.published = 0
+        self.errors = 0
+
+    def subscribe(self, name: str = 'anonymous', room_id: Optional[str] = None,
+                  event_types: Optional[Iterable[Type[GameEvent]]] = None,
+                  maxsize: int = DEFAULT_QUEUE_SIZE, overflow: str = OVERFLOW_DROP_OLDEST,
+                  block_timeout: float = 0.05) -> Subscription:
+        """
+        订阅事件
+
+        参数:
+            name: 订阅者名称（指标标签）
+            room_id: 只接收该房间的事件（默认所有房间）
+            event_types: 只接收这些类型的事件（默认所有类型）
+            maxsize: 队列长度
+            overflow: 队列满时的策略（drop_oldest / drop_newest / block）
+            block_timeout: block 策略下发布方最多等待的秒数。事件在处理请求的线程中、释放房间锁之后发布，
+                           等待期间该请求停顿，同一房间后续操作的事件也排在其后发布，应尽量短
+
+        返回:
+            订阅（用完后调用 close，或作为上下文管理器使用）
+
+        异常:
+            ValueError: 队列长度或策略无效
+        """
+        if maxsize <= 0:
+            raise ValueError(f"Invalid event queue size: {maxsize}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+
+        subscription = Subscription(self, name, room_id, tuple(event_types) if event_types else None,
+                                    maxsize, overflow, block_timeout)
+        with self._lock:
+            if room_id is None:
+                self._global = self._global + (subscription,)
+            else:
+                self._by_room[room_id] = self._by_room.get(room_id, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """取消订阅（订阅不存在时忽略）"""
+        with self._lock:
+            if subscription.room_id is None:
+                self._global = tuple(s for s in self._global if s is not subscription)
+                return
+            remaining = tuple(s for s in self._by_room.get(subscription.room_id, ()) if s is not subscription)
+            if remaining:
+                self._by_room[subscription.room_id] = remaining
+            else:
+                self._by_room.pop(subscription.room_id, None)
+
+    def wants(self, room_id: str) -> bool:
+        """是否有订阅者接收该房间的事件（没有时发布方直接跳过）"""
+        return bool(self._global) or room_id in self._by_room
+
+    def publish(self, event: GameEvent) -> int:
+        """
+        发布事件
+
+        某个订阅者出错时记录日志并跳过，不影响其他订阅者和发布方（状态已经修改完成）
+
+        返回:
+            入队的订阅者数
+        """
+        self.published += 1
+        delivered = 0
+        for subscription in self._global + self._by_room.get(event.room_id, ()):
+            try:
+                delivered += subscription.offer(event)
+            except Exception:
+                self.errors += 1
+                logger.exception(f"[EventBus] 订阅者 {subscription.name} 处理事件 {event.type} 失败")
+        return delivered
+
+    def stats(self) -> Dict:
+        """各订阅者的积压和丢弃统计"""
+        with self._lock:
+            subscriptions = list(self._global)
+            for room_subscriptions in self._by_room.values():
+                subscriptions.extend(room_subscriptions)
+        return {
+            'published': self.published,
+            'errors': self.errors,
+            'subscribers': [
+                {'name': s.name, 'roomId': s.room_id, 'pending': s.pending(), 'dropped': s.dropped,
+                 'overflow': s.overflow}
+                for s in subscriptions
+            ],
+        }
+
+
+EVENT_BUS = EventBus()
@@ -0,0 +1,241 @@
+"""
+大房间狼人杀状态机（30–100 座）
+逐人发言和全量投票状态在大房间里不可玩，轮询成本也随座位数线性增长。
+大房间模式按组开放发言窗口（组内同时发言），投票在提交时增量计票，
+状态只返回当前发言组和票数最高的若干目标，逐人投票状态改为分页查询（get_player_votes）。
+夜晚沿用快速模式的同时行动。
+"""
+import heapq
+import logging
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from .clock import Clock
+from .quick_mode_state_machine import QuickModeStateMachine
+from .state_enums import Role
+
+logger = logging.getLogger('state_machine')
+
+
+class LargeRoomStateMachine(QuickModeStateMachine):
+    """
+    大房间狼人杀状态机
+
+    与快速模式的差异：
+    - 白天按 SPEECH_GROUP_SIZE 人一组开放发言窗口，组内同时发言，推进发言者时进入下一组
+    - 投票在提交时维护票数（extensions['vote_tally']），每票 O(1)，全员投完即计票
+    - 投票阶段的状态只含票数最高的 VOTE_COUNTS_LIMIT 个目标，逐人投票状态分页查询；
+      计票结果不含逐人明细（vote_details），明细在下一轮投票前仍可分页查询
+    - 计时按大房间放宽：每个发言窗口 60 秒、投票 30 秒、夜晚 30 秒
+    - 狼人数按座位数的平方根增长（见 _get_custom_roles）
+    """
+
+    MODE = 'large'
+    DISCUSSION_DURATION = 600
+    VOTING_DURATION = 30
+    NIGHT_DURATION = 30
+
+    # 上下文计时（秒，发言计时按窗口）
+    SPEAKING_TIME_LIMIT = 60
+    VOTING_TIME_LIMIT = 30
+    NIGHT_TIME_LIMIT = 30
+
+    # 每个发言窗口的人数
+    SPEECH_GROUP_SIZE = 8
+    # 投票阶段状态中返回的票数最高的目标数
+    VOTE_COUNTS_LIMIT = 10
+
+    def __init__(self, room_id: str, seat_count: int = 60, clock: Optional[Clock] = None,
+                 seed: Optional[int] = None):
+        # 投票阶段票数排行的缓存：(上下文, 状态版本号, 排行)
+        self._vote_counts_cache: Optional[tuple] = None
+        super().__init__(room_id, seat_count, clock=clock, seed=seed)
+
+    def _get_custom_roles(self, count: int) -> list:
+        """
+        根据玩家数获取角色配置（狼人 ⌊√n⌋ // 2，至少 2 人、不超过 1/6；一个预言家和一个女巫）
+
+        夜晚只有狼人杀人，白天的放逐接近随机，按固定比例配置狼人时房间越大狼人越占优
+        （规则策略下 60 人、1/6 狼人几乎全是狼人获胜）；按平方根配置时 30/60/100 人的村民胜率约四到六成
+        """
+        werewolves = min(max(2, math.isqrt(count) // 2), max(1, count // 6))
+        special_roles = 2 if count >= 6 else (1 if count >= 4 else 0)
+        villagers = count - werewolves - special_roles
+
+        return (
+            [Role.WEREWOLF] * werewolves +
+            [Role.SEER, Role.WITCH][:special_roles] +
+            [Role.VILLAGER] * villagers
+        )
+
+    # === 发言窗口 ===
+
+    def current_speakers(self) -> List[int]:
+        """当前发言窗口内的座位号"""
+        index = self.context.current_speaker_index
+        return self.context.speaking_order[index:index + self.SPEECH_GROUP_SIZE]
+
+    def _handle_speech(self, payload: Dict) -> Tuple[bool, str, Any]:
+        """处理发言动作（讨论阶段只接受当前发言窗口内的座位）"""
+        if self.context.phase == 'day_discussion' and payload.get('seat') not in self.current_speakers():
+            return False, "Not in the current speaking window", None
+        return super()._handle_speech(payload)
+
+    def _handle_advance_speaker(self, payload: Dict) -> Tuple[bool, str, Any]:
+        """推进到下一个发言窗口"""
+        ctx = self.context
+        if not ctx.speaking_order:
+            return False, "No speaking order available", None
+
+        next_index = ctx.current_speaker_index + self.SPEECH_GROUP_SIZE
+        if next_index >= len(ctx.speaking_order):
+            # 所有窗口都结束了，自动转换到投票阶段（会触发播报）
+            self.transition_to('day_voting')
+            return True, "All speakers finished, moving to voting", None
+
+        ctx.current_speaker_index = next_index
+        ctx.speaking_start_time = self.now()
+
+        return True, "Speaking window advanced successfully", {
+            'currentSpeakers': self.current_speakers()
+        }
+
+    # === 增量计票 ===
+
+    def _init_voting(self):
+        """初始化投票（清空票数，记录参与投票的人数）"""
+        super()._init_voting()
+        self.context.extensions['vote_tally'] = {}
+        self.context.extensions['voting_alive_count'] = len(self.context.get_alive_players())
+
+    def _handle_vote(self, payload: Dict) -> Tuple[bool, str, Any]:
+        """
+        处理投票动作（改票时从原目标扣除一票）
+
+        参数:
+            payload: {'voterSeat': 投票者座位, 'targetSeat': 目标座位}
+        """
+        ctx = self.context
+        if ctx.phase != 'day_voting':
+            return False, "Not in voting phase", None
+
+        voter_seat = payload.get('voterSeat')
+        target_seat = payload.get('targetSeat')
+
+        if voter_seat not in ctx.players or target_seat not in ctx.players:
+            return False, "Invalid player seats", None
+
+        voter = ctx.players[voter_seat]
+        target = ctx.players[target_seat]
+
+        if not voter.alive or not target.alive:
+            return False, "Player is not alive", None
+
+        tally = ctx.extensions.setdefault('vote_tally', {})
+        if voter.has_voted:
+            previous = voter.voted_for
+            remaining = tally.get(previous, 0) - 1
+            if remaining > 0:
+                tally[previous] = remaining
+            else:
+                tally.pop(previous, None)
+        else:
+            ctx.voting_voted_count += 1
+
+        voter.voted_for = target_seat
+        voter.has_voted = True
+        tally[target_seat] = tally.get(target_seat, 0) + 1
+
+        if ctx.voting_voted_count >= ctx.extensions.get('voting_alive_count', 0):
+            self._calculate_voting_result()
+
+        return True, "Vote submitted successfully", {
+            'voterSeat': voter_seat,
+            'targetSeat': target_seat
+        }
+
+    def _calculate_voting_result(self):
+        """
+        按增量票数计算投票结果（播报只列出票数最高的目标）
+        不逐座位生成投票明细：玩家的投票目标保留到下一轮投票，需要时通过 get_player_votes 分页查询
+        """
+        ctx = self.context
+        vote_counts = dict(ctx.extensions.get('vote_tally') or {})
+
+        if not vote_counts:
+            ctx.voting_result = {
+                'voted_out': None,
+                'vote_counts': {}
+            }
+            return
+
+        max_votes = max(vote_counts.values())
+        voted_outs = sorted(seat for seat, count in vote_counts.items() if count == max_votes)
+
+        # 平票处理：随机选择
+        voted_out = self.rng.choice(voted_outs) if len(voted_outs) > 1 else voted_outs[0]
+
+        announcement_lines = ['🗳️ 投票结果（得票最多）：']
+        for seat, count in self._top_vote_counts(vote_counts, 5):
+            announcement_lines.append(f'  {seat}号 {count}票')
+        announcement_lines.append(f'\n💀 {voted_out}号玩家被投票出局（{vote_counts[voted_out]}票）')
+
+        ctx.voting_result = {
+            'voted_out': voted_out,
+            'vote_counts': vote_counts
+        }
+
+        ctx.extensions['announcement'] = '\n'.join(announcement_lines)
+        ctx.extensions['announcement_time'] = self.now()
+
+        # 投票完成后转移到晚上行动阶段
+        if not self._check_game_over():
+            self.transition_to('night_action')
+
+    @staticmethod
+    def _top_vote_counts(vote_counts: Dict[int, int], limit: int) -> List[Tuple[int, int]]:
+        """票数最高的 limit 个目标（票数相同按座位号）"""
+        return heapq.nsmallest(limit, vote_counts.items(), key=lambda item: (-item[1], item[0]))
+
+    def _vote_count_ranking(self) -> Dict[int, int]:
+        """当前票数排行（按状态版本号缓存，同一版本的多次轮询不重复排序）"""
+        ctx = self.context
+        cache = self._vote_counts_cache
+        if cache is not None and cache[0] is ctx and cache[1] == ctx.version:
+            return cache[2]
+        ranking = dict(self._top_vote_counts(ctx.extensions.get('vote_tally') or {}, self.VOTE_COUNTS_LIMIT))
+        self._vote_counts_cache = (ctx, ctx.version, ranking)
+        return ranking
+
+    # === 状态 ===
+
+    def _get_extended_state(self) -> Dict[str, Any]:
+        """发言阶段只返回当前窗口，投票阶段只返回票数排行"""
+        ctx = self.context
+        if ctx.phase == 'day_discussion':
+            speakers = self.current_speakers()
+            group_size = self.SPEECH_GROUP_SIZE
+            return {
+                'currentSpeakers': speakers,
+                'currentSpeaker': speakers[0] if speakers else None,
+                'currentSpeakerIndex': ctx.current_speaker_index,
+                'speakingGroupIndex': ctx.current_speaker_index // group_size,
+                'speakingGroupCount': -(-len(ctx.speaking_order) // group_size),
+                'speakingTimeLeft': max(0, ctx.speaking_time_limit - int(self.now() - ctx.speaking_start_time))
+            }
+
+        if ctx.phase == 'day_voting':
+            extended_state = {
+                'votingTimeLeft': max(0, ctx.voting_time_limit - int(self.now() - ctx.voting_start_time)),
+                'votingVotedCount': ctx.voting_voted_count,
+                'votingAliveCount': ctx.extensions.get('voting_alive_count', 0),
+                'voteCounts': self._vote_count_ranking()
+            }
+            if ctx.voting_result:
+                extended_state['votingResult'] = {
+                    'voted_out': ctx.voting_result.get('voted_out'),
+                    'vote_counts': self._vote_count_ranking()
+                }
+            return extended_state
+
+        return super()._get_extended_state()
@@ -0,0 +1,179 @@
+"""
+快速模式狼人杀状态机
+阶段流程与经典模式相同，但计时更短、夜晚所有角色同时行动、默认角色池更小（只有狼人、预言家、女巫和村民），
+一局的时长只有经典模式的几分之一，适合追求每服务器每小时对局数的高周转大厅。
+"""
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from .classic_werewolf_state_machine import ClassicWerewolfStateMachine
+from .clock import Clock
+from .state_enums import Role
+
+logger = logging.getLogger('state_machine')
+
+# 夜晚同时行动时 night_current_role 的取值（所有夜晚角色共用一个计时窗口）
+NIGHT_ALL_ROLES = 'all'
+
+
+class QuickModeStateMachine(ClassicWerewolfStateMachine):
+    """
+    快速模式狼人杀状态机
+
+    与经典模式的差异：
+    - 计时：每人发言 20 秒、投票 10 秒、夜晚所有角色共用 20 秒
+      （经典模式每人发言 60 秒、投票 20 秒、每个夜晚角色 60 秒）
+    - 阶段时长：讨论 45 秒、投票 10 秒、夜晚 20 秒（经典模式 120/20/120 秒）
+    - 夜晚狼人、女巫、预言家同时行动，全部完成或窗口超时即天亮；没有存活成员的角色不等待
+    - 狼人的击杀在天亮时结算，女巫在狼人选定目标后可以看到并使用解药
+    - 默认角色池只有狼人、预言家、女巫和村民（不设没有夜晚行动的猎人），狼人约占 1/6
+    """
+
+    # 12人局的默认角色配置
+    DEFAULT_ROLES_12P = [
+        Role.WEREWOLF, Role.WEREWOLF,  # 2 个狼人
+        Role.SEER, Role.WITCH,  # 特殊角色
+        Role.VILLAGER, Role.VILLAGER, Role.VILLAGER, Role.VILLAGER,  # 8 个村民
+        Role.VILLAGER, Role.VILLAGER, Role.VILLAGER, Role.VILLAGER
+    ]
+
+    MODE = 'quick'
+    DISCUSSION_DURATION = 45
+    VOTING_DURATION = 10
+    NIGHT_DURATION = 20
+
+    # 上下文计时（秒）
+    SPEAKING_TIME_LIMIT = 20
+    VOTING_TIME_LIMIT = 10
+    NIGHT_TIME_LIMIT = 20
+
+    # 夜晚行动的角色
+    NIGHT_ROLES = ('werewolf', 'witch', 'seer')
+
+    def __init__(self, room_id: str, seat_count: int = 12, clock: Optional[Clock] = None,
+                 seed: Optional[int] = None):
+        super().__init__(room_id, seat_count, clock=clock, seed=seed)
+        self._init_time_limits()
+
+    def _init_time_limits(self):
+        """设置快速模式的计时"""
+        self.context.speaking_time_limit = self.SPEAKING_TIME_LIMIT
+        self.context.voting_time_limit = self.VOTING_TIME_LIMIT
+        self.context.night_role_time_limit = self.NIGHT_TIME_LIMIT
+
+    def _on_reset(self) -> None:
+        """重置后补齐座位并恢复快速模式的计时（上下文重置为默认计时）"""
+        super()._on_reset()
+        self._init_time_limits()
+
+    def _get_custom_roles(self, count: int) -> list:
+        """根据玩家数获取角色配置（约 1/6 狼人，6 人及以上有预言家和女巫）"""
+        werewolves = max(1, count // 6)
+        special_roles = 2 if count >= 6 else (1 if count >= 4 else 0)
+        villagers = count - werewolves - special_roles
+
+        return (
+            [Role.WEREWOLF] * werewolves +
+            [Role.SEER, Role.WITCH][:special_roles] +
+            [Role.VILLAGER] * villagers
+        )
+
+    # === 夜晚：所有角色同时行动 ===
+
+    def _on_night_action_start(self):
+        """晚上行动开始：所有夜晚角色共用一个计时窗口"""
+        self._execute_voting()
+
+        ctx = self.context
+        now = self.now()
+        ctx.night_current_role = NIGHT_ALL_ROLES
+        ctx.night_action_start_time = now
+        ctx.night_role_start_times = {NIGHT_ALL_ROLES: now}
+        ctx.seer_checked = None
+        ctx.werewolf_killed = None
+        ctx.witch_saved = None
+        ctx.witch_poisoned = None
+        ctx.extensions['werewolf_choices'] = {}
+        alive_roles = ctx.count_alive_roles()
+        # 没有存活成员的角色直接视为已完成
+        ctx.night_actions_completed = [role for role in self.NIGHT_ROLES if not alive_roles.get(Role(role))]
+        # 击杀天亮才结算，夜晚内存活狼人数不变，狼人行动时不再扫描全部座位
+        ctx.extensions['night_werewolves'] = alive_roles.get(Role.WEREWOLF, 0)
+
+        ctx.extensions['announcement'] = '🌙 天黑请闭眼，狼人、女巫、预言家请同时行动'
+        ctx.extensions['announcement_time'] = now
+        ctx.extensions['action_role'] = NIGHT_ALL_ROLES
+
+    def _handle_night_action(self, payload: Dict) -> Tuple[bool, str, Any]:
+        """
+        处理晚上动作（任意尚未完成的夜晚角色都可以行动）
+
+        参数:
+            payload: {'playerSeat': 玩家座位, 'role': 角色, 'actionType': 动作类型, 'targetSeat': 目标座位}
+        """
+        if self._expire_night_role(self.now()):
+            return False, "Night timeout, action not accepted", None
+
+        player_seat = payload.get('playerSeat')
+        role = payload.get('role')
+        action_type = payload.get('actionType')
+        target_seat = payload.get('targetSeat')
+
+        player = self.context.players.get(player_seat)
+        if not player or not player.alive:
+            return False, "Player not found or not alive", None
+
+        if player.role.value != role:
+            return False, "Role mismatch", None
+
+        completed = self.context.night_actions_completed
+        if role not in self.NIGHT_ROLES or role in completed:
+            return False, f"Role {role} has no pending night action", None
+
+        success, message, announcement_text = self._apply_night_action(player_seat, role, action_type, target_seat)
+        if not success:
+            return False, message, None
+
+        # 狼人在所有存活狼人选定后完成（见 _execute_werewolf_kill），其他角色行动一次即完成
+        if role != 'werewolf' and role not in completed:
+            completed.append(role)
+
+        if all(night_role in completed for night_role in self.NIGHT_ROLES):
+            logger.debug(f"[quick_mode] All night roles completed, transitioning to day_discussion")
+            self.transition_to('day_discussion')
+
+        return True, "Night action submitted successfully", {
+            'action': action_type,
+            'targetSeat': target_seat,
+            'announcement': announcement_text
+        }
+
+    def _alive_werewolf_count(self) -> int:
+        count = self.context.extensions.get('night_werewolves')
+        return count if count is not None else super()._alive_werewolf_count()
+
+    def _execute_werewolf_kill(self):
+        """狼人选定目标（天亮时与女巫的解药、毒药一起结算）"""
+        killed = self._choose_werewolf_target()
+        self.context.werewolf_killed = killed
+        self.context.extensions['werewolf_choices'] = {}
+        if 'werewolf' not in self.context.night_actions_completed:
+            self.context.night_actions_completed.append('werewolf')
+
+    def _get_next_night_role(self, current_role: str) -> Optional[str]:
+        """只有一个行动窗口，超时即天亮"""
+        return None
+
+    def _on_new_day(self):
+        """新一天开始：超时前只有部分狼人选择时按已有选择结算"""
+        if self.context.werewolf_killed is None and self.context.extensions.get('werewolf_choices'):
+            self._execute_werewolf_kill()
+        super()._on_new_day()
+
+    def _get_extended_state(self) -> Dict[str, Any]:
+        """在经典模式的扩展状态之外返回尚未行动的夜晚角色"""
+        extended_state = super()._get_extended_state()
+        if self.context.phase == 'night_action':
+            completed = self.context.night_actions_completed
+            extended_state['nightPendingRoles'] = [role for role in self.NIGHT_ROLES if role not in completed]
+        return extended_state
@@ -0,0 +1,127 @@
+"""
+对局回放
+根据回放记录（房间种子 + 带时间的动作流）在虚拟时钟上重新执行一局游戏，
+结果与原局逐位一致，可用于本地复现线上问题、性能剖析和跨版本基准对比
+"""
+import hashlib
+import json
+from typing import Any, Dict, Tuple
+
+from .base_state_machine import BaseStateMachine
+from .clock import VirtualClock
+from .state_context import GameStateContext
+from .state_enums import Role
+from .state_machine_factory import create_state_machine
+
+# 回放记录格式版本（字段变化时递增）
+REPLAY_FORMAT_VERSION = 1
+
+
+def state_fingerprint(context: GameStateContext) -> str:
+    """
+    计算游戏状态指纹（用于校验回放结果）
+    覆盖阶段、结果、玩家、消息和角色上下文，不包含播报等展示字段
+
+    参数:
+        context: 游戏状态上下文
+
+    返回:
+        十六进制 SHA-256 摘要
+    """
+    payload = {
+        'phase': context.phase,
+        'result': context.result,
+        'round': context.round,
+        'players': [
+            [p.seat, p.role.value if p.role else None, p.alive, p.has_voted, p.voted_for]
+            for p in context.players.values()
+        ],
+        'messages': [[m.id, m.timestamp, m.type, m.content] for m in context.messages],
+        'lastDeadPlayer': context.last_dead_player,
+        'votingResult': context.voting_result,
+        'werewolfContext': context.werewolf_context,
+        'seerContext': context.seer_context,
+        'witchContext': context.witch_context,
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def apply_operation(state_machine: BaseStateMachine, entry: Dict[str, Any]):
+    """
+    在状态机上执行一条动作流记录（调用方负责先把时钟推进到记录时间）
+
+    参数:
+        state_machine: 状态机实例
+        entry: 动作流记录 {'t', 'op', ...}
+
+    异常:
+        ValueError: 未知的操作
+    """
+    op = entry['op']
+    if op == 'assign_roles':
+        role_pool = entry.get('rolePool')
+        state_machine.assign_roles(
+            [Role(r) for r in role_pool] if role_pool is not None else None,
+            {int(seat): Role(role) for seat, role in (entry.get('fixedRoles') or {}).items()}
+        )
+    elif op == 'start_round':
+        state_machine.start_round()
+    elif op == 'action':
+        state_machine.handle_player_action(entry['action'], entry.get('payload') or {})
+    elif op == 'advance_speaker':
+        state_machine.advance_speaker()
+    elif op == 'timeout':
+        state_machine.check_timeouts()
+    else:
+        raise ValueError(f"Unknown replay operation: {op}")
+
+
+def replay_game(record: Dict[str, Any]) -> BaseStateMachine:
+    """
+    回放一局游戏
+
+    参数:
+        record: BaseStateMachine.export_replay() 导出的回放记录
+
+    返回:
+        回放完成后的状态机（使用虚拟时钟）
+
+    异常:
+        ValueError: 记录格式版本不支持
+    """
+    if record.get('formatVersion') != REPLAY_FORMAT_VERSION:
+        raise ValueError(f"Unsupported replay format version: {record.get('formatVersion')}")
+
+    clock = VirtualClock(record['createdAt'])
+    state_machine = create_state_machine(
+        room_id=record['roomId'],
+        mode=record['mode'],
+        seat_count=record['seatCount'],
+        clock=clock,
+        seed=record['seed']
+    )
+    # 回放重新执行的是已经发生过的动作，不向订阅者重复发布事件
+    event_bus = state_machine.event_bus
+    state_machine.event_bus = None
+    try:
+        for entry in record['actions']:
+            clock.advance_to(entry['t'])
+            apply_operation(state_machine, entry)
+    finally:
+        state_machine.event_bus = event_bus
+    return state_machine
+
+
+def verify_replay(record: Dict[str, Any]) -> Tuple[bool, BaseStateMachine]:
+    """
+    回放并校验结果指纹
+
+    参数:
+        record: 回放记录
+
+    返回:
+        (指纹是否一致, 回放后的状态机)
+    """
+    state_machine = replay_game(record)
+    return state_fingerprint(state_machine.context) == record.get('fingerprint'), state_machine
@@ -0,0 +1,207 @@
+"""
+紧凑座位表
+用按座位号索引的并行数组代替 Dict[int, Player]：角色编码、标志位（在座/存活/已投票）和投票目标各一个数组，
+每个座位 4 字节，没有逐个玩家的对象和字典。适合大房间（数十个座位）和单进程数万个房间的场景。
+
+SeatTable 实现字典接口（座位号 → 玩家），取出的 SeatView 与 Player 有相同的属性，读写直接落在数组上，
+context.players[seat].alive = False 等原有代码无需修改。
+"""
+from array import array
+from collections import Counter
+from collections.abc import MutableMapping
+from itertools import compress
+from typing import Dict, Iterator, List, Optional
+
+from .state_enums import Role
+
+# 角色编码（-1 表示未分配）
+_ROLES = tuple(Role)
+_ROLE_CODES = {role: code for code, role in enumerate(_ROLES)}
+
+_PRESENT = 1
+_ALIVE = 2
+_HAS_VOTED = 4
+# 标志位字节映射表（bytearray.translate）：按座位批量筛选和清除，扫描在 C 层完成
+_CLEAR_VOTED = bytes(flags & ~_HAS_VOTED for flags in range(256))
+_IS_PRESENT = bytes(1 if flags & _PRESENT else 0 for flags in range(256))
+_IS_ALIVE = bytes(1 if flags & (_PRESENT | _ALIVE) == _PRESENT | _ALIVE else 0 for flags in range(256))
+_IS_DEAD = bytes(1 if flags & (_PRESENT | _ALIVE) == _PRESENT else 0 for flags in range(256))
+
+
+class SeatView:
+    """座位表中一个玩家的视图（属性与 Player 相同）"""
+
+    __slots__ = ('_table', 'seat')
+
+    def __init__(self, table: 'SeatTable', seat: int):
+        self._table = table
+        self.seat = seat
+
+    @property
+    def role(self) -> Optional[Role]:
+        code = self._table._roles[self.seat]
+        return _ROLES[code] if code >= 0 else None
+
+    @role.setter
+    def role(self, value: Optional[Role]):
+        self._table._roles[self.seat] = _ROLE_CODES[Role(value)] if value is not None else -1
+
+    @property
+    def alive(self) -> bool:
+        return bool(self._table._flags[self.seat] & _ALIVE)
+
+    @alive.setter
+    def alive(self, value: bool):
+        self._table._set_flag(self.seat, _ALIVE, value)
+
+    @property
+    def has_voted(self) -> bool:
+        return bool(self._table._flags[self.seat] & _HAS_VOTED)
+
+    @has_voted.setter
+    def has_voted(self, value: bool):
+        self._table._set_flag(self.seat, _HAS_VOTED, value)
+
+    @property
+    def voted_for(self) -> Optional[int]:
+        target = self._table._voted_for[self.seat]
+        return target if target >= 0 else None
+
+    @voted_for.setter
+    def voted_for(self, value: Optional[int]):
+        self._table._voted_for[self.seat] = value if value is not None else -1
+
+    def reset(self):
+        """重置为未分配角色的存活玩家（新对局复用）"""
+        self._table._reset_seat(self.seat)
+
+    def __eq__(self, other):
+        # 与 Player 或其他 SeatView 按属性比较
+        try:
+            theirs = (other.seat, other.role, other.alive, other.has_voted, other.voted_for)
+        except AttributeError:
+            return NotImplemented
+        return (self.seat, self.role, self.alive, self.has_voted, self.voted_for) == theirs
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (f"SeatView(seat={self.seat!r}, role={self.role!r}, alive={self.alive!r}, "
+                f"has_voted={self.has_voted!r}, voted_for={self.voted_for!r})")
+
+
+class SeatTable(MutableMapping):
+    """
+    紧凑座位表（座位号 → SeatView）
+
+    参数:
+        seat_count: 预分配的座位数（座位号 1..seat_count，写入更大的座位号时自动扩展）
+    """
+
+    __slots__ = ('_roles', '_flags', '_voted_for', '_count')
+
+    def __init__(self, seat_count: int = 0):
+        size = seat_count + 1  # 下标 0 不使用，座位号直接作下标
+        self._roles = array('b', [-1]) * size
+        self._flags = bytearray(size)
+        self._voted_for = array('h', [-1]) * size
+        self._count = 0
+
+    def _grow(self, seat: int):
+        extra = seat + 1 - len(self._flags)
+        if extra > 0:
+            self._roles.extend(array('b', [-1]) * extra)
+            self._flags.extend(bytes(extra))
+            self._voted_for.extend(array('h', [-1]) * extra)
+
+    def _set_flag(self, seat: int, flag: int, value: bool):
+        if value:
+            self._flags[seat] |= flag
+        else:
+            self._flags[seat] &= ~flag
+
+    def _reset_seat(self, seat: int):
+        self._roles[seat] = -1
+        self._flags[seat] = _PRESENT | _ALIVE
+        self._voted_for[seat] = -1
+
+    # ---------- 字典接口 ----------
+
+    def __getitem__(self, seat: int) -> SeatView:
+        if 0 < seat < len(self._flags) and self._flags[seat] & _PRESENT:
+            return SeatView(self, seat)
+        raise KeyError(seat)
+
+    def get(self, seat: int, default=None):
+        if 0 < seat < len(self._flags) and self._flags[seat] & _PRESENT:
+            return SeatView(self, seat)
+        return default
+
+    def __contains__(self, seat) -> bool:
+        return isinstance(seat, int) and 0 < seat < len(self._flags) and bool(self._flags[seat] & _PRESENT)
+
+    def __setitem__(self, seat: int, player):
+        """写入玩家（Player 或 SeatView，按属性复制）"""
+        if seat < 1:
+            raise KeyError(seat)
+        self._grow(seat)
+        if not self._flags[seat] & _PRESENT:
+            self._count += 1
+        self._flags[seat] = _PRESENT
+        view = SeatView(self, seat)
+        view.role = player.role
+        view.alive = player.alive
+        view.has_voted = player.has_voted
+        view.voted_for = player.voted_for
+
+    def __delitem__(self, seat: int):
+        if seat not in self:
+            raise KeyError(seat)
+        self._flags[seat] = 0
+        self._roles[seat] = -1
+        self._voted_for[seat] = -1
+        self._count -= 1
+
+    def __iter__(self) -> Iterator[int]:
+        return self._seats(_IS_PRESENT)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def values(self) -> List[SeatView]:
+        return [SeatView(self, seat) for seat in self]
+
+    def items(self) -> List[tuple]:
+        return [(seat, SeatView(self, seat)) for seat in self]
+
+    def __repr__(self):
+        return f"SeatTable({dict(self.items())!r})"
+
+    # ---------- 批量操作 ----------
+
+    def _seats(self, table: bytes) -> Iterator[int]:
+        # 下标 0 的标志位恒为 0，不会被选中
+        return compress(range(len(self._flags)), self._flags.translate(table))
+
+    def alive_seats(self) -> List[int]:
+        """存活玩家座位号列表"""
+        return list(self._seats(_IS_ALIVE))
+
+    def dead_seats(self) -> List[int]:
+        """死亡玩家座位号列表"""
+        return list(self._seats(_IS_DEAD))
+
+    def alive_role_counts(self) -> Dict[Role, int]:
+        """按角色统计存活玩家数（未分配角色的玩家不计）"""
+        counts = Counter(compress(self._roles, self._flags.translate(_IS_ALIVE)))
+        return {_ROLES[code]: count for code, count in counts.items() if code >= 0}
+
+    def reset_players(self):
+        """所有在座玩家重置为未分配角色的存活玩家"""
+        for seat in self:
+            self._reset_seat(seat)
+
+    def clear_votes(self):
+        """清除所有玩家的投票状态"""
+        self._flags = self._flags.translate(_CLEAR_VOTED)
+        self._voted_for = array('h', [-1]) * len(self._flags)
@@ -0,0 +1,310 @@
+"""
+状态快照编码
+GameStateContext 的紧凑二进制格式（带格式版本），用于房间持久化、休眠和进程间交接。
+
+布局（小端）:
+    魔数 b'WSNP' | 格式版本 u8
+    字段区   u32 长度 + marshal(按 _FIELDS 顺序的字段值元组)
+    玩家区   u16 人数 + 每人 6 字节 (座位 u16, 角色 i8, 标志 u8, 投票目标 i16)
+    消息区   u32 条数 + u32 长度 + marshal([(id, 时间戳, 类型, 内容), ...])
+    动作流区 u32 条数 + u32 长度 + marshal(action_log)
+
+嵌套字段（extensions、角色上下文、动作流、消息内容等）用 marshal 编码：C 实现，
+保留整数键（如 vote_count、werewolf_choices）和元组，比 pickle / JSON 更快更小。
+消息区和动作流区可以延迟解码：只在第一次访问列表内容（len 除外）时才解析，
+只读取状态或休眠唤醒后很快再次休眠的房间不需要解码它们。
+
+房间快照（encode_room / decode_room）在上下文之外还包含模式、座位数和房间随机数生成器状态，
+恢复后的状态机与原状态机继续执行的结果逐位一致。
+"""
+import dataclasses
+import marshal
+import struct
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+from .base_state_machine import BaseStateMachine
+from .clock import Clock
+from .seat_table import SeatTable
+from .state_context import GameMessage, GameStateContext, Player
+from .state_enums import Role
+from .state_machine_pool import STATE_MACHINE_POOL
+
+# 快照格式版本（布局或字段变化时递增）
+SNAPSHOT_FORMAT_VERSION = 1
+
+_MAGIC = b'WSNP'
+_ROOM_MAGIC = b'WROM'
+
+# 编码进字段区的上下文字段（顺序即格式，只能在末尾追加并递增格式版本）
+_FIELDS = (
+    'room_id', 'mode', 'phase', 'result', 'round', 'version', 'seed', 'created_at',
+    'phase_start_time', 'phase_duration',
+    'speaking_time_limit', 'voting_time_limit', 'night_role_time_limit',
+    'witch_saved', 'witch_poisoned', 'werewolf_killed', 'seer_checked', 'last_dead_player',
+    'night_current_role', 'night_action_start_time', 'night_actions_completed', 'night_role_start_times',
+    'vote_count', 'speaking_order', 'current_speaker_index', 'speaking_start_time',
+    'voting_start_time', 'voting_voted_count', 'voting_result',
+    'werewolf_context', 'seer_context', 'witch_context', 'extensions',
+)
+# 单独编码或不序列化的字段
+_SPECIAL_FIELDS = ('players', 'messages', 'action_log', 'clock')
+
+# 角色编码（只能在末尾追加）
+_ROLE_CODES = ('werewolf', 'villager', 'seer', 'witch', 'hunter')
+_ROLE_BY_CODE = tuple(Role(value) for value in _ROLE_CODES)
+_CODE_BY_ROLE = {role: code for code, role in enumerate(_ROLE_BY_CODE)}
+
+_PLAYER = struct.Struct('<HbBh')
+_FLAG_ALIVE = 1
+_FLAG_HAS_VOTED = 2
+
+_HEADER = struct.Struct('<4sB')
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_SECTION_HEADER = struct.Struct('<II')
+
+
+def _check_schema():
+    """GameStateContext 新增字段时必须同步更新快照格式"""
+    names = {f.name for f in dataclasses.fields(GameStateContext)}
+    missing = names - set(_FIELDS) - set(_SPECIAL_FIELDS)
+    if missing:
+        raise RuntimeError(f"Snapshot format does not cover GameStateContext fields: {sorted(missing)}")
+
+
+_check_schema()
+
+
+class LazyList(list):
+    """
+    延迟解码的列表（消息、动作流）
+    第一次访问列表内容时才解码；len() 不触发解码
+    """
+
+    __slots__ = ('_raw', '_count', '_decode')
+
+    def __init__(self, raw: bytes, count: int, decode: Callable[[bytes], list]):
+        super().__init__()
+        self._raw = raw
+        self._count = count
+        self._decode = decode
+
+    @property
+    def decoded(self) -> bool:
+        return self._raw is None
+
+    def _load(self):
+        raw = self._raw
+        if raw is not None:
+            self._raw = None
+            list.extend(self, self._decode(raw))
+
+    def __len__(self):
+        if self._raw is not None:
+            return self._count
+        return list.__len__(self)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __reduce_ex__(self, protocol):
+        self._load()
+        return list, (list(self),)
+
+
+def _lazy_method(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._load()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in (
+    '__iter__', '__reversed__', '__getitem__', '__setitem__', '__delitem__', '__contains__',
+    '__eq__', '__ne__', '__lt__', '__le__', '__gt__', '__ge__', '__add__', '__iadd__', '__mul__', '__imul__',
+    '__repr__',
+    'append', 'extend', 'insert', 'pop', 'remove', 'clear', 'index', 'count', 'sort', 'reverse', 'copy',
+):
+    setattr(LazyList, _name, _lazy_method(_name))
+
+
+def _encode_messages(messages: List[GameMessage]) -> bytes:
+    return marshal.dumps([(m.id, m.timestamp, m.type, m.content) for m in messages])
+
+
+def _decode_messages(raw: bytes) -> List[GameMessage]:
+    return [GameMessage(id, timestamp, type_, content) for id, timestamp, type_, content in marshal.loads(raw)]
+
+
+def _encode_actions(action_log: list) -> bytes:
+    # marshal 不接受 list 子类（已解码的 LazyList）
+    return marshal.dumps(list(action_log))
+
+
+def _encode_section(items: list, encode: Callable[[list], bytes]) -> bytes:
+    if isinstance(items, LazyList) and not items.decoded:
+        # 未解码的区原样写回
+        return items._raw
+    return encode(items)
+
+
+def _decode_section(data, offset: int, decode: Callable[[bytes], list], lazy: bool) -> Tuple[list, int]:
+    count, size = _SECTION_HEADER.unpack_from(data, offset)
+    offset += _SECTION_HEADER.size
+    raw = bytes(data[offset:offset + size])
+    offset += size
+    return (LazyList(raw, count, decode) if lazy else decode(raw)), offset
+
+
+def encode_context(context: GameStateContext) -> bytes:
+    """
+    编码游戏状态上下文
+
+    参数:
+        context: 游戏状态上下文
+
+    返回:
+        快照字节
+
+    异常:
+        ValueError: 字段中有无法编码的值（marshal 只支持内置类型）
+    """
+    fields = marshal.dumps(tuple(getattr(context, name) for name in _FIELDS))
+
+    players = bytearray(_U16.pack(len(context.players)))
+    for player in context.players.values():
+        flags = (_FLAG_ALIVE if player.alive else 0) | (_FLAG_HAS_VOTED if player.has_voted else 0)
+        players += _PLAYER.pack(
+            player.seat,
+            _CODE_BY_ROLE[player.role] if player.role is not None else -1,
+            flags,
+            player.voted_for if player.voted_for is not None else -1
+        )
+
+    messages = _encode_section(context.messages, _encode_messages)
+    action_log = _encode_section(context.action_log, _encode_actions)
+
+    return b''.join((
+        _HEADER.pack(_MAGIC, SNAPSHOT_FORMAT_VERSION),
+        _U32.pack(len(fields)), fields,
+        players,
+        _SECTION_HEADER.pack(len(context.messages), len(messages)), messages,
+        _SECTION_HEADER.pack(len(context.action_log), len(action_log)), action_log,
+    ))
+
+
+def _decode_context(data, offset: int, lazy: bool) -> Tuple[GameStateContext, int]:
+    magic, version = _HEADER.unpack_from(data, offset)
+    if magic != _MAGIC:
+        raise ValueError('Not a game state snapshot')
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {version}")
+    offset += _HEADER.size
+
+    (fields_size,) = _U32.unpack_from(data, offset)
+    offset += _U32.size
+    values = marshal.loads(data[offset:offset + fields_size])
+    offset += fields_size
+    context = GameStateContext(**dict(zip(_FIELDS, values)))
+
+    (player_count,) = _U16.unpack_from(data, offset)
+    offset += _U16.size
+    players = context.players
+    for seat, role_code, flags, voted_for in _PLAYER.iter_unpack(data[offset:offset + player_count * _PLAYER.size]):
+        players[seat] = Player(
+            seat,
+            _ROLE_BY_CODE[role_code] if role_code >= 0 else None,
+            bool(flags & _FLAG_ALIVE),
+            bool(flags & _FLAG_HAS_VOTED),
+            voted_for if voted_for >= 0 else None
+        )
+    offset += player_count * _PLAYER.size
+
+    context.messages, offset = _decode_section(data, offset, _decode_messages, lazy)
+    context.action_log, offset = _decode_section(data, offset, marshal.loads, lazy)
+    return context, offset
+
+
+def decode_context(data: bytes, lazy: bool = True) -> GameStateContext:
+    """
+    解码游戏状态上下文
+
+    参数:
+        data: encode_context() 的结果
+        lazy: 是否延迟解码消息区和动作流区
+
+    异常:
+        ValueError: 不是快照或格式版本不支持
+    """
+    context, _ = _decode_context(memoryview(data), 0, lazy)
+    return context
+
+
+# ============== 房间快照 ==============
+
+_ROOM_HEADER = struct.Struct('<4sBH')
+_RNG_WORDS = 625
+
+
+def encode_room(state_machine: BaseStateMachine) -> bytes:
+    """
+    编码房间（状态机模式、座位数、房间随机数生成器状态和上下文）
+
+    参数:
+        state_machine: 状态机实例
+    """
+    rng_version, rng_internal, rng_gauss = state_machine.rng.getstate()
+    meta = marshal.dumps((state_machine.mode, getattr(state_machine, 'seat_count', len(state_machine.context.players)),
+                          rng_version, rng_gauss))
+    return b''.join((
+        _ROOM_HEADER.pack(_ROOM_MAGIC, SNAPSHOT_FORMAT_VERSION, len(meta)), meta,
+        array('I', rng_internal).tobytes(),
+        encode_context(state_machine.context),
+    ))
+
+
+def decode_room(data: bytes, clock: Optional[Clock] = None, lazy: bool = True) -> BaseStateMachine:
+    """
+    由房间快照恢复状态机
+
+    参数:
+        data: encode_room() 的结果
+        clock: 恢复后使用的时钟（默认为墙上时钟）
+        lazy: 是否延迟解码消息区和动作流区
+
+    异常:
+        ValueError: 不是房间快照或格式版本不支持
+    """
+    view = memoryview(data)
+    magic, version, meta_size = _ROOM_HEADER.unpack_from(view, 0)
+    if magic != _ROOM_MAGIC:
+        raise ValueError('Not a room snapshot')
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {version}")
+    offset = _ROOM_HEADER.size
+    mode, seat_count, rng_version, rng_gauss = marshal.loads(view[offset:offset + meta_size])
+    offset += meta_size
+    rng_internal = array('I')
+    rng_internal.frombytes(view[offset:offset + _RNG_WORDS * rng_internal.itemsize])
+    offset += _RNG_WORDS * rng_internal.itemsize
+
+    context, _ = _decode_context(view, offset, lazy)
+    state_machine = STATE_MACHINE_POOL.acquire(context.room_id, mode, seat_count, clock=clock, seed=context.seed)
+    if type(state_machine.context.players) is SeatTable:
+        # 保持状态机选择的玩家存储方式
+        players = SeatTable(seat_count)
+        for seat, player in context.players.items():
+            players[seat] = player
+        context.players = players
+    created_at = context.created_at
+    state_machine.context = context
+    context.clock = state_machine.clock
+    context.created_at = created_at
+    state_machine.rng.setstate((rng_version, tuple(rng_internal), rng_gauss))
+    return state_machine
+
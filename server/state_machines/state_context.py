@@ -2,9 +2,10 @@
 状态上下文
 定义游戏状态的通用数据容器，跨模式共享
 """
-from dataclasses import dataclass, field
+from dataclasses import MISSING, dataclass, field, fields
 from typing import Dict, List, Optional, Any
 
+from .seat_table import SeatTable
 from .state_enums import Role
 
 
@@ -17,6 +18,13 @@ class Player:
     has_voted: bool = False
     voted_for: Optional[int] = None
 
+    def reset(self):
+        """重置为未分配角色的存活玩家（新对局复用）"""
+        self.role = None
+        self.alive = True
+        self.has_voted = False
+        self.voted_for = None
+
 
 @dataclass
 class GameMessage:
@@ -39,7 +47,15 @@ class GameStateContext:
     result: str = 'ongoing'
     round: int = 0
 
-    # 玩家数据
+    # 状态版本号：每次状态变更递增，用于派生数据的缓存失效
+    version: int = 0
+
+    # 回放数据：房间随机种子、创建时间和改变状态的动作流
+    seed: int = 0
+    created_at: float = 0.0
+    action_log: List[Dict] = field(default_factory=list)
+
+    # 玩家数据（大房间可使用紧凑座位表 SeatTable，接口相同）
     players: Dict[int, Player] = field(default_factory=dict)
     messages: List[GameMessage] = field(default_factory=list)
 
@@ -47,6 +63,11 @@ class GameStateContext:
     phase_start_time: float = 0.0
     phase_duration: int = 0
 
+    # 回合限时（秒），不同模式可覆盖
+    speaking_time_limit: int = 60  # 每人发言时间
+    voting_time_limit: int = 20  # 投票时间
+    night_role_time_limit: int = 60  # 每个夜晚角色的行动时间
+
     # 夜间行动（经典模式）
     witch_saved: Optional[int] = None
     witch_poisoned: Optional[int] = None
@@ -60,6 +81,7 @@ class GameStateContext:
     night_current_role: Optional[str] = None  # 当前行动的角色：'seer', 'werewolf', 'witch'
     night_action_start_time: float = 0.0  # 当前角色行动开始时间
     night_actions_completed: List[str] = field(default_factory=list)  # 已完成行动的角色列表
+    night_role_start_times: Dict[str, float] = field(default_factory=dict)  # 每个角色的行动开始时间
 
     # 投票数据（经典模式）
     vote_count: Dict[int, int] = field(default_factory=dict)
@@ -82,15 +104,74 @@ class GameStateContext:
     # 扩展字段 - 用于特定模式的额外数据
     extensions: Dict[str, Any] = field(default_factory=dict)
 
+    # 运行时时钟（由状态机注入，不参与比较和序列化）
+    clock: Optional[Any] = field(default=None, repr=False, compare=False)
+
+    def reset(self, room_id: Optional[str] = None):
+        """
+        就地重置为新对局（再来一局、状态机池复用）
+        复用玩家对象和列表/字典容器，保留模式和时钟；状态版本号继续递增，派生数据的缓存不会误用旧对局的结果
+
+        参数:
+            room_id: 新的房间ID（默认不变）
+        """
+        for name, default, factory in _RESET_FIELDS:
+            if factory is None:
+                setattr(self, name, default)
+            else:
+                value = getattr(self, name)
+                if type(value) is list or type(value) is dict:
+                    value.clear()
+                else:
+                    setattr(self, name, factory())
+        if type(self.players) is SeatTable:
+            self.players.reset_players()
+        else:
+            for player in self.players.values():
+                player.reset()
+        if room_id is not None:
+            self.room_id = room_id
+        self.version += 1
+
+    def clear_votes(self):
+        """清除所有玩家的投票状态"""
+        if type(self.players) is SeatTable:
+            self.players.clear_votes()
+            return
+        for player in self.players.values():
+            player.has_voted = False
+            player.voted_for = None
+
     def get_alive_players(self) -> List[int]:
         """获取存活玩家座位号列表"""
+        if type(self.players) is SeatTable:
+            return self.players.alive_seats()
         return [p.seat for p in self.players.values() if p.alive]
 
     def get_dead_players(self) -> List[int]:
         """获取死亡玩家座位号列表"""
+        if type(self.players) is SeatTable:
+            return self.players.dead_seats()
         return [p.seat for p in self.players.values() if not p.alive]
 
+    def count_alive_roles(self) -> Dict[Role, int]:
+        """按角色统计存活玩家数（未分配角色的玩家不计）"""
+        if type(self.players) is SeatTable:
+            return self.players.alive_role_counts()
+        counts: Dict[Role, int] = {}
+        for p in self.players.values():
+            if p.alive and p.role is not None:
+                counts[p.role] = counts.get(p.role, 0) + 1
+        return counts
+
     def get_player_by_seat(self, seat: int) -> Optional[Player]:
         """根据座位号获取玩家"""
         return self.players.get(seat)
 
+
+# reset() 恢复默认值的字段：(字段名, 默认值, 默认值工厂)
+_RESET_FIELDS = tuple(
+    (f.name, f.default, f.default_factory if f.default_factory is not MISSING else None)
+    for f in fields(GameStateContext)
+    if f.name not in ('room_id', 'mode', 'version', 'players', 'clock')
+)
@@ -9,6 +9,7 @@ class GameMode(str, Enum):
     """游戏模式"""
     CLASSIC = 'classic'           # 经典狼人杀
     QUICK = 'quick'               # 快速模式
+    LARGE = 'large'               # 大房间（30–100 座）
     ADVANCED = 'advanced'         # 高级规则
 
 
@@ -2,17 +2,19 @@
 状态机工厂
 负责根据游戏模式创建对应的状态机实例
 """
-from typing import Dict, Type
+from typing import Dict, Optional, Type
 
 from .base_state_machine import BaseStateMachine
+from .clock import Clock
 from .classic_werewolf_state_machine import ClassicWerewolfStateMachine
+from .large_room_state_machine import LargeRoomStateMachine
+from .quick_mode_state_machine import QuickModeStateMachine
 from .state_enums import GameMode
 
-# 注册的状态机类型
+# 注册的状态机类型（其他模式通过 register_state_machine 注册）
 _STATE_MACHINE_REGISTRY: Dict[str, Type[BaseStateMachine]] = {
     GameMode.CLASSIC.value: ClassicWerewolfStateMachine,
     # 可以在这里注册其他游戏模式的状态机
-    # GameMode.QUICK.value: QuickModeStateMachine,
     # GameMode.ADVANCED.value: AdvancedWerewolfStateMachine,
 }
 
@@ -20,7 +22,9 @@ _STATE_MACHINE_REGISTRY: Dict[str, Type[BaseStateMachine]] = {
 def create_state_machine(
     room_id: str,
     mode: str = GameMode.CLASSIC.value,
-    seat_count: int = 12
+    seat_count: int = 12,
+    clock: Optional[Clock] = None,
+    seed: Optional[int] = None
 ) -> BaseStateMachine:
     """
     创建状态机实例
@@ -29,6 +33,8 @@ def create_state_machine(
         room_id: 房间ID
         mode: 游戏模式（默认为经典模式）
         seat_count: 座位数（默认为12人局）
+        clock: 时钟（默认为墙上时钟，模拟/测试可传入虚拟时钟）
+        seed: 房间随机种子（默认随机生成，回放时传入记录的种子）
 
     返回:
         状态机实例
@@ -43,9 +49,9 @@ def create_state_machine(
 
     # 根据不同的状态机类型，可能需要不同的初始化参数
     if mode == GameMode.CLASSIC.value:
-        return state_machine_class(room_id, seat_count)
+        return state_machine_class(room_id, seat_count, clock=clock, seed=seed)
     else:
-        return state_machine_class(room_id, seat_count)
+        return state_machine_class(room_id, seat_count, clock=clock, seed=seed)
 
 
 def register_state_machine(mode: str, state_machine_class: Type[BaseStateMachine]):
@@ -64,3 +70,6 @@ def get_supported_modes() -> list:
     """获取所有支持的游戏模式"""
     return list(_STATE_MACHINE_REGISTRY.keys())
 
+
+register_state_machine(GameMode.QUICK.value, QuickModeStateMachine)
+register_state_machine(GameMode.LARGE.value, LargeRoomStateMachine)
@@ -0,0 +1,120 @@
+"""
+状态机池
+按 (模式, 座位数) 预先构造状态机，创建房间时取出一台就地重置（reset），
+不再重复注册阶段转换和处理器、创建玩家对象；取走后由后台线程补足。
+不再使用的状态机（房间删除、迁出）可以归还复用。
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .base_state_machine import BaseStateMachine
+from .clock import Clock, WALL_CLOCK
+from .state_machine_factory import create_state_machine
+
+# 未配置预热数量的 (模式, 座位数) 最多保留的归还状态机数
+DEFAULT_MAX_IDLE = 16
+
+
+class StateMachinePool:
+    """按 (模式, 座位数) 分组的状态机池"""
+
+    def __init__(self):
+        # (模式, 座位数) → 预热数量
+        self._targets: Dict[Tuple[str, int], int] = {}
+        # (模式, 座位数) → 空闲的状态机
+        self._idle: Dict[Tuple[str, int], List[BaseStateMachine]] = {}
+        self._lock = threading.Lock()
+        self._refill_wanted = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, mode: str, seat_count: int, size: int):
+        """
+        设置某个 (模式, 座位数) 的预热数量
+
+        参数:
+            mode: 游戏模式
+            seat_count: 座位数
+            size: 保持空闲的状态机数量（0 表示不预热）
+        """
+        with self._lock:
+            if size > 0:
+                self._targets[(mode, seat_count)] = size
+            else:
+                self._targets.pop((mode, seat_count), None)
+        self._refill_wanted.set()
+
+    def fill(self) -> int:
+        """把各组空闲状态机补足到预热数量，返回新构造的数量"""
+        built = 0
+        for key, target in list(self._targets.items()):
+            while len(self._idle.get(key, ())) < target:
+                # 构造在锁外进行，不阻塞 acquire
+                state_machine = create_state_machine('', key[0], key[1])
+                with self._lock:
+                    self._idle.setdefault(key, []).append(state_machine)
+                built += 1
+        return built
+
+    def acquire(self, room_id: str, mode: str = 'classic', seat_count: int = 12,
+                clock: Optional[Clock] = None, seed: Optional[int] = None) -> BaseStateMachine:
+        """
+        取出一台状态机（没有空闲的时直接构造），参数与 create_state_machine 相同
+
+        重置后的状态机与新构造的逐位一致（同一种子下回放结果相同）
+        """
+        key = (mode, seat_count)
+        with self._lock:
+            idle = self._idle.get(key)
+            state_machine = idle.pop() if idle else None
+        if state_machine is None:
+            self.misses += 1
+            return create_state_machine(room_id, mode, seat_count, clock=clock, seed=seed)
+
+        self.hits += 1
+        if key in self._targets:
+            self._refill_wanted.set()
+        state_machine.reset(room_id=room_id, seed=seed, clock=clock or WALL_CLOCK)
+        return state_machine
+
+    def release(self, state_machine: BaseStateMachine) -> bool:
+        """
+        归还不再使用的状态机（调用方和仍在处理的请求都不能再持有它，不能确定时应直接丢弃）
+
+        返回:
+            是否放回池中（超过保留数量时丢弃）
+        """
+        key = (state_machine.mode, getattr(state_machine, 'seat_count', len(state_machine.context.players)))
+        # 先清空对局数据，空闲期间不占用消息和动作流的内存；
+        # 持有房间锁重置，不与仍在进行的操作交错
+        with state_machine._lock:
+            state_machine.context.reset()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= max(self._targets.get(key, 0), DEFAULT_MAX_IDLE):
+                return False
+            idle.append(state_machine)
+            return True
+
+    def stats(self) -> Dict:
+        """各组空闲数量和命中统计"""
+        with self._lock:
+            idle = {f'{mode}:{seats}': len(machines) for (mode, seats), machines in self._idle.items()}
+        return {'idle': idle, 'hits': self.hits, 'misses': self.misses}
+
+    def _run(self):
+        while True:
+            self._refill_wanted.wait()
+            self._refill_wanted.clear()
+            self.fill()
+
+    def start(self):
+        """预热并启动后台补足线程"""
+        self.fill()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='state-machine-pool', daemon=True)
+            self._thread.start()
+
+
+STATE_MACHINE_POOL = StateMachinePool()
@@ -6,7 +6,7 @@ import json
 
 import requests
 
-BASE_URL = "http://localhost:5000/api"
+BASE_URL = "http://localhost:5010/api"
 ROOM_ID = "test_room_001"
 
 def print_response(title, response):
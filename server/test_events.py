@@ -0,0 +1,231 @@
+"""
+引擎事件总线测试
+队列满时的各策略、操作中产生的事件在释放房间锁之后发布，以及订阅者出错不影响状态修改
+"""
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from state_machines import (
+    ActionHandled,
+    EventBus,
+    MessageAdded,
+    PhaseChanged,
+    VirtualClock,
+    create_state_machine,
+)
+from state_machines.events import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST, OVERFLOW_DROP_OLDEST
+
+
+def make_event(version: int, room_id: str = 'room') -> MessageAdded:
+    return MessageAdded(room_id=room_id, mode='classic', version=version, timestamp=0.0,
+                        message_id=str(version), message_type='speech', content={})
+
+
+def machine_in_voting(bus: EventBus, room_id: str = 'events'):
+    sm = create_state_machine(room_id, 'classic', 12, clock=VirtualClock(), seed=1)
+    sm.event_bus = bus
+    sm.assign_roles()
+    sm.start_round()
+    while sm.context.phase == 'day_discussion':
+        sm.advance_speaker()
+    assert sm.context.phase == 'day_voting'
+    return sm
+
+
+def lock_is_free(sm) -> bool:
+    """从其他线程尝试取得房间锁（同一线程可重入，无法据此判断）"""
+    result = []
+
+    def probe():
+        acquired = sm._lock._lock.acquire(blocking=False)
+        if acquired:
+            sm._lock._lock.release()
+        result.append(acquired)
+
+    thread = threading.Thread(target=probe)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+# ============== 队列满时的策略 ==============
+
+def test_drop_oldest_keeps_latest_events():
+    bus = EventBus()
+    subscription = bus.subscribe('push', maxsize=3, overflow=OVERFLOW_DROP_OLDEST)
+    for version in range(5):
+        bus.publish(make_event(version))
+
+    assert [event.version for event in subscription.drain()] == [2, 3, 4]
+    assert subscription.dropped == 2
+
+
+def test_drop_newest_keeps_queued_prefix():
+    bus = EventBus()
+    subscription = bus.subscribe('storage', maxsize=3, overflow=OVERFLOW_DROP_NEWEST)
+    delivered = [bus.publish(make_event(version)) for version in range(5)]
+
+    assert delivered == [1, 1, 1, 0, 0]
+    assert [event.version for event in subscription.drain()] == [0, 1, 2]
+    assert subscription.dropped == 2
+
+
+def test_block_waits_for_consumer_then_times_out():
+    bus = EventBus()
+    subscription = bus.subscribe('metrics', maxsize=1, overflow=OVERFLOW_BLOCK, block_timeout=5)
+    bus.publish(make_event(0))
+
+    # 订阅者读取后发布方继续
+    reader = threading.Timer(0.05, subscription.get)
+    reader.start()
+    started = time.monotonic()
+    assert bus.publish(make_event(1)) == 1
+    assert time.monotonic() - started < 5
+    reader.join()
+    assert [event.version for event in subscription.drain()] == [1]
+
+    # 订阅者跟不上时最多等待 block_timeout，然后丢弃新事件
+    subscription.block_timeout = 0.05
+    bus.publish(make_event(2))
+    started = time.monotonic()
+    assert bus.publish(make_event(3)) == 0
+    assert time.monotonic() - started >= 0.05
+    assert subscription.dropped == 1
+    assert [event.version for event in subscription.drain()] == [2]
+
+
+def test_closing_wakes_blocked_publisher():
+    bus = EventBus()
+    subscription = bus.subscribe('agents', maxsize=1, overflow=OVERFLOW_BLOCK, block_timeout=5)
+    bus.publish(make_event(0))
+
+    closer = threading.Timer(0.05, subscription.close)
+    closer.start()
+    started = time.monotonic()
+    assert bus.publish(make_event(1)) == 0
+    assert time.monotonic() - started < 5
+    closer.join()
+    assert not bus.wants('room')
+
+
+def test_filters_by_room_and_event_type():
+    bus = EventBus()
+    room = bus.subscribe('room', room_id='r1')
+    phases = bus.subscribe('phases', event_types=[PhaseChanged])
+
+    bus.publish(make_event(1, room_id='r1'))
+    bus.publish(make_event(2, room_id='r2'))
+
+    assert [event.version for event in room.drain()] == [1]
+    assert phases.drain() == []
+    assert bus.wants('r1') and bus.wants('r2')
+    phases.close()
+    assert bus.wants('r1') and not bus.wants('r2')
+
+
+def test_invalid_subscription_arguments():
+    bus = EventBus()
+    with pytest.raises(ValueError):
+        bus.subscribe(maxsize=0)
+    with pytest.raises(ValueError):
+        bus.subscribe(overflow='drop_everything')
+
+
+# ============== 状态机发布 ==============
+
+def test_operation_events_are_published_after_lock_release():
+    bus = EventBus()
+    sm = machine_in_voting(bus)
+    subscription = bus.subscribe('push', room_id=sm.room_id, maxsize=10000)
+    offered = []
+    offer = subscription.offer
+
+    def recording_offer(event):
+        offered.append((event, lock_is_free(sm), sm._op_time))
+        return offer(event)
+
+    subscription.offer = recording_offer
+
+    alive = sm.context.get_alive_players()
+    for seat in alive:
+        sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': alive[0]})
+
+    events = subscription.drain()
+    assert any(isinstance(event, PhaseChanged) for event in events)
+    assert len([event for event in events if isinstance(event, ActionHandled)]) == len(alive)
+    # 所有事件都在操作结束、房间锁释放之后发布
+    assert all(free and op_time is None for _, free, op_time in offered)
+    # 同一操作的事件按发生顺序发布（计票的消息和阶段转换在该票的动作事件之前）
+    assert [event for event, _, _ in offered] == events
+    assert isinstance(events[-1], ActionHandled)
+
+
+def test_nested_lock_holders_publish_after_outermost_release():
+    bus = EventBus()
+    sm = create_state_machine('events_timeout', 'classic', 12, clock=VirtualClock(), seed=2)
+    sm.event_bus = bus
+    sm.assign_roles()
+    subscription = bus.subscribe('push', room_id=sm.room_id)
+
+    with sm._lock:
+        sm.start_round()
+        # 外层仍持有房间锁时不发布
+        assert subscription.pending() == 0
+    assert subscription.pending() > 0
+
+
+def test_blocked_subscriber_does_not_hold_the_room_lock():
+    bus = EventBus()
+    sm = machine_in_voting(bus, 'events_blocked')
+    subscription = bus.subscribe('slow', room_id=sm.room_id, maxsize=1, overflow=OVERFLOW_BLOCK,
+                                 block_timeout=5)
+    alive = sm.context.get_alive_players()
+    # 先填满队列，下一个操作发布时阻塞
+    sm.handle_player_action('vote', {'voterSeat': alive[0], 'targetSeat': alive[1]})
+    assert subscription.pending() == 1
+
+    voter = threading.Thread(target=sm.handle_player_action,
+                             args=('vote', {'voterSeat': alive[1], 'targetSeat': alive[2]}))
+    voter.start()
+    time.sleep(0.05)
+    assert voter.is_alive()
+
+    # 阻塞的发布方不持有房间锁：其他请求可以读取状态和提交动作
+    assert lock_is_free(sm)
+    assert sm.get_state_for_frontend()['phase'] == 'day_voting'
+    assert sm.context.players[alive[1]].has_voted
+
+    subscription.close()
+    voter.join()
+    assert not voter.is_alive()
+
+
+def test_subscriber_error_does_not_break_mutation(caplog):
+    bus = EventBus()
+    sm = machine_in_voting(bus, 'events_error')
+    broken = bus.subscribe('broken', room_id=sm.room_id)
+    healthy = bus.subscribe('healthy', room_id=sm.room_id)
+
+    def fail(event):
+        raise RuntimeError('subscriber failed')
+
+    broken.offer = fail
+    alive = sm.context.get_alive_players()
+    version = sm.context.version
+
+    success, _, _ = sm.handle_player_action('vote', {'voterSeat': alive[0], 'targetSeat': alive[1]})
+
+    assert success
+    assert sm.context.players[alive[0]].voted_for == alive[1]
+    assert sm.context.version > version
+    assert [type(event) for event in healthy.drain()] == [ActionHandled]
+    assert bus.errors == 1
+    assert bus.stats()['errors'] == 1
+    assert 'broken' in caplog.text
@@ -0,0 +1,151 @@
+"""
+大模型响应缓存测试
+内存命中写回磁盘访问时间、磁盘层的 TTL 过期和按最近访问时间淘汰
+"""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import llm_cache
+from llm_cache import LLMResponseCache, make_cache_key
+
+
+class FakeTime:
+    """可控的 time.time（缓存的时间戳来自 time.time）"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(llm_cache, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'cache' / 'llm.sqlite3')
+
+
+def accessed_at(path: str, key: str):
+    with sqlite3.connect(path) as db:
+        row = db.execute('SELECT accessed_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+    return row[0] if row else None
+
+
+def disk_keys(path: str):
+    with sqlite3.connect(path) as db:
+        return {key for key, in db.execute('SELECT key FROM llm_cache')}
+
+
+def test_cache_key_normalizes_prompt():
+    messages = [{'role': 'user', 'content': '你好  \r\n世界\n'}]
+    same = [{'role': 'user', 'content': '你好\n世界'}]
+    assert make_cache_key('m', messages, temperature=0) == make_cache_key('m', same, temperature=0)
+    assert make_cache_key('m', messages, temperature=0) != make_cache_key('m', messages, temperature=1)
+
+
+def test_memory_hits_update_disk_access_time(clock, db_path):
+    cache = LLMResponseCache(db_path, memory_entries=10)
+    cache.EVICT_INTERVAL = 3
+    for key in ('hot', 'a', 'b'):
+        cache.set(key, key)
+    written_at = clock.now
+
+    clock.now += 10
+    assert cache.get('hot') == 'hot'
+    assert cache.get('a') == 'a'
+    # 内存命中先记在内存里，攒满一批才写回
+    assert accessed_at(db_path, 'hot') == written_at
+
+    assert cache.get('b') == 'b'
+    assert all(accessed_at(db_path, key) == written_at + 10 for key in ('hot', 'a', 'b'))
+    assert cache.stats()['hits'] == 3
+
+
+def test_pending_access_times_are_flushed_before_eviction(clock, db_path):
+    cache = LLMResponseCache(db_path, memory_entries=2, max_entries=3)
+    cache.EVICT_INTERVAL = 4
+    cache.set('hot', 'v')
+    for index in range(3):
+        clock.now += 1
+        # 第 4 次写入时检查淘汰
+        cache.set(f'cold{index}', 'x')
+        # 最先写入的键一直在内存中命中
+        assert cache.get('hot') == 'v'
+
+    # 淘汰前先写回内存命中的访问时间：最常用的键保留，淘汰最久未访问的 cold0
+    assert disk_keys(db_path) == {'hot', 'cold1', 'cold2'}
+    assert LLMResponseCache(db_path).get('hot') == 'v'
+
+
+def test_disk_hit_refreshes_access_time(clock, db_path):
+    LLMResponseCache(db_path).set('k', 'v')
+    clock.now += 5
+
+    # 新实例内存为空，从磁盘命中并写回访问时间
+    cache = LLMResponseCache(db_path)
+    assert cache.get('k') == 'v'
+    assert accessed_at(db_path, 'k') == clock.now
+    assert cache.stats() == {'hits': 1, 'misses': 0, 'memoryEntries': 1, 'diskEntries': 1}
+
+
+def test_ttl_expires_memory_and_disk_entries(clock, db_path):
+    cache = LLMResponseCache(db_path, ttl_seconds=60)
+    cache.set('k', 'v')
+
+    clock.now += 59
+    assert cache.get('k') == 'v'
+
+    clock.now += 2
+    assert cache.get('k') is None
+    # 过期条目从两级中删除
+    assert disk_keys(db_path) == set()
+    assert cache.stats()['memoryEntries'] == 0
+    assert cache.stats()['misses'] == 1
+
+
+def test_eviction_drops_expired_then_least_recently_used(clock, db_path):
+    cache = LLMResponseCache(db_path, memory_entries=1, max_entries=2, ttl_seconds=100)
+    cache.EVICT_INTERVAL = 1
+    cache.set('old', 'x')
+    clock.now += 50
+    cache.set('a', 'x')
+    clock.now += 1
+    cache.set('b', 'x')
+    # 超过上限，按访问时间淘汰最旧的 old
+    assert disk_keys(db_path) == {'a', 'b'}
+
+    clock.now += 1
+    assert cache.get('a') == 'x'  # 磁盘命中，a 成为最近访问
+    clock.now += 1
+    cache.set('c', 'x')
+    assert disk_keys(db_path) == {'a', 'c'}
+
+    # TTL 到期的条目在淘汰时一并删除
+    clock.now += 101
+    cache.set('d', 'x')
+    assert disk_keys(db_path) == {'d'}
+
+
+def test_clear_and_memory_only_cache(clock):
+    cache = LLMResponseCache(memory_entries=2)
+    cache.set('a', '1')
+    cache.set('b', '2')
+    cache.set('c', '3')
+    # 内存 LRU 超出上限丢弃最旧的
+    assert cache.get('a') is None
+    assert cache.get('c') == '3'
+    cache.clear()
+    assert cache.get('c') is None
+    assert cache.stats()['diskEntries'] == 0
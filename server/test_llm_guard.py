@@ -0,0 +1,204 @@
+"""
+大模型调用保护测试
+熔断器的关闭 → 打开 → 半开 → 关闭，截止时间内的重试和超时降级，以及按房间计时计算的决策截止时间
+"""
+import os
+import sys
+import time
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agent_decision
+from llm_guard import MIN_ATTEMPT_SECONDS, CircuitBreaker, LLMUnavailableError, call_with_deadline
+from state_machines import VirtualClock, create_state_machine
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
+
+
+def make_breaker(clock, **kwargs):
+    options = dict(window_size=4, min_calls=3, failure_rate_threshold=0.5, cooldown_seconds=30, clock=clock)
+    options.update(kwargs)
+    return CircuitBreaker(**options)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+# ============== 熔断器 ==============
+
+def test_breaker_opens_when_failure_rate_exceeds_threshold(clock):
+    breaker = make_breaker(clock)
+    breaker.record_failure()
+    breaker.record_success()
+    # 调用数不足 min_calls 时不计算失败率
+    assert breaker.state == CircuitBreaker.CLOSED
+    for _ in range(3):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # 窗口（最近 4 次）中失败达到一半
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_breaker_half_open_probe_success_closes(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+
+    clock.advance(29)
+    assert not breaker.allow_request()
+    clock.advance(2)
+    # 冷却结束只放行一次试探请求
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    # 关闭后窗口重新统计（只有试探成功的一次），调用数不足时失败不会再次打开
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_breaker_half_open_probe_failure_reopens(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+    clock.advance(31)
+    assert breaker.allow_request()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    # 冷却重新计时
+    clock.advance(29)
+    assert not breaker.allow_request()
+    clock.advance(2)
+    assert breaker.allow_request()
+
+
+# ============== 截止时间和重试 ==============
+
+def test_retries_with_backoff_within_deadline(clock):
+    breaker = make_breaker(clock, min_calls=10)
+    start = clock.now()
+    timeouts = []
+
+    def flaky(timeout):
+        timeouts.append(timeout)
+        if len(timeouts) < 3:
+            raise ConnectionError('reset')
+        return 'ok'
+
+    assert call_with_deadline(flaky, start + 10, max_retries=2, breaker=breaker,
+                              backoff_seconds=0.2, clock=clock) == 'ok'
+    # 指数退避 0.2 + 0.4 秒，每次调用的超时是剩余时间
+    assert clock.now() - start == pytest.approx(0.6)
+    assert timeouts == pytest.approx([10, 9.8, 9.4])
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_timeout_falls_back_after_retries(clock):
+    start = clock.now()
+    calls = []
+
+    def slow(timeout):
+        calls.append(timeout)
+        clock.advance(1)
+        raise TimeoutError('read timeout')
+
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        call_with_deadline(slow, start + 10, max_retries=1, backoff_seconds=0.2, clock=clock)
+    assert excinfo.value.reason == 'timeout'
+    assert isinstance(excinfo.value.__cause__, TimeoutError)
+    assert len(calls) == 2
+
+
+def test_slow_call_stops_retrying_at_deadline(clock):
+    deadline = clock.now() + 5
+    calls = []
+
+    def hangs_until_deadline(timeout):
+        calls.append(timeout)
+        clock.advance(timeout)
+        raise TimeoutError('timed out')
+
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        call_with_deadline(hangs_until_deadline, deadline, max_retries=3, clock=clock)
+    assert excinfo.value.reason == 'timeout'
+    # 超时用满了剩余时间，不再重试，也不退避越过截止时间
+    assert calls == [5]
+    assert clock.now() == deadline
+
+
+def test_insufficient_deadline_skips_call(clock):
+    def never(timeout):
+        raise AssertionError('should not be called')
+
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        call_with_deadline(never, clock.now() + MIN_ATTEMPT_SECONDS / 2, clock=clock)
+    assert excinfo.value.reason == 'deadline'
+
+
+def test_open_breaker_skips_call(clock):
+    breaker = make_breaker(clock)
+    trip(breaker)
+
+    def never(timeout):
+        raise AssertionError('should not be called')
+
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        call_with_deadline(never, clock.now() + 10, breaker=breaker, clock=clock)
+    assert excinfo.value.reason == 'circuit_open'
+
+
+# ============== 按房间计时的决策截止时间 ==============
+
+@pytest.fixture
+def settings(monkeypatch):
+    values = {'LLM_TIMEOUT_SECONDS': 15.0, 'DECISION_DEADLINE_MARGIN_SECONDS': 3.0}
+    monkeypatch.setattr(agent_decision.config, 'get_setting', lambda name, default=None: values.get(name, default))
+    return values
+
+
+def voting_context(clock):
+    sm = create_state_machine('guard', 'classic', 12, clock=clock, seed=1)
+    sm.assign_roles()
+    sm.start_round()
+    while sm.context.phase == 'day_discussion':
+        sm.advance_speaker()
+    return sm.context
+
+
+def test_decision_deadline_follows_room_timer(clock, settings):
+    context = voting_context(clock)
+    # 投票 20 秒，已过去 5 秒，预留 3 秒：还剩 12 秒（少于 15 秒的请求超时）
+    clock.advance(5)
+    before = time.time()
+    deadline = agent_decision.get_decision_deadline(context, 'vote')
+    assert before + 12 - 0.5 <= deadline <= time.time() + 12
+
+    # 房间计时快结束时截止时间不足，直接降级为规则决策
+    clock.advance(context.voting_time_limit)
+    deadline = agent_decision.get_decision_deadline(context, 'vote')
+    assert deadline < time.time()
+    with pytest.raises(LLMUnavailableError) as excinfo:
+        call_with_deadline(lambda timeout: 'unused', deadline)
+    assert excinfo.value.reason == 'deadline'
+
+
+def test_decision_deadline_without_timer_uses_request_timeout(clock, settings):
+    context = voting_context(clock)
+    before = time.time()
+    deadline = agent_decision.get_decision_deadline(context, 'speech_unknown')
+    assert before + 15 <= deadline <= time.time() + 15
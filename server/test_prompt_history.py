@@ -0,0 +1,193 @@
+"""
+提示词历史测试
+长对局中历史文本始终在预算以内、已结束轮次的摘要增量计算，以及房间重置后从头重建
+"""
+import os
+import sys
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import prompt_history
+from prompt_history import RoomHistory, estimate_tokens
+from state_machines import GameStateContext
+from state_machines.state_context import GameMessage
+
+
+def add_message(context: GameStateContext, msg_type: str, **content):
+    content.setdefault('round', context.round)
+    index = len(context.messages)
+    context.messages.append(GameMessage(id=str(index), timestamp=float(index), type=msg_type, content=content))
+
+
+def play_round(context: GameStateContext, speeches: int = 12):
+    """追加一整轮的消息：讨论发言、投票出局、夜晚死亡"""
+    context.round += 1
+    round_num = context.round
+    add_message(context, 'phase_change', phase='day_discussion')
+    for seat in range(1, speeches + 1):
+        add_message(context, 'speech', message=f'{seat}号发言：我是好人，第{round_num}轮请大家相信我')
+    add_message(context, 'phase_change', phase='day_voting')
+    add_message(context, 'player_death', seat=round_num % 12 + 1, role='villager', killed_by='vote')
+    add_message(context, 'phase_change', phase='night_action')
+    add_message(context, 'player_death', seat=(round_num + 5) % 12 + 1, role='seer', killed_by='werewolf')
+
+
+@pytest.fixture
+def context():
+    return GameStateContext(room_id='history', mode='classic')
+
+
+@pytest.fixture
+def summarize_calls(monkeypatch):
+    calls = []
+    summarize = RoomHistory._summarize_round
+
+    def counting(self, round_num, events):
+        calls.append(round_num)
+        return summarize(self, round_num, events)
+
+    monkeypatch.setattr(RoomHistory, '_summarize_round', counting)
+    return calls
+
+
+# ============== 预算和最近事件窗口 ==============
+
+def test_history_stays_bounded_over_long_game(context):
+    history = RoomHistory(token_budget=300, recent_window=8)
+    sizes = []
+    for _ in range(60):
+        play_round(context)
+        text = history.render(context)
+        lines = text.split('\n')
+        sizes.append(estimate_tokens(text))
+
+        assert sum(estimate_tokens(line) + 1 for line in lines) <= history.token_budget
+        # 当前轮次最多保留 recent_window 条事件，且保留的是最新的
+        current = [line for line in lines if line.startswith(f'[第{context.round}轮]')]
+        assert len(current) == history.recent_window
+        assert lines[-1].endswith('夜里被狼人杀害（预言家）')
+
+    # 消息总量线性增长，历史文本长度不随之增长
+    assert max(sizes) <= history.token_budget
+    assert estimate_tokens('\n'.join(format_all(context))) > 20 * history.token_budget
+
+
+def format_all(context: GameStateContext):
+    return [line for line in map(prompt_history.format_message, context.messages) if line]
+
+
+def test_truncation_drops_earliest_summaries_first(context):
+    history = RoomHistory(token_budget=150, recent_window=4)
+    for _ in range(20):
+        play_round(context, speeches=0)
+    lines = history.render(context).split('\n')
+
+    summaries = [line for line in lines if '轮摘要' in line]
+    rounds = [int(line[1:line.index('轮')]) for line in summaries]
+    # 保留的是最近的连续若干轮摘要，最早的被丢弃
+    assert rounds and rounds == list(range(rounds[0], context.round))
+    assert rounds[0] > 1
+    assert lines[len(summaries):] == format_all(context)[-4:]
+
+
+# ============== 增量摘要 ==============
+
+def test_round_summaries_computed_once(context, summarize_calls):
+    history = RoomHistory()
+    play_round(context, speeches=0)
+    history.render(context)
+    # 第 1 轮仍在进行，不生成摘要
+    assert summarize_calls == [] and history.get_round_summary(1) is None
+
+    play_round(context, speeches=0)
+    history.render(context)
+    summary = history.get_round_summary(1)
+    assert summary == '第1轮摘要：2号被投票出局（村民）；7号夜里被狼人杀害（预言家）'
+
+    for _ in range(5):
+        play_round(context, speeches=0)
+        history.render(context)
+        history.render(context)
+    # 每个已结束轮次只压缩一次，之后的渲染复用缓存
+    assert summarize_calls == [1, 2, 3, 4, 5, 6]
+    assert history.get_round_summary(1) is summary
+
+
+def test_late_message_invalidates_round_summary(context, summarize_calls):
+    history = RoomHistory()
+    for _ in range(3):
+        play_round(context, speeches=0)
+    history.render(context)
+    assert history.get_round_summary(1).endswith('（预言家）')
+
+    add_message(context, 'player_death', round=1, seat=9, role='hunter', killed_by='witch')
+    text = history.render(context)
+
+    assert history.get_round_summary(1).endswith('；9号夜里被毒杀（猎人）')
+    assert history.get_round_summary(1) in text
+    assert summarize_calls == [1, 2, 1]
+
+
+# ============== 重置后重建 ==============
+
+def test_rebuilds_after_context_reset(context):
+    history = RoomHistory(token_budget=400, recent_window=10)
+    for _ in range(3):
+        play_round(context)
+    old = history.render(context)
+    assert history.get_round_summary(2) is not None
+
+    # 就地重置：消息列表对象不变
+    messages = context.messages
+    context.reset()
+    assert context.messages is messages and context.round == 0
+    assert history.render(context) == ''
+    assert history.get_round_summary(1) is None
+
+    for _ in range(2):
+        play_round(context, speeches=3)
+    assert history.render(context) == RoomHistory(token_budget=400, recent_window=10).render(context)
+    assert history.render(context) != old
+
+
+def test_rebuilds_when_new_game_outgrows_old_cursor(context):
+    history = RoomHistory(token_budget=400, recent_window=10)
+    play_round(context, speeches=3)
+    history.render(context)
+
+    # 重置后未渲染，新对局的消息数已超过旧游标
+    context.reset()
+    for _ in range(4):
+        play_round(context, speeches=6)
+    fresh = RoomHistory(token_budget=400, recent_window=10)
+    assert history.render(context) == fresh.render(context)
+    # 旧对局第 1 轮的事件不会混入，新对局的前几条消息也不会被跳过
+    for round_num in (1, 2, 3):
+        assert history.get_round_summary(round_num) == fresh.get_round_summary(round_num)
+    assert history.get_round_summary(1).startswith('第1轮摘要：1号发言')
+    assert history.get_round_summary(1).count('发言') == 6
+
+
+def test_rebuilds_when_message_list_replaced(context):
+    history = RoomHistory()
+    for _ in range(3):
+        play_round(context)
+    history.render(context)
+
+    # 快照恢复等场景会整体替换消息列表
+    context.messages = list(context.messages[:len(context.messages) // 2])
+    context.round = 2
+    assert history.render(context) == RoomHistory().render(context)
+
+
+def test_room_history_registry():
+    history = prompt_history.get_room_history('registry_room', token_budget=100)
+    assert prompt_history.get_room_history('registry_room') is history
+    assert history.token_budget == 100
+
+    prompt_history.clear_room_history('registry_room')
+    assert prompt_history.get_room_history('registry_room') is not history
+    prompt_history.clear_room_history('registry_room')
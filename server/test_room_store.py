@@ -0,0 +1,211 @@
+"""
+房间存储测试
+各后端的比较并交换语义，以及 RoomRegistry 的进程内缓存、冲突处理和休眠恢复
+"""
+import json
+import os
+import sys
+import time
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from room_store import (
+    HibernatedRecord,
+    MemoryRoomStore,
+    RoomRegistry,
+    VersionConflict,
+    configure_hibernation,
+    create_store,
+)
+
+NAMESPACE = 'test'
+
+
+def encode(obj) -> bytes:
+    return json.dumps(obj, sort_keys=True).encode('utf-8')
+
+
+def decode(data: bytes):
+    return json.loads(data)
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'shm'])
+def store(request, tmp_path):
+    backend = request.param
+    path = {'memory': None, 'sqlite': str(tmp_path / 'rooms.sqlite3'), 'shm': str(tmp_path / 'shm')}[backend]
+    store = create_store(backend, path)
+    yield store
+    store.close()
+
+
+def stored_value(store, value):
+    """后端中保存的值（序列化后端保存字节）"""
+    return encode(value) if store.serializes else value
+
+
+# ============== 比较并交换 ==============
+
+def test_save_creates_record_and_increments_version(store):
+    assert store.version(NAMESPACE, 'r1') is None
+    assert store.load(NAMESPACE, 'r1') is None
+
+    assert store.save(NAMESPACE, 'r1', stored_value(store, {'n': 1}), None) == 1
+    assert store.save(NAMESPACE, 'r1', stored_value(store, {'n': 2}), 1) == 2
+    assert store.version(NAMESPACE, 'r1') == 2
+
+    value, version = store.load(NAMESPACE, 'r1')
+    assert version == 2
+    assert value == stored_value(store, {'n': 2})
+
+
+def test_save_with_stale_version_raises(store):
+    store.save(NAMESPACE, 'r1', stored_value(store, {'n': 1}), None)
+    store.save(NAMESPACE, 'r1', stored_value(store, {'n': 2}), 1)
+
+    with pytest.raises(VersionConflict):
+        store.save(NAMESPACE, 'r1', stored_value(store, {'n': 3}), 1)
+    # 记录已存在时不能按“不存在”创建
+    with pytest.raises(VersionConflict):
+        store.save(NAMESPACE, 'r1', stored_value(store, {'n': 3}), None)
+    # 记录不存在时不能按旧版本更新
+    with pytest.raises(VersionConflict):
+        store.save(NAMESPACE, 'missing', stored_value(store, {'n': 1}), 1)
+
+    value, version = store.load(NAMESPACE, 'r1')
+    assert (value, version) == (stored_value(store, {'n': 2}), 2)
+
+
+def test_overwrite_ignores_version(store):
+    assert store.overwrite(NAMESPACE, 'r1', stored_value(store, {'n': 1})) == 1
+    assert store.overwrite(NAMESPACE, 'r1', stored_value(store, {'n': 2})) == 2
+    assert store.load(NAMESPACE, 'r1') == (stored_value(store, {'n': 2}), 2)
+
+
+def test_delete_and_room_ids(store):
+    store.save(NAMESPACE, 'r1', stored_value(store, 1), None)
+    store.save(NAMESPACE, 'room/2', stored_value(store, 2), None)
+    store.save('other', 'r3', stored_value(store, 3), None)
+
+    assert sorted(store.room_ids(NAMESPACE)) == ['r1', 'room/2']
+    assert store.delete(NAMESPACE, 'r1')
+    assert not store.delete(NAMESPACE, 'r1')
+    assert store.version(NAMESPACE, 'r1') is None
+    assert store.room_ids(NAMESPACE) == ['room/2']
+
+
+def test_memory_swap_keeps_version_and_checks_identity():
+    store = MemoryRoomStore()
+    original = {'n': 1}
+    store.save(NAMESPACE, 'r1', original, None)
+
+    assert not store.swap(NAMESPACE, 'r1', {'n': 1}, {'n': 2})
+    replacement = {'n': 2}
+    assert store.swap(NAMESPACE, 'r1', original, replacement)
+    value, version = store.load(NAMESPACE, 'r1')
+    assert value is replacement
+    assert version == 1
+    assert not store.swap(NAMESPACE, 'missing', original, replacement)
+
+
+# ============== RoomRegistry ==============
+
+def test_registry_round_trip_and_cache(store):
+    registry = RoomRegistry(NAMESPACE, encode, decode, store=store)
+    room = {'phase': 'waiting'}
+    assert registry.put('r1', room) == 1
+    assert registry.get('r1') is room
+    assert registry.peek('r1') is room
+
+    if store.serializes:
+        # 编码结果没有变化时不写入
+        assert registry.put('r1', room) == 1
+    room['phase'] = 'day_voting'
+    assert registry.put('r1', room) == 2
+    assert registry.get('nope') is None
+
+
+def test_registry_conflict_between_processes(store):
+    # 两个注册表模拟两个进程（各自的进程内缓存，共用一个存储）
+    first = RoomRegistry(NAMESPACE, encode, decode, store=store)
+    second = RoomRegistry(NAMESPACE, encode, decode, store=store)
+
+    first.put('r1', {'n': 1})
+    seen = second.get('r1')
+    assert seen == {'n': 1}
+
+    first.put('r1', {'n': 2})
+    with pytest.raises(VersionConflict):
+        second.put('r1', {'n': 3})
+    # 冲突后丢弃本进程缓存，重新读取得到其他进程的写入
+    assert second.peek('r1') is None
+    assert second.get('r1') == {'n': 2}
+    assert second.put('r1', {'n': 3}) == 3
+    assert first.get('r1') == {'n': 3}
+
+    # force 不比较版本号
+    assert first.put('r1', {'n': 4}, force=True) == 4
+
+
+def test_registry_remove_and_evict(store):
+    registry = RoomRegistry(NAMESPACE, encode, decode, store=store)
+    registry.put('r1', {'n': 1})
+    assert registry.evict('r1')
+    assert registry.peek('r1') is None
+    assert registry.get('r1') == {'n': 1}
+
+    assert registry.remove('r1')
+    assert registry.get('r1') is None
+    assert store.version(NAMESPACE, 'r1') is None
+
+
+@pytest.mark.parametrize('use_dir', [False, True])
+def test_memory_registry_hibernate_and_rehydrate(tmp_path, use_dir):
+    store = MemoryRoomStore()
+    registry = RoomRegistry(NAMESPACE, encode, decode, store=store)
+    configure_hibernation(str(tmp_path / 'hibernate') if use_dir else None)
+    try:
+        room = {'phase': 'night_action', 'round': 3}
+        registry.put('r1', room)
+
+        assert registry.hibernate('r1')
+        assert registry.hibernated_ids() == ['r1']
+        assert registry.cached_ids() == []
+        record, version = store.load(NAMESPACE, 'r1')
+        assert isinstance(record, HibernatedRecord)
+        assert version == 1
+        if use_dir:
+            assert os.listdir(tmp_path / 'hibernate')
+
+        restored = registry.get('r1')
+        assert restored == room and restored is not room
+        # 恢复不改变版本号，休眠文件已删除
+        assert store.load(NAMESPACE, 'r1') == (restored, 1)
+        assert registry.hibernated_ids() == []
+        if use_dir:
+            assert os.listdir(tmp_path / 'hibernate') == []
+    finally:
+        configure_hibernation(None)
+
+
+def test_serialized_registry_hibernate_drops_cache(store):
+    registry = RoomRegistry(NAMESPACE, encode, decode, store=store)
+    registry.put('r1', {'n': 1})
+    version = store.version(NAMESPACE, 'r1')
+
+    assert registry.hibernate('r1')
+    assert registry.peek('r1') is None
+    assert registry.get('r1') == {'n': 1}
+    assert store.version(NAMESPACE, 'r1') == version
+
+
+def test_hibernate_skips_recently_used_rooms():
+    registry = RoomRegistry(NAMESPACE, encode, decode, store=MemoryRoomStore())
+    registry.put('r1', {'n': 1})
+    idle_since = time.monotonic() - 60
+
+    assert not registry.hibernate('r1', idle_since=idle_since)
+    assert registry.peek('r1') == {'n': 1}
+    assert not registry.hibernate('missing')
@@ -0,0 +1,131 @@
+"""
+紧凑座位表测试
+SeatView 与 Player 属性一致、读写直接落在数组上，以及批量扫描、清票和重置
+"""
+import os
+import sys
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from state_machines import (
+    ClassicWerewolfStateMachine,
+    GameStateContext,
+    Player,
+    Role,
+    SeatTable,
+    SeatView,
+    VirtualClock,
+)
+
+
+def make_table(seat_count: int = 6) -> SeatTable:
+    table = SeatTable(seat_count)
+    for seat in range(1, seat_count + 1):
+        table[seat] = Player(seat=seat)
+    return table
+
+
+def test_view_reads_and_writes_through_to_arrays():
+    table = make_table()
+    player = table[3]
+    assert isinstance(player, SeatView)
+    assert player == Player(seat=3)
+
+    player.role = Role.WEREWOLF
+    player.alive = False
+    player.has_voted = True
+    player.voted_for = 5
+
+    # 新取出的视图读到同样的值，数组中的编码也已更新
+    again = table[3]
+    assert (again.role, again.alive, again.has_voted, again.voted_for) == (Role.WEREWOLF, False, True, 5)
+    assert table._voted_for[3] == 5
+    assert table._roles[3] == list(Role).index(Role.WEREWOLF)
+    # 其他座位不受影响
+    assert table[2] == Player(seat=2)
+    assert table[4] == Player(seat=4)
+
+    player.role = None
+    player.voted_for = None
+    player.alive = True
+    assert table[3] == Player(seat=3, has_voted=True)
+
+
+def test_setitem_copies_player_attributes():
+    table = SeatTable(2)
+    table[1] = Player(seat=1, role=Role.SEER, alive=False, has_voted=True, voted_for=2)
+    # 超出预分配的座位号自动扩展
+    table[5] = Player(seat=5, role=Role.WITCH)
+
+    assert table[1] == Player(seat=1, role=Role.SEER, alive=False, has_voted=True, voted_for=2)
+    assert table[5] == Player(seat=5, role=Role.WITCH)
+    assert list(table) == [1, 5]
+    assert len(table) == 2
+    assert 2 not in table and 5 in table
+    with pytest.raises(KeyError):
+        table[2]
+    assert table.get(2) is None
+
+    del table[1]
+    assert list(table) == [5] and len(table) == 1
+
+
+def test_clear_votes_resets_flags_and_targets():
+    table = make_table()
+    for seat in (1, 2, 4):
+        table[seat].has_voted = True
+        table[seat].voted_for = 6
+    table[2].alive = False
+    view = table[1]
+
+    table.clear_votes()
+
+    assert all(not p.has_voted and p.voted_for is None for p in table.values())
+    # 已取出的视图读到清除后的数组，其他标志位保留
+    assert not view.has_voted and view.voted_for is None
+    assert not table[2].alive and table[1].alive
+
+
+def test_bulk_scans_match_player_dict():
+    roles = [Role.WEREWOLF, Role.WEREWOLF, Role.SEER, Role.VILLAGER, Role.VILLAGER, Role.WITCH]
+    compact = GameStateContext(room_id='compact', mode='classic', players=make_table())
+    plain = GameStateContext(room_id='plain', mode='classic',
+                             players={seat: Player(seat=seat) for seat in range(1, 7)})
+    for context in (compact, plain):
+        for seat, role in enumerate(roles, 1):
+            context.players[seat].role = role
+        context.players[1].alive = False
+        context.players[4].alive = False
+
+    assert compact.get_alive_players() == plain.get_alive_players() == [2, 3, 5, 6]
+    assert compact.get_dead_players() == plain.get_dead_players() == [1, 4]
+    assert compact.count_alive_roles() == plain.count_alive_roles()
+
+
+def test_reset_players_keeps_seats():
+    table = make_table(4)
+    table[1].role = Role.HUNTER
+    table[1].alive = False
+    table[2].voted_for = 1
+
+    table.reset_players()
+
+    assert list(table) == [1, 2, 3, 4]
+    assert all(table[seat] == Player(seat=seat) for seat in table)
+
+
+def test_compact_seats_option(monkeypatch):
+    # 默认关闭，房间总是使用字典
+    assert ClassicWerewolfStateMachine.COMPACT_SEATS_FROM is None
+    sm = ClassicWerewolfStateMachine('dict_room', 40, clock=VirtualClock())
+    assert type(sm.context.players) is dict
+
+    monkeypatch.setattr(ClassicWerewolfStateMachine, 'COMPACT_SEATS_FROM', 30)
+    small = ClassicWerewolfStateMachine('small_room', 12, clock=VirtualClock())
+    large = ClassicWerewolfStateMachine('compact_room', 40, clock=VirtualClock())
+    assert type(small.context.players) is dict
+    assert type(large.context.players) is SeatTable
+    assert sorted(large.context.players) == list(range(1, 41))
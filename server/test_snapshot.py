@@ -0,0 +1,179 @@
+"""
+状态快照测试
+encode_room / decode_room 在各模式、两种玩家存储下的往返一致性，以及消息区和动作流区的延迟解码
+"""
+import os
+import random
+import sys
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from state_machines import (
+    ClassicWerewolfStateMachine,
+    SeatTable,
+    VirtualClock,
+    create_state_machine,
+    decode_context,
+    decode_room,
+    encode_context,
+    encode_room,
+    state_fingerprint,
+    verify_replay,
+)
+from state_machines.snapshot import LazyList
+
+# 测试中 30 座及以上的房间使用紧凑座位表
+COMPACT_SEATS_FROM = 30
+
+# (模式, 座位数, 玩家存储)
+ROOMS = [
+    ('classic', 12, dict),
+    ('classic', 40, SeatTable),
+    ('quick', 12, dict),
+    ('quick', 30, SeatTable),
+    ('large', 12, dict),
+    ('large', 60, SeatTable),
+]
+
+
+@pytest.fixture(autouse=True)
+def compact_seats(monkeypatch):
+    """开启紧凑座位表（默认关闭）"""
+    monkeypatch.setattr(ClassicWerewolfStateMachine, 'COMPACT_SEATS_FROM', COMPACT_SEATS_FROM)
+
+
+def step(sm, rng: random.Random) -> bool:
+    """按规则推进一步（确定性），游戏结束时返回 False"""
+    ctx = sm.context
+    alive = ctx.get_alive_players()
+    if ctx.result != 'ongoing':
+        return False
+    if ctx.phase == 'day_discussion':
+        for seat in sm.current_speakers():
+            sm.handle_player_action('speech', {'seat': seat, 'text': f'{seat}号发言'})
+        sm.advance_speaker()
+    elif ctx.phase == 'day_voting':
+        voter = next((seat for seat in alive if not ctx.players[seat].has_voted), None)
+        if voter is None:
+            return False
+        sm.handle_player_action('vote', {'voterSeat': voter, 'targetSeat': rng.choice(alive)})
+    elif ctx.phase == 'night_action':
+        sm.clock.advance(ctx.night_role_time_limit + 1)
+        if not sm.check_timeouts():
+            return False
+    else:
+        sm.start_round()
+    return True
+
+
+def new_room(mode: str, seat_count: int, seed: int = 1):
+    sm = create_state_machine(f'snap_{mode}_{seat_count}', mode, seat_count, clock=VirtualClock(), seed=seed)
+    sm.assign_roles()
+    sm.start_round()
+    return sm
+
+
+def play(sm, steps: int, rng: random.Random):
+    for _ in range(steps):
+        if not step(sm, rng):
+            break
+
+
+def rng_state(sm):
+    return sm.rng.getstate()
+
+
+@pytest.mark.parametrize('mode,seat_count,store', ROOMS)
+def test_room_round_trip(mode, seat_count, store):
+    sm = new_room(mode, seat_count)
+    play(sm, 40, random.Random(2))
+    assert type(sm.context.players) is store
+
+    data = encode_room(sm)
+    restored = decode_room(data, clock=VirtualClock(sm.clock.now()), lazy=False)
+
+    assert type(restored) is type(sm)
+    assert restored.mode == mode
+    assert type(restored.context.players) is store
+    assert state_fingerprint(restored.context) == state_fingerprint(sm.context)
+    assert rng_state(restored) == rng_state(sm)
+    assert restored.context.version == sm.context.version
+    assert restored.context.extensions == sm.context.extensions
+    assert list(restored.context.action_log) == list(sm.context.action_log)
+    assert restored.get_state_for_frontend() == sm.get_state_for_frontend()
+    assert verify_replay(restored.export_replay())[0]
+
+
+@pytest.mark.parametrize('mode,seat_count,store', ROOMS)
+def test_restored_room_continues_identically(mode, seat_count, store):
+    sm = new_room(mode, seat_count, seed=5)
+    play(sm, 25, random.Random(3))
+
+    restored = decode_room(encode_room(sm), clock=VirtualClock(sm.clock.now()))
+    play(sm, 200, random.Random(4))
+    play(restored, 200, random.Random(4))
+
+    assert state_fingerprint(restored.context) == state_fingerprint(sm.context)
+    assert rng_state(restored) == rng_state(sm)
+
+
+@pytest.mark.parametrize('mode,seat_count,store', ROOMS)
+def test_lazy_sections_stay_encoded_until_accessed(mode, seat_count, store):
+    sm = new_room(mode, seat_count)
+    play(sm, 30, random.Random(6))
+    data = encode_room(sm)
+
+    restored = decode_room(data, clock=VirtualClock(sm.clock.now()))
+    messages = restored.context.messages
+    action_log = restored.context.action_log
+    assert isinstance(messages, LazyList) and isinstance(action_log, LazyList)
+
+    # 长度和状态渲染不触发解码
+    assert len(messages) == len(sm.context.messages)
+    assert len(action_log) == len(sm.context.action_log)
+    restored.get_state_for_frontend()
+    assert not messages.decoded and not action_log.decoded
+
+    # 未解码的区原样写回（字段区由 marshal 重新编码，不要求字节一致）
+    rewritten = decode_room(encode_room(restored)).context
+    assert rewritten.messages._raw == messages._raw
+    assert rewritten.action_log._raw == action_log._raw
+
+    # 访问内容时才解码，内容与原局一致
+    assert [m.id for m in messages] == [m.id for m in sm.context.messages]
+    assert messages.decoded and not action_log.decoded
+    assert state_fingerprint(restored.context) == state_fingerprint(sm.context)
+
+
+def test_lazy_sections_decode_on_append():
+    sm = new_room('classic', 12)
+    play(sm, 10, random.Random(7))
+
+    restored = decode_room(encode_room(sm), clock=VirtualClock(sm.clock.now()))
+    play(restored, 5, random.Random(8))
+    assert restored.context.action_log.decoded
+
+    reencoded = decode_room(encode_room(restored), clock=VirtualClock(restored.clock.now()), lazy=False)
+    assert list(reencoded.context.action_log) == list(restored.context.action_log)
+    assert state_fingerprint(reencoded.context) == state_fingerprint(restored.context)
+
+
+def test_context_round_trip_and_rejects_other_data():
+    sm = new_room('classic', 12)
+    play(sm, 20, random.Random(9))
+
+    data = encode_context(sm.context)
+    context = decode_context(data)
+    rewritten = decode_context(encode_context(context))
+    assert not context.messages.decoded and not context.action_log.decoded
+    assert rewritten.messages._raw == context.messages._raw
+    assert rewritten.action_log._raw == context.action_log._raw
+    assert state_fingerprint(context) == state_fingerprint(sm.context)
+
+    with pytest.raises(ValueError):
+        decode_room(data)
+    with pytest.raises(ValueError):
+        decode_context(encode_room(sm))
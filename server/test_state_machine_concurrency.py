@@ -0,0 +1,106 @@
+"""
+状态机并发测试
+多个请求线程同时操作一个房间时，每个动作都要记录到动作流，回放结果与原局一致
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from state_machines import EVENT_BUS, ActionHandled, MessageAdded, create_state_machine, verify_replay
+
+TRIALS = 20
+SEAT_COUNT = 100
+
+
+@pytest.fixture(autouse=True)
+def frequent_thread_switches():
+    """缩短线程切换间隔，让竞争更容易出现"""
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def machine_in_voting(room_id: str, seed: int):
+    """大房间推进到投票阶段"""
+    sm = create_state_machine(room_id, 'large', SEAT_COUNT, seed=seed)
+    sm.assign_roles()
+    sm.start_round()
+    while sm.context.phase == 'day_discussion':
+        sm.advance_speaker()
+    assert sm.context.phase == 'day_voting'
+    return sm
+
+
+def run_concurrently(targets):
+    """所有线程在同一时刻开始执行"""
+    barrier = threading.Barrier(len(targets))
+
+    def run(target):
+        barrier.wait()
+        target()
+
+    threads = [threading.Thread(target=run, args=(target,)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@pytest.mark.parametrize('trial', range(TRIALS))
+def test_concurrent_votes_are_logged_and_replayable(trial):
+    sm = machine_in_voting(f'concurrency_{trial}', seed=trial)
+    alive = sm.context.get_alive_players()
+    logged_before = len(sm.context.action_log)
+
+    run_concurrently([
+        lambda seat=seat, index=index: sm.handle_player_action(
+            'vote', {'voterSeat': seat, 'targetSeat': alive[(index + 1) % len(alive)]})
+        for index, seat in enumerate(alive)
+    ])
+
+    assert len(sm.context.action_log) - logged_before == len(alive)
+    assert sm.context.phase != 'day_voting'
+    matched, _ = verify_replay(sm.export_replay())
+    assert matched
+
+
+def test_concurrent_reads_during_actions_are_replayable():
+    sm = machine_in_voting('concurrency_reads', seed=7)
+    alive = sm.context.get_alive_players()
+
+    votes = [
+        lambda seat=seat: sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': alive[0]})
+        for seat in alive
+    ]
+    reads = [sm.get_state_for_frontend for _ in range(50)] + [sm.check_timeouts for _ in range(50)]
+    run_concurrently(votes + reads)
+
+    matched, _ = verify_replay(sm.export_replay())
+    assert matched
+
+
+def test_concurrent_actions_publish_events_per_operation():
+    sm = machine_in_voting('concurrency_events', seed=11)
+    alive = sm.context.get_alive_players()
+    messages_before = len(sm.context.messages)
+
+    with EVENT_BUS.subscribe('test', room_id=sm.room_id, maxsize=10000) as subscription:
+        run_concurrently([
+            lambda seat=seat: sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': alive[0]})
+            for seat in alive
+        ])
+        events = subscription.drain()
+
+    actions = [event for event in events if isinstance(event, ActionHandled)]
+    assert sorted(event.payload['voterSeat'] for event in actions) == sorted(alive)
+    assert len([event for event in events if isinstance(event, MessageAdded)]) == \
+        len(sm.context.messages) - messages_before
+    # 同一操作的事件连续发布，版本号不回退
+    versions = [event.version for event in events]
+    assert versions == sorted(versions)
@@ -0,0 +1,81 @@
+"""
+状态机池测试
+取出的状态机与新构造的一致，归还时不与仍在进行的操作交错，可能仍被使用的状态机不归还
+"""
+import os
+import sys
+import threading
+
+import pytest
+
+# 添加 server 目录到 Python 路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import game_engine
+from state_machines import StateMachinePool, VirtualClock, create_state_machine, state_fingerprint
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = StateMachinePool()
+    monkeypatch.setattr(game_engine, 'STATE_MACHINE_POOL', pool)
+    return pool
+
+
+def test_acquired_machine_matches_fresh_one(pool):
+    used = pool.acquire('used', 'classic', 12, clock=VirtualClock(), seed=1)
+    used.assign_roles()
+    used.start_round()
+    assert pool.release(used)
+
+    reused = pool.acquire('room', 'classic', 12, clock=VirtualClock(), seed=7)
+    assert reused is used and pool.hits == 1
+    fresh = create_state_machine('room', 'classic', 12, clock=VirtualClock(), seed=7)
+    for sm in (reused, fresh):
+        sm.assign_roles()
+        sm.start_round()
+    assert state_fingerprint(reused.context) == state_fingerprint(fresh.context)
+
+
+def test_release_waits_for_running_operation(pool):
+    sm = create_state_machine('busy', 'classic', 12, clock=VirtualClock(), seed=3)
+    sm.assign_roles()
+    entered = threading.Event()
+    finish = threading.Event()
+    seen = {}
+
+    def operation():
+        # 模拟持有房间锁的请求
+        with sm._lock:
+            entered.set()
+            finish.wait(5)
+            seen['phase'] = sm.context.phase
+
+    worker = threading.Thread(target=operation)
+    worker.start()
+    entered.wait(5)
+    releaser = threading.Thread(target=pool.release, args=(sm,))
+    releaser.start()
+    releaser.join(0.1)
+    # 操作结束前不重置
+    assert releaser.is_alive()
+    finish.set()
+    worker.join()
+    releaser.join()
+
+    assert seen['phase'] == 'role_assigned'
+    assert sm.context.phase == 'waiting'
+
+
+@pytest.mark.parametrize('recycle', [True, False])
+def test_remove_game_recycles_only_when_allowed(pool, recycle):
+    room_id = f'pool_remove_{recycle}'
+    engine = game_engine.get_or_create_game(room_id, 'classic', 12)
+    state_machine = engine.state_machine
+    state_machine.assign_roles()
+
+    assert game_engine.remove_game(room_id, recycle=recycle)
+    assert game_engine.get_game(room_id) is None
+    assert pool.stats()['idle'].get('classic:12', 0) == (1 if recycle else 0)
+    # 丢弃的状态机保持原状，仍在处理的请求不受影响
+    assert state_machine.context.phase == ('waiting' if recycle else 'role_assigned')
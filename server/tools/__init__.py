@@ -0,0 +1,3 @@
+"""
+开发与压测工具
+"""
@@ -0,0 +1,569 @@
+"""
+引擎热点微基准
+
+覆盖状态轮询（各阶段的 get_state_for_frontend）、完整一轮投票（_handle_vote，含有事件订阅者时）、
+100 座房间（经典模式与大房间模式）的状态渲染和投票、
+完整一晚（_handle_night_action）、长历史的消息增量查询、不同座位数的 assign_roles、Agent 提示词构建
+和各房间存储后端的读写。
+结果保存为基准 JSON，compare 子命令用 Mann-Whitney U 检验判断是否有统计显著的变慢。
+
+所有对局都使用虚拟时钟和固定种子，结果只和代码有关。
+
+用法:
+    python -m tools.bench run --save benchmarks/baseline.json
+    python -m tools.bench run --filter state_ --rounds 30
+    python -m tools.bench run --filter store_               # 比较房间存储后端
+    python -m tools.bench run --filter _100_                # 100 座房间：经典模式与大房间模式
+    python -m tools.bench compare benchmarks/baseline.json              # 现在跑一遍并与基准比较
+    python -m tools.bench compare benchmarks/baseline.json current.json
+    python -m tools.bench memory --seats 12,30,100          # 单房间内存和每 GB 房间数
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from state_machines import ClassicWerewolfStateMachine, VirtualClock, create_state_machine
+
+# 每轮计时的目标时长（秒），内层迭代次数据此自动校准
+TARGET_ROUND_SECONDS = 0.02
+
+# 默认轮数（每个基准得到这么多个样本）
+DEFAULT_ROUNDS = 15
+
+# 回归判定：显著性水平和最小变慢比例
+DEFAULT_ALPHA = 0.01
+DEFAULT_THRESHOLD = 0.05
+
+NIGHT_ACTION_TYPES = {'werewolf': 'kill', 'seer': 'check', 'witch': 'save'}
+
+
+class Benchmark:
+    """
+    一个基准
+
+    没有 setup 时对 run() 成批计时；有 setup 时每次迭代先执行 setup()（不计时），
+    再单独对 run(state) 计时，用于会消耗状态的操作（如一轮完整投票）。
+    """
+
+    def __init__(self, name: str, run: Callable, setup: Optional[Callable] = None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+    def measure(self, iterations: int) -> float:
+        """执行 iterations 次，返回总耗时（秒）"""
+        if self.setup is None:
+            run = self.run
+            started = time.perf_counter()
+            for _ in range(iterations):
+                run()
+            return time.perf_counter() - started
+
+        total = 0.0
+        for _ in range(iterations):
+            state = self.setup()
+            started = time.perf_counter()
+            self.run(state)
+            total += time.perf_counter() - started
+        return total
+
+    def calibrate(self) -> int:
+        """估算每轮的迭代次数，使一轮大约耗时 TARGET_ROUND_SECONDS"""
+        iterations = 1
+        while True:
+            elapsed = self.measure(iterations)
+            if elapsed >= TARGET_ROUND_SECONDS / 10 or iterations >= 1_000_000:
+                return max(1, int(iterations * TARGET_ROUND_SECONDS / max(elapsed, 1e-9)))
+            iterations *= 10
+
+
+# ============== 对局准备 ==============
+
+def new_machine(seat_count: int = 12, seed: int = 0, mode: str = 'classic') -> ClassicWerewolfStateMachine:
+    """创建一个使用虚拟时钟和固定种子的状态机"""
+    return create_state_machine(f'bench_{seat_count}', mode, seat_count, clock=VirtualClock(), seed=seed)
+
+
+def machine_in_phase(phase: str, seat_count: int = 12, seed: int = 0,
+                     mode: str = 'classic') -> ClassicWerewolfStateMachine:
+    """
+    把一局游戏推进到第一次进入指定阶段
+
+    参数:
+        phase: 'day_discussion' / 'day_voting' / 'night_action'
+        seat_count: 座位数
+        seed: 房间随机种子
+        mode: 游戏模式
+    """
+    sm = new_machine(seat_count, seed, mode)
+    sm.assign_roles()
+    sm.start_round()
+    while sm.context.phase != phase:
+        if sm.context.phase == 'day_discussion':
+            sm.advance_speaker()
+        elif sm.context.phase == 'day_voting':
+            vote_all(sm)
+        else:
+            raise RuntimeError(f"Cannot reach phase {phase} from {sm.context.phase}")
+    return sm
+
+
+def vote_all(sm: ClassicWerewolfStateMachine):
+    """所有存活玩家投票给下一个存活座位（确定性）"""
+    alive = sm.context.get_alive_players()
+    for index, seat in enumerate(alive):
+        if sm.context.phase != 'day_voting':
+            break
+        sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': alive[(index + 1) % len(alive)]})
+
+
+def machine_half_voted(seat_count: int, mode: str = 'classic') -> ClassicWerewolfStateMachine:
+    """进入投票阶段且一半存活玩家已投票的状态机"""
+    sm = machine_in_phase('day_voting', seat_count, mode=mode)
+    alive = sm.context.get_alive_players()
+    for index, seat in enumerate(alive[:len(alive) // 2]):
+        sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': alive[(index * 7 + 1) % len(alive)]})
+    return sm
+
+
+def play_night(sm: ClassicWerewolfStateMachine):
+    """夜晚各角色依次通过 _handle_night_action 行动，直到天亮"""
+    ctx = sm.context
+    while ctx.phase == 'night_action':
+        role = ctx.night_current_role
+        actors = [s for s in ctx.get_alive_players() if ctx.players[s].role.value == role]
+        targets = [s for s in ctx.get_alive_players() if ctx.players[s].role.value != 'werewolf']
+        if not actors:
+            ctx.clock.advance_to(sm.next_deadline())
+            sm.check_timeouts()
+            continue
+        for seat in actors:
+            sm.handle_player_action('night_action', {
+                'playerSeat': seat,
+                'role': role,
+                'actionType': NIGHT_ACTION_TYPES[role],
+                'targetSeat': targets[0] if targets else None,
+            })
+
+
+def machine_with_history(message_count: int) -> ClassicWerewolfStateMachine:
+    """构造一局消息数不少于 message_count 的游戏（在发言阶段补充发言消息）"""
+    sm = machine_in_phase('day_discussion')
+    while len(sm.context.messages) < message_count:
+        sm._add_message('speech', {'seat': 1, 'text': '我是好人，请相信我', 'round': sm.context.round})
+    return sm
+
+
+# ============== 基准定义 ==============
+
+def build_benchmarks() -> List[Benchmark]:
+    """构建所有基准"""
+    benchmarks = []
+
+    # 状态轮询（每个客户端每秒一次，最热的路径）
+    for phase in ('day_discussion', 'day_voting', 'night_action'):
+        sm = machine_in_phase(phase)
+        benchmarks.append(Benchmark(f'state_{phase}', sm.get_state_for_frontend))
+
+    # 完整一轮投票（12 票，最后一票触发计票和转入夜晚）
+    benchmarks.append(Benchmark('vote_full_round', vote_all, lambda: machine_in_phase('day_voting')))
+
+    # 100 座房间：经典模式（逐人发言、全量投票状态）与大房间模式（发言窗口、票数排行、增量计票）
+    for mode in ('classic', 'large'):
+        sm = machine_in_phase('day_discussion', 100, mode=mode)
+        benchmarks.append(Benchmark(f'state_day_discussion_100_{mode}', sm.get_state_for_frontend))
+        sm = machine_half_voted(100, mode)
+        benchmarks.append(Benchmark(f'state_day_voting_100_{mode}', sm.get_state_for_frontend))
+        benchmarks.append(Benchmark(f'vote_full_round_100_{mode}', vote_all,
+                                    lambda mode=mode: machine_in_phase('day_voting', 100, mode=mode)))
+
+    # 有事件订阅者时的完整一轮投票（与 vote_full_round 的差值即事件总线的开销）
+    from state_machines import EVENT_BUS
+    subscription = EVENT_BUS.subscribe('bench', room_id='bench_events')
+
+    def voting_with_subscriber():
+        # 订阅者跟得上：每次计时前清空队列，只计入发布和入队
+        subscription.drain()
+        sm = machine_in_phase('day_voting')
+        sm.room_id = 'bench_events'
+        return sm
+    benchmarks.append(Benchmark('vote_full_round_subscribed', vote_all, voting_with_subscriber))
+
+    # 完整一晚（狼人、女巫、预言家依次行动，天亮结算）
+    benchmarks.append(Benchmark('night_full', play_night, lambda: machine_in_phase('night_action')))
+
+    # 长历史的消息查询
+    from game_engine import GameEngine
+    engine = GameEngine('bench_messages')
+    engine.state_machine = machine_with_history(2000)
+    messages = engine.state_machine.context.messages
+    benchmarks.append(Benchmark('messages_full_2000', engine.get_messages))
+    tail_id = messages[-5].id
+    benchmarks.append(Benchmark('messages_after_2000', lambda: engine.get_messages(after=tail_id)))
+
+    # 不同座位数的角色分配
+    for seat_count in (6, 12, 20):
+        benchmarks.append(Benchmark(
+            f'assign_roles_{seat_count}',
+            lambda sm: sm.assign_roles(),
+            lambda seat_count=seat_count: new_machine(seat_count)
+        ))
+
+    # 创建房间：直接构造状态机 / 从状态机池取出并重置
+    from state_machines import StateMachinePool
+    pool = StateMachinePool()
+    pool.configure('classic', 12, 1)
+    benchmarks.append(Benchmark('room_create', lambda: ClassicWerewolfStateMachine('bench_room', 12)))
+
+    def create_pooled():
+        pool.release(pool.acquire('bench_room'))
+
+    benchmarks.append(Benchmark('room_create_pooled', create_pooled))
+
+    # Agent 提示词构建（冷缓存：每次都是新的状态版本；热缓存：同一版本）
+    from prompt_context import RoomPromptContext
+    sm = machine_in_phase('day_voting')
+    ctx = sm.context
+    prompt_context = RoomPromptContext(sm.room_id)
+
+    def build_cold():
+        ctx.version += 1
+        prompt_context.build(ctx, 3, '', '【任务】投票')
+
+    benchmarks.append(Benchmark('prompt_build_cold', build_cold))
+    benchmarks.append(Benchmark('prompt_build_warm', lambda: prompt_context.build(ctx, 3, '', '【任务】投票')))
+
+    # 状态快照编解码（长历史房间；延迟解码不解析消息区和动作流区）
+    from state_machines import decode_context, decode_room, encode_context, encode_room
+    sm = machine_with_history(200)
+    snapshot = encode_context(sm.context)
+    room_snapshot = encode_room(sm)
+    benchmarks.append(Benchmark('snapshot_encode', lambda: encode_context(sm.context)))
+    benchmarks.append(Benchmark('snapshot_decode_lazy', lambda: decode_context(snapshot)))
+    benchmarks.append(Benchmark('snapshot_decode_full', lambda: decode_context(snapshot, lazy=False)))
+    benchmarks.append(Benchmark('snapshot_room_decode', lambda: decode_room(room_snapshot)))
+
+    # 房间存储后端：写回（编码 + 比较并交换）、缓存命中的读取（版本校验）、冷加载（解码重建）
+    benchmarks.extend(build_store_benchmarks())
+
+    return benchmarks
+
+
+def build_store_benchmarks() -> List[Benchmark]:
+    """各房间存储后端的同一组基准（一局进行到第一晚的房间）"""
+    import atexit
+    import shutil
+    import tempfile
+    import game_engine
+    from room_store import RoomRegistry, create_store
+
+    directory = tempfile.mkdtemp(prefix='wolf-bench-store-')
+    atexit.register(shutil.rmtree, directory, True)
+
+    sm = machine_in_phase('night_action')
+    engine = game_engine.GameEngine(sm.room_id)
+    engine.state_machine = sm
+
+    benchmarks = []
+    for backend, path in (('memory', None), ('sqlite', f'{directory}/rooms.sqlite3'), ('shm', f'{directory}/shm')):
+        registry = RoomRegistry('rooms', game_engine._encode_game, game_engine._decode_game,
+                                store=create_store(backend, path))
+        registry.put(engine.room_id, engine, force=True)
+
+        def load_cold(registry=registry):
+            registry.clear_cache()
+            registry.get(engine.room_id)
+
+        benchmarks.append(Benchmark(f'store_{backend}_save', lambda registry=registry: registry.put(
+            engine.room_id, engine, force=True)))
+        benchmarks.append(Benchmark(f'store_{backend}_get_cached', lambda registry=registry: registry.get(
+            engine.room_id)))
+        benchmarks.append(Benchmark(f'store_{backend}_load', load_cold))
+    return benchmarks
+
+
+# ============== 单房间内存（每 GB 房间数） ==============
+
+def measure_room_memory(seat_counts=(12, 30, 100), rooms: int = 1000) -> List[Dict]:
+    """
+    按座位数比较玩家字典和紧凑座位表下的单房间内存和座位扫描耗时
+
+    每种配置构造 rooms 个进行到第一天讨论的房间（共享一个虚拟时钟，与生产环境共享墙上时钟一致），
+    用 tracemalloc 统计总分配量
+
+    返回:
+        [{'seats', 'players', 'bytesPerRoom', 'roomsPerGB', 'aliveScanUs', 'clearVotesUs'}]
+    """
+    import gc
+    import timeit
+    import tracemalloc
+
+    logging.getLogger('state_machine').setLevel(logging.WARNING)
+    clock = VirtualClock()
+    default = ClassicWerewolfStateMachine.COMPACT_SEATS_FROM
+    rows = []
+    try:
+        for seat_count in seat_counts:
+            for storage, compact_from in (('dict', None), ('seat_table', 1)):
+                ClassicWerewolfStateMachine.COMPACT_SEATS_FROM = compact_from
+                gc.collect()
+                tracemalloc.start()
+                machines = []
+                for index in range(rooms):
+                    sm = ClassicWerewolfStateMachine(f'mem_{index}', seat_count, clock=clock, seed=index)
+                    sm.assign_roles()
+                    sm.start_round()
+                    machines.append(sm)
+                gc.collect()
+                allocated = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+
+                context = machines[0].context
+                scans = 2000
+                per_room = allocated / rooms
+                rows.append({
+                    'seats': seat_count,
+                    'players': storage,
+                    'bytesPerRoom': round(per_room),
+                    'roomsPerGB': int(1024 ** 3 / per_room),
+                    'aliveScanUs': round(timeit.timeit(context.get_alive_players, number=scans) / scans * 1e6, 3),
+                    'clearVotesUs': round(timeit.timeit(context.clear_votes, number=scans) / scans * 1e6, 3),
+                })
+                del machines, context
+    finally:
+        ClassicWerewolfStateMachine.COMPACT_SEATS_FROM = default
+    return rows
+
+
+def print_room_memory(rows: List[Dict]):
+    print(f"  {'座位数':<6}{'玩家存储':<12}{'字节/房间':>12}{'房间/GB':>12}{'存活扫描(us)':>14}{'清票(us)':>10}")
+    for row in rows:
+        print(f"  {row['seats']:<9}{row['players']:<12}{row['bytesPerRoom']:>12}{row['roomsPerGB']:>12}"
+              f"{row['aliveScanUs']:>14.2f}{row['clearVotesUs']:>10.2f}")
+
+
+# ============== 运行与比较 ==============
+
+def run_benchmarks(rounds: int = DEFAULT_ROUNDS, name_filter: Optional[str] = None, verbose: bool = True) -> Dict:
+    """
+    运行基准
+
+    参数:
+        rounds: 每个基准的轮数（样本数）
+        name_filter: 只运行名称包含该字符串的基准
+        verbose: 是否打印进度
+
+    返回:
+        {'meta': {...}, 'benchmarks': {名称: {'unit', 'iterations', 'samples', 'median', 'stdev'}}}
+    """
+    logging.getLogger('state_machine').setLevel(logging.WARNING)
+    logging.getLogger('agent_decision').setLevel(logging.WARNING)
+
+    results = {}
+    for benchmark in build_benchmarks():
+        if name_filter and name_filter not in benchmark.name:
+            continue
+        iterations = benchmark.calibrate()
+        benchmark.measure(iterations)  # 预热一轮，不计入样本
+        samples = [benchmark.measure(iterations) / iterations * 1e6 for _ in range(rounds)]
+        results[benchmark.name] = {
+            'unit': 'us',
+            'iterations': iterations,
+            'samples': [round(s, 3) for s in samples],
+            'median': round(statistics.median(samples), 3),
+            'stdev': round(statistics.stdev(samples), 3) if len(samples) > 1 else 0.0,
+        }
+        if verbose:
+            print(f"  {benchmark.name:<24}{results[benchmark.name]['median']:>12.2f} us"
+                  f"  ±{results[benchmark.name]['stdev']:.2f}  ({iterations} × {rounds})", file=sys.stderr)
+
+    return {'meta': _environment(), 'benchmarks': results}
+
+
+def _environment() -> Dict[str, Any]:
+    """记录运行环境，便于判断两次结果是否可比"""
+    commit = None
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'commit': commit,
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def mann_whitney_u(a: List[float], b: List[float]) -> float:
+    """
+    Mann-Whitney U 检验（正态近似，含平局校正）
+
+    返回:
+        双侧 p 值
+    """
+    n1, n2 = len(a), len(b)
+    if n1 == 0 or n2 == 0:
+        return 1.0
+    combined = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+
+    # 计算秩（平局取平均秩）
+    ranks = [0.0] * len(combined)
+    tie_term = 0.0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[k] = rank
+        ties = j - i + 1
+        tie_term += ties ** 3 - ties
+        i = j + 1
+
+    rank_sum_a = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u = rank_sum_a - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2) / math.sqrt(variance)
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def compare_results(baseline: Dict, current: Dict, alpha: float = DEFAULT_ALPHA,
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    比较两次结果
+
+    参数:
+        baseline: 基准结果
+        current: 当前结果
+        alpha: 显著性水平
+        threshold: 最小变化比例（中位数）
+
+    返回:
+        每个基准的比较结果列表，status 为 'slower' / 'faster' / 'same' / 'new' / 'missing'
+    """
+    rows = []
+    base_items = baseline.get('benchmarks', {})
+    current_items = current.get('benchmarks', {})
+    for name in sorted(set(base_items) | set(current_items)):
+        base, cur = base_items.get(name), current_items.get(name)
+        if base is None or cur is None:
+            rows.append({'name': name, 'status': 'new' if base is None else 'missing'})
+            continue
+        change = cur['median'] / base['median'] - 1 if base['median'] else 0.0
+        p_value = mann_whitney_u(base['samples'], cur['samples'])
+        status = 'same'
+        if p_value < alpha and abs(change) >= threshold:
+            status = 'slower' if change > 0 else 'faster'
+        rows.append({
+            'name': name,
+            'status': status,
+            'baseline': base['median'],
+            'current': cur['median'],
+            'change': round(change, 4),
+            'pValue': round(p_value, 6),
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    marks = {'slower': '🔴 变慢', 'faster': '🟢 变快', 'same': '   持平', 'new': '   新增', 'missing': '   缺失'}
+    print(f"  {'基准':<24}{'基准(us)':>12}{'当前(us)':>12}{'变化':>9}{'p值':>10}  结论")
+    for row in rows:
+        if 'baseline' not in row:
+            print(f"  {row['name']:<26}{'':>12}{'':>12}{'':>9}{'':>10}  {marks[row['status']]}")
+            continue
+        print(f"  {row['name']:<26}{row['baseline']:>12.2f}{row['current']:>12.2f}"
+              f"{row['change'] * 100:>+8.1f}%{row['pValue']:>10.4f}  {marks[row['status']]}")
+
+
+def _load(path: str) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save(result: Dict, path: str):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='引擎热点微基准')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help='运行基准')
+    run_parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help='每个基准的轮数（样本数）')
+    run_parser.add_argument('--filter', default=None, help='只运行名称包含该字符串的基准')
+    run_parser.add_argument('--save', default=None, help='保存结果 JSON 的路径')
+
+    compare_parser = subparsers.add_parser('compare', help='与基准结果比较')
+    compare_parser.add_argument('baseline', help='基准结果 JSON')
+    compare_parser.add_argument('current', nargs='?', default=None, help='当前结果 JSON（省略则现在运行）')
+    compare_parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    compare_parser.add_argument('--filter', default=None)
+    compare_parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help='显著性水平')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='最小变化比例')
+    compare_parser.add_argument('--save', default=None, help='保存本次结果 JSON 的路径')
+
+    memory_parser = subparsers.add_parser('memory', help='单房间内存和每 GB 房间数（玩家字典 vs 紧凑座位表）')
+    memory_parser.add_argument('--seats', default='12,30,100', help='座位数，逗号分隔')
+    memory_parser.add_argument('--rooms', type=int, default=1000, help='每种配置构造的房间数')
+
+    args = parser.parse_args()
+
+    if args.command == 'memory':
+        print_room_memory(measure_room_memory([int(s) for s in args.seats.split(',')], args.rooms))
+        return
+
+    if args.command == 'run':
+        result = run_benchmarks(args.rounds, args.filter)
+        if args.save:
+            _save(result, args.save)
+            print(f"💾 已保存到 {args.save}", file=sys.stderr)
+        else:
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+
+    baseline = _load(args.baseline)
+    current = _load(args.current) if args.current else run_benchmarks(args.rounds, args.filter)
+    if args.save:
+        _save(current, args.save)
+    if args.filter:
+        baseline = {**baseline, 'benchmarks': {
+            k: v for k, v in baseline.get('benchmarks', {}).items() if args.filter in k
+        }}
+
+    base_meta, current_meta = baseline.get('meta', {}), current.get('meta', {})
+    print(f"📊 基准: {base_meta.get('commit')} ({base_meta.get('python')})"
+          f"  当前: {current_meta.get('commit')} ({current_meta.get('python')})")
+    if base_meta.get('machine') != current_meta.get('machine') or base_meta.get('python') != current_meta.get('python'):
+        print("⚠️ 两次结果的运行环境不同，比较结果仅供参考")
+
+    rows = compare_results(baseline, current, args.alpha, args.threshold)
+    print_comparison(rows)
+    if any(row['status'] == 'slower' for row in rows):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
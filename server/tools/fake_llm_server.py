@@ -0,0 +1,327 @@
+"""
+本地模拟大模型服务
+
+兼容 OpenAI /v1/chat/completions 接口，针对 agent_decision 构建的提示词
+返回合法的发言文本或 JSON 决策，并按延迟配置模拟首字延迟、生成速度、错误率和流式输出。
+用于离线压测排队、超时和并发行为，不需要网络和真实的模型服务。
+
+用法:
+    python -m tools.fake_llm_server --port 8765 --profile slow
+
+    或在 config.json 中配置:
+    {
+      "fake_llm": {"enabled": true, "port": 8765, "profile": "normal", "autostart": true}
+    }
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from prompt_history import estimate_tokens
+
+logger = logging.getLogger('fake_llm')
+
+# 延迟配置
+# - ttft_ms: 首字延迟分布 {'distribution': 'fixed' | 'uniform' | 'lognormal', ...}
+# - tokens_per_second: 生成速度，0 表示瞬间完成
+# - error_rate: 返回 500 的概率
+# - rate_limit_rate: 返回 429 的概率
+# - hang_rate: 请求挂起 hang_seconds 秒后才返回的概率（模拟超时）
+LATENCY_PROFILES: Dict[str, Dict] = {
+    'instant': {
+        'ttft_ms': {'distribution': 'fixed', 'value': 0},
+        'tokens_per_second': 0,
+    },
+    'fast': {
+        'ttft_ms': {'distribution': 'lognormal', 'median': 200, 'sigma': 0.3},
+        'tokens_per_second': 200,
+    },
+    'normal': {
+        'ttft_ms': {'distribution': 'lognormal', 'median': 800, 'sigma': 0.5},
+        'tokens_per_second': 60,
+        'error_rate': 0.01,
+    },
+    'slow': {
+        'ttft_ms': {'distribution': 'lognormal', 'median': 3000, 'sigma': 0.7},
+        'tokens_per_second': 20,
+        'error_rate': 0.02,
+        'hang_rate': 0.02,
+        'hang_seconds': 60,
+    },
+    'flaky': {
+        'ttft_ms': {'distribution': 'uniform', 'low': 100, 'high': 5000},
+        'tokens_per_second': 40,
+        'error_rate': 0.2,
+        'rate_limit_rate': 0.1,
+        'hang_rate': 0.05,
+        'hang_seconds': 30,
+    },
+}
+
+SPEECH_TEMPLATES = [
+    "我是{seat}号。目前场上信息还不多，我先听听大家怎么说，重点关注发言前后矛盾的人。",
+    "{seat}号发言。我是好人，昨晚的情况大家都看到了，我觉得应该先从发言最少的人开始排查。",
+    "我是{seat}号，我这轮没有太多信息，但我会跟着票型分析，希望预言家能站出来给点信息。",
+    "{seat}号。我觉得刚才有几位的发言比较划水，投票时我会重点看他们的表态。",
+]
+
+
+class FakeCompletionModel:
+    """根据提示词生成模拟回复并采样延迟"""
+
+    def __init__(self, profile: Dict, seed: Optional[int] = None):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_ttft(self) -> float:
+        """采样首字延迟（秒）"""
+        spec = self.profile.get('ttft_ms', {})
+        distribution = spec.get('distribution', 'fixed')
+        with self._lock:
+            if distribution == 'uniform':
+                value = self._rng.uniform(spec.get('low', 0), spec.get('high', 0))
+            elif distribution == 'lognormal':
+                value = self._rng.lognormvariate(math.log(max(spec.get('median', 1), 1)), spec.get('sigma', 0.5))
+            else:
+                value = spec.get('value', 0)
+        return max(0.0, value) / 1000.0
+
+    def sample_failure(self) -> Optional[str]:
+        """采样本次请求的故障类型：'error' / 'rate_limit' / 'hang' / None"""
+        with self._lock:
+            roll = self._rng.random()
+        for failure, key in (('error', 'error_rate'), ('rate_limit', 'rate_limit_rate'), ('hang', 'hang_rate')):
+            rate = self.profile.get(key, 0)
+            if roll < rate:
+                return failure
+            roll -= rate
+        return None
+
+    def token_delay(self) -> float:
+        """每个 token 的生成耗时（秒）"""
+        tokens_per_second = self.profile.get('tokens_per_second', 0)
+        return 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+
+    def complete(self, messages: List[Dict]) -> str:
+        """根据提示词生成回复：决策请求返回 JSON，其余返回发言文本"""
+        prompt = '\n'.join(m.get('content') or '' for m in messages)
+        with self._lock:
+            if '可选目标：' in prompt or 'JSON' in prompt:
+                targets = self._parse_targets(prompt)
+                target = self._rng.choice(targets) if targets else None
+                return json.dumps({'targetSeat': target, 'reason': '模拟决策'}, ensure_ascii=False)
+
+            seat_match = re.search(r'座位号：(\d+)', prompt)
+            seat = seat_match.group(1) if seat_match else '?'
+            return self._rng.choice(SPEECH_TEMPLATES).format(seat=seat)
+
+    @staticmethod
+    def _parse_targets(prompt: str) -> List[int]:
+        match = re.search(r'可选目标：([\d,\s]*)', prompt)
+        if not match:
+            return []
+        return [int(t) for t in re.findall(r'\d+', match.group(1))]
+
+
+def _split_stream_chunks(text: str, chunk_tokens: int = 4) -> List[str]:
+    """把回复切分为流式片段（按字符近似 token）"""
+    return [text[i:i + chunk_tokens] for i in range(0, len(text), chunk_tokens)] or ['']
+
+
+class FakeLLMRequestHandler(BaseHTTPRequestHandler):
+    """处理 /v1/chat/completions 和 /v1/models 请求"""
+
+    model: FakeCompletionModel = None  # 由 create_server 注入
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'fake-model', 'object': 'model'}]})
+        else:
+            self._send_json(404, {'error': {'message': 'Not Found', 'type': 'invalid_request_error'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'Not Found', 'type': 'invalid_request_error'}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'Invalid JSON', 'type': 'invalid_request_error'}})
+            return
+
+        failure = self.model.sample_failure()
+        if failure == 'hang':
+            time.sleep(self.model.profile.get('hang_seconds', 60))
+        elif failure == 'error':
+            time.sleep(self.model.sample_ttft())
+            self._send_json(500, {'error': {'message': 'Simulated server error', 'type': 'server_error'}})
+            return
+        elif failure == 'rate_limit':
+            self._send_json(429, {'error': {'message': 'Simulated rate limit', 'type': 'rate_limit_error'}})
+            return
+
+        messages = body.get('messages', [])
+        content = self.model.complete(messages)
+        prompt_tokens = sum(estimate_tokens(m.get('content') or '') for m in messages)
+        completion_tokens = estimate_tokens(content)
+        model_name = body.get('model', 'fake-model')
+
+        time.sleep(self.model.sample_ttft())
+        if body.get('stream'):
+            self._stream(model_name, content)
+            return
+
+        time.sleep(completion_tokens * self.model.token_delay())
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model_name,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def _stream(self, model_name: str, content: str):
+        """以 SSE 流式返回，每个片段按生成速度延迟"""
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def _chunk(delta: Dict, finish_reason: Optional[str]) -> bytes:
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model_name,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        self.wfile.write(_chunk({'role': 'assistant'}, None))
+        for piece in _split_stream_chunks(content):
+            time.sleep(estimate_tokens(piece) * self.model.token_delay())
+            self.wfile.write(_chunk({'content': piece}, None))
+            self.wfile.flush()
+        self.wfile.write(_chunk({}, 'stop'))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_json(self, status: int, payload: Dict):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def resolve_profile(name: str, overrides: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    解析延迟配置
+
+    Args:
+        name: 配置名称
+        overrides: 额外的配置（同名时覆盖内置配置）
+
+    Returns:
+        延迟配置字典
+    """
+    profiles = {**LATENCY_PROFILES, **(overrides or {})}
+    if name not in profiles:
+        raise ValueError(f"Unknown latency profile: {name}")
+    return profiles[name]
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8765, profile: str = 'normal',
+                  overrides: Optional[Dict[str, Dict]] = None, seed: Optional[int] = None) -> ThreadingHTTPServer:
+    """
+    创建模拟服务（未启动）
+
+    Args:
+        host: 监听地址
+        port: 监听端口（0 表示随机端口）
+        profile: 延迟配置名称
+        overrides: 额外的延迟配置
+        seed: 随机种子
+
+    Returns:
+        ThreadingHTTPServer 实例
+    """
+    handler = type('BoundFakeLLMRequestHandler', (FakeLLMRequestHandler,), {
+        'model': FakeCompletionModel(resolve_profile(profile, overrides), seed)
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server_in_background(host: str = '127.0.0.1', port: int = 8765, profile: str = 'normal',
+                               overrides: Optional[Dict[str, Dict]] = None,
+                               seed: Optional[int] = None) -> Tuple[ThreadingHTTPServer, threading.Thread]:
+    """
+    在后台守护线程中启动模拟服务
+
+    返回:
+        (服务实例, 线程)
+    """
+    server = create_server(host, port, profile, overrides, seed)
+    thread = threading.Thread(target=server.serve_forever, name='fake-llm-server', daemon=True)
+    thread.start()
+    logger.info(f"模拟大模型服务已启动: http://{host}:{server.server_address[1]}/v1 (profile={profile})")
+    return server, thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟大模型服务（OpenAI 兼容）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--profile', default='normal', help=f"延迟配置: {', '.join(LATENCY_PROFILES)}")
+    parser.add_argument('--profiles-file', help='额外的延迟配置 JSON 文件 {名称: 配置}')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    overrides = None
+    if args.profiles_file:
+        with open(args.profiles_file, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    server = create_server(args.host, args.port, args.profile, overrides, args.seed)
+    logger.info(f"🚀 模拟大模型服务启动在 http://{args.host}:{args.port}/v1 (profile={args.profile})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
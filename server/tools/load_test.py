@@ -0,0 +1,535 @@
+"""
+小程序客户端负载生成器
+
+用 asyncio 模拟 N 个房间 × 12 个客户端的真实小程序行为：
+- 每个客户端每秒轮询一次 /state，并按间隔增量轮询 /messages?after=
+- 每个房间由房主客户端驱动对局（与 pages/room/room.ts 一致）：开局、发言、推进发言者、
+  投票、夜晚行动，Agent 座位走 agent-speech / agent-vote / agent-action 接口
+- 对局结束后自动换一个新房间继续
+
+输出每个接口的吞吐、p50/p95/p99 延迟和错误率；指定 --server-pid 时采样服务端 CPU 和内存（Linux /proc）。
+--rooms 支持逗号分隔的多档房间数，逐档加压，用于找到单个服务的饱和点。
+
+只依赖标准库（内置极简 HTTP/1.1 客户端）。
+
+用法:
+    python -m tools.load_test --rooms 10 --duration 60
+    python -m tools.load_test --rooms 10,20,50,100 --duration 30 --server-pid 12345
+    python -m tools.load_test --rooms 20 --no-agents   # 不调用 Agent 接口（不经过大模型）
+    python -m tools.load_test --rooms 50 --mode quick   # 快速模式房间
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# 小程序客户端的轮询间隔（秒）
+STATE_POLL_INTERVAL = 1.0
+
+# 每个房间的客户端数
+CLIENTS_PER_ROOM = 12
+
+# 人类玩家座位（其余座位是 Agent，与小程序一致）
+HUMAN_SEAT = 1
+
+
+class HTTPError(Exception):
+    """请求失败（连接错误、超时或非 2xx 响应）"""
+
+
+class AsyncHTTPConnection:
+    """
+    极简 asyncio HTTP/1.1 客户端（一个客户端一条连接）
+
+    服务端允许时复用连接，否则每次请求重新建立连接；
+    支持 Content-Length、chunked 和读到连接关闭三种响应体。
+    """
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, bytes]:
+        """发送请求，返回 (状态码, 响应体)"""
+        return await asyncio.wait_for(self._request(method, path, body), self.timeout)
+
+    async def _request(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        head = (
+            f"{method} {path} HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            "Connection: keep-alive\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n"
+        ).encode('ascii')
+
+        for attempt in range(2):
+            reused = self._writer is not None
+            if not reused:
+                self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                self._writer.write(head + payload)
+                await self._writer.drain()
+                return await self._read_response()
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                # 复用的连接可能已被服务端关闭，重连重试一次
+                if not reused or attempt:
+                    raise
+        raise HTTPError('unreachable')
+
+    async def _read_response(self) -> Tuple[int, bytes]:
+        status_line = await self._reader.readline()
+        if not status_line:
+            raise ConnectionError('connection closed')
+        version, status, _ = status_line.decode('latin-1').split(' ', 2)
+
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            data = await self._reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    await self._reader.readline()
+                    break
+                chunks.append(await self._reader.readexactly(size))
+                await self._reader.readline()
+            data = b''.join(chunks)
+        else:
+            data = await self._reader.read()
+            self.close()
+            return int(status), data
+
+        connection = headers.get('connection', '').lower()
+        if connection == 'close' or (version == 'HTTP/1.0' and connection != 'keep-alive'):
+            self.close()
+        return int(status), data
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+class LoadStats:
+    """按接口聚合的延迟和错误统计"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: Dict[str, str] = {}
+        self.games_started = 0
+        self.games_finished = 0
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None):
+        self.latencies[endpoint].append(seconds)
+        if error:
+            self.errors[endpoint] += 1
+            self.error_samples.setdefault(endpoint, error)
+
+    def report(self, elapsed: float) -> Dict:
+        endpoints = {}
+        total = total_errors = 0
+        for endpoint in sorted(self.latencies):
+            samples = sorted(self.latencies[endpoint])
+            count = len(samples)
+            errors = self.errors.get(endpoint, 0)
+            total += count
+            total_errors += errors
+            endpoints[endpoint] = {
+                'count': count,
+                'rps': round(count / elapsed, 1) if elapsed > 0 else None,
+                'errors': errors,
+                'errorRate': round(errors / count, 4) if count else 0,
+                'p50Ms': _percentile_ms(samples, 0.50),
+                'p95Ms': _percentile_ms(samples, 0.95),
+                'p99Ms': _percentile_ms(samples, 0.99),
+                'maxMs': round(samples[-1] * 1000, 1) if samples else None,
+            }
+            if endpoint in self.error_samples:
+                endpoints[endpoint]['errorSample'] = self.error_samples[endpoint]
+        return {
+            'requests': total,
+            'rps': round(total / elapsed, 1) if elapsed > 0 else None,
+            'errors': total_errors,
+            'errorRate': round(total_errors / total, 4) if total else 0,
+            'gamesStarted': self.games_started,
+            'gamesFinished': self.games_finished,
+            'endpoints': endpoints,
+        }
+
+
+def _percentile_ms(samples: List[float], q: float) -> Optional[float]:
+    """已排序样本的分位数（毫秒，最近秩法）"""
+    if not samples:
+        return None
+    index = min(len(samples) - 1, max(0, math.ceil(q * len(samples)) - 1))
+    return round(samples[index] * 1000, 1)
+
+
+class Client:
+    """一个小程序客户端（一条连接）"""
+
+    def __init__(self, base_path: str, host: str, port: int, timeout: float, stats: LoadStats):
+        self.base_path = base_path
+        self.stats = stats
+        self.conn = AsyncHTTPConnection(host, port, timeout)
+
+    async def call(self, method: str, room_id: str, endpoint: str, body: Optional[Dict] = None,
+                   query: str = '') -> Optional[Dict]:
+        """调用房间接口，返回 data 字段；失败时记录错误并返回 None"""
+        path = f"{self.base_path}/rooms/{room_id}/{endpoint}{query}"
+        label = f"{method} {endpoint}"
+        started = time.perf_counter()
+        try:
+            status, raw = await self.conn.request(method, path, body)
+        except Exception as e:
+            self.conn.close()
+            self.stats.record(label, time.perf_counter() - started, f"{type(e).__name__}: {e}")
+            return None
+
+        elapsed = time.perf_counter() - started
+        if status >= 300:
+            self.stats.record(label, elapsed, f"HTTP {status}: {raw[:120].decode('utf-8', 'replace')}")
+            return None
+        self.stats.record(label, elapsed)
+        try:
+            return json.loads(raw).get('data') or {}
+        except ValueError:
+            return {}
+
+    def close(self):
+        self.conn.close()
+
+
+class RoomSession:
+    """
+    一个房间的 12 个客户端
+
+    房主客户端（座位 1）轮询状态并驱动对局，其余客户端只轮询状态和消息。
+    """
+
+    def __init__(self, room_prefix: str, index: int, clients: List[Client], stats: LoadStats,
+                 use_agents: bool, think_time: float, message_interval: float, rng: random.Random,
+                 mode: str = 'classic'):
+        self.room_prefix = room_prefix
+        self.index = index
+        self.clients = clients
+        self.stats = stats
+        self.use_agents = use_agents
+        self.think_time = think_time
+        self.message_interval = message_interval
+        self.rng = rng
+        self.mode = mode
+
+        self.game_number = 0
+        self.room_id = ''
+        self.roles: Dict[int, str] = {}
+        self._processed_speakers: set = set()
+        self._processed_round = -1
+
+    async def run(self, stop_at: float):
+        await self._new_game()
+        tasks = [asyncio.ensure_future(self._host_loop(stop_at))]
+        for client in self.clients[1:]:
+            tasks.append(asyncio.ensure_future(self._poll_loop(client, stop_at)))
+        await asyncio.gather(*tasks)
+        for client in self.clients:
+            client.close()
+
+    async def _new_game(self):
+        self.game_number += 1
+        self.room_id = f"{self.room_prefix}_{self.index}_{self.game_number}"
+        self._processed_speakers = set()
+        self._processed_round = -1
+        self.stats.games_started += 1
+
+        host = self.clients[0]
+        data = await host.call('POST', self.room_id, 'assign-roles',
+                               {'seatCount': CLIENTS_PER_ROOM, 'mode': self.mode})
+        self.roles = {int(seat): role for seat, role in ((data or {}).get('rolesBySeat') or {}).items()}
+        await host.call('POST', self.room_id, 'start-round')
+
+    async def _poll_loop(self, client: Client, stop_at: float):
+        """普通客户端：1Hz 轮询状态，按间隔增量轮询消息"""
+        last_message_id = None
+        next_message_poll = time.monotonic() + self.rng.random() * self.message_interval
+        # 错开各客户端的轮询相位
+        await asyncio.sleep(self.rng.random() * STATE_POLL_INTERVAL)
+        while time.monotonic() < stop_at:
+            tick = time.monotonic()
+            room_id = self.room_id
+            await client.call('GET', room_id, 'state')
+            if tick >= next_message_poll:
+                query = f"?after={last_message_id}" if last_message_id else ''
+                data = await client.call('GET', room_id, 'messages', query=query)
+                messages = (data or {}).get('messages') or []
+                if messages:
+                    last_message_id = messages[-1]['id']
+                next_message_poll = tick + self.message_interval
+            if room_id != self.room_id:
+                last_message_id = None
+            await asyncio.sleep(max(0.0, STATE_POLL_INTERVAL - (time.monotonic() - tick)))
+
+    async def _host_loop(self, stop_at: float):
+        """房主客户端：轮询状态并按阶段驱动对局（上一轮处理完才开始下一轮，与小程序一致）"""
+        host = self.clients[0]
+        while time.monotonic() < stop_at:
+            tick = time.monotonic()
+            state = await host.call('GET', self.room_id, 'state')
+            if state:
+                await self._handle_state(host, state)
+            await asyncio.sleep(max(0.0, STATE_POLL_INTERVAL - (time.monotonic() - tick)))
+
+    async def _handle_state(self, host: Client, state: Dict):
+        phase = state.get('phase')
+        alive = state.get('alivePlayers') or []
+
+        if state.get('result', 'ongoing') != 'ongoing' or phase == 'game_over':
+            self.stats.games_finished += 1
+            await self._new_game()
+            return
+
+        if state.get('announcement'):
+            await host.call('POST', self.room_id, 'complete-announcement')
+
+        if phase == 'role_assigned':
+            await host.call('POST', self.room_id, 'start-round')
+
+        elif phase == 'day_discussion':
+            if state.get('round') != self._processed_round:
+                self._processed_round = state.get('round')
+                self._processed_speakers = set()
+            speaker = state.get('currentSpeaker') or 0
+            if speaker and speaker not in self._processed_speakers:
+                self._processed_speakers.add(speaker)
+                await self._think()
+                if speaker == HUMAN_SEAT:
+                    await host.call('POST', self.room_id, 'speech', {'seat': speaker, 'text': f'{speaker}号玩家发言，我是好人'})
+                elif self.use_agents:
+                    await host.call('POST', self.room_id, 'agent-speech', {'seat': speaker})
+                else:
+                    await host.call('POST', self.room_id, 'speech', {'seat': speaker, 'text': f'{speaker}号玩家发言'})
+                await host.call('POST', self.room_id, 'advance-speaker')
+
+        elif phase == 'day_voting':
+            for seat_key, vote in (state.get('playerVotes') or {}).items():
+                seat = int(seat_key)
+                if vote.get('hasVoted'):
+                    continue
+                targets = [s for s in alive if s != seat] or alive
+                if seat != HUMAN_SEAT and self.use_agents:
+                    await host.call('POST', self.room_id, 'agent-vote', {'seat': seat})
+                else:
+                    await self._think()
+                    await host.call('POST', self.room_id, 'vote',
+                                    {'voterSeat': seat, 'targetSeat': self.rng.choice(targets)})
+
+        elif phase == 'night_action':
+            current_role = state.get('currentRole')
+            # 快速模式下所有未完成的角色同时行动
+            acting_roles = (state.get('nightPendingRoles') or []) if current_role == 'all' else [current_role]
+            for seat in alive:
+                role = self.roles.get(seat)
+                if role not in acting_roles or role not in ('werewolf', 'seer', 'witch'):
+                    continue
+                targets = [s for s in alive if s != seat] or alive
+                if seat != HUMAN_SEAT and self.use_agents:
+                    action = await host.call('POST', self.room_id, 'agent-action',
+                                             {'seat': seat, 'role': role, 'availableTargets': alive})
+                    if not action:
+                        continue
+                    action_type, target = action.get('actionType'), action.get('targetSeat')
+                else:
+                    await self._think()
+                    action_type = {'werewolf': 'kill', 'seer': 'check', 'witch': 'save'}[role]
+                    target = self.rng.choice(targets)
+                await host.call('POST', self.room_id, 'night-action', {
+                    'playerSeat': seat,
+                    'role': role,
+                    'actionType': action_type,
+                    'targetSeat': target
+                })
+
+    async def _think(self):
+        """模拟人类操作的思考时间"""
+        if self.think_time > 0:
+            await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.think_time)
+
+
+class ResourceSampler:
+    """通过 /proc 采样服务端进程的 CPU 和内存（仅 Linux）"""
+
+    def __init__(self, pid: int, interval: float = 1.0):
+        self.pid = pid
+        self.interval = interval
+        self.cpu_percent: List[float] = []
+        self.rss_mb: List[float] = []
+        self.threads: List[int] = []
+        self._ticks = os.sysconf('SC_CLK_TCK')
+
+    def _read(self) -> Tuple[float, float, int]:
+        with open(f'/proc/{self.pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / self._ticks
+        threads = int(fields[17])
+        rss_kb = 0
+        with open(f'/proc/{self.pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss_kb = int(line.split()[1])
+                    break
+        return cpu_seconds, rss_kb / 1024, threads
+
+    async def run(self, stop_at: float):
+        try:
+            last_cpu, _, _ = self._read()
+        except OSError:
+            return
+        last_time = time.monotonic()
+        while time.monotonic() < stop_at:
+            await asyncio.sleep(self.interval)
+            try:
+                cpu, rss, threads = self._read()
+            except OSError:
+                return
+            now = time.monotonic()
+            self.cpu_percent.append((cpu - last_cpu) / (now - last_time) * 100)
+            self.rss_mb.append(rss)
+            self.threads.append(threads)
+            last_cpu, last_time = cpu, now
+
+    def report(self) -> Optional[Dict]:
+        if not self.cpu_percent:
+            return None
+        return {
+            'cpuPercentAvg': round(sum(self.cpu_percent) / len(self.cpu_percent), 1),
+            'cpuPercentMax': round(max(self.cpu_percent), 1),
+            'rssMbMax': round(max(self.rss_mb), 1),
+            'threadsMax': max(self.threads),
+        }
+
+
+async def run_stage(base_url: str, rooms: int, duration: float, use_agents: bool, think_time: float,
+                    message_interval: float, timeout: float, server_pid: Optional[int], seed: int,
+                    mode: str = 'classic') -> Dict:
+    """
+    跑一档负载
+
+    参数:
+        base_url: 服务地址（如 http://127.0.0.1:5010/api）
+        rooms: 房间数
+        duration: 持续秒数
+        use_agents: 是否调用 Agent 接口
+        think_time: 人类操作平均思考时间（秒）
+        message_interval: 消息轮询间隔（秒）
+        timeout: 单个请求超时（秒）
+        server_pid: 服务端进程 PID（可选，用于采样资源）
+        seed: 随机种子
+        mode: 游戏模式（classic / quick）
+
+    返回:
+        该档的统计报告
+    """
+    parts = urlsplit(base_url)
+    host, port, base_path = parts.hostname, parts.port or 80, parts.path.rstrip('/')
+    stats = LoadStats()
+    rng = random.Random(seed)
+    room_prefix = f"load_{uuid.uuid4().hex[:6]}"
+
+    sessions = []
+    for index in range(rooms):
+        clients = [Client(base_path, host, port, timeout, stats) for _ in range(CLIENTS_PER_ROOM)]
+        sessions.append(RoomSession(room_prefix, index, clients, stats, use_agents, think_time,
+                                    message_interval, random.Random(rng.getrandbits(32)), mode))
+
+    started = time.monotonic()
+    stop_at = started + duration
+    sampler = ResourceSampler(server_pid) if server_pid else None
+    tasks = [session.run(stop_at) for session in sessions]
+    if sampler:
+        tasks.append(sampler.run(stop_at))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    report = stats.report(elapsed)
+    report.update({'rooms': rooms, 'clients': rooms * CLIENTS_PER_ROOM, 'elapsedSeconds': round(elapsed, 1)})
+    if sampler:
+        report['server'] = sampler.report()
+    return report
+
+
+def print_report(report: Dict):
+    print(f"\n📈 房间: {report['rooms']}  客户端: {report['clients']}  耗时: {report['elapsedSeconds']}s")
+    print(f"  请求: {report['requests']}  吞吐: {report['rps']} req/s  错误率: {report['errorRate'] * 100:.2f}%"
+          f"  开局: {report['gamesStarted']}  完成: {report['gamesFinished']}")
+    if report.get('server'):
+        server = report['server']
+        print(f"  服务端: CPU 平均 {server['cpuPercentAvg']}% / 峰值 {server['cpuPercentMax']}%"
+              f"  内存峰值 {server['rssMbMax']}MB  线程峰值 {server['threadsMax']}")
+    print(f"  {'接口':<28}{'次数':>8}{'req/s':>9}{'错误率':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for endpoint, item in report['endpoints'].items():
+        print(f"  {endpoint:<30}{item['count']:>8}{item['rps']:>9}{item['errorRate'] * 100:>8.1f}%"
+              f"{item['p50Ms']:>9}{item['p95Ms']:>9}{item['p99Ms']:>9}{item['maxMs']:>9}")
+        if item.get('errorSample'):
+            print(f"    ↳ {item['errorSample']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='狼人杀小程序客户端负载生成器')
+    parser.add_argument('--url', default='http://127.0.0.1:5010/api', help='服务地址')
+    parser.add_argument('--rooms', default='10', help='房间数，多档用逗号分隔（逐档加压）')
+    parser.add_argument('--duration', type=float, default=60, help='每档持续秒数')
+    parser.add_argument('--no-agents', action='store_true', help='不调用 Agent 接口，Agent 座位直接提交动作')
+    parser.add_argument('--think-time', type=float, default=1.0, help='人类操作平均思考时间（秒）')
+    parser.add_argument('--message-interval', type=float, default=1.0, help='消息轮询间隔（秒）')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时（秒）')
+    parser.add_argument('--server-pid', type=int, default=None, help='服务端进程 PID，用于采样 CPU/内存')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--mode', default='classic', help='游戏模式（classic / quick）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    reports = []
+    for rooms in [int(r) for r in args.rooms.split(',')]:
+        report = asyncio.run(run_stage(
+            base_url=args.url,
+            rooms=rooms,
+            duration=args.duration,
+            use_agents=not args.no_agents,
+            think_time=args.think_time,
+            message_interval=args.message_interval,
+            timeout=args.timeout,
+            server_pid=args.server_pid,
+            seed=args.seed,
+            mode=args.mode,
+        ))
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+对局回放工具
+
+读取回放记录（GET /api/rooms/{roomId}/replay 导出的 JSON，或模拟器 --record 保存的文件），
+在虚拟时钟上逐位复现对局并校验状态指纹，可选在 cProfile 下运行以定位慢局的热点。
+
+用法:
+    python -m tools.replay replay.json
+    python -m tools.replay replay.json --repeat 100 --profile
+"""
+import argparse
+import cProfile
+import json
+import logging
+import pstats
+import time
+
+from state_machines import verify_replay
+
+
+def load_record(path: str) -> dict:
+    """读取回放记录（兼容接口响应包装 {'code', 'data'}）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        record = json.load(f)
+    if 'data' in record and 'actions' not in record:
+        record = record['data']
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='狼人杀对局回放')
+    parser.add_argument('path', help='回放记录 JSON 文件')
+    parser.add_argument('--repeat', type=int, default=1, help='重复回放次数（用于计时）')
+    parser.add_argument('--profile', action='store_true', help='在 cProfile 下回放并输出热点')
+    parser.add_argument('--top', type=int, default=30, help='剖析输出的函数数量')
+    args = parser.parse_args()
+
+    logging.getLogger('state_machine').setLevel(logging.WARNING)
+    record = load_record(args.path)
+
+    profiler = cProfile.Profile() if args.profile else None
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    for _ in range(args.repeat):
+        matched, state_machine = verify_replay(record)
+    if profiler:
+        profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    context = state_machine.context
+    print("🎬 回放完成")
+    print(f"  房间: {record['roomId']}  模式: {record['mode']}  座位: {record['seatCount']}  种子: {record['seed']}")
+    print(f"  动作数: {len(record['actions'])}  消息数: {len(context.messages)}  结果: {context.result}  轮数: {context.round}")
+    print(f"  指纹: {'一致 ✅' if matched else '不一致 ❌'}")
+    print(f"  耗时: {elapsed / args.repeat * 1000:.2f}ms/局（共 {args.repeat} 次）")
+
+    if profiler:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(args.top)
+
+    if not matched:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
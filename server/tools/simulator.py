@@ -0,0 +1,367 @@
+"""
+无头对局模拟器
+
+不经过 Flask，直接创建状态机（经典、快速或大房间模式）并用规则策略（或 Agent 决策 + 模拟大模型）
+跑完整局游戏，多进程并行，统计每秒对局数、状态转换数、阶段计数、胜负分布和每局计时上限
+（所有发言/投票/夜晚计时都用满时的对局时长，换算为单个房间每小时对局数）。
+用于压测引擎热点路径（transition_to、_handle_vote、_handle_night_action、_check_game_over）
+并发现性能回退。
+
+用法:
+    python -m tools.simulator --games 10000 --workers 8 --seats 12
+    python -m tools.simulator --games 1000 --seats 12 --roles werewolf:3,seer:1,witch:1,hunter:1,villager:6
+    python -m tools.simulator --games 10000 --mode quick   # 快速模式
+    python -m tools.simulator --games 1000 --mode large --seats 30,60,100   # 大房间模式
+    python -m tools.simulator --games 100 --policy agents   # 使用 agent_decision（需配置模拟大模型服务）
+    python -m tools.simulator --games 1000 --record-slowest slowest.json   # 保存最慢一局的回放记录
+
+同样的 --seed 每次产生同样的对局序列（每局的房间种子由批次随机数生成器派生），结果可跨提交对比。
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from state_machines import ClassicWerewolfStateMachine, Role, VirtualClock, create_state_machine, get_supported_modes
+from state_machines.quick_mode_state_machine import NIGHT_ALL_ROLES
+
+# 单局最多推进的步数，防止异常状态下死循环
+MAX_STEPS_PER_GAME = 10000
+
+
+class RulePolicy:
+    """
+    规则策略（不调用大模型）
+
+    狼人随机击杀非狼人，预言家查验未查过的玩家并投票给已知狼人，
+    女巫有解药就救人，其余随机投票。
+    """
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def vote(self, sm: ClassicWerewolfStateMachine, seat: int, targets: List[int]) -> Optional[int]:
+        ctx = sm.context
+        player = ctx.players[seat]
+        if player.role == Role.WEREWOLF:
+            non_wolves = [t for t in targets if ctx.players[t].role != Role.WEREWOLF]
+            targets = non_wolves or targets
+        elif player.role == Role.SEER and ctx.seer_context:
+            known_wolves = [c['seat'] for c in ctx.seer_context
+                            if c.get('result') == Role.WEREWOLF.value and c.get('seat') in targets]
+            if known_wolves:
+                return known_wolves[0]
+        return self.rng.choice(targets) if targets else None
+
+    def night_action(self, sm: ClassicWerewolfStateMachine, seat: int, role: str) -> Dict:
+        ctx = sm.context
+        alive = ctx.get_alive_players()
+        if role == 'werewolf':
+            targets = [s for s in alive if ctx.players[s].role != Role.WEREWOLF]
+            return {'actionType': 'kill', 'targetSeat': self.rng.choice(targets) if targets else None}
+        if role == 'seer':
+            checked = {c.get('seat') for c in (ctx.seer_context or [])}
+            targets = [s for s in alive if s != seat and s not in checked] or [s for s in alive if s != seat]
+            return {'actionType': 'check', 'targetSeat': self.rng.choice(targets) if targets else None}
+        if role == 'witch':
+            witch_context = ctx.witch_context or {}
+            if ctx.werewolf_killed and witch_context.get('has_save_potion'):
+                return {'actionType': 'save', 'targetSeat': ctx.werewolf_killed}
+            return {'actionType': 'save', 'targetSeat': None}
+        return {'actionType': 'kill', 'targetSeat': None}
+
+    def finish(self, room_id: str):
+        """对局结束"""
+
+
+class AgentPolicy:
+    """使用 agent_decision 的 Agent 决策（大模型请求建议指向模拟服务或离线缓存）"""
+
+    def __init__(self, rng: random.Random):
+        import agent_decision
+        self.agent_decision = agent_decision
+        self.rng = rng
+
+    def vote(self, sm: ClassicWerewolfStateMachine, seat: int, targets: List[int]) -> Optional[int]:
+        decision = self.agent_decision.decide_agent_vote(sm.room_id, seat, targets, sm.context)
+        return decision.get('targetSeat')
+
+    def night_action(self, sm: ClassicWerewolfStateMachine, seat: int, role: str) -> Dict:
+        targets = [s for s in sm.context.get_alive_players() if s != seat]
+        return self.agent_decision.decide_agent_action(sm.room_id, seat, role, targets, sm.context)
+
+    def finish(self, room_id: str):
+        """对局结束，释放该房间的 Agent 上下文"""
+        self.agent_decision.clear_agent_contexts(room_id)
+
+
+def _skip_to_deadline(sm: ClassicWerewolfStateMachine, clock: VirtualClock):
+    """当前计时无人可推进（如夜晚角色已死亡）时，虚拟时钟直接跳到截止时间触发超时推进"""
+    deadline = sm.next_deadline()
+    if deadline is not None:
+        clock.advance_to(deadline)
+    sm.check_timeouts()
+
+
+def play_game(room_id: str, seat_count: int, policy, role_pool: Optional[List[Role]] = None,
+              seed: Optional[int] = None, mode: str = 'classic') -> Dict:
+    """
+    跑完一局游戏
+
+    参数:
+        room_id: 房间ID
+        seat_count: 座位数
+        policy: 决策策略（RulePolicy / AgentPolicy）
+        role_pool: 自定义角色池（可选）
+        seed: 房间随机种子（可选）
+        mode: 游戏模式（classic / quick / large）
+
+    返回:
+        {'result', 'rounds', 'steps', 'phases': Counter, 'timer_seconds', 'state_machine'}
+    """
+    clock = VirtualClock()
+    sm = create_state_machine(room_id, mode, seat_count, clock=clock, seed=seed)
+    ctx = sm.context
+    sm.assign_roles(role_pool)
+    sm.start_round()
+
+    steps = 0
+    # 打开过的计时窗口 → 时限（秒），用于计算每局计时上限
+    timers = {}
+    while ctx.result == 'ongoing' and ctx.phase != 'game_over' and steps < MAX_STEPS_PER_GAME:
+        steps += 1
+        phase = ctx.phase
+
+        if phase == 'day_discussion':
+            # 当前发言者（大房间模式为整个发言窗口）
+            speakers = sm.current_speakers()
+            if speakers:
+                timers[('speech', ctx.round, ctx.current_speaker_index)] = ctx.speaking_time_limit
+            for speaker in speakers:
+                sm.handle_player_action('speech', {'seat': speaker, 'text': f'{speaker}号发言'})
+            sm.advance_speaker()
+
+        elif phase == 'day_voting':
+            timers[('vote', ctx.round)] = ctx.voting_time_limit
+            alive = ctx.get_alive_players()
+            for seat in alive:
+                if ctx.phase != 'day_voting' or ctx.players[seat].has_voted:
+                    continue
+                target = policy.vote(sm, seat, [s for s in alive if s != seat])
+                if target is None or not sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': target})[0]:
+                    # 无效投票时随机补票，保证投票能够结束
+                    sm.handle_player_action('vote', {'voterSeat': seat, 'targetSeat': policy.rng.choice(alive)})
+
+        elif phase == 'night_action':
+            window = ctx.night_current_role
+            timers[('night', ctx.round, window)] = ctx.night_role_time_limit
+            if window == NIGHT_ALL_ROLES:
+                # 快速模式：尚未完成的角色在同一个窗口内依次提交
+                roles = [r for r in sm.NIGHT_ROLES if r not in ctx.night_actions_completed]
+            else:
+                roles = [window]
+            acted = False
+            for role in roles:
+                for seat in [s for s in ctx.get_alive_players() if ctx.players[s].role.value == role]:
+                    if ctx.phase != 'night_action' or ctx.night_current_role != window or \
+                            role in ctx.night_actions_completed:
+                        break
+                    decision = policy.night_action(sm, seat, role)
+                    success, _, _ = sm.handle_player_action('night_action', {
+                        'playerSeat': seat,
+                        'role': role,
+                        'actionType': decision.get('actionType'),
+                        'targetSeat': decision.get('targetSeat')
+                    })
+                    acted = acted or success
+            if not acted and ctx.phase == 'night_action' and ctx.night_current_role == window:
+                # 当前窗口无人可推进（角色已死亡或动作无效），等待超时
+                _skip_to_deadline(sm, clock)
+
+        else:
+            sm.start_round()
+
+    policy.finish(room_id)
+
+    phases = Counter(
+        msg.content.get('phase') for msg in ctx.messages if msg.type == 'phase_change'
+    )
+    return {
+        'result': ctx.result if steps < MAX_STEPS_PER_GAME else 'aborted',
+        'rounds': ctx.round,
+        'steps': steps,
+        'phases': phases,
+        'timer_seconds': sum(timers.values()),
+        'state_machine': sm,
+    }
+
+
+def _run_batch(args) -> Dict:
+    """在一个工作进程中跑一批对局，返回聚合统计"""
+    worker_id, game_count, seat_counts, role_pool, policy_name, seed, record_slowest, mode = args
+    logging.getLogger('state_machine').setLevel(logging.WARNING)
+    logging.getLogger('agent_decision').setLevel(logging.WARNING)
+
+    rng = random.Random(seed)
+    policy = AgentPolicy(rng) if policy_name == 'agents' else RulePolicy(rng)
+
+    outcomes = Counter()
+    phases = Counter()
+    rounds = 0
+    steps = 0
+    timer_seconds = 0
+    slowest = (0.0, None)  # (耗时, 回放记录)
+    started = time.perf_counter()
+    for i in range(game_count):
+        seat_count = seat_counts[i % len(seat_counts)]
+        game_started = time.perf_counter()
+        stats = play_game(f'sim_{worker_id}_{i}', seat_count, policy, role_pool, seed=rng.getrandbits(63),
+                          mode=mode)
+        game_seconds = time.perf_counter() - game_started
+        if record_slowest and game_seconds > slowest[0]:
+            slowest = (game_seconds, stats['state_machine'].export_replay())
+        outcomes[stats['result']] += 1
+        phases.update(stats['phases'])
+        rounds += stats['rounds']
+        steps += stats['steps']
+        timer_seconds += stats['timer_seconds']
+
+    return {
+        'games': game_count,
+        'outcomes': outcomes,
+        'phases': phases,
+        'rounds': rounds,
+        'steps': steps,
+        'timer_seconds': timer_seconds,
+        'cpu_seconds': time.perf_counter() - started,
+        'slowest': slowest,
+    }
+
+
+def parse_role_pool(spec: Optional[str]) -> Optional[List[Role]]:
+    """解析角色池参数，如 'werewolf:3,seer:1,villager:8'"""
+    if not spec:
+        return None
+    pool = []
+    for item in spec.split(','):
+        name, _, count = item.partition(':')
+        pool.extend([Role(name.strip())] * int(count or 1))
+    return pool
+
+
+def run_simulation(games: int, workers: int, seat_counts: List[int],
+                   role_pool: Optional[List[Role]] = None, policy: str = 'rule', seed: int = 0,
+                   record_slowest: Optional[str] = None, mode: str = 'classic') -> Dict:
+    """
+    并行跑多局游戏并汇总统计
+
+    参数:
+        games: 总局数
+        workers: 工作进程数（1 表示在当前进程中运行）
+        seat_counts: 座位数列表（按局轮换）
+        role_pool: 自定义角色池（可选）
+        policy: 'rule' 或 'agents'
+        seed: 随机种子
+        record_slowest: 保存最慢一局回放记录的文件路径（可选）
+        mode: 游戏模式（classic / quick / large）
+
+    返回:
+        汇总统计字典
+    """
+    if role_pool is not None and any(len(role_pool) != n for n in seat_counts):
+        raise ValueError("自定义角色池的数量必须与所有座位数一致")
+
+    workers = max(1, min(workers, games))
+    batches = [
+        (w, games // workers + (1 if w < games % workers else 0), seat_counts, role_pool, policy, seed + w,
+         bool(record_slowest), mode)
+        for w in range(workers)
+    ]
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [_run_batch(batches[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_run_batch, batches)
+    elapsed = time.perf_counter() - started
+
+    outcomes = Counter()
+    phases = Counter()
+    for r in results:
+        outcomes.update(r['outcomes'])
+        phases.update(r['phases'])
+    transitions = sum(phases.values())
+
+    if record_slowest:
+        seconds, record = max((r['slowest'] for r in results), key=lambda item: item[0])
+        with open(record_slowest, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False)
+    total_rounds = sum(r['rounds'] for r in results)
+    avg_timer_seconds = sum(r['timer_seconds'] for r in results) / games if games else 0
+
+    return {
+        'games': games,
+        'workers': workers,
+        'seatCounts': seat_counts,
+        'mode': mode,
+        'policy': policy,
+        'elapsedSeconds': round(elapsed, 3),
+        'gamesPerSecond': round(games / elapsed, 1) if elapsed > 0 else None,
+        'transitions': transitions,
+        'transitionsPerSecond': round(transitions / elapsed, 1) if elapsed > 0 else None,
+        'avgRounds': round(total_rounds / games, 2) if games else 0,
+        'avgTimerSeconds': round(avg_timer_seconds, 1),
+        'gamesPerRoomHour': round(3600 / avg_timer_seconds, 2) if avg_timer_seconds else None,
+        'steps': sum(r['steps'] for r in results),
+        'outcomes': dict(outcomes),
+        'phaseCounts': dict(phases),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='无头狼人杀对局模拟器')
+    parser.add_argument('--games', type=int, default=1000, help='总局数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='工作进程数')
+    parser.add_argument('--seats', default='12', help='座位数，多个用逗号分隔（按局轮换）')
+    parser.add_argument('--mode', choices=get_supported_modes(), default='classic', help='游戏模式')
+    parser.add_argument('--roles', default=None, help='自定义角色池，如 werewolf:3,seer:1,witch:1,hunter:1,villager:6')
+    parser.add_argument('--policy', choices=['rule', 'agents'], default='rule', help='决策策略')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--record-slowest', default=None, help='保存最慢一局的回放记录到指定文件')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    args = parser.parse_args()
+
+    report = run_simulation(
+        games=args.games,
+        workers=args.workers,
+        seat_counts=[int(s) for s in args.seats.split(',')],
+        role_pool=parse_role_pool(args.roles),
+        policy=args.policy,
+        seed=args.seed,
+        record_slowest=args.record_slowest,
+        mode=args.mode,
+    )
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
+    print("🎮 模拟完成")
+    print(f"  局数: {report['games']}  进程: {report['workers']}  座位: {report['seatCounts']}  "
+          f"模式: {report['mode']}  策略: {report['policy']}")
+    print(f"  耗时: {report['elapsedSeconds']}s  每秒对局: {report['gamesPerSecond']}")
+    print(f"  状态转换: {report['transitions']}  每秒转换: {report['transitionsPerSecond']}")
+    print(f"  平均轮数: {report['avgRounds']}")
+    print(f"  每局计时上限: {report['avgTimerSeconds']}s  单房间每小时对局: {report['gamesPerRoomHour']}")
+    print(f"  胜负分布: {report['outcomes']}")
+    print(f"  阶段计数: {report['phaseCounts']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+请求追踪
+在一次请求内记录嵌套的耗时区间（span）：路由 → GameEngine → 状态机 → Agent 提示词构建 / 大模型调用。
+当前 span 保存在 contextvars 中，没有活动追踪时 span() 几乎没有开销（状态机在模拟器中也可直接调用）。
+结束的追踪按采样率保留，慢请求总是保留；保留的追踪进入内存环形缓冲，可选导出到文件。
+"""
+import contextvars
+import functools
+import itertools
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+class Span:
+    """一段计时区间"""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'trace', 'start', 'end', 'attributes')
+
+    def __init__(self, name: str, trace: 'Trace', parent_id: Optional[int], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace = trace
+        self.span_id = next(trace.span_ids)
+        self.parent_id = parent_id
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'spanId': self.span_id,
+            'parentId': self.parent_id,
+            'startMs': round((self.start - self.trace.root.start) * 1000, 3),
+            'durationMs': round(self.duration * 1000, 3),
+            'attributes': self.attributes,
+        }
+
+
+class Trace:
+    """一次请求的追踪"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.trace_id = f"{int(time.time() * 1000):x}-{next(self._ids)}"
+        self.name = name
+        self.timestamp = time.time()
+        self.span_ids = itertools.count(1)
+        self.spans: List[Span] = []
+        self.root = Span(name, self, None, attributes)
+        self.spans.append(self.root)
+
+    @property
+    def duration(self) -> float:
+        return self.root.duration
+
+    def to_dict(self) -> Dict:
+        return {
+            'traceId': self.trace_id,
+            'name': self.name,
+            'timestamp': self.timestamp,
+            'durationMs': round(self.duration * 1000, 3),
+            'attributes': self.root.attributes,
+            'spans': [span.to_dict() for span in self.spans[1:]],
+        }
+
+
+class TraceCollector:
+    """
+    追踪收集器
+
+    结束的追踪按采样率保留（超过慢请求阈值的总是保留），
+    保留的追踪放入环形缓冲，并交给 exporter（如写文件）。
+    """
+
+    def __init__(self, sample_rate: float = 0.01, slow_seconds: float = 1.0, ring_size: int = 1000,
+                 exporter: Optional[Callable[[Dict], None]] = None):
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.exporter = exporter
+        self._ring: deque = deque(maxlen=ring_size)
+        self._sampler = random.Random()
+        self._lock = threading.Lock()
+
+    def submit(self, trace: Trace):
+        if trace.duration < self.slow_seconds and self._sampler.random() >= self.sample_rate:
+            return
+        record = trace.to_dict()
+        with self._lock:
+            self._ring.append(record)
+        if self.exporter is not None:
+            self.exporter(record)
+
+    def resize(self, ring_size: int):
+        """调整环形缓冲大小（保留最近的追踪）"""
+        with self._lock:
+            self._ring = deque(self._ring, maxlen=ring_size)
+
+    def recent(self) -> List[Dict]:
+        with self._lock:
+            return list(self._ring)
+
+    def slowest(self, name: Optional[str] = None, limit: int = 5) -> Dict[str, List[Dict]]:
+        """
+        每个追踪名（路由）最慢的若干条最近追踪
+
+        参数:
+            name: 只返回指定路由（可选）
+            limit: 每个路由返回的条数
+        """
+        grouped: Dict[str, List[Dict]] = {}
+        for record in self.recent():
+            if name is None or record['name'] == name:
+                grouped.setdefault(record['name'], []).append(record)
+        return {
+            key: sorted(records, key=lambda r: r['durationMs'], reverse=True)[:limit]
+            for key, records in grouped.items()
+        }
+
+    def clear(self):
+        with self._lock:
+            self._ring.clear()
+
+
+COLLECTOR = TraceCollector()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('wolf_current_span', default=None)
+
+
+def start_trace(name: str, **attributes) -> contextvars.Token:
+    """开始一次追踪（返回的 token 交给 finish_trace）"""
+    trace = Trace(name, attributes)
+    return _current_span.set(trace.root)
+
+
+def finish_trace(token: contextvars.Token, **attributes) -> Optional[Trace]:
+    """结束追踪并提交给收集器"""
+    root = _current_span.get()
+    _current_span.reset(token)
+    if root is None:
+        return None
+    trace = root.trace
+    trace.root.attributes.update(attributes)
+    trace.root.end = time.perf_counter()
+    COLLECTOR.submit(trace)
+    return trace
+
+
+def active() -> bool:
+    """当前是否有活动追踪"""
+    return _current_span.get() is not None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    在当前追踪下记录一个子区间（没有活动追踪时什么也不做，产出 None）
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace, parent.span_id, attributes)
+    parent.trace.spans.append(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end = time.perf_counter()
+        _current_span.reset(token)
+
+
+def traced(name: str):
+    """把函数调用记录为一个 span 的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def set_attribute(key: str, value: Any):
+    """给当前 span 添加属性"""
+    current = _current_span.get()
+    if current is not None:
+        current.set_attribute(key, value)